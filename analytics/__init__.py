@@ -0,0 +1,28 @@
+"""NumPy-backed representations for bulk analysis of MISP data.
+
+As in :mod:`models`, the names below are reachable from the package itself
+but their submodules are only imported on first lookup, so using one index
+does not load every other one and the models they depend on.
+"""
+from __future__ import annotations
+
+from models import lazy_exports
+
+_MODULE_EXPORTS = {
+    "attribute_batch": ("AttributeBatch", "StringPool"),
+    "correlation": ("CorrelationIndex",),
+    "decay": ("DecayEvent", "DecayScheduler", "PolynomialDecay"),
+    "exports": ("ExportStats", "ExportWriter", "export"),
+    "freetext": ("Ioc", "IocExtractor"),
+    "fuzzy": ("FuzzyHashIndex", "FuzzyMatch", "SsdeepIndex", "TlshIndex"),
+    "hostnames": ("HostnameIndex",),
+    "networks": ("NetworkIndex",),
+    "search": ("AttributeSearchEngine",),
+    "snapshot": ("Snapshot", "SnapshotError", "SnapshotWriter"),
+    "visibility": ("VisibilityEngine",),
+    "warninglists": ("CompiledWarninglists", "WarninglistHit", "WarninglistMatcher"),
+}
+
+__all__ = sorted(name for names in _MODULE_EXPORTS.values() for name in names)
+
+__getattr__, __dir__ = lazy_exports(__name__, _MODULE_EXPORTS)
@@ -0,0 +1,363 @@
+"""Columnar storage for large attribute result sets.
+
+A validated :class:`~models.attributes.ExtendedAttribute` carries several
+``RootModel`` wrappers, regex-checked strings and enum members per row.
+:class:`AttributeBatch` keeps the same rows as NumPy columns instead: integer
+ids and timestamps as ``int64``, enumerations as ``uint8`` codes, flags as
+``bool`` and values in one contiguous UTF-8 pool, and only builds models
+again for the rows that are asked for.
+"""
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Union,
+)
+from uuid import UUID
+
+import numpy as np
+
+from models.attributes import ExtendedAttribute
+from models.common import AttributeCategory, AttributeType, DistributionLevelId
+
+#: Code stored for a missing enumeration value.
+MISSING_CODE = 255
+#: Value stored for a missing id or timestamp.
+MISSING_INT = -1
+
+TYPES = tuple(AttributeType)
+CATEGORIES = tuple(AttributeCategory)
+DISTRIBUTIONS = tuple(DistributionLevelId)
+
+_TYPE_CODES = {member.value: code for code, member in enumerate(TYPES)}
+_CATEGORY_CODES = {member.value: code for code, member in enumerate(CATEGORIES)}
+_DISTRIBUTION_CODES = {
+    member.value: code for code, member in enumerate(DISTRIBUTIONS)
+}
+
+_NIL_UUID = bytes(16)
+#: The strings pydantic accepts for a ``bool``.
+_BOOL_STRINGS = {
+    **dict.fromkeys(("0", "off", "f", "false", "n", "no"), False),
+    **dict.fromkeys(("1", "on", "t", "true", "y", "yes"), True),
+}
+
+Index = Union[int, slice, Sequence[int], np.ndarray]
+
+
+class StringPool:
+    """Variable-length UTF-8 strings stored back to back in one buffer.
+
+    String ``i`` is ``data[offsets[i]:offsets[i + 1]]``; ``None`` is kept
+    apart from ``""`` by ``missing``.
+    """
+
+    __slots__ = ("data", "offsets", "missing")
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, missing: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self.missing = missing
+
+    @classmethod
+    def from_strings(cls, strings: Sequence[Optional[str]]) -> StringPool:
+        encoded = [b"" if s is None else s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(
+            np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            offsets,
+            np.fromiter((s is None for s in strings), dtype=bool, count=len(strings)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if self.missing[index]:
+            return None
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Encoded length of every string, in bytes."""
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes + self.missing.nbytes
+
+    def take(self, indices: np.ndarray) -> StringPool:
+        """Gather the strings at ``indices`` into a new, compact pool."""
+        lengths = self.lengths[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Byte ``j`` of output string ``k`` comes from ``starts[k] + j``.
+        shift = np.repeat(self.offsets[:-1][indices] - offsets[:-1], lengths)
+        positions = shift + np.arange(offsets[-1], dtype=np.int64)
+        return StringPool(self.data[positions], offsets, self.missing[indices])
+
+    def equals(self, value: str) -> np.ndarray:
+        """Mask of the strings equal to ``value``."""
+        needle = np.frombuffer(value.encode("utf-8"), dtype=np.uint8)
+        mask = (self.lengths == len(needle)) & ~self.missing
+        candidates = np.flatnonzero(mask)
+        if len(needle) and len(candidates):
+            starts = self.offsets[candidates]
+            window = self.data[starts[:, None] + np.arange(len(needle))]
+            mask[candidates] = (window == needle).all(axis=1)
+        return mask
+
+
+class AttributeBatch:
+    """Attributes stored column by column.
+
+    Build one with :meth:`from_payload` from the raw JSON rows of an
+    ``/attributes/restSearch`` response (``response["Attribute"]``), or with
+    :meth:`from_models` from already validated attributes. Columns are plain
+    NumPy arrays and can be combined freely into masks for :meth:`filter`.
+
+    Only the columns below are kept; ``comment``, ``object_relation``,
+    ``first_seen``/``last_seen``, ``sharing_group_id``, attachments, decay
+    scores and the nested ``Event``/``Object``/``Tag`` are dropped.
+    """
+
+    __slots__ = (
+        "id",
+        "event_id",
+        "object_id",
+        "timestamp",
+        "type",
+        "category",
+        "distribution",
+        "to_ids",
+        "deleted",
+        "uuid",
+        "event_uuid",
+        "value",
+    )
+
+    def __init__(
+        self,
+        id: np.ndarray,
+        event_id: np.ndarray,
+        object_id: np.ndarray,
+        timestamp: np.ndarray,
+        type: np.ndarray,
+        category: np.ndarray,
+        distribution: np.ndarray,
+        to_ids: np.ndarray,
+        deleted: np.ndarray,
+        uuid: np.ndarray,
+        event_uuid: np.ndarray,
+        value: StringPool,
+    ):
+        self.id = id
+        self.event_id = event_id
+        self.object_id = object_id
+        self.timestamp = timestamp
+        self.type = type
+        self.category = category
+        self.distribution = distribution
+        self.to_ids = to_ids
+        self.deleted = deleted
+        self.uuid = uuid
+        self.event_uuid = event_uuid
+        self.value = value
+
+    @classmethod
+    def from_payload(cls, rows: Iterable[Mapping[str, Any]]) -> AttributeBatch:
+        """Build a batch from raw attribute dictionaries.
+
+        Values go through the same conversions as the model fields would,
+        without instantiating them; an unknown ``type``, ``category`` or
+        ``distribution`` raises :class:`ValueError`.
+        """
+        columns: Dict[str, list] = {name: [] for name in cls.__slots__}
+        for row in rows:
+            columns["id"].append(_int(row.get("id")))
+            columns["event_id"].append(_int(row.get("event_id")))
+            columns["object_id"].append(_int(row.get("object_id")))
+            columns["timestamp"].append(_int(row.get("timestamp")))
+            columns["type"].append(_code(_TYPE_CODES, row.get("type")))
+            columns["category"].append(_code(_CATEGORY_CODES, row.get("category")))
+            columns["distribution"].append(
+                _code(_DISTRIBUTION_CODES, row.get("distribution"))
+            )
+            columns["to_ids"].append(_bool(row.get("to_ids")))
+            columns["deleted"].append(_bool(row.get("deleted")))
+            columns["uuid"].append(_uuid_bytes(row.get("uuid")))
+            columns["event_uuid"].append(_uuid_bytes(row.get("event_uuid")))
+            columns["value"].append(row.get("value"))
+        return cls._from_columns(columns)
+
+    @classmethod
+    def from_models(cls, attributes: Iterable[ExtendedAttribute]) -> AttributeBatch:
+        """Build a batch from validated attributes, e.g. an ``AttributeRestSearchList``."""
+        return cls.from_payload(
+            attribute.model_dump(mode="json")
+            for attribute in getattr(attributes, "root", attributes)
+        )
+
+    @classmethod
+    def _from_columns(cls, columns: Dict[str, list]) -> AttributeBatch:
+        return cls(
+            id=np.array(columns["id"], dtype=np.int64),
+            event_id=np.array(columns["event_id"], dtype=np.int64),
+            object_id=np.array(columns["object_id"], dtype=np.int64),
+            timestamp=np.array(columns["timestamp"], dtype=np.int64),
+            type=np.array(columns["type"], dtype=np.uint8),
+            category=np.array(columns["category"], dtype=np.uint8),
+            distribution=np.array(columns["distribution"], dtype=np.uint8),
+            to_ids=np.array(columns["to_ids"], dtype=bool),
+            deleted=np.array(columns["deleted"], dtype=bool),
+            uuid=_uuid_column(columns["uuid"]),
+            event_uuid=_uuid_column(columns["event_uuid"]),
+            value=StringPool.from_strings(columns["value"]),
+        )
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the columns."""
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    def type_in(self, *types: Union[AttributeType, str]) -> np.ndarray:
+        """Mask of the rows whose type is one of ``types``."""
+        return np.isin(self.type, [_TYPE_CODES[AttributeType(t).value] for t in types])
+
+    def category_in(self, *categories: Union[AttributeCategory, str]) -> np.ndarray:
+        """Mask of the rows whose category is one of ``categories``."""
+        return np.isin(
+            self.category,
+            [_CATEGORY_CODES[AttributeCategory(c).value] for c in categories],
+        )
+
+    def distribution_in(
+        self, *distributions: Union[DistributionLevelId, str]
+    ) -> np.ndarray:
+        """Mask of the rows whose distribution is one of ``distributions``."""
+        return np.isin(
+            self.distribution,
+            [_DISTRIBUTION_CODES[DistributionLevelId(d).value] for d in distributions],
+        )
+
+    def timestamp_between(
+        self, since: Optional[int] = None, until: Optional[int] = None
+    ) -> np.ndarray:
+        """Mask of the rows with ``since <= timestamp <= until``."""
+        mask = self.timestamp != MISSING_INT
+        if since is not None:
+            mask &= self.timestamp >= since
+        if until is not None:
+            mask &= self.timestamp <= until
+        return mask
+
+    def value_equals(self, value: str) -> np.ndarray:
+        """Mask of the rows whose value is exactly ``value``."""
+        return self.value.equals(value)
+
+    def filter(self, mask: np.ndarray) -> AttributeBatch:
+        """Rows where the boolean ``mask`` is true, as a new batch."""
+        return self.take(np.flatnonzero(mask))
+
+    def take(self, indices: Index) -> AttributeBatch:
+        """Rows at ``indices``, in that order, as a new batch."""
+        if isinstance(indices, slice):
+            indices = np.arange(len(self))[indices]
+        else:
+            indices = np.asarray(indices, dtype=np.int64)
+        columns = {
+            name: getattr(self, name)[indices]
+            for name in self.__slots__
+            if name != "value"
+        }
+        return AttributeBatch(value=self.value.take(indices), **columns)
+
+    def __getitem__(self, index: Index) -> Union[ExtendedAttribute, AttributeBatch]:
+        if isinstance(index, (int, np.integer)):
+            return self.to_attribute(int(index))
+        if isinstance(index, np.ndarray) and index.dtype == bool:
+            return self.filter(index)
+        return self.take(index)
+
+    def __iter__(self) -> Iterator[ExtendedAttribute]:
+        for index in range(len(self)):
+            yield self.to_attribute(index)
+
+    def to_attribute(self, index: int) -> ExtendedAttribute:
+        """Build the :class:`ExtendedAttribute` for row ``index``."""
+        return ExtendedAttribute(
+            id=_str(self.id[index]),
+            event_id=_str(self.event_id[index]),
+            object_id=_str(self.object_id[index]),
+            timestamp=_str(self.timestamp[index]),
+            type=_member(TYPES, self.type[index]),
+            category=_member(CATEGORIES, self.category[index]),
+            distribution=_member(DISTRIBUTIONS, self.distribution[index]),
+            to_ids=bool(self.to_ids[index]),
+            deleted=bool(self.deleted[index]),
+            uuid=_uuid(self.uuid[index]),
+            event_uuid=_uuid(self.event_uuid[index]),
+            value=self.value[index],
+        )
+
+
+def _int(value: Any) -> int:
+    if value is None or value == "":
+        return MISSING_INT
+    return int(value)
+
+
+def _bool(value: Any) -> bool:
+    """``value`` read as pydantic reads a ``bool`` field; unset is False."""
+    if value is None or value is True or value is False:
+        return bool(value)
+    if isinstance(value, str):
+        flag = _BOOL_STRINGS.get(value.lower())
+        if flag is not None:
+            return flag
+    elif isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    raise ValueError(f"invalid boolean {value!r}")
+
+
+def _str(value: np.int64) -> Optional[str]:
+    return None if value == MISSING_INT else str(value)
+
+
+def _code(codes: Mapping[str, int], value: Any) -> int:
+    if value is None:
+        return MISSING_CODE
+    try:
+        return codes[getattr(value, "value", value)]
+    except KeyError:
+        raise ValueError(f"unknown value {value!r}") from None
+
+
+def _member(members: Sequence[Any], code: np.uint8) -> Any:
+    return None if code == MISSING_CODE else members[code]
+
+
+def _uuid_bytes(value: Any) -> bytes:
+    if not value:
+        return _NIL_UUID
+    return (value if isinstance(value, UUID) else UUID(value)).bytes
+
+
+def _uuid_column(values: Sequence[bytes]) -> np.ndarray:
+    return np.frombuffer(b"".join(values), dtype="V16").copy()
+
+
+def _uuid(value: np.void) -> Optional[UUID]:
+    raw = value.tobytes()
+    return None if raw == _NIL_UUID else UUID(bytes=raw)
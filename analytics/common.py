@@ -0,0 +1,73 @@
+"""Helpers shared by the indexes of :mod:`analytics`.
+
+A posting packs ``(event_id << ID_BITS) | attribute_id`` into one integer
+in the correlation, hostname and network indexes alike, and the hostname
+and network indexes parse values the way :class:`WarninglistMatcher` does,
+so these live here rather than in any one of those modules.
+"""
+from __future__ import annotations
+
+import socket
+from typing import Any, Optional, Tuple
+from urllib.parse import urlsplit
+
+#: Bits of a posting holding the attribute id.
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+#: Attribute types whose value is a URL; hostname lists match their host.
+URL_TYPES = frozenset({"url", "uri", "link"})
+
+#: Trie key marking the end of an entry.
+TRIE_END = ""
+
+_FAMILIES = ((socket.AF_INET, 32), (socket.AF_INET6, 128))
+
+
+def record_id(value: Any) -> int:
+    """The event or attribute id in ``value``, checked to fit a posting."""
+    value = getattr(value, "root", value)
+    if value is None or value == "":
+        raise ValueError("attribute and event ids are needed to index correlations")
+    number = int(value)
+    if not 0 <= number <= ID_MASK:
+        raise ValueError(f"id {number} does not fit in {ID_BITS} bits")
+    return number
+
+
+def hostname_of(value: str, type: Optional[str]) -> Optional[str]:
+    """The lowercased host of ``value``, or of its URL for ``URL_TYPES``."""
+    if type in URL_TYPES or (type is None and "://" in value):
+        try:
+            return urlsplit(value if "//" in value else f"//{value}").hostname
+        except ValueError:
+            return None
+    return value.lower().rstrip(".")
+
+
+def parse_address(value: str) -> Optional[Tuple[int, int, int]]:
+    """``(family, address, length)`` of an IP address."""
+    for family, bits in _FAMILIES:
+        try:
+            packed = socket.inet_pton(family, value)
+        except (OSError, ValueError):
+            continue
+        return family, int.from_bytes(packed, "big"), bits
+    return None
+
+
+def parse_network(value: str) -> Optional[Tuple[int, int, int]]:
+    """``(family, network, length)`` of a CIDR block, host bits cleared."""
+    address, _, length = value.partition("/")
+    parsed = parse_address(address)
+    if parsed is None:
+        return None
+    family, number, bits = parsed
+    if length:
+        if not length.isdigit() or int(length) > bits:
+            return None
+        bits_kept = int(length)
+    else:
+        bits_kept = bits
+    mask = ((1 << bits_kept) - 1) << (bits - bits_kept)
+    return family, number & mask, bits_kept
@@ -0,0 +1,291 @@
+"""In-memory exact-value correlation across events.
+
+MISP correlates two attributes of different events when they hold the same
+value, and stores each pair in its ``Correlation`` table. That table lives
+on the server. :class:`CorrelationIndex` answers the same "which events hold
+this value" question locally, from an inverted index of normalized values
+to posting lists.
+
+A posting packs ``(event_id << 32) | attribute_id`` into one integer. A
+value seen once keeps that bare integer, and longer lists use a sorted
+``array("Q")``, so the index costs little more than its keys and 8 bytes
+per posting. Sorted postings keep each event's postings together: deleting
+an event cuts one slice out of each of its lists, even under values shared
+by half of the index.
+"""
+from __future__ import annotations
+
+import bisect
+import sys
+from array import array
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from analytics.common import ID_BITS, ID_MASK, record_id
+from models.attributes import AttributeNoId
+from models.events import ExtendedEvent
+
+#: Types MISP never correlates on.
+NON_CORRELATING_TYPES = frozenset(
+    {
+        "comment",
+        "http-method",
+        "aba-rtn",
+        "gender",
+        "counter",
+        "float",
+        "port",
+        "nationality",
+        "cortex",
+        "boolean",
+        "anonymised",
+    }
+)
+
+Postings = Union[int, array]
+
+
+def correlation_keys(
+    value: Optional[str], type: Optional[str] = None
+) -> Tuple[str, ...]:
+    """The normalized values ``value`` correlates on.
+
+    Values compare case-insensitively and without surrounding blanks, and
+    a composite value (``domain|ip``, ...) correlates on each of its parts.
+    """
+    if not value:
+        return ()
+    parts = value.split("|") if type and "|" in type else (value,)
+    keys = []
+    for part in parts:
+        key = part.strip().lower()
+        if key and key not in keys:
+            keys.append(key)
+    return tuple(keys)
+
+
+class CorrelationIndex:
+    """Inverted index from normalized attribute values to their events.
+
+    :meth:`add_event` replaces whatever was indexed for the event before,
+    so feeding each new version of an event keeps the index current. The
+    index is not safe for concurrent writers.
+    """
+
+    def __init__(self, non_correlating_types: FrozenSet[str] = NON_CORRELATING_TYPES):
+        self.non_correlating_types = non_correlating_types
+        self._postings: Dict[str, Postings] = {}
+        #: Keys each event has postings under, to delete it again. A key
+        #: repeated within an event is listed again; deleting it twice is
+        #: harmless and a list costs far less than a set.
+        self._events: Dict[int, List[str]] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct values indexed."""
+        return len(self._postings)
+
+    def __contains__(self, value: str) -> bool:
+        return value.strip().lower() in self._postings
+
+    @property
+    def events(self) -> int:
+        """Number of events with at least one posting."""
+        return len(self._events)
+
+    @property
+    def postings(self) -> int:
+        return sum(
+            1 if isinstance(postings, int) else len(postings)
+            for postings in self._postings.values()
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index: keys, posting lists and event key sets."""
+        size = sys.getsizeof(self._postings) + sys.getsizeof(self._events)
+        for key, postings in self._postings.items():
+            size += sys.getsizeof(key) + sys.getsizeof(postings)
+        for event_id, keys in self._events.items():
+            size += sys.getsizeof(event_id) + sys.getsizeof(keys)
+        return size
+
+    def add_event(self, event: ExtendedEvent) -> int:
+        """Index the attributes of ``event`` and its objects.
+
+        Deleted attributes, non-correlating types and attributes or events
+        with ``disable_correlation`` are left out. Returns the number of
+        postings added.
+        """
+        event_id = record_id(event.id)
+        self.remove_event(event_id)
+        if event.disable_correlation:
+            return 0
+        attributes: List[Any] = list(event.Attribute or ())
+        for item in event.Object or ():
+            if not item.deleted:
+                attributes.extend(item.Attribute or ())
+        return sum(self.add_attribute(attribute, event_id) for attribute in attributes)
+
+    def add_events(self, events: Iterable[ExtendedEvent]) -> int:
+        return sum(self.add_event(event) for event in events)
+
+    def add_attribute(
+        self, attribute: AttributeNoId, event_id: Optional[int] = None
+    ) -> int:
+        """Index one attribute; it needs an ``id`` and an event id."""
+        if attribute.deleted or attribute.disable_correlation:
+            return 0
+        type = getattr(attribute.type, "value", attribute.type)
+        if event_id is None:
+            event_id = record_id(attribute.event_id)
+        return self.add(
+            event_id, record_id(getattr(attribute, "id", None)), attribute.value, type
+        )
+
+    def add(
+        self,
+        event_id: int,
+        attribute_id: int,
+        value: Optional[str],
+        type: Optional[str] = None,
+    ) -> int:
+        """Index ``value`` for one attribute; the primitive the others use."""
+        if type in self.non_correlating_types:
+            return 0
+        keys = correlation_keys(value, type)
+        if not keys:
+            return 0
+        posting = (event_id << ID_BITS) | attribute_id
+        index = self._postings
+        event_keys = self._events.setdefault(event_id, [])
+        for key in keys:
+            postings = index.get(key)
+            if postings is None:
+                index[key] = posting
+            elif isinstance(postings, int):
+                index[key] = array("Q", sorted((postings, posting)))
+            elif posting > postings[-1]:
+                postings.append(posting)
+            else:
+                bisect.insort(postings, posting)
+            event_keys.append(key)
+        return len(keys)
+
+    def remove_event(self, event_id: Union[int, str]) -> int:
+        """Drop every posting of ``event_id``; returns how many there were."""
+        event_id = int(event_id)
+        keys = self._events.pop(event_id, None)
+        if not keys:
+            return 0
+        return sum(self._remove(key, event_id) for key in keys)
+
+    def remove_attribute(
+        self,
+        event_id: int,
+        attribute_id: int,
+        value: Optional[str],
+        type: Optional[str] = None,
+    ) -> int:
+        removed = 0
+        for key in correlation_keys(value, type):
+            removed += self._remove(key, event_id, attribute_id)
+        return removed
+
+    def lookup(self, value: str, type: Optional[str] = None) -> List[Tuple[int, int]]:
+        """``(event_id, attribute_id)`` of the attributes holding ``value``."""
+        return [
+            posting
+            for key in correlation_keys(value, type)
+            for posting in _unpack(self._postings.get(key))
+        ]
+
+    def event_ids(self, value: str, type: Optional[str] = None) -> List[int]:
+        """Ids of the events holding ``value``, ascending."""
+        event_ids: Set[int] = set()
+        for key in correlation_keys(value, type):
+            postings = self._postings.get(key)
+            if postings is None:
+                continue
+            if isinstance(postings, int):
+                event_ids.add(postings >> ID_BITS)
+            else:
+                # Postings are sorted, so each event's postings are adjacent.
+                events = np.frombuffer(postings, dtype=np.uint64) >> ID_BITS
+                first = np.empty(len(events), dtype=bool)
+                first[0] = True
+                np.not_equal(events[1:], events[:-1], out=first[1:])
+                event_ids.update(events[first].tolist())
+        return sorted(event_ids)
+
+    def correlations(
+        self, attribute: AttributeNoId, event_id: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """Postings of other events sharing a value with ``attribute``.
+
+        Nothing correlates with an attribute that has
+        ``disable_correlation`` set or a non-correlating type.
+        """
+        type = getattr(attribute.type, "value", attribute.type)
+        if attribute.disable_correlation or type in self.non_correlating_types:
+            return []
+        if event_id is None:
+            event_id = record_id(attribute.event_id)
+        return [
+            posting
+            for posting in self.lookup(attribute.value, type)
+            if posting[0] != event_id
+        ]
+
+    def items(self) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+        for key, postings in self._postings.items():
+            yield key, list(_unpack(postings))
+
+    def _remove(
+        self, key: str, event_id: int, attribute_id: Optional[int] = None
+    ) -> int:
+        postings = self._postings.get(key)
+        if postings is None:
+            return 0
+        if attribute_id is None:
+            low, high = event_id << ID_BITS, (event_id + 1) << ID_BITS
+        else:
+            low = (event_id << ID_BITS) | attribute_id
+            high = low + 1
+        if isinstance(postings, int):
+            if not low <= postings < high:
+                return 0
+            del self._postings[key]
+            return 1
+        start = bisect.bisect_left(postings, low)
+        end = bisect.bisect_left(postings, high, start)
+        del postings[start:end]
+        if len(postings) == 1:
+            self._postings[key] = postings[0]
+        elif not postings:
+            del self._postings[key]
+        return end - start
+
+
+def _packed(postings: Optional[Postings]) -> Iterable[int]:
+    if postings is None:
+        return ()
+    if isinstance(postings, int):
+        return (postings,)
+    return postings
+
+
+def _unpack(postings: Optional[Postings]) -> Iterator[Tuple[int, int]]:
+    for posting in _packed(postings):
+        yield posting >> ID_BITS, posting & ID_MASK
@@ -0,0 +1,484 @@
+"""Vectorized ``Polynomial`` decay scoring.
+
+MISP scores an attribute ``t`` days after it was last seen as::
+
+    score = base_score * (1 - (t / lifetime) ** (1 / decay_speed))
+
+clipped at 0, and calls it decayed once ``score < threshold``. ``t`` counts
+from the later of the attribute's ``timestamp`` and its last sighting, and
+the base score is the average of the numerical values of the tags named in
+``base_score_config``, weighted by it, or ``default_base_score`` without
+such tags.
+
+:class:`PolynomialDecay` computes the same for whole NumPy arrays, so that
+``modelOverrides``, ``score`` and ``excludeDecayed`` can be applied to a
+local :class:`~analytics.attribute_batch.AttributeBatch` without asking the
+server again. Since the score only falls between sightings, the moment it
+crosses the threshold is known in advance: :class:`DecayScheduler` keeps
+those moments in a heap and reports attributes as they decay, instead of
+rescoring all of them on every query.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from analytics.attribute_batch import AttributeBatch
+from models.decay import (
+    DecayingModel,
+    DecayingModelParameters,
+    DecayScore,
+    Formula,
+    FullDecayingModel,
+)
+
+DAY = 86400.0
+#: A batch at least 1/16th of the heap is merged with one ``heapify``.
+_HEAPIFY_RATIO = 16
+
+#: A tag name and its numerical value, if it has one.
+TagValue = Tuple[str, Optional[float]]
+ArrayLike = Union[np.ndarray, Iterable[float], float]
+
+
+@dataclass(frozen=True)
+class PolynomialDecay:
+    """The parameters of a ``Polynomial`` decaying model, ready to score.
+
+    ``lifetime`` is in days. ``model`` is the model the parameters came
+    from, reported back in :meth:`decay_scores`.
+    """
+
+    lifetime: float
+    decay_speed: float
+    threshold: float
+    default_base_score: float = 0.0
+    base_score_config: Optional[Mapping[str, Any]] = None
+    model: Optional[DecayingModel] = None
+
+    @classmethod
+    def from_parameters(
+        cls,
+        parameters: DecayingModelParameters,
+        overrides: Optional[DecayingModelParameters] = None,
+        model: Optional[DecayingModel] = None,
+    ) -> PolynomialDecay:
+        """Scorer for ``parameters``, with the fields set in ``overrides``."""
+        fields = parameters.model_dump(exclude_none=True)
+        if overrides is not None:
+            fields.update(overrides.model_dump(exclude_none=True))
+        missing = {"lifetime", "decay_speed", "threshold"} - fields.keys()
+        if missing:
+            raise ValueError(f"decaying model lacks {', '.join(sorted(missing))}")
+        if fields["lifetime"] <= 0 or fields["decay_speed"] <= 0:
+            raise ValueError("lifetime and decay_speed must be positive")
+        return cls(
+            lifetime=fields["lifetime"],
+            decay_speed=fields["decay_speed"],
+            threshold=fields["threshold"],
+            default_base_score=fields.get("default_base_score", 0.0),
+            base_score_config=fields.get("base_score_config"),
+            model=model,
+        )
+
+    @classmethod
+    def from_model(
+        cls,
+        model: FullDecayingModel,
+        overrides: Optional[DecayingModelParameters] = None,
+    ) -> PolynomialDecay:
+        if model.formula not in (None, Formula.POLYNOMIAL):
+            raise ValueError(f"unsupported decay formula {model.formula}")
+        if model.parameters is None:
+            raise ValueError("decaying model has no parameters")
+        return cls.from_parameters(
+            model.parameters,
+            overrides,
+            DecayingModel(id=model.id, name=model.name),
+        )
+
+    def with_filter(self, filters: Any) -> PolynomialDecay:
+        """This scorer as a ``restSearch`` filter would adjust it.
+
+        ``modelOverrides`` replaces the parameters it sets and ``score``
+        the threshold.
+        """
+        scorer = self
+        overrides = _filter(filters, "modelOverrides")
+        if overrides is not None:
+            if isinstance(overrides, Mapping):
+                overrides = DecayingModelParameters.model_validate(overrides)
+            fields = overrides.model_dump(exclude_none=True)
+            scorer = replace(scorer, **fields)
+        score = _filter(filters, "score")
+        if score is not None:
+            scorer = replace(scorer, threshold=float(score))
+        return scorer
+
+    def base_scores(self, tags: Iterable[Iterable[TagValue]]) -> np.ndarray:
+        """Base score of each attribute from its tags.
+
+        As on the server, the weights in ``base_score_config`` are rescaled
+        over the taxonomies the attribute actually carries: each tag with a
+        weight adds its numerical value times that weight divided by the
+        sum of the weights of its attribute's weighted taxonomies.
+        Attributes without such a tag get ``default_base_score``.
+        """
+        weights = self.base_score_config or {}
+        result = []
+        for attribute_tags in tags:
+            matched = []
+            present: Dict[str, float] = {}
+            for name, numerical_value in attribute_tags:
+                if numerical_value is None:
+                    continue
+                key = name.split("=", 1)[0]
+                weight = weights.get(key)
+                if weight is None:
+                    key = name.split(":", 1)[0]
+                    weight = weights.get(key)
+                if weight is not None:
+                    matched.append((float(weight), float(numerical_value)))
+                    present[key] = float(weight)
+            if not matched:
+                result.append(self.default_base_score)
+                continue
+            total = sum(present.values())
+            result.append(
+                sum(weight * value for weight, value in matched) / total
+                if total
+                else 0.0
+            )
+        return np.asarray(result, dtype=np.float64)
+
+    def scores(
+        self,
+        timestamps: ArrayLike,
+        last_sightings: Optional[ArrayLike] = None,
+        base_scores: Optional[ArrayLike] = None,
+        now: Optional[float] = None,
+    ) -> np.ndarray:
+        """Score of each attribute at ``now``, from 0 to its base score.
+
+        ``last_sightings`` may hold 0 or NaN where there is no sighting,
+        and ``base_scores`` NaN where ``default_base_score`` applies.
+        """
+        last_seen = self._last_seen(timestamps, last_sightings)
+        base = self._base(base_scores, last_seen.shape)
+        now = time.time() if now is None else now
+        days = np.maximum(now - last_seen, 0.0) / DAY
+        scores = base * (1.0 - np.power(days / self.lifetime, 1.0 / self.decay_speed))
+        return np.maximum(scores, 0.0, out=scores)
+
+    def decayed(self, scores: np.ndarray) -> np.ndarray:
+        """Mask of the scores under the threshold."""
+        return scores < self.threshold
+
+    def expiry(
+        self,
+        timestamps: ArrayLike,
+        last_sightings: Optional[ArrayLike] = None,
+        base_scores: Optional[ArrayLike] = None,
+    ) -> np.ndarray:
+        """Time at which each attribute's score drops under the threshold.
+
+        Solving the formula for ``score == threshold`` gives
+        ``t = lifetime * (1 - threshold / base_score) ** decay_speed``.
+        An attribute whose base score is not above the threshold expires
+        as soon as it is last seen.
+        """
+        last_seen = self._last_seen(timestamps, last_sightings)
+        base = self._base(base_scores, last_seen.shape)
+        remaining = np.zeros_like(base)
+        alive = base > self.threshold
+        remaining[alive] = 1.0 - self.threshold / base[alive]
+        days = self.lifetime * np.power(remaining, self.decay_speed)
+        return last_seen + days * DAY
+
+    def apply(
+        self,
+        batch: AttributeBatch,
+        last_sightings: Optional[ArrayLike] = None,
+        base_scores: Optional[ArrayLike] = None,
+        exclude_decayed: bool = False,
+        now: Optional[float] = None,
+    ) -> Tuple[AttributeBatch, np.ndarray]:
+        """Score ``batch`` and return it with its scores.
+
+        With ``exclude_decayed`` the decayed rows are dropped from both, as
+        ``excludeDecayed`` does on the server.
+        """
+        scores = self.scores(batch.timestamp, last_sightings, base_scores, now)
+        if not exclude_decayed:
+            return batch, scores
+        keep = ~self.decayed(scores)
+        return batch.filter(keep), scores[keep]
+
+    def decay_scores(
+        self, scores: np.ndarray, base_scores: Optional[ArrayLike] = None
+    ) -> Iterable[DecayScore]:
+        """``scores`` as the ``decay_score`` entries the server returns."""
+        base = self._base(base_scores, scores.shape)
+        decayed = self.decayed(scores)
+        for score, base_score, is_decayed in zip(
+            scores.tolist(), base.tolist(), decayed.tolist()
+        ):
+            yield DecayScore(
+                score=score,
+                base_score=base_score,
+                decayed=is_decayed,
+                DecayingModel=self.model,
+            )
+
+    def _last_seen(
+        self, timestamps: ArrayLike, last_sightings: Optional[ArrayLike]
+    ) -> np.ndarray:
+        last_seen = np.array(timestamps, dtype=np.float64, ndmin=1)
+        if last_sightings is not None:
+            sightings = np.asarray(last_sightings, dtype=np.float64)
+            np.fmax(last_seen, sightings, out=last_seen)
+        return last_seen
+
+    def _base(self, base_scores: Optional[ArrayLike], shape: Tuple[int, ...]):
+        if base_scores is None:
+            return np.full(shape, self.default_base_score, dtype=np.float64)
+        base = np.array(np.broadcast_to(base_scores, shape), dtype=np.float64)
+        base[np.isnan(base)] = self.default_base_score
+        return base
+
+
+class DecayEvent(NamedTuple):
+    """An attribute changing status: decaying, or revived by a sighting."""
+
+    key: Hashable
+    time: float
+    decayed: bool
+
+
+class _Scheduled:
+    __slots__ = ("last_seen", "base_score", "expires", "decayed")
+
+    def __init__(self, last_seen: float, base_score: float, expires: float):
+        self.last_seen = last_seen
+        self.base_score = base_score
+        self.expires = expires
+        self.decayed = False
+
+
+class DecayScheduler:
+    """Attributes keyed by any hashable, ordered by when they decay.
+
+    A min-heap holds the predicted expiry of every live attribute.
+    :meth:`advance` pops the ones that are due and reports them as
+    :class:`DecayEvent`; the other attributes are not touched. A sighting
+    pushes the attribute's expiry back, and revives it if it had decayed.
+    Superseded heap entries are skipped when popped, and dropped in bulk
+    once they outnumber the live ones. Thread-safe.
+    """
+
+    def __init__(self, decay: PolynomialDecay, clock: Callable[[], float] = time.time):
+        self.decay = decay
+        self.clock = clock
+        self._attributes: Dict[Hashable, _Scheduled] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._sequence = itertools.count()
+        self._live = 0
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._attributes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._attributes
+
+    @property
+    def live(self) -> int:
+        """Number of attributes not decayed yet."""
+        return self._live
+
+    def is_decayed(self, key: Hashable) -> bool:
+        return self._attributes[key].decayed
+
+    def expires(self, key: Hashable) -> float:
+        """Predicted time at which ``key`` decays, or did."""
+        return self._attributes[key].expires
+
+    def next_expiry(self) -> Optional[float]:
+        with self._condition:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def schedule(
+        self,
+        key: Hashable,
+        timestamp: float,
+        last_sighting: Optional[float] = None,
+        base_score: Optional[float] = None,
+    ) -> float:
+        """Add or replace ``key`` and return its predicted expiry."""
+        return self.schedule_many(
+            [key],
+            [timestamp],
+            None if last_sighting is None else [last_sighting],
+            None if base_score is None else [base_score],
+        )[0]
+
+    def schedule_many(
+        self,
+        keys: Sequence[Hashable],
+        timestamps: ArrayLike,
+        last_sightings: Optional[ArrayLike] = None,
+        base_scores: Optional[ArrayLike] = None,
+    ) -> np.ndarray:
+        """Add or replace ``keys``, with expiries computed in one pass.
+
+        Attributes already past their expiry are reported by the next
+        :meth:`advance`.
+        """
+        last_seen = self.decay._last_seen(timestamps, last_sightings)
+        bases = self.decay._base(base_scores, last_seen.shape)
+        expiries = self.decay.expiry(last_seen, base_scores=bases)
+        with self._condition:
+            entries = zip(keys, last_seen.tolist(), bases.tolist(), expiries.tolist())
+            pushed = []
+            for key, seen, base, expires in entries:
+                previous = self._attributes.get(key)
+                if previous is not None and not previous.decayed:
+                    self._live -= 1
+                self._attributes[key] = _Scheduled(seen, base, expires)
+                self._live += 1
+                pushed.append((expires, next(self._sequence), key))
+            # k pushes cost O(k log n), a heapify O(n + k): rebuild only for
+            # batches that are a large part of the heap.
+            if len(pushed) * _HEAPIFY_RATIO > len(self._heap):
+                self._heap.extend(pushed)
+                heapq.heapify(self._heap)
+            else:
+                for entry in pushed:
+                    heapq.heappush(self._heap, entry)
+            self._condition.notify_all()
+        return expiries
+
+    def sight(
+        self, key: Hashable, when: Optional[float] = None
+    ) -> Optional[DecayEvent]:
+        """Record a sighting of ``key`` and reschedule it.
+
+        Returns the event reviving ``key`` if it had decayed.
+        """
+        when = self.clock() if when is None else when
+        with self._condition:
+            scheduled = self._attributes[key]
+            if when <= scheduled.last_seen:
+                return None
+            scheduled.last_seen = when
+            scheduled.expires = float(
+                self.decay.expiry([when], base_scores=[scheduled.base_score])[0]
+            )
+            heapq.heappush(self._heap, (scheduled.expires, next(self._sequence), key))
+            revived = scheduled.decayed and scheduled.expires > when
+            if revived:
+                scheduled.decayed = False
+                self._live += 1
+            self._condition.notify_all()
+        return DecayEvent(key, when, False) if revived else None
+
+    def remove(self, key: Hashable) -> None:
+        with self._condition:
+            scheduled = self._attributes.pop(key)
+            if not scheduled.decayed:
+                self._live -= 1
+
+    def advance(self, now: Optional[float] = None) -> List[DecayEvent]:
+        """Mark the attributes due by ``now`` as decayed and report them."""
+        now = self.clock() if now is None else now
+        events = []
+        with self._condition:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                expires, _, key = heapq.heappop(heap)
+                scheduled = self._attributes.get(key)
+                if (
+                    scheduled is None
+                    or scheduled.decayed
+                    or scheduled.expires != expires
+                ):
+                    continue
+                scheduled.decayed = True
+                self._live -= 1
+                events.append(DecayEvent(key, expires, True))
+            if len(heap) > 2 * self._live + 1024:
+                self._compact()
+        return events
+
+    def run(
+        self,
+        callback: Callable[[List[DecayEvent]], None],
+        stop: threading.Event,
+        max_wait: float = 1.0,
+    ) -> None:
+        """Call ``callback`` with each batch of decays as it falls due.
+
+        Sleeps until the next expiry, and wakes up early when attributes
+        are scheduled or sighted. ``stop`` is checked at least every
+        ``max_wait`` seconds; the call returns once it is set.
+        """
+        while True:
+            events = self.advance()
+            if events:
+                callback(events)
+            if stop.is_set():
+                return
+            with self._condition:
+                self._drop_stale()
+                wait = max_wait
+                if self._heap:
+                    wait = min(max_wait, max(self._heap[0][0] - self.clock(), 0.0))
+                if wait > 0:
+                    self._condition.wait(wait)
+
+    def _drop_stale(self) -> None:
+        heap = self._heap
+        while heap:
+            expires, _, key = heap[0]
+            scheduled = self._attributes.get(key)
+            if (
+                scheduled is not None
+                and not scheduled.decayed
+                and scheduled.expires == expires
+            ):
+                return
+            heapq.heappop(heap)
+
+    def _compact(self) -> None:
+        self._heap = [
+            (scheduled.expires, next(self._sequence), key)
+            for key, scheduled in self._attributes.items()
+            if not scheduled.decayed
+        ]
+        heapq.heapify(self._heap)
+
+
+def _filter(filters: Any, name: str) -> Any:
+    if isinstance(filters, Mapping):
+        return filters.get(name)
+    return getattr(filters, name, None)
@@ -0,0 +1,856 @@
+"""Streaming export of attributes in the server's restSearch text formats.
+
+``returnFormat`` values such as ``hashes``, ``netfilter``, ``rpz``,
+``snort``, ``suricata``, ``csv`` and ``text`` make the server render the
+whole export in memory before sending it. The writers here produce the
+same kinds of output locally from any stream of attributes: validated
+models (:class:`~models.search.AttributeRestSearchListItem`, the
+attributes of :meth:`~client.mirror.MirrorStore.attributes`, an
+:class:`~analytics.attribute_batch.AttributeBatch`) or plain mappings as
+parsed from JSON. Output goes to a path, a binary or text file object or
+a connected socket, one batch at a time, so memory use does not grow with
+the export.
+
+Values end up in shell commands, rule headers and zone files, and feeds
+pass them on unchecked, so the ``netfilter``, ``rpz``, ``snort`` and
+``suricata`` writers parse addresses with :mod:`ipaddress`, take ports
+between 0 and 65535 and hostnames made of DNS labels only, and count
+anything else as ``skipped``.
+
+``to_ids`` keeps the attributes with that IDS flag only. ``dedup`` writes
+each exported value once; the values already written are remembered as
+64-bit hashes in sorted NumPy runs, eight bytes each, so a collision may
+drop a distinct value once in about ``2**64 / n`` values.
+"""
+from __future__ import annotations
+
+import abc
+import collections.abc
+import csv
+import io
+import ipaddress
+import os
+import re
+import socket
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Type,
+    Union,
+)
+from urllib.parse import urlsplit
+
+import numpy as np
+from pydantic import BaseModel
+
+from models.search import AttributesRestSearchReturnFormat, EventsRestSearchReturnFormat
+
+#: Attributes formatted and written at a time.
+DEFAULT_BATCH_SIZE = 10000
+#: First rule id of the Snort and Suricata exports, as on the server.
+DEFAULT_SID = 1000000
+
+#: Columns of the ``csv`` export, as the server writes them by default.
+CSV_COLUMNS = (
+    "uuid",
+    "event_id",
+    "category",
+    "type",
+    "value",
+    "comment",
+    "to_ids",
+    "date",
+    "object_relation",
+    "attribute_tag",
+    "object_uuid",
+    "object_name",
+    "object_meta_category",
+)
+
+HASH_TYPES = frozenset(
+    "md5 sha1 sha224 sha256 sha384 sha512 sha512/224 sha512/256 sha3-224"
+    " sha3-256 sha3-384 sha3-512 authentihash cdhash imphash pehash ssdeep"
+    " telfhash tlsh vhash".split()
+)
+
+#: Owner name each response policy rewrites to.
+RPZ_POLICIES = {
+    "NXDOMAIN": ".",
+    "NODATA": "*.",
+    "DROP": "rpz-drop.",
+    "PASSTHRU": "rpz-passthru.",
+    "TCP-ONLY": "rpz-tcp-only.",
+}
+
+Sink = Union[str, "os.PathLike[str]", BinaryIO, TextIO, socket.socket]
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+@dataclass
+class ExportStats:
+    """Counters of an :class:`ExportWriter`."""
+
+    attributes: int = 0
+    written: int = 0
+    #: Attributes of a type the format has no use for.
+    skipped: int = 0
+    #: Attributes left out by the ``to_ids`` filter.
+    filtered: int = 0
+    duplicates: int = 0
+    bytes_written: int = 0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def attributes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.attributes / elapsed if elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes_written / elapsed if elapsed else 0.0
+
+
+class ExportWriter:
+    """Write attributes to ``sink`` in one export format.
+
+    Subclasses pick the attributes they export with :meth:`_key`, the
+    exported value that ``dedup`` compares, and render it with
+    :meth:`_format`. A sink given as a path is opened and closed by the
+    writer; file objects and sockets are left open.
+    """
+
+    format: str = ""
+    #: Attribute types exported; ``None`` for all.
+    types: Optional[FrozenSet[str]] = None
+
+    def __init__(
+        self,
+        sink: Sink,
+        *,
+        to_ids: Optional[bool] = None,
+        dedup: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.to_ids = to_ids
+        self.dedup = dedup
+        self.batch_size = batch_size
+        self.stats = ExportStats()
+        self._sink = sink
+        self._send, self._file, self._text = _sender(sink)
+        self._seen = _SeenHashes() if dedup else None
+        self._keys: List[Hashable] = []
+        self._items: List[Any] = []
+        self._opened = False
+        self._closed = False
+
+    def __enter__(self) -> ExportWriter:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def write(self, attributes: Iterable[Any]) -> ExportStats:
+        """Export ``attributes``; more may follow until :meth:`close`."""
+        if self._closed:
+            raise ValueError("export writer is closed")
+        stats = self.stats
+        if stats.started is None:
+            stats.started = time.perf_counter()
+        types, to_ids = self.types, self.to_ids
+        keys, items = self._keys, self._items
+        for item in attributes:
+            stats.attributes += 1
+            type = _field(item, "type")
+            if types is not None and type not in types:
+                stats.skipped += 1
+                continue
+            if to_ids is not None and _flag(_field(item, "to_ids")) is not to_ids:
+                stats.filtered += 1
+                continue
+            value = _field(item, "value")
+            key = self._key(item, type, value) if value else None
+            if key is None:
+                stats.skipped += 1
+                continue
+            keys.append(key)
+            items.append(item)
+            if len(keys) >= self.batch_size:
+                self._flush()
+        return stats
+
+    def close(self) -> ExportStats:
+        """Write what is pending and the format's trailer."""
+        if self._closed:
+            return self.stats
+        if self.stats.started is None:
+            self.stats.started = time.perf_counter()
+        self._flush()
+        self._emit(self._footer())
+        self._closed = True
+        if self._file is not None:
+            self._file.close()
+        elif hasattr(self._sink, "flush"):
+            self._sink.flush()
+        self.stats.finished = time.perf_counter()
+        return self.stats
+
+    def _key(self, item: Any, type: str, value: str) -> Optional[Hashable]:
+        """What ``item`` exports, compared by ``dedup``; ``None`` to skip."""
+        return value
+
+    def _format(self, item: Any, key: Any) -> str:
+        """The text written for ``item``, lines terminated."""
+        return f"{key}\n"
+
+    def _header(self) -> str:
+        return ""
+
+    def _footer(self) -> str:
+        return ""
+
+    def _render(self, items: Sequence[Any], keys: Sequence[Any]) -> str:
+        return "".join([self._format(item, key) for item, key in zip(items, keys)])
+
+    def _flush(self) -> None:
+        if not self._opened:
+            self._opened = True
+            self._emit(self._header())
+        keys, items = self._keys, self._items
+        if not keys:
+            return
+        if self._seen is not None:
+            fresh = self._seen.add(
+                np.fromiter(map(hash, keys), dtype=np.int64, count=len(keys))
+            )
+            if not fresh.all():
+                self.stats.duplicates += len(keys) - int(fresh.sum())
+                keep = np.flatnonzero(fresh).tolist()
+                keys = [keys[i] for i in keep]
+                items = [items[i] for i in keep]
+        self.stats.written += len(keys)
+        self._emit(self._render(items, keys))
+        self._keys.clear()
+        self._items.clear()
+
+    def _emit(self, text: str) -> None:
+        if not text:
+            return
+        data = text if self._text else text.encode("utf-8")
+        self._send(data)
+        self.stats.bytes_written += len(data)
+
+
+class TextWriter(ExportWriter):
+    """``text``: the values, one per line.
+
+    Values spanning lines, such as e-mail bodies, are left out.
+    """
+
+    format = "text"
+
+    def _key(self, item: Any, type: str, value: str) -> Optional[Hashable]:
+        return None if "\n" in value or "\r" in value else value
+
+
+class HashesWriter(ExportWriter):
+    """``hashes``: file hashes one per line, from ``filename|<hash>`` too."""
+
+    format = "hashes"
+    types = HASH_TYPES | frozenset(f"filename|{type}" for type in HASH_TYPES)
+
+    def _key(self, item: Any, type: str, value: str) -> Optional[Hashable]:
+        if "|" in type:
+            value = value.rpartition("|")[2]
+        return value or None
+
+
+class NetfilterWriter(ExportWriter):
+    """``netfilter``: an ``iptables`` DROP rule per address.
+
+    Sources are dropped on ``INPUT``, destinations on ``OUTPUT``; IPv6
+    addresses get ``ip6tables`` rules.
+    """
+
+    format = "netfilter"
+    types = frozenset(("ip-src", "ip-dst", "ip-src|port", "ip-dst|port", "domain|ip"))
+
+    def _key(self, item: Any, type: str, value: str) -> Optional[Hashable]:
+        if type == "domain|ip":
+            network = _network(value.rpartition("|")[2])
+        else:
+            network = _network(value.partition("|")[0])
+        if network is None:
+            return None
+        address = _address(network)
+        command = "ip6tables" if network.version == 6 else "iptables"
+        if type.startswith("ip-src"):
+            return f"{command} -A INPUT -s {address} -j DROP"
+        return f"{command} -A OUTPUT -d {address} -j DROP"
+
+
+class RpzWriter(ExportWriter):
+    """``rpz``: a DNS response policy zone.
+
+    Domains are listed with their subdomains, hostnames alone and
+    addresses as ``rpz-ip`` triggers. ``policy`` is a key of
+    :data:`RPZ_POLICIES`; ``walled_garden``, a host name, overrides it.
+    ``serial`` defaults to today's date. Entries are written in stream
+    order rather than grouped by type.
+    """
+
+    format = "rpz"
+    types = frozenset(("domain", "hostname", "ip-src", "ip-dst", "domain|ip"))
+
+    def __init__(
+        self,
+        sink: Sink,
+        *,
+        policy: str = "NXDOMAIN",
+        walled_garden: Optional[str] = None,
+        serial: Optional[str] = None,
+        ttl: str = "1w",
+        refresh: str = "2h",
+        retry: str = "30m",
+        expiry: str = "1000h",
+        minimum_ttl: str = "1h",
+        ns: str = "localhost.",
+        email: str = "root.localhost.",
+        **options: Any,
+    ):
+        if walled_garden:
+            self.target = walled_garden.rstrip(".") + "."
+        else:
+            try:
+                self.target = RPZ_POLICIES[policy.upper()]
+            except KeyError:
+                raise ValueError(f"unknown RPZ policy {policy!r}") from None
+        super().__init__(sink, **options)
+        self.soa = (
+            ns,
+            email,
+            serial or time.strftime("%Y%m%d00"),
+            refresh,
+            retry,
+            expiry,
+            minimum_ttl,
+        )
+        self.ttl = ttl
+
+    def _key(self, item: Any, type: str, value: str) -> Optional[Hashable]:
+        if type == "domain|ip":
+            domain, _, address = value.partition("|")
+            owners = _rpz_domain(domain) + _rpz_address(address)
+        elif type == "domain":
+            owners = _rpz_domain(value)
+        elif type == "hostname":
+            host = _hostname(value)
+            owners = (host,) if host else ()
+        else:
+            owners = _rpz_address(value)
+        return owners or None
+
+    def _format(self, item: Any, key: Any) -> str:
+        return "".join(f"{owner} CNAME {self.target}\n" for owner in key)
+
+    def _header(self) -> str:
+        ns, email, serial, refresh, retry, expiry, minimum_ttl = self.soa
+        return (
+            f"$TTL {self.ttl};\n"
+            f"@ SOA {ns} {email} ({serial} {refresh} {retry} {expiry} {minimum_ttl});\n"
+            f"  NS {ns}\n\n"
+        )
+
+
+class _NidsWriter(ExportWriter, abc.ABC):
+    """Rules of the Snort family, numbered from ``sid``.
+
+    The rule message names the attribute's event; with ``base_url`` (the
+    server's) each rule also references the event's page. ``dedup``
+    compares the rules without their message.
+    """
+
+    types = frozenset(
+        (
+            "ip-src",
+            "ip-dst",
+            "ip-src|port",
+            "ip-dst|port",
+            "domain",
+            "hostname",
+            "url",
+            "email-src",
+            "email-dst",
+            "user-agent",
+        )
+    )
+
+    def __init__(
+        self,
+        sink: Sink,
+        *,
+        sid: int = DEFAULT_SID,
+        base_url: Optional[str] = None,
+        classtype: str = "trojan-activity",
+        **options: Any,
+    ):
+        super().__init__(sink, **options)
+        self.sid = sid
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.classtype = classtype
+
+    def _key(self, item: Any, type: str, value: str) -> Optional[Hashable]:
+        if type.startswith("ip-"):
+            rule = self._ip(type, value)
+        elif type in ("domain", "hostname"):
+            host = _hostname(value)
+            rule = self._dns(type, host) if host else None
+        elif type == "url":
+            rule = self._url(value)
+        elif type == "user-agent":
+            rule = self._user_agent(value)
+        else:
+            rule = self._email(type, value)
+        return None if rule is None else (*rule, value)
+
+    def _format(self, item: Any, key: Any) -> str:
+        label, header, options, value = key
+        event_id = _field(item, "event_id")
+        tail = ""
+        if self.base_url and event_id:
+            tail = f" reference:url,{self.base_url}/events/view/{event_id};"
+        sid = self.sid
+        self.sid += 1
+        return (
+            f'alert {header} (msg:"MISP e{event_id or 0} {label}: {_message(value)}";'
+            f" {options}classtype:{self.classtype}; sid:{sid}; rev:1; priority:1;{tail})\n"
+        )
+
+    def _ip(self, type: str, value: str) -> Optional[Tuple[str, str, str]]:
+        address, separator, port = value.partition("|")
+        network = _network(address)
+        if network is None:
+            return None
+        address = _address(network)
+        if separator:
+            port = _port(port)
+            if port is None:
+                return None
+        protocol = "tcp" if port else "ip"
+        port = port or "any"
+        if type.startswith("ip-src"):
+            return (
+                "Incoming From IP",
+                f"{protocol} {address} {port} -> $HOME_NET any",
+                "",
+            )
+        return "Outgoing To IP", f"{protocol} $HOME_NET any -> {address} {port}", ""
+
+    def _email(self, type: str, value: str) -> Optional[Tuple[str, str, str]]:
+        command = "MAIL FROM|3a|" if type == "email-src" else "RCPT TO|3a|"
+        label = "Source Email" if type == "email-src" else "Destination Email"
+        return (
+            label,
+            "tcp $EXTERNAL_NET any -> $SMTP_SERVERS 25",
+            f'flow:established,to_server; content:"{command}"; nocase;'
+            f' content:"{_content(value)}"; nocase; distance:0; ',
+        )
+
+    @abc.abstractmethod
+    def _dns(self, type: str, host: str) -> Optional[Tuple[str, str, str]]:
+        """The rule matching DNS queries for ``host``."""
+
+    @abc.abstractmethod
+    def _url(self, value: str) -> Optional[Tuple[str, str, str]]:
+        """The rule matching HTTP requests for the URL ``value``."""
+
+    @abc.abstractmethod
+    def _user_agent(self, value: str) -> Optional[Tuple[str, str, str]]:
+        """The rule matching HTTP requests sent with user agent ``value``."""
+
+
+class SnortWriter(_NidsWriter):
+    """``snort``: Snort 2 rules."""
+
+    format = "snort"
+
+    def _dns(self, type: str, host: str) -> Optional[Tuple[str, str, str]]:
+        labels = [label for label in host.split(".") if label]
+        if not labels or any(len(label) > 63 for label in labels):
+            return None
+        name = "".join(f"|{len(label):02x}|{_content(label)}" for label in labels)
+        return (
+            "Domain" if type == "domain" else "Hostname",
+            "udp any any -> any 53",
+            f'content:"{name}|00|"; nocase; fast_pattern; ',
+        )
+
+    def _url(self, value: str) -> Optional[Tuple[str, str, str]]:
+        host, path = _url_parts(value)
+        if not host and not path:
+            return None
+        options = "flow:to_server,established; "
+        if host:
+            options += f'content:"Host|3a| {_content(host)}"; http_header; nocase; '
+        if path:
+            options += f'content:"{_content(path)}"; http_uri; '
+        return (
+            "Outgoing HTTP URL",
+            "tcp $HOME_NET any -> $EXTERNAL_NET $HTTP_PORTS",
+            options,
+        )
+
+    def _user_agent(self, value: str) -> Optional[Tuple[str, str, str]]:
+        return (
+            "Outgoing User-Agent",
+            "tcp $HOME_NET any -> $EXTERNAL_NET $HTTP_PORTS",
+            f'flow:to_server,established; content:"User-Agent|3a| {_content(value)}";'
+            " http_header; ",
+        )
+
+
+class SuricataWriter(_NidsWriter):
+    """``suricata``: Suricata 5+ rules, on its DNS and HTTP buffers."""
+
+    format = "suricata"
+
+    def _dns(self, type: str, host: str) -> Optional[Tuple[str, str, str]]:
+        if not host:
+            return None
+        if type == "domain":
+            # dotprefix matches the domain and any of its subdomains.
+            query = f'dns.query; dotprefix; content:".{_content(host)}"; nocase;'
+            query += " endswith; "
+        else:
+            query = f'dns.query; content:"{_content(host)}"; nocase;'
+            query += f" bsize:{len(host.encode())}; "
+        return (
+            "Domain" if type == "domain" else "Hostname",
+            "dns any any -> any any",
+            query,
+        )
+
+    def _url(self, value: str) -> Optional[Tuple[str, str, str]]:
+        host, path = _url_parts(value)
+        if not host and not path:
+            return None
+        options = "flow:to_server,established; "
+        if host:
+            options += f'http.host; content:"{_content(host)}"; nocase; '
+        if path:
+            options += f'http.uri; content:"{_content(path)}"; '
+        return "Outgoing HTTP URL", "http $HOME_NET any -> $EXTERNAL_NET any", options
+
+    def _user_agent(self, value: str) -> Optional[Tuple[str, str, str]]:
+        return (
+            "Outgoing User-Agent",
+            "http $HOME_NET any -> $EXTERNAL_NET any",
+            f'flow:to_server,established; http.user_agent; content:"{_content(value)}"; ',
+        )
+
+
+class CsvWriter(ExportWriter):
+    """``csv``: one row per attribute, under a header row.
+
+    ``columns`` are attribute fields or the derived ``date`` (of the
+    timestamp), ``attribute_tag`` and ``object_uuid``, ``object_name`` and
+    ``object_meta_category`` (of the ``Object`` a search result carries).
+    ``dedup`` compares type and value.
+    """
+
+    format = "csv"
+
+    def __init__(
+        self,
+        sink: Sink,
+        *,
+        columns: Sequence[str] = CSV_COLUMNS,
+        header: bool = True,
+        **options: Any,
+    ):
+        super().__init__(sink, **options)
+        self.columns = tuple(columns)
+        self.header = header
+        self._cells = [_csv_column(column) for column in self.columns]
+
+    def _key(self, item: Any, type: str, value: str) -> Optional[Hashable]:
+        return type, value
+
+    def _render(self, items: Sequence[Any], keys: Sequence[Any]) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        cells = self._cells
+        writer.writerows([cell(item) for cell in cells] for item in items)
+        return buffer.getvalue()
+
+    def _header(self) -> str:
+        if not self.header:
+            return ""
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(self.columns)
+        return buffer.getvalue()
+
+
+WRITERS: Dict[str, Type[ExportWriter]] = {
+    writer.format: writer
+    for writer in (
+        CsvWriter,
+        HashesWriter,
+        NetfilterWriter,
+        RpzWriter,
+        SnortWriter,
+        SuricataWriter,
+        TextWriter,
+    )
+}
+
+
+def export(
+    format: Union[str, EventsRestSearchReturnFormat, AttributesRestSearchReturnFormat],
+    attributes: Iterable[Any],
+    sink: Sink,
+    **options: Any,
+) -> ExportStats:
+    """Write ``attributes`` to ``sink`` in ``format``; see :data:`WRITERS`.
+
+    ``options`` go to the format's writer.
+    """
+    name = getattr(format, "value", format)
+    try:
+        writer_type = WRITERS[name]
+    except KeyError:
+        raise ValueError(f"no local writer for the {name!r} format") from None
+    with writer_type(sink, **options) as writer:
+        writer.write(attributes)
+    return writer.stats
+
+
+class _SeenHashes:
+    """Set of 64-bit hashes kept as sorted runs of halving sizes.
+
+    A new run is merged into the last while that one is no larger, so every
+    hash is copied O(log n) times and a lookup searches O(log n) runs.
+    """
+
+    def __init__(self) -> None:
+        self._runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self._runs)
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """Mask of the first occurrences of the hashes not added before."""
+        unique, first = np.unique(hashes, return_index=True)
+        fresh = np.ones(len(unique), dtype=bool)
+        for run in self._runs:
+            position = np.searchsorted(run, unique)
+            np.minimum(position, len(run) - 1, out=position)
+            fresh &= run[position] != unique
+        mask = np.zeros(len(hashes), dtype=bool)
+        mask[first[fresh]] = True
+        run = unique[fresh]
+        while self._runs and len(self._runs[-1]) <= len(run):
+            run = np.concatenate((self._runs.pop(), run))
+            run.sort(kind="stable")
+        if len(run):
+            self._runs.append(run)
+        return mask
+
+
+def _sender(
+    sink: Sink,
+) -> Tuple[Callable[[Any], Any], Optional[BinaryIO], bool]:
+    """Write function for ``sink``, the file opened for it, whether it takes text."""
+    if isinstance(sink, (str, os.PathLike)):
+        file = open(sink, "wb")
+        return file.write, file, False
+    if isinstance(sink, socket.socket):
+        return sink.sendall, None, False
+    return sink.write, None, isinstance(sink, io.TextIOBase)
+
+
+def _field(item: Any, name: str) -> Any:
+    """Plain value of field ``name`` of a model, mapping or object."""
+    kind = _KINDS.get(item.__class__)
+    if kind is None:
+        kind = _KINDS[item.__class__] = _kind(item.__class__)
+    if kind is _MAPPING:
+        value = item.get(name)
+    elif kind is _MODEL:
+        # Fields are kept in the instance dict; asking a model for one it
+        # lacks goes through its slow ``__getattr__``.
+        value = item.__dict__.get(name)
+    else:
+        value = getattr(item, name, None)
+    if value is None or value.__class__ in _PLAIN:
+        return value
+    if isinstance(value, Enum):
+        return value.value
+    return getattr(value, "root", value)
+
+
+def _kind(cls: type) -> str:
+    if issubclass(cls, collections.abc.Mapping):
+        return _MAPPING
+    if issubclass(cls, BaseModel):
+        return _MODEL
+    return _OBJECT
+
+
+def _flag(value: Any) -> bool:
+    if value.__class__ is str:
+        return value.lower() in ("1", "true")
+    return bool(value)
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if value is True or value is False:
+        return "1" if value else "0"
+    return str(value)
+
+
+def _csv_column(column: str) -> Callable[[Any], str]:
+    """Cell getter of a ``csv`` export column."""
+    if column == "date":
+        return _csv_date
+    if column == "to_ids":
+        return lambda item: "1" if _flag(_field(item, "to_ids")) else "0"
+    if column == "attribute_tag":
+        return lambda item: ",".join(
+            _text(_field(tag, "name")) for tag in _field(item, "Tag") or ()
+        )
+    if column in ("object_uuid", "object_name", "object_meta_category"):
+        name = column[len("object_") :]
+        return lambda item: _csv_object(_field(item, "Object"), name)
+    return lambda item: _text(_field(item, column))
+
+
+def _csv_date(item: Any) -> str:
+    timestamp = _field(item, "timestamp")
+    return time.strftime("%Y%m%d", time.gmtime(int(timestamp))) if timestamp else ""
+
+
+def _csv_object(found: Any, name: str) -> str:
+    if found is None:
+        return ""
+    if name == "meta_category" and isinstance(found, collections.abc.Mapping):
+        name = "meta-category"
+    return _text(_field(found, name))
+
+
+def _network(value: str) -> Optional[Network]:
+    """The address or CIDR block ``value``, ``None`` if it is anything else."""
+    try:
+        network = ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        return None
+    # A zone id may hold any character but "%" and "/".
+    if getattr(network.network_address, "scope_id", None):
+        return None
+    return network
+
+
+def _address(network: Network) -> str:
+    """``network`` as written in rules: a bare address for a single host."""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return str(network)
+
+
+def _port(value: str) -> Optional[str]:
+    if not value.isascii() or not value.isdigit() or int(value) > 65535:
+        return None
+    return str(int(value))
+
+
+def _hostname(value: str) -> Optional[str]:
+    """``value`` lowercased without its root dot, if it is a DNS name."""
+    host = value.rstrip(".").lower()
+    if len(host) > 253 or not _HOSTNAME.match(host):
+        return None
+    return host
+
+
+def _rpz_domain(domain: str) -> Tuple[str, ...]:
+    domain = _hostname(domain)
+    return (domain, f"*.{domain}") if domain else ()
+
+
+def _rpz_address(value: str) -> Tuple[str, ...]:
+    network = _network(value.partition("|")[0])
+    if network is None:
+        return ()
+    address = network.network_address
+    if address.version == 4:
+        labels = reversed(str(address).split("."))
+    else:
+        groups = [f"{int(group, 16):x}" for group in address.exploded.split(":")]
+        # The longest run of zero groups is written "zz", as "::" would be.
+        best, start = (0, 0), None
+        for index, group in enumerate(groups + ["x"]):
+            if group == "0" and start is None:
+                start = index
+            elif group != "0" and start is not None:
+                if index - start > best[1] - best[0]:
+                    best = (start, index)
+                start = None
+        if best[1] - best[0] > 1:
+            groups[best[0] : best[1]] = ["zz"]
+        labels = reversed(groups)
+    return (f"{network.prefixlen}.{'.'.join(labels)}.rpz-ip",)
+
+
+def _url_parts(value: str) -> Tuple[str, str]:
+    """Host, without any port, and path with query of a URL."""
+    parts = urlsplit(value if "://" in value else f"http://{value}")
+    path = parts.path
+    if parts.query:
+        path += f"?{parts.query}"
+    return (parts.hostname or "", "" if path == "/" else path)
+
+
+_PLAIN = frozenset((str, int, bool, float))
+#: Dot-separated DNS labels; "_" is common in the wild and allowed.
+_HOSTNAME = re.compile(
+    r"(?:[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?\.)*"
+    r"[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?\Z"
+)
+_MAPPING, _MODEL, _OBJECT = "mapping", "model", "object"
+#: How :func:`_field` reads the items of each class met.
+_KINDS: Dict[type, str] = {}
+_CONTENT_ESCAPES = str.maketrans({char: f"|{ord(char):02x}|" for char in '";\\|:\r\n'})
+_MESSAGE_ESCAPES = str.maketrans(
+    {char: f"\\{char}" for char in '";\\'} | {"\n": " ", "\r": " "}
+)
+
+
+def _content(text: str) -> str:
+    """``text`` as a rule ``content`` string, with reserved bytes in hex."""
+    return text.translate(_CONTENT_ESCAPES)
+
+
+def _message(text: str) -> str:
+    return text.translate(_MESSAGE_ESCAPES)
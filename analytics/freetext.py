@@ -0,0 +1,244 @@
+"""Indicator extraction from unstructured text.
+
+Reports, freetext feeds and ``email-body``/``text`` attributes mention
+addresses, domains, URLs, hashes, e-mail addresses, CVE ids and bitcoin
+addresses in running prose, often defanged (``hxxp``, ``[.]``).
+:class:`IocExtractor` refangs a document and finds all of them in one
+scan with a single combined pattern; every hit is then typed by its
+match group and given the category and IDS flag the server's
+``describeTypes`` ``sane_defaults`` give that type.
+
+The pattern only starts matching where a token can start, so scanning
+prose costs little more than a pass over its characters.
+:meth:`IocExtractor.extract_many` spreads documents over a process pool.
+"""
+from __future__ import annotations
+
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from models.unknown import DescribeAttributeTypesResponse
+
+#: ``sane_defaults`` of the types extracted, as MISP ships them; used for
+#: types the ``describeTypes`` response given does not cover.
+SANE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "ip-dst": {"default_category": "Network activity", "to_ids": 1},
+    "ip-dst|port": {"default_category": "Network activity", "to_ids": 1},
+    "domain": {"default_category": "Network activity", "to_ids": 1},
+    "hostname": {"default_category": "Network activity", "to_ids": 1},
+    "url": {"default_category": "Network activity", "to_ids": 1},
+    "email-src": {"default_category": "Payload delivery", "to_ids": 1},
+    "md5": {"default_category": "Payload delivery", "to_ids": 1},
+    "sha1": {"default_category": "Payload delivery", "to_ids": 1},
+    "sha256": {"default_category": "Payload delivery", "to_ids": 1},
+    "sha512": {"default_category": "Payload delivery", "to_ids": 1},
+    "ssdeep": {"default_category": "Payload delivery", "to_ids": 1},
+    "vulnerability": {"default_category": "External analysis", "to_ids": 0},
+    "btc": {"default_category": "Financial fraud", "to_ids": 1},
+}
+
+#: Minimum characters per document batch sent to a worker.
+DEFAULT_BATCH_CHARS = 1024 * 1024
+
+_HASH_TYPES = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
+#: Last labels of file names, which look like domains.
+_FILE_SUFFIXES = frozenset(
+    "bat bin cmd dat db dll doc docm docx exe gif gz htm html ini jar jpg js json"
+    " lnk log msi pdf php png ps1 py rar rtf scr sh sys tmp txt vbs xls xlsm xlsx"
+    " xml zip".split()
+)
+#: Defanged spellings and what they stand for.
+_REFANG = (
+    ("hxxp", "http"),
+    ("hXXp", "http"),
+    ("[.]", "."),
+    ("(.)", "."),
+    ("{.}", "."),
+    ("[dot]", "."),
+    ("[:]", ":"),
+    ("[@]", "@"),
+    ("[at]", "@"),
+    ("[://]", "://"),
+)
+_DEFANGED = re.compile(r"hxxp|hXXp|\[(?:\.|dot|:|@|at|://)\]|\(\.\)|\{\.\}")
+
+_LABEL = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+_OCTET = r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+_IPV4 = rf"{_OCTET}(?:\.{_OCTET}){{3}}"
+_PATTERN = re.compile(
+    # Only where a token can start: not inside a word, host or path.
+    r"(?<![\w.@:/\\-])"
+    # Every indicator but a CVE id has a dot, "@" or ":", or is a long hash
+    # or address; one look at the token rules out plain words early.
+    r"(?=[^\s.@:]*[.@:]|[^\s.@:]{25}|CVE-)(?:"
+    r"(?P<url>(?:https?|ftp)://[^\s\"'<>()\[\]{}]+)"
+    rf"|(?P<email>[\w.+-]+@(?:{_LABEL}\.)+[A-Za-z]{{2,63}})"
+    rf"|(?P<ip>{_IPV4})(?::(?P<port>\d{{1,5}})|/(?P<prefix>3[0-2]|[12]?\d))?(?!\w|\.\d)"
+    r"|(?P<ipv6>(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}"
+    r"|(?:[0-9A-Fa-f]{1,4}:){1,6}:(?:[0-9A-Fa-f]{1,4}(?::[0-9A-Fa-f]{1,4})*)?)(?![\w:])"
+    r"|(?P<cve>CVE-\d{4}-\d{4,7})\b"
+    r"|(?P<ssdeep>\d{1,10}:[A-Za-z0-9/+]{3,}:[A-Za-z0-9/+]{3,})(?![\w:])"
+    r"|(?P<hex>[0-9A-Fa-f]{32,128})(?!\w)"
+    r"|(?P<btc>(?:[13][1-9A-HJ-NP-Za-km-z]{25,34}|bc1[02-9ac-hj-np-z]{11,71}))(?!\w)"
+    rf"|(?P<host>(?:{_LABEL}\.)+[A-Za-z][A-Za-z0-9-]{{0,61}}[A-Za-z0-9])(?![\w-]|\.\w)"
+    r")"
+)
+
+
+class Ioc(NamedTuple):
+    """One indicator found in a document."""
+
+    type: str
+    category: str
+    to_ids: bool
+    value: str
+    #: Offset of the hit in the refanged document.
+    offset: int
+
+
+def refang(text: str) -> str:
+    """``text`` with defanged indicators written out again."""
+    if _DEFANGED.search(text) is None:
+        return text
+    for defanged, fanged in _REFANG:
+        text = text.replace(defanged, fanged)
+    return text
+
+
+class IocExtractor:
+    """Find and classify the indicators in text.
+
+    ``describe`` is the server's ``describeTypes`` response; types it
+    leaves out fall back to :data:`SANE_DEFAULTS`. ``types`` restricts the
+    hits to those attribute types. Instances pickle, for worker pools.
+    """
+
+    def __init__(
+        self,
+        describe: Optional[DescribeAttributeTypesResponse] = None,
+        types: Optional[Iterable[str]] = None,
+    ):
+        defaults = dict(SANE_DEFAULTS)
+        if describe is not None and describe.sane_defaults:
+            defaults.update(
+                (type, value)
+                for type, value in describe.sane_defaults.items()
+                if type in SANE_DEFAULTS
+            )
+        wanted = set(types) if types is not None else set(SANE_DEFAULTS)
+        unknown = wanted - set(SANE_DEFAULTS)
+        if unknown:
+            raise ValueError(f"cannot extract types {sorted(unknown)}")
+        #: ``(category, to_ids)`` per extracted type.
+        self.defaults = {
+            type: (
+                default.get("default_category") or "Other",
+                bool(int(default.get("to_ids") or 0)),
+            )
+            for type, default in defaults.items()
+            if type in wanted
+        }
+
+    def extract(self, text: str, unique: bool = True) -> List[Ioc]:
+        """Indicators of ``text`` in document order, each value once."""
+        text = refang(text)
+        found = []
+        seen = set()
+        for match in _PATTERN.finditer(text):
+            ioc = self._classify(match)
+            if ioc is None:
+                continue
+            if unique:
+                key = (ioc.type, ioc.value)
+                if key in seen:
+                    continue
+                seen.add(key)
+            found.append(ioc)
+        return found
+
+    def classify(self, value: str) -> Optional[Ioc]:
+        """The indicator ``value`` is as a whole, ``None`` if none."""
+        match = _PATTERN.fullmatch(refang(value.strip()))
+        return self._classify(match) if match is not None else None
+
+    def extract_many(
+        self,
+        documents: Iterable[str],
+        workers: Optional[int] = None,
+        batch_chars: int = DEFAULT_BATCH_CHARS,
+    ) -> Iterator[List[Ioc]]:
+        """:meth:`extract` of each document, in order, on a process pool.
+
+        Documents are sent in batches of at least ``batch_chars``
+        characters, at most two batches per worker at a time.
+        """
+        workers = workers or os.cpu_count() or 1
+        limit = 2 * workers
+        with ProcessPoolExecutor(workers) as pool:
+            pending: Deque[Future] = deque()
+            for batch in _batches(documents, batch_chars):
+                pending.append(pool.submit(self._extract_batch, batch))
+                if len(pending) >= limit:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _extract_batch(self, documents: List[str]) -> List[List[Ioc]]:
+        return [self.extract(document) for document in documents]
+
+    def _classify(self, match: re.Match) -> Optional[Ioc]:
+        kind = match.lastgroup
+        if kind in ("port", "prefix"):
+            kind = "ip"
+        value = match.group(kind)
+        if kind == "url":
+            type = "url"
+            value = value.rstrip(".,;:!?")
+        elif kind == "email":
+            type = "email-src"
+        elif kind == "ip":
+            if match.group("port") is not None:
+                type, value = "ip-dst|port", f"{value}|{match.group('port')}"
+            else:
+                type = "ip-dst"
+                if match.group("prefix") is not None:
+                    value = f"{value}/{match.group('prefix')}"
+        elif kind == "ipv6":
+            type = "ip-dst"
+        elif kind == "cve":
+            type = "vulnerability"
+        elif kind == "ssdeep":
+            type = "ssdeep"
+        elif kind == "hex":
+            type = _HASH_TYPES.get(len(value))
+            if type is None:
+                return None
+        elif kind == "btc":
+            type = "btc"
+        elif kind == "host":
+            suffix = value.rpartition(".")[2].lower()
+            if suffix in _FILE_SUFFIXES:
+                return None
+            type = "domain" if value.count(".") == 1 else "hostname"
+        else:
+            return None
+        defaults = self.defaults.get(type)
+        if defaults is None:
+            return None
+        return Ioc(type, defaults[0], defaults[1], value, match.start(kind))
+
+
+def _batches(documents: Iterable[str], batch_chars: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    size = 0
+    for document in documents:
+        batch.append(document)
+        size += len(document)
+        if size >= batch_chars:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
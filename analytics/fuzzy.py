@@ -0,0 +1,658 @@
+"""Similarity search over ssdeep and TLSH fuzzy hashes.
+
+MISP finds similar fuzzy hashes by comparing against every stored one. The
+indexes here find them from a small candidate set instead.
+
+ssdeep: two signatures only score above 0 when their block sizes are equal
+or one is double the other, and when the chunks compared share a run of 7
+characters. :class:`SsdeepIndex` files every 7-gram of each chunk under the
+block size of that chunk, so the candidates of a query are the hashes
+sharing one of its grams: exactly those that can score. Candidates are then
+scored with ssdeep's own formula.
+
+TLSH distances have no such cut-off. :class:`TlshIndex` samples, for each
+of ``tables`` hash tables, ``positions`` of the 128 buckets of the digest
+body, and files each digest under its quartile codes at those positions.
+Close digests differ in few buckets, so they very likely agree on every
+position of at least one table; recall grows with ``tables`` and bucket
+sizes shrink with ``positions``. Candidates are ranked by the exact TLSH
+distance, and ``exhaustive=True`` ranks every digest instead.
+
+Both keep their postings as sorted ``uint64`` arrays of ``key << 32 | row``
+plus a sorted delta of recent additions, merged in once it grows past an
+eighth of the main array. Neither is safe for concurrent use: a query
+sorts what was added since the last one.
+"""
+from __future__ import annotations
+
+import heapq
+import re
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from models.attributes import AttributeNoId
+
+SSDEEP_TYPES = frozenset({"ssdeep", "filename|ssdeep"})
+TLSH_TYPES = frozenset({"tlsh", "filename|tlsh"})
+
+# ssdeep's constants.
+SPAMSUM_LENGTH = 64
+ROLLING_WINDOW = 7
+MIN_BLOCKSIZE = 3
+
+_SSDEEP = re.compile(r"^\s*(\d+):([^:]*):([^:,\s]*)")
+_SEQUENCES = re.compile(r"(.)\1{3,}")
+_BASE64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+#: Six-bit code of each character of a chunk; others share code 0.
+_CODES = np.zeros(256, dtype=np.uint64)
+_CODES[np.frombuffer(_BASE64.encode(), dtype=np.uint8)] = np.arange(64)
+#: Gram key bits: 7 codes of 6 bits, the block size exponent above them and,
+#: for chunks too short to hold a gram, a flag and the chunk length.
+_GRAM_BITS = 6 * ROLLING_WINDOW
+_SHORT = np.uint64(1 << (_GRAM_BITS + 6))
+_BATCH = 65536
+
+#: Hex digits of a TLSH digest: checksum, L-value, Q ratios and 32 body bytes.
+TLSH_LENGTH = 70
+_TLSH_BUCKETS = 128
+_ROW_MASK = np.uint64(0xFFFFFFFF)
+
+
+class FuzzyMatch(NamedTuple):
+    """A similar hash: the key it was added under and how close it is.
+
+    ``score`` is ssdeep's 1 to 100 similarity, or the TLSH distance, 0 for
+    identical digests.
+    """
+
+    key: Hashable
+    score: int
+
+
+class _Postings:
+    """Sorted ``key << 32 | row`` postings, appended to in batches."""
+
+    def __init__(self) -> None:
+        self._main = np.empty(0, dtype=np.uint64)
+        self._delta = np.empty(0, dtype=np.uint64)
+        self._pending: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self._main) + len(self._delta) + sum(map(len, self._pending))
+
+    @property
+    def nbytes(self) -> int:
+        return 8 * len(self)
+
+    def add(self, keys: np.ndarray, rows: np.ndarray) -> None:
+        self._pending.append(
+            (keys.astype(np.uint64) << np.uint64(32)) | rows.astype(np.uint64)
+        )
+
+    def rows(self, keys: np.ndarray) -> np.ndarray:
+        """Distinct rows filed under any of ``keys``."""
+        self._flush()
+        low = np.unique(keys).astype(np.uint64) << np.uint64(32)
+        high = low | _ROW_MASK
+        found = []
+        for packed in (self._main, self._delta):
+            if not len(packed):
+                continue
+            starts = np.searchsorted(packed, low)
+            ends = np.searchsorted(packed, high, side="right")
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                if end > start:
+                    found.append(packed[start:end])
+        if not found:
+            return np.empty(0, dtype=np.uint32)
+        return np.unique((np.concatenate(found) & _ROW_MASK).astype(np.uint32))
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        delta = np.concatenate([self._delta, *self._pending])
+        self._pending.clear()
+        delta.sort()
+        if len(delta) * 8 > len(self._main):
+            # Two sorted runs: timsort merges them in linear time.
+            delta = np.concatenate([self._main, delta])
+            delta.sort(kind="stable")
+            self._main, self._delta = delta, np.empty(0, dtype=np.uint64)
+        else:
+            self._delta = delta
+
+
+class _Keys:
+    """The keys of an index's rows, with deleted rows marked."""
+
+    def __init__(self) -> None:
+        self.keys: List[Hashable] = []
+        self.rows: Dict[Hashable, int] = {}
+        self.alive = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, keys: Sequence[Hashable]) -> np.ndarray:
+        """Rows for ``keys``, retiring the rows they had before."""
+        first = len(self.keys)
+        for row, key in enumerate(keys, first):
+            self.remove(key)
+            self.rows[key] = row
+        self.keys.extend(keys)
+        self.alive.extend(b"\x01" * len(keys))
+        return np.arange(first, len(self.keys), dtype=np.uint32)
+
+    def remove(self, key: Hashable) -> bool:
+        row = self.rows.pop(key, None)
+        if row is None:
+            return False
+        self.alive[row] = 0
+        return True
+
+    def live(self, rows: np.ndarray) -> np.ndarray:
+        return rows[np.frombuffer(self.alive, dtype=np.bool_)[rows]]
+
+
+def parse_ssdeep(value: str) -> Optional[Tuple[int, str, str]]:
+    """``(block_size, chunk, double_chunk)`` of an ssdeep signature.
+
+    Runs of more than three identical characters are cut to three, as
+    ssdeep does before comparing. A trailing ``,"filename"`` is ignored.
+    """
+    match = _SSDEEP.match(value)
+    if match is None:
+        return None
+    block_size = int(match.group(1))
+    if block_size < MIN_BLOCKSIZE:
+        return None
+    return (
+        block_size,
+        _SEQUENCES.sub(r"\1\1\1", match.group(2)),
+        _SEQUENCES.sub(r"\1\1\1", match.group(3)),
+    )
+
+
+def ssdeep_compare(first: str, second: str) -> int:
+    """ssdeep's 0 to 100 match score of two signatures."""
+    parsed_first, parsed_second = parse_ssdeep(first), parse_ssdeep(second)
+    if parsed_first is None or parsed_second is None:
+        return 0
+    return _ssdeep_score(parsed_first, parsed_second)
+
+
+def _ssdeep_score(first: Tuple[int, str, str], second: Tuple[int, str, str]) -> int:
+    size1, chunk1, double1 = first
+    size2, chunk2, double2 = second
+    if size1 == size2:
+        if chunk1 == chunk2:
+            return 100
+        return max(
+            _score_strings(chunk1, chunk2, size1),
+            _score_strings(double1, double2, size1 * 2),
+        )
+    if size1 == size2 * 2:
+        return _score_strings(chunk1, double2, size1)
+    if size2 == size1 * 2:
+        return _score_strings(double1, chunk2, size2)
+    return 0
+
+
+def _score_strings(first: str, second: str, block_size: int) -> int:
+    length1, length2 = len(first), len(second)
+    if (
+        length1 > SPAMSUM_LENGTH
+        or length2 > SPAMSUM_LENGTH
+        or not _common_substring(first, second)
+    ):
+        return 0
+    # Edit distance weighing a substitution as a deletion and an insertion.
+    distance = length1 + length2 - 2 * _lcs(first, second)
+    score = distance * SPAMSUM_LENGTH // (length1 + length2)
+    score = 100 * score // SPAMSUM_LENGTH
+    if score >= 100:
+        return 0
+    score = 100 - score
+    # Small block sizes cannot vouch for a high score.
+    if block_size < (99 + ROLLING_WINDOW) // ROLLING_WINDOW * MIN_BLOCKSIZE:
+        score = min(score, block_size // MIN_BLOCKSIZE * min(length1, length2))
+    return score
+
+
+def _common_substring(first: str, second: str) -> bool:
+    if len(first) < ROLLING_WINDOW or len(second) < ROLLING_WINDOW:
+        return False
+    grams = {
+        first[start : start + ROLLING_WINDOW]
+        for start in range(len(first) - ROLLING_WINDOW + 1)
+    }
+    return any(
+        second[start : start + ROLLING_WINDOW] in grams
+        for start in range(len(second) - ROLLING_WINDOW + 1)
+    )
+
+
+def _lcs(first: str, second: str) -> int:
+    """Longest common subsequence length, bit-parallel (Allison-Dix)."""
+    masks: Dict[str, int] = {}
+    bit = 1
+    for character in first:
+        masks[character] = masks.get(character, 0) | bit
+        bit <<= 1
+    full = bit - 1
+    vector = full
+    for character in second:
+        match = vector & masks.get(character, 0)
+        vector = ((vector + match) | (vector - match)) & full
+    return len(first) - bin(vector).count("1")
+
+
+def _mix(keys: np.ndarray) -> np.ndarray:
+    """32-bit multiplicative hash of 64-bit keys."""
+    return ((keys * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)).astype(np.uint32)
+
+
+def _gram_keys(
+    chunks: Sequence[str], exponents: np.ndarray, rows: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Keys of the 7-grams of ``chunks`` and the row each belongs to.
+
+    A gram is keyed with the block size exponent of its chunk. A chunk too
+    short to hold a gram can only match itself, and is keyed whole.
+    """
+    width = SPAMSUM_LENGTH
+    count = width - ROLLING_WINDOW + 1
+    data = "".join(chunk[:width].ljust(width, "A") for chunk in chunks)
+    codes = _CODES[
+        np.frombuffer(data.encode("ascii", "replace"), dtype=np.uint8).reshape(
+            len(chunks), width
+        )
+    ]
+    grams = np.zeros((len(chunks), count), dtype=np.uint64)
+    for offset in range(ROLLING_WINDOW):
+        grams |= codes[:, offset : offset + count] << np.uint64(6 * offset)
+    grams |= exponents.astype(np.uint64)[:, None] << np.uint64(_GRAM_BITS)
+    lengths = np.fromiter(map(len, chunks), dtype=np.int64, count=len(chunks))
+    short = lengths < ROLLING_WINDOW
+    grams[short, 0] |= _SHORT | (
+        lengths[short].astype(np.uint64) << np.uint64(_GRAM_BITS + 7)
+    )
+    valid = np.arange(count) < np.maximum(lengths, ROLLING_WINDOW)[:, None] - (
+        ROLLING_WINDOW - 1
+    )
+    return (
+        _mix(grams[valid]),
+        np.broadcast_to(rows[:, None], grams.shape)[valid],
+    )
+
+
+def _exponent(block_size: int) -> int:
+    """Distinct small number for each ``3 * 2**n`` block size."""
+    return block_size.bit_length() & 0x3F
+
+
+class SsdeepIndex:
+    """Top-k ssdeep similarity search.
+
+    Adding a key again replaces its signature. Signatures ssdeep cannot
+    parse are not added.
+    """
+
+    def __init__(self) -> None:
+        self._keys = _Keys()
+        self._hashes: List[Tuple[int, str, str]] = []
+        self._postings = _Postings()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def postings(self) -> int:
+        return len(self._postings)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the postings; signatures and keys not included."""
+        return self._postings.nbytes
+
+    def add(self, key: Hashable, value: str) -> bool:
+        return self.add_many([(key, value)]) == 1
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]) -> int:
+        """Index ``(key, signature)`` pairs; returns how many were added."""
+        added = 0
+        batch: List[Tuple[Hashable, Tuple[int, str, str]]] = []
+        for key, value in items:
+            parsed = parse_ssdeep(value)
+            if parsed is None:
+                continue
+            batch.append((key, parsed))
+            if len(batch) == _BATCH:
+                added += self._add_batch(batch)
+                batch = []
+        if batch:
+            added += self._add_batch(batch)
+        return added
+
+    def remove(self, key: Hashable) -> bool:
+        return self._keys.remove(key)
+
+    def query(self, value: str, k: int = 10, threshold: int = 1) -> List[FuzzyMatch]:
+        """The ``k`` best matches of ``value`` scoring at least ``threshold``.
+
+        Best first; ties keep the order the hashes were added in.
+        """
+        parsed = parse_ssdeep(value)
+        if parsed is None:
+            return []
+        size, chunk, double = parsed
+        exponent = _exponent(size)
+        keys, _ = _gram_keys(
+            [chunk, double],
+            np.array([exponent, exponent + 1]),
+            np.zeros(2, dtype=np.uint32),
+        )
+        hashes, names = self._hashes, self._keys.keys
+        scored = []
+        for row in self._keys.live(self._postings.rows(keys)).tolist():
+            score = _ssdeep_score(parsed, hashes[row])
+            if score >= threshold:
+                scored.append((score, -row))
+        return [
+            FuzzyMatch(names[-row], score) for score, row in heapq.nlargest(k, scored)
+        ]
+
+    def _add_batch(self, batch: List[Tuple[Hashable, Tuple[int, str, str]]]) -> int:
+        rows = self._keys.add([key for key, _ in batch])
+        parsed = [item for _, item in batch]
+        self._hashes.extend(parsed)
+        exponents = np.fromiter(
+            (_exponent(size) for size, _, _ in parsed), dtype=np.int64, count=len(rows)
+        )
+        for chunks, shift in (
+            ([chunk for _, chunk, _ in parsed], 0),
+            ([double for _, _, double in parsed], 1),
+        ):
+            keys, key_rows = _gram_keys(chunks, exponents + shift, rows)
+            self._postings.add(keys, key_rows)
+        return len(batch)
+
+
+def parse_tlsh(value: str) -> Optional[bytes]:
+    """The 35 bytes of a TLSH digest, header nibbles in arithmetic order.
+
+    Accepts digests with and without the ``T1`` version prefix.
+    """
+    value = value.strip()
+    if len(value) == TLSH_LENGTH + 2 and value[:2] in ("T1", "t1"):
+        value = value[2:]
+    if len(value) != TLSH_LENGTH:
+        return None
+    try:
+        digest = bytearray.fromhex(value)
+    except ValueError:
+        return None
+    # The checksum, L-value and Q ratio bytes are written nibble-swapped.
+    for index in range(3):
+        digest[index] = ((digest[index] & 0x0F) << 4) | (digest[index] >> 4)
+    return bytes(digest)
+
+
+def tlsh_distance(first: str, second: str) -> Optional[int]:
+    """TLSH distance of two digests, ``None`` if either is malformed."""
+    parsed_first, parsed_second = parse_tlsh(first), parse_tlsh(second)
+    if parsed_first is None or parsed_second is None:
+        return None
+    return int(
+        _tlsh_distances(
+            np.frombuffer(parsed_first, dtype=np.uint8),
+            np.frombuffer(parsed_second, dtype=np.uint8)[None, :],
+        )[0]
+    )
+
+
+def _byte_distances() -> np.ndarray:
+    """Body distance of every pair of bytes of four 2-bit quartile codes."""
+    first = np.arange(256)[:, None]
+    second = np.arange(256)[None, :]
+    table = np.zeros((256, 256), dtype=np.int32)
+    for shift in range(0, 8, 2):
+        diff = np.abs(((first >> shift) & 3) - ((second >> shift) & 3))
+        table += np.where(diff == 3, 6, diff)
+    return table
+
+
+_BYTE_DISTANCE = _byte_distances()
+
+
+def _mod_diff(first: np.ndarray, second: int, modulus: int) -> np.ndarray:
+    diff = np.abs(first.astype(np.int32) - second)
+    return np.minimum(diff, modulus - diff)
+
+
+def _tlsh_distances(query: np.ndarray, digests: np.ndarray) -> np.ndarray:
+    """Distances from ``query`` to each row of ``digests``, as TLSH has them."""
+    distances = (digests[:, 0] != query[0]).astype(np.int32)
+    lvalue = _mod_diff(digests[:, 1], int(query[1]), 256)
+    distances += np.where(lvalue <= 1, lvalue, lvalue * 12)
+    for ratios, ratio in (
+        (digests[:, 2] & 0x0F, int(query[2] & 0x0F)),
+        (digests[:, 2] >> 4, int(query[2] >> 4)),
+    ):
+        diff = _mod_diff(ratios, ratio, 16)
+        distances += np.where(diff <= 1, diff, (diff - 1) * 12)
+    distances += _BYTE_DISTANCE[query[3:], digests[:, 3:]].sum(axis=1)
+    return distances
+
+
+class TlshIndex:
+    """Top-k TLSH nearest-neighbour search, by locality-sensitive hashing.
+
+    ``tables`` tables each key a digest by ``positions`` of its body
+    buckets, drawn with ``seed``. Adding a key again replaces its digest.
+    """
+
+    def __init__(self, tables: int = 32, positions: int = 8, seed: int = 0):
+        if tables < 1 or positions < 1:
+            raise ValueError("tables and positions must be positive")
+        if 2 * positions + (tables - 1).bit_length() > 32:
+            raise ValueError(
+                f"{tables} tables of {positions} positions need over 32 bits"
+            )
+        self.tables = tables
+        self.positions = positions
+        self._sampled = np.random.default_rng(seed).integers(
+            0, _TLSH_BUCKETS, size=(tables, positions)
+        )
+        self._shifts = (2 * np.arange(positions)).astype(np.uint32)
+        self._table_ids = np.arange(tables, dtype=np.uint32) << np.uint32(2 * positions)
+        self._keys = _Keys()
+        self._digests = np.empty((0, TLSH_LENGTH // 2), dtype=np.uint8)
+        self._pending: List[np.ndarray] = []
+        self._postings = _Postings()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the digests and postings; keys not included."""
+        return (
+            self._digests.nbytes
+            + sum(block.nbytes for block in self._pending)
+            + self._postings.nbytes
+        )
+
+    def add(self, key: Hashable, value: str) -> bool:
+        return self.add_many([(key, value)]) == 1
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]) -> int:
+        """Index ``(key, digest)`` pairs; returns how many were added."""
+        added = 0
+        keys: List[Hashable] = []
+        digests = bytearray()
+        for key, value in items:
+            parsed = parse_tlsh(value)
+            if parsed is None:
+                continue
+            keys.append(key)
+            digests += parsed
+            if len(keys) == _BATCH:
+                added += self._add_batch(keys, digests)
+                keys, digests = [], bytearray()
+        if keys:
+            added += self._add_batch(keys, digests)
+        return added
+
+    def remove(self, key: Hashable) -> bool:
+        return self._keys.remove(key)
+
+    def query(
+        self,
+        value: str,
+        k: int = 10,
+        max_distance: Optional[int] = None,
+        exhaustive: bool = False,
+    ) -> List[FuzzyMatch]:
+        """The ``k`` digests closest to ``value``, nearest first.
+
+        Digests farther than ``max_distance`` are left out. The index may
+        miss a digest no table keys like ``value``; ``exhaustive`` ranks
+        every digest instead.
+        """
+        parsed = parse_tlsh(value)
+        if parsed is None:
+            return []
+        query = np.frombuffer(parsed, dtype=np.uint8)
+        digests = self._consolidate()
+        if exhaustive:
+            rows = self._keys.live(np.arange(len(digests), dtype=np.uint32))
+        else:
+            rows = self._keys.live(
+                self._postings.rows(self._bucket_keys(query[None, :]))
+            )
+        if not len(rows):
+            return []
+        distances = _tlsh_distances(query, digests[rows])
+        if max_distance is not None:
+            close = distances <= max_distance
+            rows, distances = rows[close], distances[close]
+        if len(rows) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            rows, distances = rows[nearest], distances[nearest]
+        order = np.lexsort((rows, distances))
+        names = self._keys.keys
+        return [
+            FuzzyMatch(names[row], distance)
+            for row, distance in zip(rows[order].tolist(), distances[order].tolist())
+        ]
+
+    def _bucket_keys(self, digests: np.ndarray) -> np.ndarray:
+        """Key of each digest in each table, ``(len(digests), tables)``."""
+        body = digests[:, 3:]
+        buckets = np.empty((len(digests), _TLSH_BUCKETS), dtype=np.uint32)
+        for shift in range(4):
+            buckets[:, shift::4] = (body >> (2 * shift)) & 3
+        sampled = buckets[:, self._sampled]
+        keys = (sampled << self._shifts).sum(axis=2, dtype=np.uint32)
+        return keys | self._table_ids
+
+    def _add_batch(self, keys: List[Hashable], data: bytearray) -> int:
+        rows = self._keys.add(keys)
+        digests = np.frombuffer(bytes(data), dtype=np.uint8).reshape(len(keys), -1)
+        self._pending.append(digests)
+        bucket_keys = self._bucket_keys(digests)
+        self._postings.add(bucket_keys.ravel(), np.repeat(rows, self.tables))
+        return len(keys)
+
+    def _consolidate(self) -> np.ndarray:
+        if self._pending:
+            self._digests = np.concatenate([self._digests, *self._pending])
+            self._pending.clear()
+        return self._digests
+
+
+def fuzzy_hash(value: Optional[str], type: Optional[str]) -> Optional[str]:
+    """The fuzzy hash in ``value``, the part after ``|`` for ``filename|``."""
+    if not value:
+        return None
+    if type and type.startswith("filename|"):
+        return value.rpartition("|")[2] or None
+    return value
+
+
+class FuzzyHashIndex:
+    """ssdeep and TLSH indexes fed with attributes of either kind.
+
+    Attributes are keyed by uuid, or by id when they have none.
+    """
+
+    def __init__(self, tlsh_tables: int = 32, tlsh_positions: int = 8, seed: int = 0):
+        self.ssdeep = SsdeepIndex()
+        self.tlsh = TlshIndex(tlsh_tables, tlsh_positions, seed)
+
+    def __len__(self) -> int:
+        return len(self.ssdeep) + len(self.tlsh)
+
+    def add_attribute(self, attribute: AttributeNoId) -> bool:
+        """Index ``attribute`` if it holds a fuzzy hash that parses."""
+        if attribute.deleted:
+            return False
+        key = _key(attribute)
+        if key is None:
+            raise ValueError("attributes need a uuid or an id to be indexed")
+        return self.add(
+            key, attribute.value, getattr(attribute.type, "value", attribute.type)
+        )
+
+    def add_attributes(self, attributes: Iterable[AttributeNoId]) -> int:
+        return sum(self.add_attribute(attribute) for attribute in attributes)
+
+    def add(self, key: Hashable, value: Optional[str], type: Optional[str]) -> bool:
+        index = self._index(type)
+        value = fuzzy_hash(value, type)
+        if index is None or value is None:
+            return False
+        return index.add(key, value)
+
+    def remove(self, key: Hashable) -> bool:
+        removed = self.ssdeep.remove(key)
+        return self.tlsh.remove(key) or removed
+
+    def similar(
+        self, value: str, type: str, k: int = 10, **options: Any
+    ) -> List[FuzzyMatch]:
+        """The ``k`` hashes most similar to ``value``, an attribute of ``type``.
+
+        ``options`` go to :meth:`SsdeepIndex.query` or :meth:`TlshIndex.query`.
+        """
+        index = self._index(type)
+        value = fuzzy_hash(value, type)
+        if index is None or value is None:
+            return []
+        return index.query(value, k, **options)
+
+    def _index(self, type: Optional[str]) -> Any:
+        if type in SSDEEP_TYPES:
+            return self.ssdeep
+        if type in TLSH_TYPES:
+            return self.tlsh
+        return None
+
+
+def _key(attribute: AttributeNoId) -> Optional[Hashable]:
+    if attribute.uuid is not None:
+        return str(attribute.uuid)
+    value = getattr(getattr(attribute, "id", None), "root", None)
+    return None if value is None else int(value)
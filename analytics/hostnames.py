@@ -0,0 +1,306 @@
+"""Domain and hostname index answering subdomain queries.
+
+Hosts of ``hostname``, ``domain``, URL-like, ``hostname|port`` and
+``domain|ip`` attributes are filed in a trie of their reversed labels, as
+:class:`~analytics.warninglists.WarninglistMatcher` files hostname lists:
+``www.example.com`` sits under ``com``, then ``example``, then ``www``. A
+query walks one node per label of its host:
+
+* :meth:`HostnameIndex.lookup`: attributes of exactly this host;
+* :meth:`HostnameIndex.containing`: attributes of this host or of a domain
+  above it, what a resolver asks for ``a.b.example.com``;
+* :meth:`HostnameIndex.within`: attributes of this domain and all of its
+  subdomains.
+
+:meth:`HostnameIndex.to_bytes` writes the index as its hosts in trie order,
+each sharing a prefix with the one before it, and delta-coded postings.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from analytics.common import ID_BITS, ID_MASK, URL_TYPES, hostname_of, record_id
+from models.attributes import AttributeNoId
+from models.events import ExtendedEvent
+
+#: Attribute types holding a host, and the part of the value that does.
+HOST_TYPES = {
+    "hostname": 0,
+    "domain": 0,
+    "hostname|port": 0,
+    "domain|ip": 0,
+    **{type: 0 for type in URL_TYPES},
+}
+
+MAGIC = b"MISPHOST"
+FORMAT_VERSION = 1
+
+#: Trie key of a node's postings; no label is empty.
+_END = ""
+
+
+def host_value(value: Optional[str], type: Optional[str]) -> Optional[str]:
+    """The normalized host in ``value``, an attribute of ``type``."""
+    part = HOST_TYPES.get(type)
+    if not value or part is None:
+        return None
+    if "|" in type:
+        value = value.split("|")[part]
+    host = hostname_of(value.strip(), type)
+    if host and host.startswith("*."):
+        host = host[2:]
+    return host or None
+
+
+def _labels(host: str) -> List[str]:
+    return [label for label in reversed(host.lower().strip().split(".")) if label]
+
+
+class HostnameIndex:
+    """Reversed-label trie from hosts to the attributes holding them.
+
+    :meth:`add_event` replaces whatever was indexed for the event before.
+    Queries take a host, normalized as values are. The index is not safe
+    for concurrent writers.
+    """
+
+    def __init__(self) -> None:
+        self._root: dict = {}
+        self._hosts = 0
+        #: Hosts each event has postings under, to delete it again.
+        self._events: Dict[int, List[str]] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct hosts indexed."""
+        return self._hosts
+
+    @property
+    def events(self) -> int:
+        return len(self._events)
+
+    def add_event(self, event: ExtendedEvent) -> int:
+        """Index the host attributes of ``event`` and its objects.
+
+        Deleted attributes and objects are left out. Returns the number of
+        postings added.
+        """
+        event_id = record_id(event.id)
+        self.remove_event(event_id)
+        attributes: List[Any] = list(event.Attribute or ())
+        for item in event.Object or ():
+            if not item.deleted:
+                attributes.extend(item.Attribute or ())
+        return sum(self.add_attribute(attribute, event_id) for attribute in attributes)
+
+    def add_events(self, events: Iterable[ExtendedEvent]) -> int:
+        return sum(self.add_event(event) for event in events)
+
+    def add_attribute(
+        self, attribute: AttributeNoId, event_id: Optional[int] = None
+    ) -> int:
+        """Index one attribute; it needs an ``id`` and an event id."""
+        if attribute.deleted:
+            return 0
+        type = getattr(attribute.type, "value", attribute.type)
+        if type not in HOST_TYPES:
+            return 0
+        if event_id is None:
+            event_id = record_id(attribute.event_id)
+        return self.add(
+            event_id, record_id(getattr(attribute, "id", None)), attribute.value, type
+        )
+
+    def add(
+        self,
+        event_id: int,
+        attribute_id: int,
+        value: Optional[str],
+        type: Optional[str] = "hostname",
+    ) -> int:
+        """Index ``value`` for one attribute; returns 1, or 0 if it has no host."""
+        host = host_value(value, type)
+        if host is None:
+            return 0
+        self._add(host, (event_id << ID_BITS) | attribute_id)
+        self._events.setdefault(event_id, []).append(host)
+        return 1
+
+    def remove_event(self, event_id: int) -> int:
+        """Drop every posting of ``event_id``; returns how many there were."""
+        event_id = int(event_id)
+        hosts = self._events.pop(event_id, None)
+        if not hosts:
+            return 0
+        return sum(self._remove(host, event_id) for host in set(hosts))
+
+    def lookup(self, host: str) -> List[Tuple[int, int]]:
+        """Attributes of exactly ``host``."""
+        node = self._find(host)
+        return _unpack(node.get(_END, ()) if node is not None else ())
+
+    def containing(self, host: str) -> List[Tuple[int, int]]:
+        """Attributes of ``host`` or of a domain it is under, broadest first."""
+        node = self._root
+        postings: List[int] = []
+        for label in _labels(host):
+            node = node.get(label)
+            if node is None:
+                break
+            postings.extend(node.get(_END, ()))
+        return _unpack(postings)
+
+    def within(self, domain: str) -> List[Tuple[int, int]]:
+        """Attributes of ``domain`` and of every subdomain of it."""
+        node = self._find(domain)
+        if node is None:
+            return []
+        postings: List[int] = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for label, child in node.items():
+                if label == _END:
+                    postings.extend(child)
+                else:
+                    stack.append(child)
+        return _unpack(postings)
+
+    def hosts(self, domain: str = "") -> Iterator[str]:
+        """Indexed hosts at or under ``domain``, in reversed-label order."""
+        node = self._find(domain)
+        if node is None:
+            return
+        for labels, _ in _walk(node, _labels(domain)):
+            yield ".".join(reversed(labels))
+
+    def to_bytes(self) -> bytes:
+        """The index in its compact serialized form."""
+        out = bytearray(MAGIC)
+        out.append(FORMAT_VERSION)
+        _write_varint(out, self._hosts)
+        previous = b""
+        for labels, postings in _walk(self._root, []):
+            name = ".".join(labels).encode()
+            shared = 0
+            limit = min(len(name), len(previous))
+            while shared < limit and name[shared] == previous[shared]:
+                shared += 1
+            _write_varint(out, shared)
+            _write_varint(out, len(name) - shared)
+            out += name[shared:]
+            _write_varint(out, len(postings))
+            last = 0
+            for posting in sorted(postings):
+                _write_varint(out, posting - last)
+                last = posting
+            previous = name
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> HostnameIndex:
+        """An index read back from :meth:`to_bytes`."""
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError("not a serialized hostname index")
+        if data[len(MAGIC)] != FORMAT_VERSION:
+            raise ValueError(f"unsupported hostname index version {data[len(MAGIC)]}")
+        index = cls()
+        position = len(MAGIC) + 1
+        count, position = _read_varint(data, position)
+        previous = b""
+        for _ in range(count):
+            shared, position = _read_varint(data, position)
+            length, position = _read_varint(data, position)
+            name = previous[:shared] + data[position : position + length]
+            position += length
+            postings, position = _read_varint(data, position)
+            labels = name.decode().split(".")
+            host = ".".join(reversed(labels))
+            node = index._root
+            for label in labels:
+                node = node.setdefault(label, {})
+            node[_END] = []
+            index._hosts += 1
+            posting = 0
+            for _ in range(postings):
+                delta, position = _read_varint(data, position)
+                posting += delta
+                node[_END].append(posting)
+                index._events.setdefault(posting >> ID_BITS, []).append(host)
+            previous = name
+        return index
+
+    def _add(self, host: str, posting: int) -> None:
+        node = self._root
+        for label in _labels(host):
+            node = node.setdefault(label, {})
+        postings = node.get(_END)
+        if postings is None:
+            postings = node[_END] = []
+            self._hosts += 1
+        postings.append(posting)
+
+    def _find(self, host: str) -> Optional[dict]:
+        node: Optional[dict] = self._root
+        for label in _labels(host):
+            node = node.get(label)
+            if node is None:
+                return None
+        return node
+
+    def _remove(self, host: str, event_id: int) -> int:
+        path = []
+        node = self._root
+        for label in _labels(host):
+            child = node.get(label)
+            if child is None:
+                return 0
+            path.append((node, label))
+            node = child
+        postings = node.get(_END)
+        if not postings:
+            return 0
+        kept = [posting for posting in postings if posting >> ID_BITS != event_id]
+        removed = len(postings) - len(kept)
+        if kept:
+            node[_END] = kept
+            return removed
+        del node[_END]
+        self._hosts -= 1
+        # Drop the nodes left without postings or children.
+        for parent, label in reversed(path):
+            if parent[label]:
+                break
+            del parent[label]
+        return removed
+
+
+def _walk(node: dict, labels: List[str]) -> Iterator[Tuple[List[str], List[int]]]:
+    """``(reversed labels, postings)`` of the hosts under ``node``, sorted."""
+    postings = node.get(_END)
+    if postings:
+        yield labels, postings
+    for label in sorted(node):
+        if label != _END:
+            yield from _walk(node[label], [*labels, label])
+
+
+def _unpack(postings: Iterable[int]) -> List[Tuple[int, int]]:
+    return [(posting >> ID_BITS, posting & ID_MASK) for posting in postings]
+
+
+def _write_varint(out: bytearray, number: int) -> None:
+    while number >= 0x80:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    number = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, position
+        shift += 7
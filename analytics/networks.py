@@ -0,0 +1,296 @@
+"""IPv4 and IPv6 radix index over network attributes.
+
+Addresses and CIDR blocks in ``ip-src``, ``ip-dst``, their ``|port``
+variants and ``domain|ip`` are filed in a patricia trie per address family:
+a binary trie over the address bits where chains of single-child nodes are
+collapsed, so a lookup visits one node per prefix length actually in use
+along its path rather than one per bit. Three questions are answered by
+one walk each:
+
+* :meth:`NetworkIndex.lookup`: attributes holding exactly this address or
+  network;
+* :meth:`NetworkIndex.containing`: attributes whose network holds this
+  address or network, such as a ``10.0.0.0/8`` attribute for ``10.20.1.1``;
+* :meth:`NetworkIndex.within`: attributes inside this network, such as any
+  address in ``10.20.0.0/16``.
+
+Results are ``(event_id, attribute_id)`` pairs, as
+:class:`~analytics.correlation.CorrelationIndex` returns them.
+"""
+from __future__ import annotations
+
+import socket
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from analytics.common import ID_BITS, ID_MASK, parse_network, record_id
+from models.attributes import AttributeNoId
+from models.events import ExtendedEvent
+
+#: Attribute types holding an address or network, and the part that does.
+NETWORK_TYPES = {
+    "ip-src": 0,
+    "ip-dst": 0,
+    "ip-src|port": 0,
+    "ip-dst|port": 0,
+    "domain|ip": 1,
+}
+
+
+def network_value(value: Optional[str], type: Optional[str]) -> Optional[str]:
+    """The address or CIDR block in ``value``, an attribute of ``type``."""
+    part = NETWORK_TYPES.get(type)
+    if not value or part is None:
+        return None
+    if "|" in type:
+        parts = value.split("|")
+        if len(parts) != 2:
+            return None
+        value = parts[part]
+    return value.strip() or None
+
+
+class _Node:
+    __slots__ = ("network", "length", "children", "postings")
+
+    def __init__(self, network: int, length: int):
+        self.network = network
+        self.length = length
+        self.children: List[Optional[_Node]] = [None, None]
+        #: Packed ``event_id << 32 | attribute_id``; ``None`` on nodes that
+        #: only branch.
+        self.postings: Optional[List[int]] = None
+
+
+class _Trie:
+    """Patricia trie of the networks of one address family."""
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root = _Node(0, 0)
+        self.networks = 0
+
+    def _bit(self, network: int, position: int) -> int:
+        return (network >> (self.bits - 1 - position)) & 1
+
+    def _matches(self, node: _Node, network: int) -> bool:
+        """Whether ``network`` starts with the prefix of ``node``."""
+        return (network ^ node.network) >> (self.bits - node.length) == 0
+
+    def insert(self, network: int, length: int) -> _Node:
+        node = self.root
+        while node.length != length:
+            bit = self._bit(network, node.length)
+            child = node.children[bit]
+            if child is None:
+                child = node.children[bit] = _Node(network, length)
+                return child
+            differing = (network ^ child.network).bit_length()
+            common = min(length, child.length, self.bits - differing)
+            if common == child.length:
+                node = child
+                continue
+            # Split the edge to ``child`` where the two prefixes part.
+            if common == length:
+                inserted = branch = _Node(network, length)
+            else:
+                mask = ((1 << common) - 1) << (self.bits - common)
+                branch = _Node(network & mask, common)
+                inserted = _Node(network, length)
+                branch.children[self._bit(network, common)] = inserted
+            branch.children[self._bit(child.network, common)] = child
+            node.children[bit] = branch
+            return inserted
+        return node
+
+    def find(self, network: int, length: int) -> Optional[_Node]:
+        node: Optional[_Node] = self.root
+        while node is not None and node.length < length:
+            node = node.children[self._bit(network, node.length)]
+        if node is None or node.length != length or node.network != network:
+            return None
+        return node
+
+    def containing(self, network: int, length: int) -> Iterator[_Node]:
+        """Nodes holding postings whose network holds ``network``."""
+        node: Optional[_Node] = self.root
+        while (
+            node is not None and node.length <= length and self._matches(node, network)
+        ):
+            if node.postings:
+                yield node
+            if node.length == length:
+                return
+            node = node.children[self._bit(network, node.length)]
+
+    def within(self, network: int, length: int) -> Iterator[_Node]:
+        """Nodes holding postings whose network lies in ``network``."""
+        node: Optional[_Node] = self.root
+        while node is not None and node.length < length:
+            node = node.children[self._bit(network, node.length)]
+        if node is None or (node.network ^ network) >> (self.bits - length):
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.postings:
+                yield node
+            stack.extend(child for child in node.children if child is not None)
+
+    def remove(self, network: int, length: int, event_id: int) -> int:
+        """Drop the postings of ``event_id`` under ``network``."""
+        path = []
+        node: Optional[_Node] = self.root
+        while node is not None and node.length < length:
+            path.append(node)
+            node = node.children[self._bit(network, node.length)]
+        if node is None or node.length != length or not node.postings:
+            return 0
+        before = len(node.postings)
+        node.postings = [
+            posting for posting in node.postings if posting >> ID_BITS != event_id
+        ] or None
+        removed = before - len(node.postings or ())
+        if node.postings is None and removed:
+            self.networks -= 1
+            self._prune(node, path)
+        return removed
+
+    def _prune(self, node: _Node, path: List[_Node]) -> None:
+        """Splice out ``node`` and ancestors left without postings or a branch."""
+        while path and node.postings is None:
+            children = [child for child in node.children if child is not None]
+            if len(children) > 1:
+                return
+            parent = path.pop()
+            slot = parent.children.index(node)
+            parent.children[slot] = children[0] if children else None
+            node = parent
+
+
+class NetworkIndex:
+    """Radix index from addresses and networks to the attributes holding them.
+
+    :meth:`add_event` replaces whatever was indexed for the event before.
+    Lookups take an address or a CIDR block. The index is not safe for
+    concurrent writers.
+    """
+
+    def __init__(self) -> None:
+        self._tries = {socket.AF_INET: _Trie(32), socket.AF_INET6: _Trie(128)}
+        #: Networks each event has postings under, to delete it again.
+        self._events: Dict[int, List[Tuple[int, int, int]]] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct addresses and networks indexed."""
+        return sum(trie.networks for trie in self._tries.values())
+
+    @property
+    def events(self) -> int:
+        return len(self._events)
+
+    def add_event(self, event: ExtendedEvent) -> int:
+        """Index the network attributes of ``event`` and its objects.
+
+        Deleted attributes and objects are left out. Returns the number of
+        postings added.
+        """
+        event_id = record_id(event.id)
+        self.remove_event(event_id)
+        attributes: List[Any] = list(event.Attribute or ())
+        for item in event.Object or ():
+            if not item.deleted:
+                attributes.extend(item.Attribute or ())
+        return sum(self.add_attribute(attribute, event_id) for attribute in attributes)
+
+    def add_events(self, events: Iterable[ExtendedEvent]) -> int:
+        return sum(self.add_event(event) for event in events)
+
+    def add_attribute(
+        self, attribute: AttributeNoId, event_id: Optional[int] = None
+    ) -> int:
+        """Index one attribute; it needs an ``id`` and an event id."""
+        if attribute.deleted:
+            return 0
+        type = getattr(attribute.type, "value", attribute.type)
+        if type not in NETWORK_TYPES:
+            return 0
+        if event_id is None:
+            event_id = record_id(attribute.event_id)
+        return self.add(
+            event_id, record_id(getattr(attribute, "id", None)), attribute.value, type
+        )
+
+    def add(
+        self,
+        event_id: int,
+        attribute_id: int,
+        value: Optional[str],
+        type: Optional[str] = "ip-dst",
+    ) -> int:
+        """Index ``value`` for one attribute; returns 1, or 0 if it holds no IP."""
+        parsed = parse_network(network_value(value, type) or "")
+        if parsed is None:
+            return 0
+        family, network, length = parsed
+        trie = self._tries[family]
+        node = trie.insert(network, length)
+        if node.postings is None:
+            node.postings = []
+            trie.networks += 1
+        node.postings.append((event_id << ID_BITS) | attribute_id)
+        self._events.setdefault(event_id, []).append((family, network, length))
+        return 1
+
+    def remove_event(self, event_id: int) -> int:
+        """Drop every posting of ``event_id``; returns how many there were."""
+        event_id = int(event_id)
+        networks = self._events.pop(event_id, None)
+        if not networks:
+            return 0
+        return sum(
+            self._tries[family].remove(network, length, event_id)
+            for family, network, length in set(networks)
+        )
+
+    def lookup(self, value: str) -> List[Tuple[int, int]]:
+        """Attributes holding exactly the address or network ``value``."""
+        parsed = parse_network(value.strip())
+        if parsed is None:
+            return []
+        family, network, length = parsed
+        node = self._tries[family].find(network, length)
+        return _unpack([node] if node is not None and node.postings else [])
+
+    def containing(self, value: str) -> List[Tuple[int, int]]:
+        """Attributes whose address or network holds ``value``, itself included.
+
+        Broadest networks first.
+        """
+        parsed = parse_network(value.strip())
+        if parsed is None:
+            return []
+        family, network, length = parsed
+        return _unpack(self._tries[family].containing(network, length))
+
+    def within(self, value: str) -> List[Tuple[int, int]]:
+        """Attributes whose address or network lies in ``value``, itself included."""
+        parsed = parse_network(value.strip())
+        if parsed is None:
+            return []
+        family, network, length = parsed
+        return _unpack(self._tries[family].within(network, length))
+
+    def event_ids(self, value: str) -> List[int]:
+        """Ids of the events with an address in, or a network around, ``value``."""
+        return sorted(
+            {event_id for event_id, _ in self.containing(value)}
+            | {event_id for event_id, _ in self.within(value)}
+        )
+
+
+def _unpack(nodes: Iterable[_Node]) -> List[Tuple[int, int]]:
+    return [
+        (posting >> ID_BITS, posting & ID_MASK)
+        for node in nodes
+        for posting in node.postings or ()
+    ]
@@ -0,0 +1,869 @@
+"""Offline ``/attributes/restSearch`` over a locally mirrored data set.
+
+:class:`AttributeSearchEngine` holds attributes with the event they belong
+to and evaluates an :class:`~models.search.AttributeRestSearchFilter`
+against them, answering in the ``AttributeRestSearchList`` shape the
+server returns, so read-heavy consumers can be served without it.
+
+Every filter becomes a predicate. Filters on the type, category, value,
+tags, creator org, event, uuid and the time fields can also list their
+matching rows from a secondary index: a dict of row sets, or a sorted
+array for the times. The engine asks each of them how many rows it would
+list, walks only the smallest and checks the other predicates on those
+rows; a full scan only happens when no indexed filter is set.
+:meth:`AttributeSearchEngine.explain` shows that plan.
+
+Values, tags and org names compare case-insensitively, as with MISP's
+MySQL collation. ``%`` is a wildcard in values, tags and ``eventinfo``,
+and a leading ``!`` negates a value. Filters needing data a mirror does
+not hold (sightings, correlations, warninglists, decay scores, sharing
+groups) raise ``ValueError``.
+"""
+from __future__ import annotations
+
+import math
+import re
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import numpy as np
+
+from analytics.common import record_id
+from models.attributes import Attribute
+from models.events import Event, ExtendedEvent
+from models.filters import as_list, canonical_filters
+from models.objects import Object
+from models.search import AttributeRestSearchList, AttributeRestSearchListItem
+from models.taxonomy_tags import Tag
+
+#: Filters whose results depend on data a local mirror does not hold.
+UNSUPPORTED_FILTERS = frozenset(
+    {
+        "sharinggroup",
+        "decayingModel",
+        "score",
+        "modelOverrides",
+        "excludeDecayed",
+        "enforceWarninglist",
+        "attackGalaxy",
+        "includeSightings",
+        "includeCorrelations",
+        "includeDecayScore",
+        "includeFullModel",
+        "includeProposals",
+        "includeWarninglistHits",
+        "withAttachments",
+    }
+)
+
+#: Time columns of each row, in seconds; event columns are copied per row.
+TIME_COLUMNS = (
+    "timestamp",
+    "event_timestamp",
+    "publish_timestamp",
+    "date",
+    "first_seen",
+    "last_seen",
+)
+
+_RELATIVE_TIME = re.compile(r"^\s*(\d+)\s*([smhdw])\s*$", re.IGNORECASE)
+_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+_DAY = 86400
+#: Dead rows kept before compacting, however few rows are live.
+_COMPACT_MIN = 1024
+
+
+class _Row:
+    __slots__ = (
+        "attribute",
+        "item",
+        "object",
+        "attribute_id",
+        "event_id",
+        "type",
+        "category",
+        "value",
+        "parts",
+        "uuid",
+        "to_ids",
+        "deleted",
+        "object_relation",
+        "tags",
+    )
+
+
+class _Event:
+    __slots__ = (
+        "event",
+        "tags",
+        "tag_names",
+        "orgc_id",
+        "uuid",
+        "published",
+        "threat_level_id",
+        "info",
+        "rows",
+    )
+
+
+class _Predicate(NamedTuple):
+    name: str
+    test: Callable[[int], bool]
+    #: Rows the predicate may hold for, from an index; ``None`` if unindexed.
+    rows: Optional[Callable[[], Iterable[int]]] = None
+    estimate: Optional[int] = None
+
+
+class AttributeSearchEngine:
+    """Attributes of mirrored events, searchable like ``restSearch``.
+
+    Feed it whole events with :meth:`add_event`, which replaces what was
+    held for the event before, or the items of an earlier attribute
+    ``restSearch`` with :meth:`add_items`. Time filters are evaluated
+    against ``clock()``. Searches may run while nothing is being added;
+    the engine is not safe for concurrent writers.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._rows: List[Optional[_Row]] = []
+        self._live = 0
+        self._attributes: Dict[int, int] = {}
+        self._events: Dict[int, _Event] = {}
+        self._types: Dict[str, Set[int]] = {}
+        self._categories: Dict[str, Set[int]] = {}
+        self._values: Dict[str, Set[int]] = {}
+        self._uuids: Dict[str, int] = {}
+        self._tags: Dict[str, Set[int]] = {}
+        self._event_tags: Dict[str, Set[int]] = {}
+        self._event_uuids: Dict[str, int] = {}
+        self._orgs: Dict[int, Set[int]] = {}
+        self._org_names: Dict[str, int] = {}
+        self._columns = {column: array("d") for column in TIME_COLUMNS}
+        #: Per time column: its values sorted and the rows they belong to.
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        """Number of attributes held."""
+        return self._live
+
+    @property
+    def events(self) -> int:
+        return len(self._events)
+
+    def add_event(self, event: ExtendedEvent) -> int:
+        """Hold the attributes of ``event`` and its objects.
+
+        Returns the number of attributes added.
+        """
+        event_id = record_id(event.id)
+        self.remove_event(event_id)
+        self._set_event(event, event.Tag or ())
+        added = 0
+        for attribute in event.Attribute or ():
+            added += self._add(attribute, event_id)
+        for item in event.Object or ():
+            summary = Object.model_validate(
+                item.model_dump(by_alias=True, exclude={"Attribute"})
+            )
+            for attribute in item.Attribute or ():
+                added += self._add(attribute, event_id, summary)
+        return added
+
+    def add_events(self, events: Iterable[ExtendedEvent]) -> int:
+        return sum(self.add_event(event) for event in events)
+
+    def add_items(self, items: Iterable[AttributeRestSearchListItem]) -> int:
+        """Hold attributes as an attribute ``restSearch`` returned them.
+
+        Each item needs its ``Event``. An attribute held already is
+        replaced; event fields are taken from the latest item of the event.
+        """
+        added = 0
+        for item in items:
+            if item.Event is None:
+                raise ValueError("restSearch items need their Event to be held")
+            event_id = record_id(item.Event.id)
+            known = self._events.get(event_id)
+            self._set_event(item.Event, known.tags if known is not None else ())
+            self.remove_attribute(record_id(item.id))
+            added += self._add(item, event_id, item.Object, item)
+        return added
+
+    def remove_event(self, event_id: int) -> int:
+        """Drop ``event_id`` and its attributes; returns how many there were."""
+        event_id = int(event_id)
+        event = self._events.pop(event_id, None)
+        if event is None:
+            return 0
+        for row in event.rows:
+            self._drop(row)
+        for name in event.tag_names:
+            _discard(self._event_tags, name, event_id)
+        _discard(self._orgs, event.orgc_id, event_id)
+        if event.uuid:
+            self._event_uuids.pop(event.uuid, None)
+        self._compact_if_sparse()
+        return len(event.rows)
+
+    def remove_attribute(self, attribute_id: int) -> bool:
+        row = self._attributes.get(int(attribute_id))
+        if row is None:
+            return False
+        self._drop(row)
+        self._compact_if_sparse()
+        return True
+
+    def search(self, filters: Any) -> AttributeRestSearchList:
+        """Attributes matching ``filters``, as ``/attributes/restSearch``.
+
+        ``filters`` is an ``AttributeRestSearchFilter`` or its request body.
+        Results come in attribute id order, paged by ``page`` and ``limit``.
+        """
+        filters = canonical_filters(filters)
+        rows = self._select(filters)
+        limit = filters.get("limit")
+        if limit:
+            page = int(filters.get("page") or 1)
+            rows = rows[(page - 1) * int(limit) : page * int(limit)]
+        event_tags = bool(filters.get("includeEventTags"))
+        return AttributeRestSearchList([self._item(row, event_tags) for row in rows])
+
+    def count(self, filters: Any) -> int:
+        """Number of attributes matching ``filters``, ignoring paging."""
+        return len(self._select(canonical_filters(filters)))
+
+    def explain(self, filters: Any) -> List[Tuple[str, Optional[int]]]:
+        """Predicates in evaluation order, with the rows each index would list.
+
+        The first one is walked; ``None`` marks predicates without an index,
+        and a plan starting with one scans every attribute.
+        """
+        predicates = self._plan(self._predicates(canonical_filters(filters)))
+        return [(predicate.name, predicate.estimate) for predicate in predicates]
+
+    def _select(self, filters: Mapping[str, Any]) -> List[int]:
+        predicates = self._plan(self._predicates(filters))
+        if predicates and predicates[0].rows is not None:
+            candidates: Iterable[int] = predicates[0].rows()
+            checks = predicates[1:]
+        else:
+            candidates = range(len(self._rows))
+            checks = predicates
+        rows = self._rows
+        selected = [
+            row
+            for row in candidates
+            if rows[row] is not None and all(check.test(row) for check in checks)
+        ]
+        selected.sort(key=lambda row: rows[row].attribute_id)
+        return selected
+
+    @staticmethod
+    def _plan(predicates: List[_Predicate]) -> List[_Predicate]:
+        """Most selective index first, then unindexed predicates."""
+        return sorted(
+            predicates,
+            key=lambda predicate: (
+                predicate.estimate is None,
+                predicate.estimate or 0,
+            ),
+        )
+
+    # Holding rows.
+
+    def _set_event(self, event: Event, tags: Sequence[Tag]) -> None:
+        event_id = record_id(event.id)
+        info = self._events.get(event_id)
+        if info is None:
+            info = self._events[event_id] = _Event()
+            info.rows = set()
+        else:
+            for name in info.tag_names:
+                _discard(self._event_tags, name, event_id)
+            _discard(self._orgs, info.orgc_id, event_id)
+            if info.uuid:
+                self._event_uuids.pop(info.uuid, None)
+        info.event = Event.model_validate(
+            event.model_dump(by_alias=True, include=set(Event.model_fields))
+        )
+        info.tags = tuple(tags)
+        info.tag_names = frozenset(_lower(tag.name) for tag in tags if tag.name)
+        info.orgc_id = record_id(event.orgc_id)
+        info.uuid = str(event.uuid) if event.uuid else ""
+        info.published = bool(event.published)
+        info.threat_level_id = getattr(
+            event.threat_level_id, "value", event.threat_level_id
+        )
+        info.info = (event.info or "").lower()
+        for name in info.tag_names:
+            self._event_tags.setdefault(name, set()).add(event_id)
+        self._orgs.setdefault(info.orgc_id, set()).add(event_id)
+        orgc = getattr(event, "Orgc", None)
+        if orgc is not None and orgc.name:
+            self._org_names[orgc.name.lower()] = info.orgc_id
+        if info.uuid:
+            self._event_uuids[info.uuid] = event_id
+
+    def _add(
+        self,
+        attribute: Attribute,
+        event_id: int,
+        summary: Optional[Object] = None,
+        item: Optional[AttributeRestSearchListItem] = None,
+    ) -> int:
+        event = self._events[event_id]
+        record = _Row()
+        record.attribute = attribute
+        record.item = item
+        record.object = summary
+        record.attribute_id = record_id(attribute.id)
+        record.event_id = event_id
+        record.type = getattr(attribute.type, "value", attribute.type) or ""
+        record.category = getattr(attribute.category, "value", attribute.category) or ""
+        record.value = (attribute.value or "").lower()
+        record.parts = tuple(record.value.split("|")) if "|" in record.type else ()
+        record.uuid = str(attribute.uuid) if attribute.uuid else ""
+        record.to_ids = bool(attribute.to_ids)
+        record.deleted = bool(attribute.deleted)
+        record.object_relation = attribute.object_relation
+        record.tags = frozenset(
+            _lower(tag.name) for tag in (item.Tag if item else None) or () if tag.name
+        )
+        self.remove_attribute(record.attribute_id)
+        row = len(self._rows)
+        self._rows.append(record)
+        self._live += 1
+        self._attributes[record.attribute_id] = row
+        event.rows.add(row)
+        self._types.setdefault(record.type, set()).add(row)
+        self._categories.setdefault(record.category, set()).add(row)
+        for value in {record.value, *record.parts}:
+            self._values.setdefault(value, set()).add(row)
+        if record.uuid:
+            self._uuids[record.uuid] = row
+        for name in record.tags:
+            self._tags.setdefault(name, set()).add(row)
+
+        source = event.event
+        columns = self._columns
+        columns["timestamp"].append(_number(attribute.timestamp))
+        columns["event_timestamp"].append(_number(source.timestamp))
+        columns["publish_timestamp"].append(_number(source.publish_timestamp))
+        date = source.date
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        columns["date"].append(_day(date.timestamp()))
+        columns["first_seen"].append(_number(attribute.first_seen))
+        columns["last_seen"].append(_number(attribute.last_seen))
+        self._sorted.clear()
+        return 1
+
+    def _drop(self, row: int) -> None:
+        record = self._rows[row]
+        if record is None:
+            return
+        self._rows[row] = None
+        self._live -= 1
+        if self._attributes.get(record.attribute_id) == row:
+            del self._attributes[record.attribute_id]
+        event = self._events.get(record.event_id)
+        if event is not None:
+            event.rows.discard(row)
+        _discard(self._types, record.type, row)
+        _discard(self._categories, record.category, row)
+        for value in {record.value, *record.parts}:
+            _discard(self._values, value, row)
+        if record.uuid and self._uuids.get(record.uuid) == row:
+            del self._uuids[record.uuid]
+        for name in record.tags:
+            _discard(self._tags, name, row)
+        for column in self._columns.values():
+            column[row] = math.nan
+        self._sorted.clear()
+
+    def _compact_if_sparse(self) -> None:
+        """Renumber the live rows once dead ones outnumber them.
+
+        Dropped rows only become ``None`` (and NaN in the time columns), so
+        that removing an event does not renumber the rest. Rebuilding once
+        the dead rows outnumber the live ones keeps an engine whose events
+        are replaced over and over at most twice its live size, for a cost
+        spread over the drops that made the rows dead.
+        """
+        dead = len(self._rows) - self._live
+        if dead <= max(self._live, _COMPACT_MIN):
+            return
+        kept = [row for row, record in enumerate(self._rows) if record is not None]
+        renumbered = {row: new for new, row in enumerate(kept)}
+        self._rows = [self._rows[row] for row in kept]
+        positions = np.array(kept, dtype=np.intp)
+        for name, column in self._columns.items():
+            values = np.frombuffer(column, dtype=np.float64)[positions]
+            self._columns[name] = array("d", values.tobytes())
+        for key, row in self._attributes.items():
+            self._attributes[key] = renumbered[row]
+        for key, row in self._uuids.items():
+            self._uuids[key] = renumbered[row]
+        for event in self._events.values():
+            event.rows = {renumbered[row] for row in event.rows}
+        for index in (self._types, self._categories, self._values, self._tags):
+            for key, rows in index.items():
+                index[key] = {renumbered[row] for row in rows}
+        self._sorted.clear()
+
+    def _item(self, row: int, event_tags: bool) -> AttributeRestSearchListItem:
+        record = self._rows[row]
+        event = self._events[record.event_id]
+        item = record.item
+        if item is None:
+            item = AttributeRestSearchListItem.model_validate(
+                {
+                    **record.attribute.model_dump(by_alias=True, exclude_none=True),
+                    "event_uuid": event.uuid or None,
+                    "Event": event.event,
+                    "Object": record.object,
+                }
+            )
+        if event_tags and event.tags:
+            names = {tag.name for tag in item.Tag or ()}
+            tags = [*(item.Tag or ()), *(t for t in event.tags if t.name not in names)]
+            item = item.model_copy(update={"Tag": tags})
+        return item
+
+    # Predicates.
+
+    def _predicates(self, filters: Mapping[str, Any]) -> List[_Predicate]:
+        unsupported = sorted(
+            name
+            for name in UNSUPPORTED_FILTERS.intersection(filters)
+            if filters[name] not in (False, 0, "0", "")
+        )
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} cannot be evaluated offline")
+        if filters.get("returnFormat", "json") != "json":
+            raise ValueError("only the json returnFormat is served offline")
+        now = self.clock()
+        rows, events = self._rows, self._events
+        predicates = []
+
+        for name, index in (("type", self._types), ("category", self._categories)):
+            if name in filters:
+                predicates.extend(
+                    self._membership(
+                        name,
+                        filters[name],
+                        index,
+                        lambda row, name=name: getattr(rows[row], name),
+                    )
+                )
+        for name in ("value", "value1", "value2"):
+            if name in filters:
+                predicates.extend(self._value(name, filters[name]))
+        if "eventid" in filters:
+            wanted = {str(value) for value in as_list(filters["eventid"])}
+            positive, negative = _split(wanted)
+            if positive:
+                ids = [int(value) for value in positive if value.isdigit()]
+                predicates.append(
+                    self._union(
+                        "eventid",
+                        [events[id].rows for id in ids if id in events],
+                        lambda row: str(rows[row].event_id) in positive,
+                    )
+                )
+            if negative:
+                predicates.append(
+                    _Predicate(
+                        "!eventid", lambda row: str(rows[row].event_id) not in negative
+                    )
+                )
+        if "uuid" in filters:
+            wanted = {str(value).lower() for value in as_list(filters["uuid"])}
+            sets: List[Iterable[int]] = [
+                [self._uuids[uuid]] for uuid in wanted if uuid in self._uuids
+            ]
+            sets += [
+                events[self._event_uuids[uuid]].rows
+                for uuid in wanted
+                if uuid in self._event_uuids
+            ]
+            predicates.append(
+                self._union(
+                    "uuid",
+                    sets,
+                    lambda row: rows[row].uuid in wanted
+                    or events[rows[row].event_id].uuid in wanted,
+                )
+            )
+        if "org" in filters:
+            positive, negative = _split(str(value) for value in as_list(filters["org"]))
+            if positive:
+                orgs = self._org_ids(positive)
+                predicates.append(
+                    self._union(
+                        "org",
+                        [
+                            events[id].rows
+                            for org in orgs
+                            for id in self._orgs.get(org, ())
+                        ],
+                        lambda row: events[rows[row].event_id].orgc_id in orgs,
+                    )
+                )
+            if negative:
+                excluded = self._org_ids(negative)
+                predicates.append(
+                    _Predicate(
+                        "!org",
+                        lambda row: events[rows[row].event_id].orgc_id not in excluded,
+                    )
+                )
+        if "tags" in filters:
+            predicates.extend(self._tag_predicates(filters["tags"]))
+
+        for name, column, upper in (
+            ("timestamp", "timestamp", False),
+            ("attribute_timestamp", "timestamp", False),
+            ("event_timestamp", "event_timestamp", False),
+            ("publish_timestamp", "publish_timestamp", False),
+            ("first_seen", "first_seen", False),
+            ("last_seen", "last_seen", True),
+        ):
+            if name in filters:
+                low, high = _range(filters[name], now)
+                if upper and not isinstance(filters[name], (list, tuple)):
+                    low, high = -math.inf, low
+                predicates.append(self._between(name, column, low, high))
+        if "last" in filters:
+            predicates.append(
+                self._between(
+                    "last", "publish_timestamp", _time(filters["last"], now), math.inf
+                )
+            )
+            predicates.append(
+                _Predicate(
+                    "published", lambda row: events[rows[row].event_id].published
+                )
+            )
+        if "from" in filters or "to" in filters:
+            low = _day(_time(filters["from"], now)) if "from" in filters else -math.inf
+            high = _day(_time(filters["to"], now)) if "to" in filters else math.inf
+            predicates.append(self._between("from/to", "date", low, high))
+
+        if "to_ids" in filters:
+            to_ids = _flag(filters["to_ids"])
+            predicates.append(
+                _Predicate("to_ids", lambda row: rows[row].to_ids is to_ids)
+            )
+        if "published" in filters:
+            published = _flag(filters["published"])
+            predicates.append(
+                _Predicate(
+                    "published",
+                    lambda row: events[rows[row].event_id].published is published,
+                )
+            )
+        deleted = {_flag(value) for value in as_list(filters.get("deleted", False))}
+        if len(deleted) == 1:
+            wanted_deleted = deleted.pop()
+            predicates.append(
+                _Predicate("deleted", lambda row: rows[row].deleted is wanted_deleted)
+            )
+        if "object_relation" in filters:
+            relation = filters["object_relation"]
+            predicates.append(
+                _Predicate(
+                    "object_relation", lambda row: rows[row].object_relation == relation
+                )
+            )
+        if "threat_level_id" in filters:
+            level = str(filters["threat_level_id"])
+            predicates.append(
+                _Predicate(
+                    "threat_level_id",
+                    lambda row: events[rows[row].event_id].threat_level_id == level,
+                )
+            )
+        if "eventinfo" in filters:
+            text = str(filters["eventinfo"]).lower()
+            pattern = _like(text if "%" in text else f"%{text}%")
+            predicates.append(
+                _Predicate(
+                    "eventinfo",
+                    lambda row: pattern.match(events[rows[row].event_id].info)
+                    is not None,
+                )
+            )
+        return predicates
+
+    def _membership(
+        self,
+        name: str,
+        values: Any,
+        index: Mapping[str, Set[int]],
+        field: Callable[[int], str],
+    ) -> List[_Predicate]:
+        positive, negative = _split(str(value) for value in as_list(values))
+        predicates = []
+        if positive:
+            predicates.append(
+                self._union(
+                    name,
+                    [index[value] for value in positive if value in index],
+                    lambda row: field(row) in positive,
+                )
+            )
+        if negative:
+            predicates.append(
+                _Predicate(f"!{name}", lambda row: field(row) not in negative)
+            )
+        return predicates
+
+    def _value(self, name: str, values: Any) -> List[_Predicate]:
+        positive, negative = _split(str(value).lower() for value in as_list(values))
+        rows = self._rows
+        if name == "value":
+            candidates = lambda row: (rows[row].value, *rows[row].parts)
+        else:
+            part = 0 if name == "value1" else 1
+            candidates = lambda row: (
+                rows[row].parts[part] if rows[row].parts else rows[row].value,
+            )
+        predicates = []
+        if positive:
+            exact = {value for value in positive if "%" not in value}
+            patterns = [_like(value) for value in positive if "%" in value]
+
+            def test(row: int) -> bool:
+                return any(
+                    value in exact or any(p.match(value) for p in patterns)
+                    for value in candidates(row)
+                )
+
+            if patterns:
+                predicates.append(_Predicate(name, test))
+            else:
+                predicates.append(
+                    self._union(
+                        name,
+                        [
+                            self._values[value]
+                            for value in exact
+                            if value in self._values
+                        ],
+                        test,
+                    )
+                )
+        if negative:
+            exact = {value for value in negative if "%" not in value}
+            patterns = [_like(value) for value in negative if "%" in value]
+            predicates.append(
+                _Predicate(
+                    f"!{name}",
+                    lambda row: not any(
+                        value in exact or any(p.match(value) for p in patterns)
+                        for value in candidates(row)
+                    ),
+                )
+            )
+        return predicates
+
+    def _tag_predicates(self, tags: Any) -> List[_Predicate]:
+        """``tags`` as a list (``!`` negates) or ``{"OR", "AND", "NOT"}``."""
+        if isinstance(tags, Mapping):
+            any_of = [str(tag) for tag in as_list(tags.get("OR"))]
+            all_of = [str(tag) for tag in as_list(tags.get("AND"))]
+            none_of = [str(tag) for tag in as_list(tags.get("NOT"))]
+        else:
+            any_of, none_of = map(list, _split(str(tag) for tag in as_list(tags)))
+            all_of = []
+        rows, events = self._rows, self._events
+
+        def names(row: int) -> Set[str]:
+            return rows[row].tags | events[rows[row].event_id].tag_names
+
+        predicates = []
+        if any_of:
+            wanted = self._tag_names(any_of)
+            predicates.append(
+                self._union(
+                    "tags",
+                    self._tag_rows(wanted),
+                    lambda row: not wanted.isdisjoint(names(row)),
+                )
+            )
+        for tag in all_of:
+            wanted_all = self._tag_names([tag])
+            predicates.append(
+                self._union(
+                    f"tags AND {tag}",
+                    self._tag_rows(wanted_all),
+                    lambda row, wanted=wanted_all: not wanted.isdisjoint(names(row)),
+                )
+            )
+        if none_of:
+            excluded = self._tag_names(none_of)
+            predicates.append(
+                _Predicate("!tags", lambda row: excluded.isdisjoint(names(row)))
+            )
+        return predicates
+
+    def _tag_names(self, tags: Iterable[str]) -> Set[str]:
+        """Held tag names matching ``tags``, ``%`` wildcards expanded."""
+        found = set()
+        for tag in tags:
+            tag = tag.lower()
+            if "%" in tag:
+                pattern = _like(tag)
+                found.update(
+                    name
+                    for name in (*self._tags, *self._event_tags)
+                    if pattern.match(name)
+                )
+            else:
+                found.add(tag)
+        return found
+
+    def _tag_rows(self, names: Set[str]) -> List[Iterable[int]]:
+        sets: List[Iterable[int]] = [
+            self._tags[name] for name in names if name in self._tags
+        ]
+        for name in names:
+            for event_id in self._event_tags.get(name, ()):
+                sets.append(self._events[event_id].rows)
+        return sets
+
+    def _org_ids(self, orgs: Iterable[str]) -> Set[int]:
+        ids = set()
+        for org in orgs:
+            if org.isdigit():
+                ids.add(int(org))
+            elif org.lower() in self._org_names:
+                ids.add(self._org_names[org.lower()])
+        return ids
+
+    @staticmethod
+    def _union(
+        name: str, sets: List[Iterable[int]], test: Callable[[int], bool]
+    ) -> _Predicate:
+        def rows() -> Iterable[int]:
+            if len(sets) == 1:
+                return sets[0]
+            return set().union(*sets)
+
+        return _Predicate(name, test, rows, sum(map(len, sets)))
+
+    def _between(self, name: str, column: str, low: float, high: float) -> _Predicate:
+        values, order = self._sorted_column(column)
+        start = int(np.searchsorted(values, low, side="left"))
+        end = int(np.searchsorted(values, high, side="right"))
+        data = self._columns[column]
+        return _Predicate(
+            name,
+            lambda row: low <= data[row] <= high,
+            lambda: order[start:end].tolist(),
+            end - start,
+        )
+
+    def _sorted_column(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._sorted.get(column)
+        if cached is None:
+            values = np.frombuffer(self._columns[column], dtype=np.float64)
+            order = np.argsort(values, kind="stable")
+            # NaN, for missing values and dropped rows, sorts last.
+            kept = len(values) - int(np.count_nonzero(np.isnan(values)))
+            order = order[:kept]
+            cached = self._sorted[column] = (values[order], order)
+        return cached
+
+
+def _discard(index: Dict[Any, Set[int]], key: Any, member: int) -> None:
+    members = index.get(key)
+    if members is not None:
+        members.discard(member)
+        if not members:
+            del index[key]
+
+
+def _lower(name: str) -> str:
+    return name.strip().lower()
+
+
+def _split(values: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+    """Values and ``!``-negated values, apart."""
+    positive, negative = set(), set()
+    for value in values:
+        if value.startswith("!"):
+            negative.add(value[1:])
+        else:
+            positive.add(value)
+    return positive, negative
+
+
+def _flag(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "0", "false")
+    return bool(value)
+
+
+def _like(pattern: str) -> Pattern[str]:
+    """SQL ``LIKE`` with ``%`` as a regular expression."""
+    return re.compile(
+        ".*".join(re.escape(part) for part in pattern.split("%")) + r"\Z", re.DOTALL
+    )
+
+
+def _number(value: Optional[str]) -> float:
+    if not value:
+        return math.nan
+    return _seconds(int(value))
+
+
+def _seconds(number: float) -> float:
+    """Seconds of a Unix time, given in seconds or, as ``first_seen``, in µs."""
+    return number / 1_000_000 if number > 10**11 else number
+
+
+def _day(timestamp: float) -> float:
+    return timestamp - timestamp % _DAY
+
+
+def _time(value: Any, now: float) -> float:
+    """Unix time of a timestamp, an ISO 8601 date or a ``5d``/``12h`` age."""
+    text = str(value).strip()
+    match = _RELATIVE_TIME.match(text)
+    if match:
+        return now - int(match.group(1)) * _SECONDS[match.group(2).lower()]
+    if text.isdigit():
+        return _seconds(int(text))
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"not a time filter: {value!r}") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _range(spec: Any, now: float) -> Tuple[float, float]:
+    """``[low, high]`` of a time filter: one bound means from then on."""
+    if isinstance(spec, (list, tuple)):
+        low, high = sorted(_time(value, now) for value in spec[:2])
+        return low, high
+    return _time(spec, now), math.inf
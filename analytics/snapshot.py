@@ -0,0 +1,684 @@
+"""Versioned, memory-mapped snapshots of compiled lookup indexes.
+
+Compiling warninglists, taxonomies and galaxy clusters from their JSON takes
+seconds, and every worker process pays for it again. :class:`SnapshotWriter`
+compiles them once into a file of flat arrays. :meth:`Snapshot.open` maps
+the file read-only and looks keys up in place, so opening only parses a
+small header whatever the size of the indexes, and the processes mapping
+the same file share its pages through the page cache.
+
+Layout, in the byte order recorded in the header::
+
+    b"MISPSNAP"
+    uint32  format version
+    uint32  header length
+    header  JSON: table of the arrays, list metadata
+    arrays  each aligned on 8 bytes
+
+A key index is an open-addressing hash table over 64-bit ``blake2b``
+hashes. Its slots point at entries holding the key itself and the rows
+filed under it.
+
+:meth:`SnapshotWriter.write` replaces the file atomically, so processes
+still mapping the previous snapshot keep reading it until they reopen.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import socket
+import sys
+import time
+from array import array
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+from uuid import UUID
+
+from analytics.warninglists import CompiledWarninglists, WarninglistMatcher
+from models.galaxy import GalaxyCluster
+from models.taxonomy_tags import Taxonomy, TaxonomyEntry, TaxonomyPredicate
+from models.warning_lists import Warninglist
+
+MAGIC = b"MISPSNAP"
+FORMAT_VERSION = 1
+
+_PREAMBLE = len(MAGIC) + 8
+_ALIGNMENT = 8
+_EMPTY = 0xFFFFFFFF
+_NIL_UUID = bytes(16)
+_FAMILY_BITS = {32: socket.AF_INET, 128: socket.AF_INET6}
+
+#: Metadata kept for each warninglist; entries live in the indexes.
+_WARNINGLIST_FIELDS = (
+    "id",
+    "name",
+    "type",
+    "description",
+    "version",
+    "enabled",
+    "valid_attributes",
+)
+
+
+class SnapshotError(ValueError):
+    """A file that is not a snapshot this version can read."""
+
+
+class TagInfo(NamedTuple):
+    """A taxonomy tag, as compiled into a snapshot."""
+
+    name: str
+    namespace: Optional[str]
+    taxonomy_id: Optional[str]
+    expanded: Optional[str]
+    description: Optional[str]
+    colour: Optional[str]
+    numerical_value: Optional[int]
+    exclusive: bool
+
+
+class ClusterInfo(NamedTuple):
+    """A galaxy cluster, as compiled into a snapshot."""
+
+    uuid: Optional[UUID]
+    type: Optional[str]
+    value: Optional[str]
+    tag_name: Optional[str]
+    description: Optional[str]
+    galaxy_id: Optional[str]
+    synonyms: Tuple[str, ...]
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _network_key(bits: int, length: int, network: int) -> bytes:
+    return b"%d/%d/%x" % (bits, length, network)
+
+
+class SnapshotWriter:
+    """Compile lookup indexes and write them as one snapshot file.
+
+    Add warninglists once; taxonomies and clusters accumulate over calls.
+    """
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self._warninglists: Optional[WarninglistMatcher] = None
+        self._taxonomies: List[Dict[str, Any]] = []
+        self._tags: Dict[str, TagInfo] = {}
+        self._clusters: List[ClusterInfo] = []
+
+    def add_warninglists(
+        self,
+        warninglists: Union[WarninglistMatcher, Iterable[Warninglist]],
+        include_disabled: bool = False,
+    ) -> None:
+        if not isinstance(warninglists, WarninglistMatcher):
+            warninglists = WarninglistMatcher(warninglists, include_disabled)
+        self._warninglists = warninglists
+
+    def add_taxonomy(
+        self,
+        taxonomy: Taxonomy,
+        predicates: Iterable[TaxonomyPredicate] = (),
+        entries: Iterable[TaxonomyEntry] = (),
+    ) -> None:
+        """File the tags of ``taxonomy``: its predicates and their entries.
+
+        ``entries`` are the tags listed by ``/taxonomies/view``, holding
+        the full ``namespace:predicate="value"`` name.
+        """
+        self._taxonomies.append(taxonomy.model_dump(mode="json", exclude_none=True))
+        namespace = taxonomy.namespace
+        taxonomy_id = _root(taxonomy.id)
+        for predicate in predicates:
+            if not predicate.value:
+                continue
+            name = f"{namespace}:{predicate.value}"
+            self._tags[name.lower()] = TagInfo(
+                name,
+                namespace,
+                taxonomy_id,
+                predicate.expanded,
+                predicate.description,
+                predicate.colour,
+                predicate.numerical_value,
+                bool(predicate.exclusive or taxonomy.exclusive),
+            )
+        for entry in entries:
+            if not entry.tag:
+                continue
+            self._tags[entry.tag.lower()] = TagInfo(
+                entry.tag,
+                namespace,
+                taxonomy_id,
+                entry.expanded,
+                entry.description,
+                None,
+                None,
+                bool(entry.exclusive_predicate),
+            )
+
+    def add_galaxy_clusters(self, clusters: Iterable[GalaxyCluster]) -> None:
+        for cluster in clusters:
+            synonyms = tuple(
+                element.value
+                for element in cluster.GalaxyElement or ()
+                if element.key == "synonyms" and element.value
+            )
+            self._clusters.append(
+                ClusterInfo(
+                    cluster.uuid,
+                    cluster.type,
+                    cluster.value,
+                    cluster.tag_name,
+                    cluster.description,
+                    _root(cluster.galaxy_id),
+                    synonyms,
+                )
+            )
+
+    def write(self, path: str) -> int:
+        """Write the snapshot to ``path`` and return its size in bytes."""
+        arrays = _Arrays()
+        header: Dict[str, Any] = {
+            "byteorder": sys.byteorder,
+            "created": time.time(),
+            "label": self.label,
+        }
+        if self._warninglists is not None:
+            header["warninglists"] = self._compile_warninglists(arrays)
+        if self._taxonomies or self._tags:
+            header["taxonomies"] = self._taxonomies
+            self._compile_tags(arrays)
+        if self._clusters:
+            header["clusters"] = len(self._clusters)
+            self._compile_clusters(arrays)
+        header["arrays"] = arrays.table
+
+        encoded = json.dumps(header, separators=(",", ":")).encode()
+        start = _align(_PREAMBLE + len(encoded))
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(MAGIC)
+            file.write(array("I", [FORMAT_VERSION, len(encoded)]).tobytes())
+            file.write(encoded)
+            file.write(bytes(start - _PREAMBLE - len(encoded)))
+            file.write(arrays.data)
+            size = file.tell()
+        os.replace(temporary, path)
+        return size
+
+    def _compile_warninglists(self, arrays: _Arrays) -> Dict[str, Any]:
+        compiled = self._warninglists.compiled()
+        arrays.key_index(
+            "wl.string",
+            ((key.encode(), lists) for key, lists in compiled.strings.items()),
+        )
+        arrays.key_index(
+            "wl.hostname",
+            ((host.encode(), lists) for host, lists in compiled.hostnames.items()),
+        )
+        networks = []
+        cidr: List[Tuple[bytes, Sequence[int]]] = []
+        for family, length, table in compiled.networks:
+            bits = 32 if family == socket.AF_INET else 128
+            networks.append([bits, length])
+            cidr.extend(
+                (_network_key(bits, length, network), lists)
+                for network, lists in table.items()
+            )
+        arrays.key_index("wl.cidr", cidr)
+        return {
+            "lists": [
+                warninglist.model_dump(
+                    mode="json", include=set(_WARNINGLIST_FIELDS), exclude_none=True
+                )
+                for warninglist in compiled.lists
+            ],
+            "valid": [
+                None if valid is None else sorted(valid) for valid in compiled.valid
+            ],
+            "networks": networks,
+            "substrings": [[i, p.pattern] for i, p in compiled.substrings],
+            "regexes": [[i, p.pattern] for i, p in compiled.regexes],
+        }
+
+    def _compile_tags(self, arrays: _Arrays) -> None:
+        tags = list(self._tags.values())
+        arrays.strings("tag.name", [tag.name for tag in tags])
+        arrays.strings("tag.namespace", [tag.namespace for tag in tags])
+        arrays.strings("tag.taxonomy_id", [tag.taxonomy_id for tag in tags])
+        arrays.strings("tag.expanded", [tag.expanded for tag in tags])
+        arrays.strings("tag.description", [tag.description for tag in tags])
+        arrays.strings("tag.colour", [tag.colour for tag in tags])
+        arrays.add(
+            "tag.numerical_value",
+            "q",
+            [tag.numerical_value or 0 for tag in tags],
+        )
+        arrays.add(
+            "tag.flags",
+            "B",
+            [tag.exclusive | (tag.numerical_value is not None) << 1 for tag in tags],
+        )
+        arrays.key_index(
+            "tag", ((key.encode(), [row]) for row, key in enumerate(self._tags))
+        )
+
+    def _compile_clusters(self, arrays: _Arrays) -> None:
+        clusters = self._clusters
+        arrays.add(
+            "cluster.uuid",
+            "B",
+            b"".join(
+                _NIL_UUID if cluster.uuid is None else cluster.uuid.bytes
+                for cluster in clusters
+            ),
+        )
+        for name in ("type", "value", "tag_name", "description", "galaxy_id"):
+            arrays.strings(
+                f"cluster.{name}", [getattr(cluster, name) for cluster in clusters]
+            )
+        arrays.strings(
+            "cluster.synonyms", ["\n".join(cluster.synonyms) for cluster in clusters]
+        )
+
+        by_uuid: Dict[bytes, List[int]] = {}
+        by_tag: Dict[bytes, List[int]] = {}
+        by_name: Dict[bytes, List[int]] = {}
+        for row, cluster in enumerate(clusters):
+            if cluster.uuid is not None:
+                by_uuid.setdefault(cluster.uuid.bytes, []).append(row)
+            if cluster.tag_name:
+                by_tag.setdefault(cluster.tag_name.lower().encode(), []).append(row)
+            names = {
+                name.lower() for name in (cluster.value, *cluster.synonyms) if name
+            }
+            for name in names:
+                by_name.setdefault(name.encode(), []).append(row)
+        arrays.key_index("cluster.by_uuid", by_uuid.items())
+        arrays.key_index("cluster.by_tag", by_tag.items())
+        arrays.key_index("cluster.by_name", by_name.items())
+
+
+class _Arrays:
+    """Arrays laid out back to back, each aligned on 8 bytes."""
+
+    def __init__(self):
+        self.data = bytearray()
+        #: name -> [offset from the first array, format, item count]
+        self.table: Dict[str, List[Any]] = {}
+
+    def add(self, name: str, format: str, values: Union[bytes, Iterable[int]]) -> None:
+        if not isinstance(values, (bytes, bytearray)):
+            values = array(format, values).tobytes()
+        self.data.extend(bytes(_align(len(self.data)) - len(self.data)))
+        count = len(values) // array(format).itemsize
+        self.table[name] = [len(self.data), format, count]
+        self.data.extend(values)
+
+    def strings(self, name: str, values: Sequence[Optional[str]]) -> None:
+        encoded = [b"" if value is None else value.encode() for value in values]
+        offsets = array("q", [0])
+        total = 0
+        for item in encoded:
+            total += len(item)
+            offsets.append(total)
+        self.add(f"{name}.offsets", "q", offsets.tobytes())
+        self.add(f"{name}.data", "B", b"".join(encoded))
+        self.add(f"{name}.missing", "B", [value is None for value in values])
+
+    def key_index(
+        self, name: str, items: Iterable[Tuple[bytes, Sequence[int]]]
+    ) -> None:
+        hashes = array("Q")
+        keys = bytearray()
+        key_offsets = array("q", [0])
+        values = array("I")
+        value_offsets = array("q", [0])
+        for key, rows in items:
+            hashes.append(_hash(key))
+            keys.extend(key)
+            key_offsets.append(len(keys))
+            values.extend(rows)
+            value_offsets.append(len(values))
+        # At most half full, so that probe chains stay short.
+        size = 1 << max(1, (2 * len(hashes)).bit_length())
+        mask = size - 1
+        slots = array("I", [_EMPTY]) * size
+        for entry, hashed in enumerate(hashes):
+            slot = hashed & mask
+            while slots[slot] != _EMPTY:
+                slot = (slot + 1) & mask
+            slots[slot] = entry
+        self.add(f"{name}.slots", "I", slots.tobytes())
+        self.add(f"{name}.hashes", "Q", hashes.tobytes())
+        self.add(f"{name}.key_offsets", "q", key_offsets.tobytes())
+        self.add(f"{name}.keys", "B", bytes(keys))
+        self.add(f"{name}.value_offsets", "q", value_offsets.tobytes())
+        self.add(f"{name}.values", "I", values.tobytes())
+
+
+class _KeyIndex:
+    """Read side of :meth:`_Arrays.key_index`."""
+
+    __slots__ = (
+        "slots",
+        "mask",
+        "hashes",
+        "key_offsets",
+        "keys",
+        "value_offsets",
+        "values",
+    )
+
+    def __init__(self, snapshot: Snapshot, name: str):
+        self.slots = snapshot._view(f"{name}.slots")
+        self.mask = len(self.slots) - 1
+        self.hashes = snapshot._view(f"{name}.hashes")
+        self.key_offsets = snapshot._view(f"{name}.key_offsets")
+        self.keys = snapshot._view(f"{name}.keys")
+        self.value_offsets = snapshot._view(f"{name}.value_offsets")
+        self.values = snapshot._view(f"{name}.values")
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def get(self, key: Union[str, bytes]) -> Optional[List[int]]:
+        """The rows filed under ``key``, or ``None``."""
+        if isinstance(key, str):
+            key = key.encode()
+        hashed = _hash(key)
+        slots, mask = self.slots, self.mask
+        slot = hashed & mask
+        while True:
+            entry = slots[slot]
+            if entry == _EMPTY:
+                return None
+            if self.hashes[entry] == hashed:
+                offsets = self.key_offsets
+                if self.keys[offsets[entry] : offsets[entry + 1]] == key:
+                    start, end = self.value_offsets[entry : entry + 2]
+                    return self.values[start:end].tolist()
+            slot = (slot + 1) & mask
+
+
+class _Strings:
+    """Read side of :meth:`_Arrays.strings`."""
+
+    __slots__ = ("offsets", "data", "missing")
+
+    def __init__(self, snapshot: Snapshot, name: str):
+        self.offsets = snapshot._view(f"{name}.offsets")
+        self.data = snapshot._view(f"{name}.data")
+        self.missing = snapshot._view(f"{name}.missing")
+
+    def __len__(self) -> int:
+        return len(self.missing)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        if self.missing[row]:
+            return None
+        return str(self.data[self.offsets[row] : self.offsets[row + 1]], "utf-8")
+
+
+class _NetworkTable:
+    """The networks of one prefix length, as ``WarninglistMatcher`` reads them."""
+
+    __slots__ = ("index", "bits", "length")
+
+    def __init__(self, index: _KeyIndex, bits: int, length: int):
+        self.index = index
+        self.bits = bits
+        self.length = length
+
+    def get(self, network: int) -> Optional[List[int]]:
+        return self.index.get(_network_key(self.bits, self.length, network))
+
+
+class _LazyPattern:
+    """A pattern compiled on its first use."""
+
+    __slots__ = ("source", "_compiled")
+
+    def __init__(self, source: str):
+        self.source = source
+        self._compiled: Optional[Pattern[str]] = None
+
+    @property
+    def pattern(self) -> str:
+        return self.source
+
+    def search(self, value: str) -> Optional[re.Match]:
+        if self._compiled is None:
+            self._compiled = re.compile(self.source)
+        return self._compiled.search(value)
+
+
+def _mapped_warninglists(
+    snapshot: Snapshot, meta: Mapping[str, Any]
+) -> WarninglistMatcher:
+    """A :class:`WarninglistMatcher` reading its indexes from ``snapshot``.
+
+    The substring and regex patterns are compiled on first use.
+    """
+    cidr = _KeyIndex(snapshot, "wl.cidr")
+    return WarninglistMatcher.from_compiled(
+        CompiledWarninglists(
+            lists=[Warninglist.model_construct(**fields) for fields in meta["lists"]],
+            valid=[
+                None if valid is None else frozenset(valid) for valid in meta["valid"]
+            ],
+            strings=_KeyIndex(snapshot, "wl.string"),
+            hostnames=_KeyIndex(snapshot, "wl.hostname"),
+            networks=[
+                (_FAMILY_BITS[bits], length, _NetworkTable(cidr, bits, length))
+                for bits, length in meta["networks"]
+            ],
+            substrings=[(i, _LazyPattern(p)) for i, p in meta["substrings"]],
+            regexes=[(i, _LazyPattern(p)) for i, p in meta["regexes"]],
+        )
+    )
+
+
+class Snapshot:
+    """A snapshot file mapped read-only.
+
+    Lookups read the mapping directly and never copy an index. Close the
+    snapshot, or use it as a context manager, to unmap it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._memory = memoryview(self._mmap)
+        self._views: List[memoryview] = [self._memory]
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+        self.warninglists: Optional[WarninglistMatcher] = None
+        if "warninglists" in self.header:
+            self.warninglists = _mapped_warninglists(self, self.header["warninglists"])
+        self._tags: Optional[_KeyIndex] = None
+        if "taxonomies" in self.header:
+            self._tags = _KeyIndex(self, "tag")
+            self._tag_columns = {
+                name: _Strings(self, f"tag.{name}")
+                for name in (
+                    "name",
+                    "namespace",
+                    "taxonomy_id",
+                    "expanded",
+                    "description",
+                    "colour",
+                )
+            }
+            self._tag_numerical_value = self._view("tag.numerical_value")
+            self._tag_flags = self._view("tag.flags")
+        self._clusters: Optional[Dict[str, _KeyIndex]] = None
+        if "clusters" in self.header:
+            self._clusters = {
+                name: _KeyIndex(self, f"cluster.{name}")
+                for name in ("by_uuid", "by_tag", "by_name")
+            }
+            self._cluster_uuid = self._view("cluster.uuid")
+            self._cluster_columns = {
+                name: _Strings(self, f"cluster.{name}")
+                for name in (
+                    "type",
+                    "value",
+                    "tag_name",
+                    "description",
+                    "galaxy_id",
+                    "synonyms",
+                )
+            }
+
+    @classmethod
+    def open(cls, path: str) -> Snapshot:
+        return cls(path)
+
+    def __enter__(self) -> Snapshot:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the file; the snapshot is unusable afterwards."""
+        self.warninglists = None
+        self._tags = self._clusters = None
+        self.__dict__.pop("_tag_columns", None)
+        self.__dict__.pop("_cluster_columns", None)
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+
+    @property
+    def created(self) -> float:
+        return self.header["created"]
+
+    @property
+    def label(self) -> str:
+        return self.header["label"]
+
+    def taxonomies(self) -> List[Taxonomy]:
+        return [
+            Taxonomy.model_validate(item) for item in self.header.get("taxonomies", ())
+        ]
+
+    def tag(self, name: str) -> Optional[TagInfo]:
+        """The taxonomy tag called ``name``, compared case-insensitively."""
+        if self._tags is None:
+            return None
+        rows = self._tags.get(name.lower())
+        if not rows:
+            return None
+        row = rows[0]
+        columns = self._tag_columns
+        flags = self._tag_flags[row]
+        return TagInfo(
+            columns["name"][row],
+            columns["namespace"][row],
+            columns["taxonomy_id"][row],
+            columns["expanded"][row],
+            columns["description"][row],
+            columns["colour"][row],
+            self._tag_numerical_value[row] if flags & 2 else None,
+            bool(flags & 1),
+        )
+
+    def cluster(self, uuid: Union[UUID, str]) -> Optional[ClusterInfo]:
+        if self._clusters is None:
+            return None
+        key = (uuid if isinstance(uuid, UUID) else UUID(uuid)).bytes
+        rows = self._clusters["by_uuid"].get(key)
+        return self._cluster(rows[0]) if rows else None
+
+    def cluster_by_tag(self, tag_name: str) -> Optional[ClusterInfo]:
+        """The cluster tagged ``tag_name``, compared case-insensitively."""
+        if self._clusters is None:
+            return None
+        rows = self._clusters["by_tag"].get(tag_name.lower())
+        return self._cluster(rows[0]) if rows else None
+
+    def clusters_named(self, name: str) -> List[ClusterInfo]:
+        """Clusters whose value or one of its synonyms is ``name``, any case."""
+        if self._clusters is None:
+            return []
+        rows = self._clusters["by_name"].get(name.lower())
+        return [self._cluster(row) for row in rows or ()]
+
+    def _cluster(self, row: int) -> ClusterInfo:
+        columns = self._cluster_columns
+        uuid = bytes(self._cluster_uuid[16 * row : 16 * row + 16])
+        synonyms = columns["synonyms"][row]
+        return ClusterInfo(
+            None if uuid == _NIL_UUID else UUID(bytes=uuid),
+            columns["type"][row],
+            columns["value"][row],
+            columns["tag_name"][row],
+            columns["description"][row],
+            columns["galaxy_id"][row],
+            tuple(synonyms.split("\n")) if synonyms else (),
+        )
+
+    def _read_header(self) -> None:
+        memory = self._memory
+        if len(memory) < _PREAMBLE or bytes(memory[: len(MAGIC)]) != MAGIC:
+            raise SnapshotError(f"{self.path} is not a snapshot")
+        version, length = array("I", bytes(memory[len(MAGIC) : _PREAMBLE]))
+        if version != FORMAT_VERSION:
+            raise SnapshotError(
+                f"{self.path} has format version {version},"
+                f" this reader reads version {FORMAT_VERSION}"
+            )
+        self.version = version
+        self.header = json.loads(bytes(memory[_PREAMBLE : _PREAMBLE + length]))
+        if self.header["byteorder"] != sys.byteorder:
+            raise SnapshotError(
+                f"{self.path} was written on a {self.header['byteorder']}-endian"
+                " machine"
+            )
+        self._start = _align(_PREAMBLE + length)
+
+    def _view(self, name: str) -> memoryview:
+        offset, format, count = self.header["arrays"][name]
+        start = self._start + offset
+        size = count * array(format).itemsize
+        view = self._memory[start : start + size]
+        if format != "B":
+            view = view.cast(format)
+        self._views.append(view)
+        return view
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _root(value: Any) -> Optional[str]:
+    """The plain value of an optional ``MispRootModel`` field."""
+    return getattr(value, "root", value)
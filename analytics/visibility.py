@@ -0,0 +1,544 @@
+"""Which organisations can see which attributes, per distribution level.
+
+An attribute is visible to an organisation when its event, its object if
+it has one, and the attribute itself each are. One level is visible when:
+
+* the organisation owns the event (``org_id``), at any distribution;
+* the distribution is ``1`` (this community) and the organisation is
+  local, or ``2``/``3`` (connected communities, all communities);
+* the distribution is ``4`` and the organisation is a member of the
+  sharing group, directly or, for a group shared with every local
+  organisation, by being local;
+* the distribution is ``5`` (inherit), which defers to the level above.
+
+:class:`VisibilityEngine` gives every organisation a dense index and keeps
+the members of every sharing group as a bitset over those indexes, so the
+question is answered for all attributes of an organisation in a few
+vectorized passes over the attribute columns. The answer is cached per
+organisation; adding a member to a group or removing one only
+re-evaluates the attributes whose chain goes through that group.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from analytics.common import record_id
+from models.events import ExtendedEvent
+from models.sharing import SharingGroupListItem
+
+YOUR_ORGANISATION = 0
+THIS_COMMUNITY = 1
+CONNECTED_COMMUNITIES = 2
+ALL_COMMUNITIES = 3
+SHARING_GROUP = 4
+INHERIT_EVENT = 5
+
+#: Server id of the local instance in ``SharingGroupServer``.
+LOCAL_SERVER = "0"
+
+_WORD = 64
+#: Largest ratio of the highest attribute id to the number of rows for
+#: which ids are looked up in a table rather than by binary search.
+_DENSE_IDS = 4
+#: Dead attribute rows tolerated whatever the number of live ones.
+_COMPACT_MIN = 256
+
+
+def _distribution(value: Any) -> int:
+    value = getattr(value, "value", value)
+    if value is None or value == "":
+        return INHERIT_EVENT
+    number = int(value)
+    if not YOUR_ORGANISATION <= number <= INHERIT_EVENT:
+        raise ValueError(f"unknown distribution level {value!r}")
+    return number
+
+
+class VisibilityEngine:
+    """Per-organisation visibility of the attributes of indexed events.
+
+    Attribute rows are appended as events are added; an event added again
+    replaces its rows, which stay behind as dead rows until they outnumber
+    the live ones and the rows are renumbered. Organisations and
+    sharing groups referenced before they are described start out local
+    and empty respectively. The engine is not safe for concurrent writers.
+    """
+
+    def __init__(self) -> None:
+        self._orgs: Dict[int, int] = {}
+        self._org_ids = array("q")
+        self._local = bytearray()
+        # Sharing groups: row in the member bitsets per group id.
+        self._groups: Dict[int, int] = {}
+        self._group_ids = array("q")
+        self._bits = np.zeros((8, 1), dtype=np.uint64)
+        self._all_local = np.zeros(8, dtype=bool)
+        # Events; group columns hold the group row + 1, 0 for none.
+        self._events: Dict[int, int] = {}
+        self._event_ids = array("q")
+        self._event_owner = array("l")
+        self._event_distribution = array("b")
+        self._event_group = array("l")
+        # Objects; attribute object columns hold the object row + 1.
+        self._object_event = array("l")
+        self._object_distribution = array("b")
+        self._object_group = array("l")
+        # Attributes.
+        self._attribute_ids = array("q")
+        self._attribute_event = array("l")
+        self._attribute_object = array("l")
+        self._attribute_distribution = array("b")
+        self._attribute_group = array("l")
+        self._alive = bytearray()
+        self._live = 0
+        #: Attribute rows per event id, to kill them again.
+        self._event_rows: Dict[int, range] = {}
+        self._columns: Optional[Dict[str, Optional[np.ndarray]]] = None
+        #: Whether rows died since the columns were built.
+        self._killed = False
+        #: Attribute rows whose chain goes through a group, per group row.
+        self._group_rows: Dict[int, np.ndarray] = {}
+        #: Visibility mask per organisation index, over the attribute rows.
+        self._masks: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        """Number of live attributes."""
+        return self._live
+
+    # Organisations and sharing groups.
+
+    def add_org(self, org_id: Any, local: bool = True) -> int:
+        """Register an organisation, or change whether it is local.
+
+        Returns its dense index.
+        """
+        index = self._org(org_id)
+        if bool(self._local[index]) != local:
+            self._local[index] = local
+            self._masks.pop(index, None)
+        return index
+
+    def add_sharing_group(self, item: SharingGroupListItem) -> int:
+        """Describe a sharing group as ``/sharing_groups/index`` lists it.
+
+        Its members are the organisations of ``SharingGroupOrg`` and its
+        owner; a ``SharingGroupServer`` entry for the local server with
+        ``all_orgs`` adds every local organisation. Returns its row.
+        """
+        group = item.SharingGroup
+        if group is None or not group.id:
+            raise ValueError("sharing group without an id")
+        members = [record_id(entry.org_id) for entry in item.SharingGroupOrg or ()]
+        if item.Organisation is not None:
+            members.append(record_id(item.Organisation.id))
+        all_local = any(
+            entry.all_orgs and getattr(entry.server_id, "root", None) == LOCAL_SERVER
+            for entry in item.SharingGroupServer or ()
+        )
+        return self.set_group(group.id, members, all_local=all_local)
+
+    def set_group(
+        self, group_id: Any, org_ids: Iterable[Any], all_local: bool = False
+    ) -> int:
+        """Replace the members of a sharing group; returns its row."""
+        row = self._group_row(group_id)
+        wanted = {self._org(org_id) for org_id in org_ids}
+        current = set(self._members(row))
+        for index in current - wanted:
+            self._set_bit(row, index, False)
+        for index in wanted - current:
+            self._set_bit(row, index, True)
+        changed = current ^ wanted
+        if bool(self._all_local[row]) != all_local:
+            self._all_local[row] = all_local
+            changed.update(
+                index for index in range(len(self._local)) if self._local[index]
+            )
+        self._refresh(row, changed)
+        return row
+
+    def add_member(self, group_id: Any, org_id: Any) -> None:
+        row = self._group_row(group_id)
+        index = self._org(org_id)
+        if not self._has_bit(row, index):
+            self._set_bit(row, index, True)
+            self._refresh(row, (index,))
+
+    def remove_member(self, group_id: Any, org_id: Any) -> None:
+        row = self._groups.get(record_id(group_id))
+        index = self._orgs.get(record_id(org_id))
+        if row is not None and index is not None and self._has_bit(row, index):
+            self._set_bit(row, index, False)
+            self._refresh(row, (index,))
+
+    def members(self, group_id: Any) -> List[int]:
+        """Ids of the organisations listed in a sharing group."""
+        row = self._groups.get(record_id(group_id))
+        if row is None:
+            return []
+        return [self._org_ids[index] for index in self._members(row)]
+
+    # Events.
+
+    def add_event(self, event: ExtendedEvent) -> int:
+        """Index the attributes of ``event`` and its objects.
+
+        Deleted attributes and objects are left out. Returns the number of
+        attributes added.
+        """
+        event_id = record_id(event.id)
+        self.remove_event(event_id)
+        event_row = self._events[event_id] = len(self._event_ids)
+        self._event_ids.append(event_id)
+        self._event_owner.append(self._org(event.org_id))
+        self._event_distribution.append(_distribution(event.distribution))
+        self._event_group.append(self._group_column(event))
+        first = len(self._attribute_ids)
+        for attribute in event.Attribute or ():
+            self._add_attribute(attribute, event_row, 0)
+        for item in event.Object or ():
+            if item.deleted:
+                continue
+            self._object_event.append(event_row)
+            self._object_distribution.append(_distribution(item.distribution))
+            self._object_group.append(self._group_column(item))
+            object_column = len(self._object_event)
+            for attribute in item.Attribute or ():
+                self._add_attribute(attribute, event_row, object_column)
+        self._event_rows[event_id] = range(first, len(self._attribute_ids))
+        self._columns = None
+        self._group_rows.clear()
+        return len(self._event_rows[event_id])
+
+    def add_events(self, events: Iterable[ExtendedEvent]) -> int:
+        return sum(self.add_event(event) for event in events)
+
+    def remove_event(self, event_id: Any) -> int:
+        """Drop the attributes of an event; returns how many there were."""
+        event_id = record_id(event_id)
+        self._events.pop(event_id, None)
+        rows = self._event_rows.pop(event_id, None)
+        if not rows:
+            return 0
+        for row in rows:
+            self._alive[row] = 0
+        self._killed = True
+        self._live -= len(rows)
+        for mask in self._masks.values():
+            mask[rows.start : min(rows.stop, len(mask))] = False
+        self._compact_if_sparse()
+        return len(rows)
+
+    # Queries.
+
+    def visible(self, org_id: Any) -> np.ndarray:
+        """Boolean mask over the attribute rows an organisation can see.
+
+        Rows line up with :meth:`attribute_ids`. The array is the cached
+        one; do not write to it.
+        """
+        index = self._org(org_id)
+        mask = self._masks.get(index)
+        rows = len(self._attribute_ids)
+        if mask is None:
+            mask = self._masks[index] = self._evaluate(index)
+        elif len(mask) < rows:
+            # Evaluate only the rows of events added since.
+            tail = self._evaluate(index, np.arange(len(mask), rows))
+            mask = self._masks[index] = np.concatenate([mask, tail])
+        return mask
+
+    def attribute_ids(self) -> np.ndarray:
+        return self._arrays()["attribute_ids"]
+
+    def visible_attributes(self, org_id: Any) -> np.ndarray:
+        """Ids of the attributes an organisation can see."""
+        return self.attribute_ids()[self.visible(org_id)]
+
+    def filter(self, org_id: Any, attribute_ids: Iterable[Any]) -> np.ndarray:
+        """The ids out of ``attribute_ids`` an organisation can see.
+
+        Ids not indexed are dropped. Order is kept.
+        """
+        if not isinstance(attribute_ids, np.ndarray):
+            attribute_ids = [record_id(attribute_id) for attribute_id in attribute_ids]
+        ids = np.asarray(attribute_ids, dtype=np.int64)
+        rows = self._rows(ids)
+        keep = rows >= 0
+        keep[keep] = self.visible(org_id)[rows[keep]]
+        return ids[keep]
+
+    def can_see(self, org_id: Any, attribute_id: Any) -> bool:
+        return len(self.filter(org_id, [attribute_id])) == 1
+
+    def visible_events(self, org_id: Any) -> np.ndarray:
+        """Ids of the live events an organisation can see."""
+        columns = self._arrays()
+        index = self._org(org_id)
+        visible = self._level(
+            index,
+            columns["event_distribution"],
+            columns["event_group"],
+            columns["event_owner"] == index,
+        )
+        live = np.zeros(len(self._event_ids), dtype=bool)
+        live[list(self._events.values())] = True
+        return columns["event_ids"][visible & live]
+
+    # Internals.
+
+    def _org(self, org_id: Any) -> int:
+        """Dense index of an organisation, registered as local if new."""
+        org_id = record_id(org_id)
+        index = self._orgs.get(org_id)
+        if index is None:
+            index = self._orgs[org_id] = len(self._org_ids)
+            self._org_ids.append(org_id)
+            self._local.append(True)
+            if index >= self._bits.shape[1] * _WORD:
+                self._bits = np.hstack([self._bits, np.zeros_like(self._bits)])
+        return index
+
+    def _add_attribute(
+        self, attribute: Any, event_row: int, object_column: int
+    ) -> None:
+        if attribute.deleted:
+            return
+        self._attribute_ids.append(record_id(attribute.id))
+        self._attribute_event.append(event_row)
+        self._attribute_object.append(object_column)
+        self._attribute_distribution.append(_distribution(attribute.distribution))
+        self._attribute_group.append(self._group_column(attribute))
+        self._alive.append(1)
+        self._live += 1
+
+    def _group_column(self, item: Any) -> int:
+        if _distribution(item.distribution) != SHARING_GROUP:
+            return 0
+        group_id = getattr(item.sharing_group_id, "root", item.sharing_group_id)
+        if not group_id or group_id == "0":
+            return 0
+        return self._group_row(group_id) + 1
+
+    def _group_row(self, group_id: Any) -> int:
+        group_id = record_id(group_id)
+        row = self._groups.get(group_id)
+        if row is None:
+            row = self._groups[group_id] = len(self._group_ids)
+            self._group_ids.append(group_id)
+            if row >= len(self._bits):
+                self._bits = np.vstack([self._bits, np.zeros_like(self._bits)])
+                self._all_local = np.concatenate(
+                    [self._all_local, np.zeros_like(self._all_local)]
+                )
+        return row
+
+    def _has_bit(self, row: int, index: int) -> bool:
+        word = int(self._bits[row, index // _WORD])
+        return bool(word >> (index % _WORD) & 1)
+
+    def _set_bit(self, row: int, index: int, value: bool) -> None:
+        bit = np.uint64(1 << (index % _WORD))
+        if value:
+            self._bits[row, index // _WORD] |= bit
+        else:
+            self._bits[row, index // _WORD] &= ~bit
+
+    def _members(self, row: int) -> List[int]:
+        bits = np.unpackbits(self._bits[row].view(np.uint8), bitorder="little")
+        return [index for index in np.flatnonzero(bits) if index < len(self._org_ids)]
+
+    def _membership(self, index: int) -> np.ndarray:
+        """Whether organisation ``index`` is in each group, by group column."""
+        groups = len(self._group_ids)
+        word = self._bits[:groups, index // _WORD]
+        member = ((word >> np.uint64(index % _WORD)) & np.uint64(1)).astype(bool)
+        if self._local[index]:
+            member |= self._all_local[:groups]
+        return np.concatenate([[False], member])
+
+    def _allowed(self, index: int) -> np.ndarray:
+        """Whether each distribution level lets organisation ``index`` in."""
+        allowed = np.ones(INHERIT_EVENT + 1, dtype=bool)
+        allowed[YOUR_ORGANISATION] = False
+        allowed[THIS_COMMUNITY] = bool(self._local[index])
+        allowed[SHARING_GROUP] = False
+        return allowed
+
+    def _level(
+        self,
+        index: int,
+        distribution: np.ndarray,
+        group: np.ndarray,
+        owner: np.ndarray,
+    ) -> np.ndarray:
+        visible = self._allowed(index)[distribution]
+        visible |= self._membership(index)[group]
+        return visible | owner
+
+    def _evaluate(self, index: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        columns = self._arrays()
+        event = columns["attribute_event"]
+        item = columns["attribute_object"]
+        distribution = columns["attribute_distribution"]
+        group = columns["attribute_group"]
+        alive = columns["alive"]
+        if rows is not None:
+            event, item, distribution, group, alive = (
+                column[rows] for column in (event, item, distribution, group, alive)
+            )
+        owned = columns["event_owner"] == index
+        events = self._level(
+            index, columns["event_distribution"], columns["event_group"], owned
+        )
+        objects = self._level(
+            index,
+            columns["object_distribution"],
+            columns["object_group"],
+            owned[columns["object_event"]],
+        )
+        # Object column 0 is "no object", visible as far as objects go.
+        objects = np.concatenate([[True], objects])
+        return (
+            alive
+            & events[event]
+            & objects[item]
+            & self._level(index, distribution, group, owned[event])
+        )
+
+    def _refresh(self, row: int, orgs: Iterable[int]) -> None:
+        """Re-evaluate the cached masks of ``orgs`` after group ``row`` changed."""
+        orgs = [index for index in orgs if index in self._masks]
+        if not orgs:
+            return
+        rows = self._group_rows.get(row)
+        if rows is None:
+            rows = self._group_rows[row] = self._rows_through(row + 1)
+        for index in orgs:
+            mask = self._masks[index]
+            # Rows past the mask are evaluated when it is next asked for.
+            cached = rows[rows < len(mask)]
+            mask[cached] = self._evaluate(index, cached)
+
+    def _rows_through(self, group: int) -> np.ndarray:
+        columns = self._arrays()
+        event = columns["attribute_event"]
+        objects = np.concatenate([[False], columns["object_group"] == group])
+        return np.flatnonzero(
+            (columns["attribute_group"] == group)
+            | (columns["event_group"] == group)[event]
+            | objects[columns["attribute_object"]]
+        )
+
+    def _compact_if_sparse(self) -> None:
+        """Renumber the live rows once dead ones outnumber them.
+
+        Removing an event only marks its rows dead, so that the rows after
+        it keep their numbers. Once the dead attribute rows outnumber the
+        live ones, the attribute, event and object rows of the live events
+        are copied down and every column, ``_event_rows`` and the cached
+        masks renumbered with them.
+        """
+        dead = len(self._attribute_ids) - self._live
+        if dead <= max(self._live, _COMPACT_MIN):
+            return
+        kept = np.flatnonzero(np.frombuffer(bytes(self._alive), dtype=bool))
+        events = np.array(sorted(self._events.values()), dtype=np.intp)
+        event_row = np.full(len(self._event_ids), -1, dtype=np.intp)
+        event_row[events] = np.arange(len(events))
+        object_event = np.array(self._object_event, dtype=np.intp)
+        objects = np.flatnonzero(event_row[object_event] >= 0)
+        # Object columns are the object row + 1, 0 for none.
+        object_column = np.zeros(len(object_event) + 1, dtype=np.intp)
+        object_column[objects + 1] = np.arange(1, len(objects) + 1)
+
+        self._event_ids = _take(self._event_ids, events)
+        self._event_owner = _take(self._event_owner, events)
+        self._event_distribution = _take(self._event_distribution, events)
+        self._event_group = _take(self._event_group, events)
+        self._events = {
+            event_id: int(event_row[row]) for event_id, row in self._events.items()
+        }
+        self._object_event = _take(self._object_event, objects, event_row)
+        self._object_distribution = _take(self._object_distribution, objects)
+        self._object_group = _take(self._object_group, objects)
+        self._attribute_ids = _take(self._attribute_ids, kept)
+        self._attribute_event = _take(self._attribute_event, kept, event_row)
+        self._attribute_object = _take(self._attribute_object, kept, object_column)
+        self._attribute_distribution = _take(self._attribute_distribution, kept)
+        self._attribute_group = _take(self._attribute_group, kept)
+        self._alive = bytearray(b"\x01") * len(kept)
+        # The rows of a live event are all live and stay contiguous.
+        for event_id, rows in self._event_rows.items():
+            start = int(np.searchsorted(kept, rows.start))
+            self._event_rows[event_id] = range(start, start + len(rows))
+        for index, mask in self._masks.items():
+            self._masks[index] = mask[kept[: np.searchsorted(kept, len(mask))]]
+        self._columns = None
+        self._killed = False
+        self._group_rows.clear()
+
+    def _rows(self, ids: np.ndarray) -> np.ndarray:
+        """Newest attribute row of each id, -1 for ids not indexed."""
+        columns = self._arrays()
+        table = columns.get("row_of_id")
+        if table is not None:
+            rows = np.full(len(ids), -1, dtype=np.intp)
+            known = (ids >= 0) & (ids < len(table))
+            rows[known] = table[ids[known]]
+            return rows
+        order, sorted_ids = columns["attribute_order"], columns["sorted_ids"]
+        if not len(order):
+            return np.full(len(ids), -1, dtype=np.intp)
+        # The sort is stable, so the last row of an id is its newest one.
+        found = np.maximum(np.searchsorted(sorted_ids, ids, side="right") - 1, 0)
+        return np.where(sorted_ids[found] == ids, order[found], -1)
+
+    def _arrays(self) -> Dict[str, Any]:
+        if self._columns is None:
+            ids = np.array(self._attribute_ids, dtype=np.int64)
+            order = np.argsort(ids, kind="stable")
+            if len(ids) and ids.max() < _DENSE_IDS * len(ids):
+                # Ids from one server are dense: look rows up directly.
+                # Later rows overwrite earlier ones of the same id.
+                row_of_id = np.full(ids.max() + 1, -1, dtype=np.intp)
+                row_of_id[ids] = np.arange(len(ids))
+            else:
+                row_of_id = None
+            self._columns = {
+                "event_ids": np.array(self._event_ids, dtype=np.int64),
+                "event_owner": np.array(self._event_owner, dtype=np.intp),
+                "event_distribution": np.array(self._event_distribution, np.intp),
+                "event_group": np.array(self._event_group, dtype=np.intp),
+                "object_event": np.array(self._object_event, dtype=np.intp),
+                "object_distribution": np.array(self._object_distribution, np.intp),
+                "object_group": np.array(self._object_group, dtype=np.intp),
+                "attribute_ids": ids,
+                "attribute_order": order,
+                "sorted_ids": ids[order],
+                "row_of_id": row_of_id,
+                "attribute_event": np.array(self._attribute_event, dtype=np.intp),
+                "attribute_object": np.array(self._attribute_object, dtype=np.intp),
+                "attribute_distribution": np.array(
+                    self._attribute_distribution, dtype=np.intp
+                ),
+                "attribute_group": np.array(self._attribute_group, dtype=np.intp),
+                "alive": np.frombuffer(bytes(self._alive), dtype=bool),
+            }
+        elif self._killed:
+            self._columns["alive"] = np.frombuffer(bytes(self._alive), dtype=bool)
+        self._killed = False
+        return self._columns
+
+
+def _take(
+    column: array, rows: np.ndarray, renumbered: Optional[np.ndarray] = None
+) -> array:
+    """``column`` at ``rows``, its values mapped through ``renumbered``."""
+    values = np.frombuffer(column, dtype=column.typecode)[rows]
+    if renumbered is not None:
+        values = renumbered[values]
+    return array(column.typecode, values.astype(column.typecode).tobytes())
@@ -0,0 +1,390 @@
+"""Local matching of values against compiled MISP warninglists.
+
+``/warninglists/checkValue`` costs a round trip and has the server walk
+every enabled list again for each call. :class:`WarninglistMatcher` compiles
+the lists once, with one lookup structure per list type:
+
+* ``string``: a dict from entry to the lists holding it;
+* ``hostname``: a dict from host to the lists holding it, looked up for
+  each suffix of a host on a label boundary, so ``a.b.example.com`` finds
+  ``example.com`` in as many lookups as it has labels;
+* ``cidr``: per address family, a table of the masked networks of each
+  prefix length in use, so an address costs one dict lookup per length;
+* ``substring``: per list, one regular expression spelling out the prefix
+  trie of its entries, which the regex engine walks like an automaton
+  instead of trying each entry in turn;
+* ``regex``: per list, one alternation of its patterns.
+
+A list only applies to the attribute types in its ``valid_attributes``.
+Composite values (``domain|ip``, ``ip-dst|port``, ...) are matched on
+their parts, and hostname lists match the host of ``url``-like values.
+
+Fetch the lists with their entries first, e.g.::
+
+    lists = [client.get_warninglist(wl.id) for wl in client.get_warninglists()]
+    matcher = WarninglistMatcher(lists)
+
+:meth:`WarninglistMatcher.compiled` exports those structures and
+:meth:`WarninglistMatcher.from_compiled` builds a matcher on them again,
+which :mod:`analytics.snapshot` uses to store them in a file.
+"""
+from __future__ import annotations
+
+import re
+import socket
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from analytics.common import TRIE_END, hostname_of, parse_address, parse_network
+from models.warning_lists import Warninglist, WarningListType
+
+#: Composite attribute types whose second part is a port, never matched.
+PORT_TYPES = frozenset({"ip-src|port", "ip-dst|port", "hostname|port"})
+
+#: ``preg`` flags with a scoped inline equivalent in :mod:`re`.
+_REGEX_FLAGS = frozenset("imsx")
+_DELIMITED = re.compile(r"^([/#~!@%|])(.*)\1([a-zA-Z]*)$", re.DOTALL)
+
+
+class WarninglistHit(NamedTuple):
+    """A list a value hits, as ``checkValue`` reports it."""
+
+    id: Optional[str]
+    name: Optional[str]
+
+
+class CompiledWarninglists(NamedTuple):
+    """The lookup structures of a :class:`WarninglistMatcher`.
+
+    :meth:`WarninglistMatcher.from_compiled` only calls ``get`` and
+    ``len`` on the mappings and ``search`` on the patterns, so they may be
+    views of a file rather than dicts and compiled patterns.
+    """
+
+    lists: Sequence[Warninglist]
+    #: Types each list applies to, ``None`` for all of them.
+    valid: Sequence[Optional[FrozenSet[str]]]
+    #: Entry of the string lists -> indexes of the lists holding it.
+    strings: Mapping[str, Sequence[int]]
+    #: Host of the hostname lists, without ``*.``, -> indexes of the lists.
+    hostnames: Mapping[str, Sequence[int]]
+    #: ``(family, prefix length, {network >> host bits: lists})``, longest
+    #: prefixes first.
+    networks: Sequence[Tuple[int, int, Mapping[int, Sequence[int]]]]
+    #: ``(list index, pattern)`` of the substring lists.
+    substrings: Sequence[Tuple[int, Pattern[str]]]
+    #: ``(list index, pattern)`` of the regex lists.
+    regexes: Sequence[Tuple[int, Pattern[str]]]
+
+
+class WarninglistMatcher:
+    """Warninglists compiled for matching many values locally.
+
+    Disabled lists are skipped unless ``include_disabled`` is set, and
+    lists of an unknown type are ignored. The matcher is read-only once
+    built and can be shared between threads.
+    """
+
+    def __init__(
+        self, warninglists: Iterable[Warninglist], include_disabled: bool = False
+    ):
+        self._load(
+            _compile(
+                [
+                    warninglist
+                    for warninglist in warninglists
+                    if warninglist.type is not None
+                    and (include_disabled or warninglist.enabled is not False)
+                ]
+            )
+        )
+
+    @classmethod
+    def from_compiled(cls, compiled: CompiledWarninglists) -> "WarninglistMatcher":
+        """A matcher on the structures :meth:`compiled` returned."""
+        matcher = cls.__new__(cls)
+        matcher._load(compiled)
+        return matcher
+
+    def compiled(self) -> CompiledWarninglists:
+        """The lookup structures of the matcher, to store or rebuild it."""
+        return self._compiled
+
+    def _load(self, compiled: CompiledWarninglists) -> None:
+        self._compiled = compiled
+        self.lists: List[Warninglist] = list(compiled.lists)
+        self._hits = [WarninglistHit(wl.id, wl.name) for wl in self.lists]
+        self._valid = list(compiled.valid)
+        self._scopes: Dict[Optional[str], Tuple[int, ...]] = {}
+        self._strings = compiled.strings
+        self._hostnames = compiled.hostnames
+        #: Per address family: (shift, {network >> shift: lists}), by length.
+        self._networks: Dict[int, List[Tuple[int, Mapping[int, Sequence[int]]]]] = {}
+        for family, length, table in compiled.networks:
+            self._networks.setdefault(family, []).append(
+                (_bits(family) - length, table)
+            )
+        self._substrings = list(compiled.substrings)
+        self._regexes = list(compiled.regexes)
+
+    def __len__(self) -> int:
+        return len(self.lists)
+
+    def match(self, value: str, type: Optional[str] = None) -> List[WarninglistHit]:
+        """The lists ``value`` hits, in list order.
+
+        ``type`` is the attribute type of ``value``. Without it every list
+        applies, and a value holding ``|`` is also matched on its parts.
+        """
+        scope = self._scope(type)
+        if not scope:
+            return []
+        hits: Set[int] = set()
+        parts = _parts(value, type)
+        if self._strings:
+            strings = self._strings
+            for part in parts:
+                found = strings.get(part)
+                if found:
+                    hits.update(found)
+        if self._hostnames:
+            for part in parts:
+                self._match_hostname(hostname_of(part, type), hits)
+        if self._networks:
+            for part in parts:
+                self._match_network(part, hits)
+        for index, pattern in self._substrings:
+            if index not in hits and pattern.search(value):
+                hits.add(index)
+        for index, pattern in self._regexes:
+            if index not in hits and pattern.search(value):
+                hits.add(index)
+        if not hits:
+            return []
+        return [self._hits[index] for index in scope if index in hits]
+
+    def check_values(
+        self, values: Iterable[str], type: Optional[str] = None
+    ) -> Dict[str, List[Dict[str, Optional[str]]]]:
+        """``values`` matched in the shape of ``/warninglists/checkValue``.
+
+        Values without hits are left out.
+        """
+        result: Dict[str, List[Dict[str, Optional[str]]]] = {}
+        for value in values:
+            hits = self.match(value, type)
+            if hits:
+                result[value] = [hit._asdict() for hit in hits]
+        return result
+
+    def match_many(
+        self, values: Sequence[str], types: Optional[Sequence[Optional[str]]] = None
+    ) -> List[List[WarninglistHit]]:
+        """:meth:`match` of each of ``values``, typed by ``types`` if given."""
+        if types is None:
+            return [self.match(value) for value in values]
+        return [self.match(value, type) for value, type in zip(values, types)]
+
+    def _scope(self, type: Optional[str]) -> Tuple[int, ...]:
+        """Indexes of the lists applying to ``type``, in list order."""
+        scope = self._scopes.get(type)
+        if scope is None:
+            scope = self._scopes[type] = tuple(
+                index
+                for index, valid in enumerate(self._valid)
+                if type is None or valid is None or type in valid
+            )
+        return scope
+
+    def _match_hostname(self, host: Optional[str], hits: Set[int]) -> None:
+        if not host:
+            return
+        hostnames = self._hostnames
+        labels = host.split(".")
+        for start in range(len(labels)):
+            found = hostnames.get(".".join(labels[start:]))
+            if found:
+                hits.update(found)
+
+    def _match_network(self, value: str, hits: Set[int]) -> None:
+        parsed = parse_network(value) if "/" in value else parse_address(value)
+        if parsed is None:
+            return
+        family, address, length = parsed
+        for shift, table in self._networks.get(family, ()):
+            # A network only holds values at least as specific as itself.
+            if _bits(family) - shift > length:
+                continue
+            found = table.get(address >> shift)
+            if found:
+                hits.update(found)
+
+
+def valid_attributes(warninglist: Warninglist) -> Optional[FrozenSet[str]]:
+    """Attribute types ``warninglist`` applies to, ``None`` for any type."""
+    types = frozenset(
+        name.strip()
+        for name in (warninglist.valid_attributes or "").split(",")
+        if name.strip()
+    )
+    if not types or "ALL" in types:
+        return None
+    return types
+
+
+def _compile(lists: List[Warninglist]) -> CompiledWarninglists:
+    strings: Dict[str, List[int]] = {}
+    hostnames: Dict[str, List[int]] = {}
+    networks: Dict[Tuple[int, int], Dict[int, List[int]]] = {}
+    substrings: List[Tuple[int, Pattern[str]]] = []
+    regexes: List[Tuple[int, Pattern[str]]] = []
+    for index, warninglist in enumerate(lists):
+        kind = WarningListType(warninglist.type)
+        entries = [
+            entry.value.strip()
+            for entry in warninglist.WarninglistEntry or ()
+            if entry.value and entry.value.strip()
+        ]
+        if kind is WarningListType.STRING:
+            for entry in entries:
+                _add(strings.setdefault(entry, []), index)
+        elif kind is WarningListType.HOSTNAME:
+            for entry in entries:
+                host = entry.lower().strip(".")
+                if host.startswith("*."):
+                    host = host[2:]
+                _add(hostnames.setdefault(host, []), index)
+        elif kind is WarningListType.CIDR:
+            for entry in entries:
+                parsed = parse_network(entry)
+                if parsed is not None:
+                    family, network, length = parsed
+                    table = networks.setdefault((family, length), {})
+                    shift = _bits(family) - length
+                    _add(table.setdefault(network >> shift, []), index)
+        elif kind is WarningListType.SUBSTRING:
+            pattern = _substring_pattern(entries)
+            if pattern is not None:
+                substrings.append((index, pattern))
+        elif kind is WarningListType.REGEX:
+            pattern = _regex_pattern(entries)
+            if pattern is not None:
+                regexes.append((index, pattern))
+    return CompiledWarninglists(
+        lists=lists,
+        valid=[valid_attributes(warninglist) for warninglist in lists],
+        strings=strings,
+        hostnames=hostnames,
+        # Longest prefixes first.
+        networks=[
+            (family, length, table)
+            for (family, length), table in sorted(
+                networks.items(), key=lambda item: -item[0][1]
+            )
+        ],
+        substrings=substrings,
+        regexes=regexes,
+    )
+
+
+def _add(indexes: List[int], index: int) -> None:
+    if not indexes or indexes[-1] != index:
+        indexes.append(index)
+
+
+def _bits(family: int) -> int:
+    return 32 if family == socket.AF_INET else 128
+
+
+def _parts(value: str, type: Optional[str]) -> Sequence[str]:
+    if type is None:
+        return (value, *value.split("|")) if "|" in value else (value,)
+    if "|" not in type:
+        return (value,)
+    parts = value.split("|")
+    if type in PORT_TYPES:
+        return parts[:1]
+    return parts
+
+
+def _substring_pattern(entries: Iterable[str]) -> Optional[Pattern[str]]:
+    """One pattern finding any of ``entries``, spelled as their prefix trie.
+
+    A trie branching along a path of hundreds of characters nests too deep
+    for the :mod:`re` parser; those lists fall back to a flat alternation.
+    """
+    entries = set(entries)
+    trie: dict = {}
+    for entry in entries:
+        node = trie
+        for character in entry:
+            node = node.setdefault(character, {})
+        node[TRIE_END] = {}
+    if not trie:
+        return None
+    try:
+        return re.compile(_trie_pattern(trie))
+    except RecursionError:
+        longest = sorted(entries, key=len, reverse=True)
+        return re.compile("|".join(map(re.escape, longest)))
+
+
+def _trie_pattern(trie: Mapping[str, dict]) -> str:
+    """The pattern of ``trie``, built children first with an explicit stack."""
+    # Frames: the character leading to a node, the node, its children left
+    # to visit and the patterns of those visited.
+    stack = [("", trie, iter(sorted(trie.items())), [])]
+    while True:
+        character, node, children, branches = stack[-1]
+        # Finding the shorter entry is enough: it is in any longer one.
+        child = None if TRIE_END in node else next(children, None)
+        if child is not None:
+            label, grandchildren = child
+            stack.append(
+                (label, grandchildren, iter(sorted(grandchildren.items())), [])
+            )
+            continue
+        stack.pop()
+        if len(branches) <= 1:
+            pattern = "".join(branches)
+        else:
+            pattern = "(?:" + "|".join(branches) + ")"
+        if not stack:
+            return pattern
+        stack[-1][3].append(re.escape(character) + pattern)
+
+
+def _regex_pattern(entries: Iterable[str]) -> Optional[Pattern[str]]:
+    """One alternation of the ``preg`` patterns of ``entries``.
+
+    Delimiters are stripped and the ``i``, ``m``, ``s`` and ``x`` flags
+    scoped to their pattern; patterns :mod:`re` cannot compile are skipped.
+    """
+    patterns = []
+    for entry in entries:
+        match = _DELIMITED.match(entry)
+        if match:
+            body = match.group(2)
+            flags = "".join(sorted(set(match.group(3)) & _REGEX_FLAGS))
+        else:
+            body, flags = entry, ""
+        pattern = f"(?{flags}:{body})" if flags else f"(?:{body})"
+        try:
+            re.compile(pattern)
+        except re.error:
+            continue
+        patterns.append(pattern)
+    if not patterns:
+        return None
+    return re.compile("|".join(patterns))
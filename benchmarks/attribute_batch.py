@@ -0,0 +1,62 @@
+"""Memory and filter speed of AttributeBatch against validated models.
+
+    python -m benchmarks.attribute_batch [--attributes N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from analytics.attribute_batch import AttributeBatch
+from benchmarks.streaming import attribute
+from models.common import AttributeType
+from models.search import AttributeRestSearchList
+
+
+def timed(label, function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {size / 2**20:8.1f} MiB")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rows = [attribute(index) for index in range(args.attributes)]
+    for index, row in enumerate(rows):
+        row["type"] = ("ip-dst", "domain", "md5")[index % 3]
+        row["to_ids"] = index % 2 == 0
+
+    models = timed(
+        "build models", lambda: AttributeRestSearchList.model_validate(rows).root
+    )
+    batch = timed("build AttributeBatch", lambda: AttributeBatch.from_payload(rows))
+    print(f"{'AttributeBatch.nbytes':<28} {batch.nbytes / 2**20:21.1f} MiB")
+
+    since = int(rows[len(rows) // 2]["timestamp"])
+    timed(
+        "filter models",
+        lambda: [
+            a
+            for a in models
+            if a.type == AttributeType.DOMAIN and a.to_ids and int(a.timestamp) >= since
+        ],
+    )
+    timed(
+        "filter AttributeBatch",
+        lambda: batch.filter(
+            batch.type_in(AttributeType.DOMAIN)
+            & batch.to_ids
+            & batch.timestamp_between(since)
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
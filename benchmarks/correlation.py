@@ -0,0 +1,76 @@
+"""Memory per posting and lookup latency of the correlation index.
+
+    python -m benchmarks.correlation [--attributes N] [--events M]
+"""
+import argparse
+import gc
+import random
+import time
+
+from analytics.correlation import CorrelationIndex
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=2_000_000)
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--distinct", type=float, default=0.5)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # Values drawn with a skew: a few recur across many events, most rarely.
+    distinct = max(1, int(args.attributes * args.distinct))
+    values = [f"{rng.getrandbits(64):016x}.test" for _ in range(distinct)]
+    rows = [
+        (
+            1 + index * args.events // args.attributes,
+            1 + index,
+            values[int(distinct * rng.random() ** 3)],
+        )
+        for index in range(args.attributes)
+    ]
+
+    gc.collect()
+    start = time.perf_counter()
+    index = CorrelationIndex()
+    for event_id, attribute_id, value in rows:
+        index.add(event_id, attribute_id, value, "domain")
+    elapsed = time.perf_counter() - start
+    size = index.nbytes
+    postings = index.postings
+    print(
+        f"build   {elapsed * 1000:9.1f} ms  {postings / elapsed:10.0f} postings/s"
+        f"  {len(index)} values"
+    )
+    print(
+        f"memory  {size / 2**20:9.1f} MiB  {size / postings:6.1f} bytes/posting"
+        " (keys included)"
+    )
+
+    probes = [rows[rng.randrange(len(rows))][2] for _ in range(args.lookups)]
+    probes += [f"missing{i}.test" for i in range(args.lookups // 10)]
+    latencies = []
+    for probe in probes:
+        start = time.perf_counter_ns()
+        index.event_ids(probe)
+        latencies.append(time.perf_counter_ns() - start)
+    latencies.sort()
+    print(
+        "lookup  "
+        + "  ".join(
+            f"p{q} {latencies[min(len(latencies) - 1, len(latencies) * q // 100)] / 1000:7.2f} us"
+            for q in (50, 99)
+        )
+        + f"  max {latencies[-1] / 1000:.0f} us"
+    )
+
+    start = time.perf_counter()
+    removed = sum(index.remove_event(event_id) for event_id in range(1, 1001))
+    elapsed = time.perf_counter() - start
+    print(f"delete  {elapsed * 1000:9.1f} ms  1000 events, {removed} postings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Vectorized Polynomial decay scoring against a per-attribute loop.
+
+Also replays a month of hourly ``excludeDecayed`` checks through the
+DecayScheduler, against rescoring every attribute each hour.
+
+    python -m benchmarks.decay [--attributes N]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from analytics.decay import DAY, DecayScheduler, PolynomialDecay
+from models.decay import DecayingModelParameters
+
+
+def scalar_scores(decay, timestamps, last_sightings, base_scores, now):
+    scores = []
+    for timestamp, sighting, base in zip(timestamps, last_sightings, base_scores):
+        days = max(now - max(timestamp, sighting), 0.0) / DAY
+        score = base * (1 - (days / decay.lifetime) ** (1 / decay.decay_speed))
+        scores.append(max(score, 0.0))
+    return scores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    now = 1_700_000_000.0
+    timestamps = now - rng.uniform(0, 30 * DAY, args.attributes)
+    last_sightings = np.where(
+        rng.random(args.attributes) < 0.3,
+        now - rng.uniform(0, 5 * DAY, args.attributes),
+        0.0,
+    )
+    base_scores = np.where(
+        rng.random(args.attributes) < 0.5, rng.uniform(20, 100, args.attributes), np.nan
+    )
+    decay = PolynomialDecay.from_parameters(
+        DecayingModelParameters(
+            lifetime=14, decay_speed=2.3, threshold=30, default_base_score=80
+        )
+    )
+
+    start = time.perf_counter()
+    scores = decay.scores(timestamps, last_sightings, base_scores, now)
+    kept = np.flatnonzero(~decay.decayed(scores))
+    elapsed = time.perf_counter() - start
+    print(
+        f"vectorized {elapsed * 1000:9.1f} ms  {args.attributes / elapsed:12.0f}"
+        f" attributes/s  {len(kept)} not decayed"
+    )
+
+    overridden = decay.with_filter({"modelOverrides": {"lifetime": 7}, "score": 50})
+    start = time.perf_counter()
+    kept = np.flatnonzero(
+        ~overridden.decayed(
+            overridden.scores(timestamps, last_sightings, base_scores, now)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    print(f"overridden {elapsed * 1000:9.1f} ms  {len(kept)} not decayed")
+
+    sample = min(args.attributes, 200_000)
+    bases = np.where(np.isnan(base_scores), decay.default_base_score, base_scores)
+    start = time.perf_counter()
+    expected = scalar_scores(
+        decay,
+        timestamps[:sample].tolist(),
+        last_sightings[:sample].tolist(),
+        bases[:sample].tolist(),
+        now,
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"loop       {elapsed * 1000:9.1f} ms  {sample / elapsed:12.0f}"
+        f" attributes/s  (first {sample})"
+    )
+    assert np.allclose(expected, scores[:sample])
+
+    scheduler = DecayScheduler(decay)
+    keys = range(args.attributes)
+    start = time.perf_counter()
+    scheduler.schedule_many(keys, timestamps, last_sightings, base_scores)
+    print(f"schedule   {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    hours = 30 * 24
+    sighted = rng.integers(0, args.attributes, hours * 100).tolist()
+    changes = 0
+    start = time.perf_counter()
+    for hour in range(hours):
+        when = now + hour * 3600
+        for key in sighted[hour * 100 : (hour + 1) * 100]:
+            changes += scheduler.sight(key, when) is not None
+        changes += len(scheduler.advance(when))
+    elapsed = time.perf_counter() - start
+    print(
+        f"scheduler  {elapsed * 1000:9.1f} ms  {hours} hourly steps,"
+        f" {len(sighted)} sightings, {changes} status changes"
+    )
+
+    steps = 24
+    start = time.perf_counter()
+    for hour in range(steps):
+        decay.decayed(
+            decay.scores(timestamps, last_sightings, base_scores, now + hour * 3600)
+        )
+    elapsed = time.perf_counter() - start
+    print(f"rescore    {elapsed / steps * hours * 1000:9.1f} ms  (extrapolated)")
+
+
+if __name__ == "__main__":
+    main()
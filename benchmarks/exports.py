@@ -0,0 +1,96 @@
+"""Export throughput and memory of the streaming restSearch format writers.
+
+Attributes are generated on the fly, so the source itself holds nothing;
+``--attributes 10000000`` runs a full 10M export per format. The second
+part exports the models streamed back from a SQLite mirror.
+
+    python -m benchmarks.exports [--attributes N] [--formats csv,text] [--output DIR]
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from analytics.exports import WRITERS, export
+from benchmarks.misp_server import SyntheticMisp, _attribute, _event
+from client.mirror import MirrorStore
+from models.events import ExtendedEventList
+
+
+def attributes(count: int, per_event: int, seed: int):
+    rng = random.Random(seed)
+    event = None
+    for index in range(count):
+        if index % per_event == 0:
+            event = _event(rng, index // per_event, 1_700_000_000 + index)
+        yield _attribute(rng, index, event)
+
+
+def peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=1_000_000)
+    parser.add_argument("--per-event", type=int, default=1000)
+    parser.add_argument("--formats", default=",".join(WRITERS))
+    parser.add_argument("--mirror-events", type=int, default=100)
+    parser.add_argument("--output", help="directory to write to, /dev/null by default")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    formats = args.formats.split(",")
+
+    def sink(name: str) -> str:
+        return os.path.join(args.output, name) if args.output else os.devnull
+
+    start = time.perf_counter()
+    for _ in attributes(args.attributes, args.per_event, args.seed):
+        pass
+    source = time.perf_counter() - start
+    print(
+        f"source       {source:7.2f} s  {args.attributes / source:9.0f} attributes/s"
+        " (generation only, included below)"
+    )
+    for format in formats:
+        for options in ({}, {"to_ids": True, "dedup": True}):
+            baseline = peak_rss()
+            stats = export(
+                format,
+                attributes(args.attributes, args.per_event, args.seed),
+                sink(f"export.{format}"),
+                **options,
+            )
+            print(
+                f"{format:9} {'ids+dedup' if options else 'all':9}"
+                f" {stats.elapsed:7.2f} s  {stats.attributes_per_second:9.0f} attributes/s"
+                f"  {stats.bytes_per_second / 2**20:6.1f} MB/s"
+                f"  {stats.written} written, {stats.skipped} skipped,"
+                f" {stats.filtered} filtered, {stats.duplicates} duplicates"
+                f"  peak RSS +{(peak_rss() - baseline) / 1024:.0f} MiB"
+            )
+
+    misp = SyntheticMisp(args.mirror_events, args.per_event, seed=args.seed)
+    by_event = {}
+    for attribute in misp.attributes:
+        by_event.setdefault(attribute["event_id"], []).append(attribute)
+    events = ExtendedEventList.model_validate(
+        [{**event, "Attribute": by_event.get(event["id"], [])} for event in misp.events]
+    )
+    with tempfile.TemporaryDirectory() as directory, MirrorStore(
+        os.path.join(directory, "mirror.db")
+    ) as store:
+        loaded = store.load_events(events)
+        for format in formats:
+            stats = export(format, store.attributes(), sink(f"mirror.{format}"))
+            print(
+                f"mirror {format:9} {stats.elapsed:7.2f} s"
+                f"  {stats.attributes_per_second:9.0f} attributes/s"
+                f"  {stats.written} of {loaded} written"
+            )
+
+
+if __name__ == "__main__":
+    main()
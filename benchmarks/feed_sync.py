@@ -0,0 +1,134 @@
+"""Full and incremental fetches of a MISP-format feed.
+
+The feed is written from synthetic events to a directory and served over
+HTTP by ``http.server``, which answers conditional requests on
+``Last-Modified``. A second run follows after ``--changed`` of the events
+were modified and ``--revoked`` removed, and a third with nothing changed.
+
+    python -m benchmarks.feed_sync [--events N] [--attributes M] [--local]
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.misp_server import SyntheticMisp
+from client.feed_sync import FeedSync
+from client.feeds import FeedIngestor
+from models.feeds import FeedNoId
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def write_feed(directory, events, attributes):
+    manifest = {}
+    hashes = []
+    for event in events:
+        body = {**event, "Attribute": attributes[event["id"]]}
+        with open(os.path.join(directory, f"{event['uuid']}.json"), "w") as file:
+            json.dump({"Event": body}, file)
+        manifest[event["uuid"]] = {
+            "info": event["info"],
+            "timestamp": event["timestamp"],
+        }
+        hashes.extend(
+            f"{hashlib.md5(a['value'].encode()).hexdigest()},{event['uuid']}\n"
+            for a in body["Attribute"]
+        )
+    with open(os.path.join(directory, "manifest.json"), "w") as file:
+        json.dump(manifest, file)
+    with open(os.path.join(directory, "hashes.csv"), "w") as file:
+        file.writelines(hashes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--attributes", type=int, default=50, help="per event")
+    parser.add_argument("--changed", type=float, default=0.02)
+    parser.add_argument("--revoked", type=float, default=0.01)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--local", action="store_true", help="no HTTP server")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    misp = SyntheticMisp(args.events, args.attributes, seed=args.seed)
+    attributes = {}
+    for attribute in misp.attributes:
+        attributes.setdefault(attribute["event_id"], []).append(attribute)
+    events = list(misp.events)
+
+    with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as cache:
+        write_feed(source, events, attributes)
+        server = None
+        url = source
+        if not args.local:
+            server = ThreadingHTTPServer(
+                ("127.0.0.1", 0), functools.partial(QuietHandler, directory=source)
+            )
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_port}"
+        feed = FeedNoId.model_validate(
+            {
+                "tag_id": "1",
+                "event_id": None,
+                "orgc_id": "1",
+                "url": url,
+                "source_format": "misp",
+                "input_source": "local" if args.local else "network",
+                "delta_merge": True,
+            }
+        )
+        sync = FeedSync(feed, cache, concurrency=args.concurrency)
+
+        def run(name):
+            report = sync.run()
+            print(
+                f"{name:12} {report.elapsed * 1000:9.1f} ms"
+                f"  {report.bytes_downloaded / 2**20:7.2f} MiB"
+                f"  listed {report.listed} new {report.new} changed {report.changed}"
+                f" fetched {report.fetched} removed {report.removed}"
+                f"{'  not modified' if report.not_modified else ''}"
+                f"{'  FAILED %d' % len(report.failed) if report.failed else ''}"
+            )
+            return report
+
+        run("full")
+        # Second-granularity Last-Modified needs the clock to move on.
+        time.sleep(1.1)
+        changed = rng.sample(events, int(len(events) * args.changed))
+        for event in changed:
+            event["timestamp"] = str(int(event["timestamp"]) + 3600)
+            attributes[event["id"]] = attributes[event["id"]][1:]
+        revoked = {
+            event["uuid"]
+            for event in rng.sample(events, int(len(events) * args.revoked))
+        }
+        events = [event for event in events if event["uuid"] not in revoked]
+        for uuid in revoked:
+            os.remove(os.path.join(source, f"{uuid}.json"))
+        write_feed(source, events, attributes)
+        report = run("incremental")
+        removed = sum(len(delta.removed) for delta in report.deltas.values())
+        print(f"{'':12} {removed} attributes removed from changed events")
+        run("unchanged")
+
+        ingestor = FeedIngestor(feed, url=cache, workers=0)
+        count = sum(len(batch) for batch in ingestor.batches())
+        print(f"cache read back as a local feed: {count} attributes")
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
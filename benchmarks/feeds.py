@@ -0,0 +1,80 @@
+"""Feed ingestion throughput and memory on a generated CSV or freetext feed.
+
+    python -m benchmarks.feeds [--megabytes N] [--format csv] [--workers W]
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+
+from client.feeds import FeedIngestor
+from models.feeds import FeedNoId
+
+TLDS = ("com", "net", "org", "io", "ru")
+
+
+def line(rng: random.Random, index: int, source_format: str) -> str:
+    kind = rng.random()
+    if kind < 0.4:
+        value = f"{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}"
+    elif kind < 0.7:
+        value = f"{rng.getrandbits(40):010x}.{rng.choice(TLDS)}"
+    elif kind < 0.8:
+        value = f"https://{rng.getrandbits(32):08x}.{rng.choice(TLDS)}/p/{index}"
+    else:
+        value = f"{rng.getrandbits(256):064x}"
+    if source_format == "csv":
+        return f"{index},{value},2024-01-{1 + index % 28:02d},scanner\n"
+    return f"seen {value} at step {index}\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=32)
+    parser.add_argument("--format", choices=("csv", "freetext"), default="csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"feed.{args.format}")
+        with open(path, "w") as file:
+            index = 0
+            while file.tell() < args.megabytes * 2**20:
+                file.writelines(line(rng, index + n, args.format) for n in range(1000))
+                index += 1000
+        size = os.path.getsize(path)
+        feed = FeedNoId.model_validate(
+            {
+                "tag_id": "1",
+                "event_id": "1",
+                "orgc_id": "1",
+                "url": path,
+                "source_format": args.format,
+                "input_source": "local",
+                "settings": '{"csv":{"value":"2","delimiter":","},'
+                '"common":{"excluderegex":"/\\\\.ru$/"}}',
+            }
+        )
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for workers in sorted({0, args.workers}):
+            ingestor = FeedIngestor(feed, workers=workers, chunk_size=args.chunk_size)
+            for _ in ingestor.batches():
+                pass
+            stats = ingestor.stats
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(
+                f"workers {workers:2}  {stats.elapsed:7.2f} s"
+                f"  {stats.bytes_per_second / 2**20:6.2f} MB/s"
+                f"  {stats.attributes_per_second:9.0f} attributes/s"
+                f"  {stats.attributes} kept, {stats.excluded} excluded"
+                f"  peak RSS +{(peak - baseline) / 1024:.0f} MiB"
+                f" for {size / 2**20:.0f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
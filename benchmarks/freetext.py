@@ -0,0 +1,94 @@
+"""Indicator extraction speed on synthetic threat-report text.
+
+Documents are paragraphs of report prose with indicators, some of them
+defanged, mixed in at ``--density`` per word.
+
+    python -m benchmarks.freetext [--megabytes N] [--workers W] [--density D]
+"""
+import argparse
+import collections
+import os
+import random
+import time
+
+from analytics.freetext import IocExtractor
+
+WORDS = (
+    "the actor used a loader to fetch the second stage from its infrastructure"
+    " and persisted through a scheduled task; analysts observed lateral movement"
+    " via SMB, credential dumping with a modified tool, version 2.4.1, and"
+    " exfiltration over HTTPS to servers in several countries. The campaign"
+    " targeted finance, energy and government sectors between March and June."
+    " See section 3.2, figure 7 and appendix B for details (e.g. invoice.pdf)."
+).split()
+TLDS = ("com", "net", "org", "info", "ru", "cn", "io")
+
+
+def indicator(rng: random.Random) -> str:
+    kind = rng.random()
+    host = f"{rng.getrandbits(24):06x}{rng.choice(('-cdn', '-api', ''))}.{rng.choice(TLDS)}"
+    if kind < 0.25:
+        value = ".".join(str(rng.randrange(1, 255)) for _ in range(4))
+    elif kind < 0.45:
+        value = host if rng.random() < 0.5 else f"mail.{host}"
+    elif kind < 0.6:
+        value = f"https://{host}/{rng.getrandbits(32):08x}/payload.bin"
+    elif kind < 0.8:
+        value = f"{rng.getrandbits(rng.choice((128, 160, 256))):x}".zfill(32)
+    elif kind < 0.88:
+        value = f"admin{rng.randrange(100)}@{host}"
+    elif kind < 0.95:
+        value = f"CVE-20{rng.randrange(10, 25)}-{rng.randrange(1000, 60000)}"
+    else:
+        value = "1" + "".join(
+            rng.choice("123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz")
+            for _ in range(33)
+        )
+    if rng.random() < 0.3:
+        value = value.replace(".", "[.]").replace("http", "hxxp")
+    return value
+
+
+def document(rng: random.Random, words: int, density: float) -> str:
+    return " ".join(
+        indicator(rng) if rng.random() < density else rng.choice(WORDS)
+        for _ in range(words)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--density", type=float, default=0.02)
+    parser.add_argument("--words", type=int, default=2000, help="per document")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    documents, size = [], 0
+    while size < args.megabytes * 2**20:
+        documents.append(document(rng, args.words, args.density))
+        size += len(documents[-1])
+    extractor = IocExtractor()
+
+    start = time.perf_counter()
+    hits = [extractor.extract(text) for text in documents]
+    elapsed = time.perf_counter() - start
+    types = collections.Counter(ioc.type for found in hits for ioc in found)
+    print(
+        f"one process  {size / 2**20 / elapsed:7.2f} MB/s"
+        f"  {sum(types.values()) / elapsed:9.0f} indicators/s"
+        f"  {len(documents)} documents, {size / 2**20:.1f} MB"
+    )
+    print("  " + ", ".join(f"{type} {count}" for type, count in types.most_common()))
+
+    start = time.perf_counter()
+    pooled = list(extractor.extract_many(documents, workers=args.workers))
+    elapsed = time.perf_counter() - start
+    assert pooled == hits
+    print(f"{args.workers:2} workers   {size / 2**20 / elapsed:7.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Top-k fuzzy-hash similarity search against a linear scan.
+
+Indexes ``--hashes`` ssdeep signatures and as many TLSH digests, then
+queries altered copies of stored ones. The ssdeep linear scan time is
+extrapolated from scoring a sample; TLSH recall is measured against the
+exhaustive ranking.
+
+    python -m benchmarks.fuzzy_hashes [--hashes N] [--queries Q]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from analytics.fuzzy import SsdeepIndex, TlshIndex, ssdeep_compare
+
+BASE64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def ssdeep_hash(rng: random.Random) -> str:
+    block_size = 3 * 2 ** min(int(rng.expovariate(0.4)), 16)
+    chunk = "".join(rng.choices(BASE64, k=rng.randint(30, 64)))
+    double = "".join(rng.choices(BASE64, k=rng.randint(15, 32)))
+    return f"{block_size}:{chunk}:{double}"
+
+
+def alter_ssdeep(value: str, rng: random.Random, edits: int = 4) -> str:
+    block_size, chunk, double = value.split(":")
+    characters = list(chunk)
+    for _ in range(edits):
+        characters[rng.randrange(len(characters))] = rng.choice(BASE64)
+    return f"{block_size}:{''.join(characters)}:{double}"
+
+
+def tlsh_digests(count: int, rng: np.random.Generator) -> np.ndarray:
+    header = rng.integers(0, 256, size=(count, 3), dtype=np.uint8)
+    # Header L-values of similar sizes, as for files of similar lengths.
+    header[:, 1] = rng.integers(100, 140, size=count)
+    body = rng.integers(0, 256, size=(count, 32), dtype=np.uint8)
+    return np.concatenate([header, body], axis=1)
+
+
+def alter_tlsh(digest: np.ndarray, rng: np.random.Generator, buckets: int) -> str:
+    digest = digest.copy()
+    for bucket in rng.choice(128, size=buckets, replace=False):
+        byte, shift = 3 + bucket // 4, 2 * (bucket % 4)
+        code = (int(digest[byte]) >> shift) & 3
+        code = code + 1 if code < 3 else 2
+        digest[byte] = (int(digest[byte]) & ~(3 << shift) & 0xFF) | (code << shift)
+    return "T1" + tlsh_hex(digest)
+
+
+def tlsh_hex(digest: np.ndarray) -> str:
+    header = bytes(((int(byte) & 0x0F) << 4) | (int(byte) >> 4) for byte in digest[:3])
+    return (header + digest[3:].tobytes()).hex().upper()
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return "  ".join(
+        f"p{q} {latencies[min(len(latencies) - 1, len(latencies) * q // 100)] * 1000:7.2f} ms"
+        for q in (50, 99)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hashes", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--tlsh-buckets", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    signatures = [ssdeep_hash(rng) for _ in range(args.hashes)]
+    start = time.perf_counter()
+    index = SsdeepIndex()
+    index.add_many(enumerate(signatures))
+    index.query(signatures[0])
+    elapsed = time.perf_counter() - start
+    print(
+        f"ssdeep build {elapsed:8.1f} s  {args.hashes / elapsed:9.0f} hashes/s"
+        f"  {index.postings} postings  {index.nbytes / 2**20:.0f} MiB"
+    )
+    targets = [rng.randrange(args.hashes) for _ in range(args.queries)]
+    queries = [alter_ssdeep(signatures[target], rng) for target in targets]
+    latencies, found = [], 0
+    for target, query in zip(targets, queries):
+        start = time.perf_counter()
+        matches = index.query(query, args.k)
+        latencies.append(time.perf_counter() - start)
+        found += any(match.key == target for match in matches)
+    sample = signatures[: min(20_000, args.hashes)]
+    start = time.perf_counter()
+    for signature in sample:
+        ssdeep_compare(queries[0], signature)
+    scan = (time.perf_counter() - start) * args.hashes / len(sample)
+    print(
+        f"ssdeep query {percentiles(latencies)}  linear scan ~{scan * 1000:.0f} ms"
+        f"  source found {found / len(queries):.1%}"
+    )
+
+    generator = np.random.default_rng(args.seed)
+    digests = tlsh_digests(args.hashes, generator)
+    start = time.perf_counter()
+    tlsh = TlshIndex(seed=args.seed)
+    tlsh.add_many((row, tlsh_hex(digest)) for row, digest in enumerate(digests))
+    tlsh.query("T1" + tlsh_hex(digests[0]))
+    elapsed = time.perf_counter() - start
+    print(
+        f"tlsh   build {elapsed:8.1f} s  {args.hashes / elapsed:9.0f} hashes/s"
+        f"  {tlsh.nbytes / 2**20:.0f} MiB"
+    )
+    targets = generator.integers(0, args.hashes, size=args.queries)
+    queries = [
+        alter_tlsh(digests[target], generator, args.tlsh_buckets) for target in targets
+    ]
+    latencies, found = [], 0
+    for target, query in zip(targets.tolist(), queries):
+        start = time.perf_counter()
+        matches = tlsh.query(query, args.k)
+        latencies.append(time.perf_counter() - start)
+        found += bool(matches) and matches[0].key == target
+    scans, agree = [], 0
+    checked = queries[: max(1, args.queries // 50)]
+    for query in checked:
+        start = time.perf_counter()
+        exact = tlsh.query(query, args.k, exhaustive=True)
+        scans.append(time.perf_counter() - start)
+        agree += tlsh.query(query, args.k)[:1] == exact[:1]
+    print(
+        f"tlsh   query {percentiles(latencies)}  exhaustive {percentiles(scans)}"
+        f"  source nearest {found / len(queries):.1%}"
+        f"  top-1 recall {agree / len(checked):.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Query latency and serialized size of the hostname index.
+
+    python -m benchmarks.hostnames [--attributes N] [--lookups L]
+"""
+import argparse
+import random
+import time
+
+from analytics.hostnames import HostnameIndex
+
+TLDS = ("com", "net", "org", "io", "ru", "co.uk")
+SUBDOMAINS = ("www", "mail", "cdn", "api", "login", "m")
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return "  ".join(
+        f"p{q} {latencies[min(len(latencies) - 1, len(latencies) * q // 100)] / 1000:7.2f} us"
+        for q in (50, 99)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=1_000_000)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--domains", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    domains = [
+        f"{rng.getrandbits(40):010x}.{rng.choice(TLDS)}" for _ in range(args.domains)
+    ]
+    rows = []
+    for index in range(args.attributes):
+        domain = domains[int(len(domains) * rng.random() ** 2)]
+        host = domain if rng.random() < 0.4 else f"{rng.choice(SUBDOMAINS)}.{domain}"
+        kind = rng.choice(("hostname", "domain", "url", "hostname|port", "domain|ip"))
+        value = {
+            "url": f"https://{host}/path/{index}",
+            "hostname|port": f"{host}|443",
+            "domain|ip": f"{host}|192.0.2.{index % 256}",
+        }.get(kind, host)
+        rows.append(
+            (1 + index * args.events // args.attributes, 1 + index, value, kind)
+        )
+
+    start = time.perf_counter()
+    index = HostnameIndex()
+    for event_id, attribute_id, value, kind in rows:
+        index.add(event_id, attribute_id, value, kind)
+    elapsed = time.perf_counter() - start
+    print(
+        f"build       {elapsed * 1000:9.1f} ms  {args.attributes / elapsed:10.0f}"
+        f" attributes/s  {len(index)} hosts"
+    )
+
+    probes = [
+        f"{rng.choice(SUBDOMAINS)}.{domains[rng.randrange(len(domains))]}"
+        for _ in range(args.lookups)
+    ]
+    for name, lookup in (
+        ("lookup", index.lookup),
+        ("containing", index.containing),
+        ("within", lambda host: index.within(host.partition(".")[2])),
+    ):
+        latencies, found = [], 0
+        for probe in probes:
+            start = time.perf_counter_ns()
+            found += len(lookup(probe))
+            latencies.append(time.perf_counter_ns() - start)
+        print(
+            f"{name:11} {percentiles(latencies)}  {found / len(probes):6.1f}"
+            " attributes/lookup"
+        )
+
+    start = time.perf_counter()
+    data = index.to_bytes()
+    written = time.perf_counter() - start
+    start = time.perf_counter()
+    HostnameIndex.from_bytes(data)
+    read = time.perf_counter() - start
+    print(
+        f"serialized  {len(data) / 2**20:9.1f} MiB  {len(data) / args.attributes:5.1f}"
+        f" bytes/attribute  write {written * 1000:.0f} ms  read {read * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Cold-start cost of the ``models`` package.
+
+Each scenario runs in a fresh interpreter so nothing is cached between
+samples. ``eager`` builds every schema up front, which is what importing
+``models.events`` used to cost before schemas were deferred.
+
+    python -m benchmarks.import_time [--runs N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = {
+    "pydantic (floor)": "import pydantic; from pydantic import BaseModel, RootModel",
+    "import models": "import models",
+    "import models.events": "import models.events",
+    "import models.search": "import models.search",
+    "models.ExtendedEvent": "import models; models.ExtendedEvent",
+    "first ExtendedEvent validation": (
+        "import models; models.ExtendedEvent.model_validate("
+        "{'org_id': '1', 'orgc_id': '1', 'date': '2024-01-01T00:00:00'})"
+    ),
+    "eager (every schema built)": (
+        "import inspect, models, pydantic\n"
+        "for name in models.__all__:\n"
+        "    value = getattr(models, name)\n"
+        "    if inspect.isclass(value) and issubclass(value, pydantic.BaseModel):\n"
+        "        value.model_rebuild()"
+    ),
+}
+
+_TIMED = """\
+import time
+_start = time.perf_counter()
+{code}
+print(time.perf_counter() - _start)
+"""
+
+
+def measure(code: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _TIMED.format(code=code)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    for name, code in SCENARIOS.items():
+        print(f"{name:<34} {measure(code, args.runs) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Bulk load and streaming read speed of the SQLite mirror.
+
+    python -m benchmarks.mirror [--events N] [--attributes M] [--path FILE]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.misp_server import SyntheticMisp
+from client.mirror import MirrorStore
+from models.events import ExtendedEvent, ExtendedEventList
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--attributes", type=int, default=200, help="per event")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--path", help="database file, a temporary one by default")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    misp = SyntheticMisp(args.events, args.attributes, seed=args.seed)
+    by_event = {}
+    for attribute in misp.attributes:
+        by_event.setdefault(attribute["event_id"], []).append(attribute)
+    events = ExtendedEventList.model_validate(
+        [{**event, "Attribute": by_event.get(event["id"], [])} for event in misp.events]
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.path or os.path.join(directory, "mirror.db")
+        with MirrorStore(path, batch_size=args.batch_size) as store:
+            start = time.perf_counter()
+            loaded = store.load_events(events)
+            elapsed = time.perf_counter() - start
+            print(
+                f"load      {elapsed * 1000:9.1f} ms  {loaded / elapsed:9.0f}"
+                f" attributes/s  {os.path.getsize(path) / 2**20:.1f} MiB"
+            )
+
+            start = time.perf_counter()
+            streamed = sum(1 for _ in store.attributes())
+            elapsed = time.perf_counter() - start
+            print(
+                f"stream    {elapsed * 1000:9.1f} ms  {streamed / elapsed:9.0f} attributes/s"
+            )
+
+            value = misp.attributes[len(misp.attributes) // 2]["value"]
+            start = time.perf_counter()
+            found = list(store.attributes(value=value))
+            elapsed = time.perf_counter() - start
+            print(f"by value  {elapsed * 1000:9.2f} ms  {len(found)} attributes")
+
+            event_id = misp.events[len(misp.events) // 2]["id"]
+            start = time.perf_counter()
+            event = store.event(event_id)
+            elapsed = time.perf_counter() - start
+            assert isinstance(event, ExtendedEvent)
+            print(
+                f"event     {elapsed * 1000:9.2f} ms  {len(event.Attribute)} attributes"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,676 @@
+"""Local stand-in for a MISP server, for load tests and benchmarks.
+
+    python -m benchmarks.misp_server [--events N] [--attributes M] [--port P]
+                                     [--latency S] [--error-rate R]
+
+:class:`SyntheticMisp` generates a deterministic data set (the same seed
+gives the same events, attributes and uuids) whose records validate as the
+``models`` classes. :class:`MispServer` serves it over HTTP on localhost:
+
+- ``POST /events/restSearch`` and ``POST /attributes/restSearch`` with
+  ``page``/``limit``, ``timestamp``, ``publish_timestamp``, ``from``/``to``,
+  ``last``, ``eventid``, ``uuid``, ``type``, ``category``, ``value``,
+  ``to_ids``, ``published``, ``deleted``, ``requested_attributes`` and
+  ``returnFormat`` ``json`` or ``count``; list filters take ``!``-negated
+  values, and flags read ``"0"`` and ``"false"`` as false, as MISP does;
+- ``GET``/``POST /events/index`` with the same paging and time filters,
+  ``minimal`` returning ``SlimEvent`` records;
+- ``GET /events/view/{eventId}``, by id or uuid;
+- ``POST /sightings/add`` and ``POST /warninglists/checkValue``.
+
+Each request can be delayed by a fixed ``latency`` plus a random ``jitter``,
+and fail with ``error_status`` at ``error_rate``.
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import gzip
+import hashlib
+import ipaddress
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_START = 1_700_000_000
+DEFAULT_SPAN = 30 * 86400
+
+#: (type, category) pairs the synthetic attributes cycle through.
+ATTRIBUTE_KINDS: Sequence[Tuple[str, str]] = (
+    ("ip-dst", "Network activity"),
+    ("ip-src", "Network activity"),
+    ("domain", "Network activity"),
+    ("hostname", "Network activity"),
+    ("url", "Network activity"),
+    ("ip-dst|port", "Network activity"),
+    ("domain|ip", "Network activity"),
+    ("md5", "Payload delivery"),
+    ("sha1", "Payload delivery"),
+    ("sha256", "Payload delivery"),
+    ("filename", "Payload delivery"),
+    ("email-src", "Payload delivery"),
+)
+
+#: The warninglists answering ``/warninglists/checkValue``: id, name and
+#: CIDR blocks or domain suffixes. Some synthetic values fall inside them.
+WARNINGLISTS: Sequence[Tuple[str, str, Sequence[str]]] = (
+    ("1", "List of known public DNS resolvers", ("8.8.8.0/24", "1.1.1.0/24")),
+    ("2", "RFC 1918 private address space", ("10.0.0.0/8", "192.168.0.0/16")),
+    ("3", "Top domains", ("example.com", "example.org")),
+)
+
+_RELATIVE = re.compile(r"^(\d+)([dhms])$")
+_SECONDS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+
+class SyntheticMisp:
+    """Deterministic MISP data set held in memory.
+
+    ``events`` events of ``attributes_per_event`` attributes each, with
+    timestamps spread over ``span`` seconds from ``start``. Attribute ids
+    follow event order, so a search returns attributes in id order.
+    """
+
+    def __init__(
+        self,
+        events: int = 100,
+        attributes_per_event: int = 100,
+        seed: int = 0,
+        start: int = DEFAULT_START,
+        span: int = DEFAULT_SPAN,
+    ):
+        self.seed = seed
+        self.now = start + span
+        self.events: List[Dict[str, Any]] = []
+        self.attributes: List[Dict[str, Any]] = []
+        self.sightings: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        rng = random.Random(seed)
+        for event_index in range(events):
+            self.events.append(
+                _event(rng, event_index, start + span * event_index // max(events, 1))
+            )
+        for event in self.events:
+            for _ in range(attributes_per_event):
+                self.attributes.append(_attribute(rng, len(self.attributes), event))
+        self._event_ids = {event["id"]: event for event in self.events}
+        self._event_attributes: Dict[str, List[Dict[str, Any]]] = {}
+        for attribute in self.attributes:
+            self._event_attributes.setdefault(attribute["event_id"], []).append(
+                attribute
+            )
+        self._networks = [
+            (
+                list_id,
+                name,
+                [ipaddress.ip_network(entry) for entry in entries if "/" in entry],
+            )
+            for list_id, name, entries in WARNINGLISTS
+        ]
+        self._domains = [
+            (list_id, name, [entry for entry in entries if "/" not in entry])
+            for list_id, name, entries in WARNINGLISTS
+        ]
+
+    def touch(self, event_id: str, timestamp: Optional[int] = None) -> None:
+        """Mark an event and its first attribute as modified at ``timestamp``.
+
+        Defaults to one second past the newest timestamp in the data set,
+        which then becomes the new ``now``.
+        """
+        with self._lock:
+            if timestamp is None:
+                self.now += 1
+                timestamp = self.now
+            event = self._event_ids[str(event_id)]
+            event["timestamp"] = str(timestamp)
+            attributes = self._event_attributes.get(event["id"])
+            if attributes:
+                attributes[0]["timestamp"] = str(timestamp)
+
+    # Endpoints, each taking the decoded request body.
+
+    def rest_search_attributes(self, filters: Dict[str, Any]) -> Any:
+        matches = [
+            attribute
+            for attribute in self.attributes
+            if _attribute_matches(attribute, filters, self.now)
+            and _event_matches(
+                self._event_ids[attribute["event_id"]],
+                filters,
+                self.now,
+                attribute_level=True,
+            )
+        ]
+        if filters.get("returnFormat") == "count":
+            return {"response": {"count": len(matches)}}
+        requested = filters.get("requested_attributes")
+        page = [
+            {
+                name: value
+                for name, value in attribute.items()
+                if not requested or name in requested
+            }
+            for attribute in _paginate(matches, filters)
+        ]
+        return {"response": {"Attribute": page}}
+
+    def rest_search_events(self, filters: Dict[str, Any]) -> Any:
+        matches = [
+            event for event in self.events if _event_matches(event, filters, self.now)
+        ]
+        attribute_filters = {
+            name: filters[name]
+            for name in ("type", "category", "value", "to_ids", "deleted")
+            if filters.get(name) is not None
+        }
+        results = []
+        for event in matches:
+            attributes = [
+                attribute
+                for attribute in self._event_attributes.get(event["id"], ())
+                if _attribute_matches(attribute, attribute_filters, self.now)
+            ]
+            if attribute_filters and not attributes:
+                continue
+            results.append({"Event": {**event, "Attribute": attributes}})
+        if filters.get("returnFormat") == "count":
+            return {"response": {"count": len(results)}}
+        return {"response": _paginate(results, filters)}
+
+    def index_events(self, filters: Dict[str, Any]) -> Any:
+        matches = [
+            event for event in self.events if _event_matches(event, filters, self.now)
+        ]
+        page = _paginate(matches, filters)
+        if filters.get("minimal"):
+            return [
+                {
+                    name: event[name]
+                    for name in (
+                        "id",
+                        "timestamp",
+                        "sighting_timestamp",
+                        "published",
+                        "uuid",
+                    )
+                }
+                | {"orgc_uuid": event["Orgc"]["uuid"]}
+                for event in page
+            ]
+        return page
+
+    def view_event(self, event_id: str, body: Any = None) -> Any:
+        event = self._event_ids.get(event_id)
+        if event is None:
+            event = next(
+                (event for event in self.events if event["uuid"] == event_id), None
+            )
+        if event is None:
+            raise _HttpError(404, "Invalid event", "Invalid event")
+        return {
+            "Event": {**event, "Attribute": self._event_attributes.get(event["id"], [])}
+        }
+
+    def add_sighting(self, body: Dict[str, Any]) -> Any:
+        values = set(body.get("values") or ())
+        timestamp = str(body.get("timestamp") or self.now)
+        with self._lock:
+            sighting = None
+            for attribute in self.attributes:
+                if attribute["value"] not in values:
+                    continue
+                sighting = {
+                    "id": str(len(self.sightings) + 1),
+                    "attribute_id": attribute["id"],
+                    "event_id": attribute["event_id"],
+                    "org_id": "1",
+                    "date_sighting": timestamp,
+                    "uuid": str(uuid.UUID(int=len(self.sightings) + 1, version=4)),
+                    "source": body.get("source") or "",
+                    "type": "0",
+                    "attribute_uuid": attribute["uuid"],
+                }
+                self.sightings.append(sighting)
+                self._event_ids[attribute["event_id"]]["sighting_timestamp"] = timestamp
+        if sighting is None:
+            raise _HttpError(404, "Could not add sighting", "No matching attribute")
+        return sighting
+
+    def check_values(self, values: Iterable[str]) -> Any:
+        hits: Dict[str, List[Dict[str, str]]] = {}
+        for value in values:
+            matched = self._warninglist_hits(str(value))
+            if matched:
+                hits[value] = matched
+        # MISP encodes an empty result as an empty PHP array.
+        return hits or []
+
+    def _warninglist_hits(self, value: str) -> List[Dict[str, str]]:
+        try:
+            address = ipaddress.ip_address(value)
+        except ValueError:
+            host = value.lower().rstrip(".")
+            return [
+                {"id": list_id, "name": name}
+                for list_id, name, suffixes in self._domains
+                if any(
+                    host == suffix or host.endswith("." + suffix) for suffix in suffixes
+                )
+            ]
+        return [
+            {"id": list_id, "name": name}
+            for list_id, name, networks in self._networks
+            if any(address in network for network in networks)
+        ]
+
+
+@dataclass
+class Faults:
+    """Latency and error injection of a :class:`MispServer`."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    seed: int = 0
+
+
+class MispServer:
+    """Serve a :class:`SyntheticMisp` on ``host``:``port`` from a thread.
+
+    Port 0 picks a free port; :attr:`url` is the base URL to give a client.
+    With ``key`` set, requests must carry it as their ``Authorization``
+    header. Used as a context manager, the server runs for the block.
+    """
+
+    def __init__(
+        self,
+        data: Optional[SyntheticMisp] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        faults: Optional[Faults] = None,
+        key: Optional[str] = None,
+    ):
+        self.data = data if data is not None else SyntheticMisp()
+        self.faults = faults if faults is not None else Faults()
+        self.key = key
+        self.requests: Dict[str, int] = {}
+        self._rng = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], Callable[[Any], Any]] = {
+            ("POST", "/attributes/restSearch"): self.data.rest_search_attributes,
+            ("POST", "/events/restSearch"): self.data.rest_search_events,
+            ("GET", "/events/index"): self.data.index_events,
+            ("POST", "/events/index"): self.data.index_events,
+            ("POST", "/sightings/add"): self.data.add_sighting,
+            ("POST", "/warninglists/checkValue"): self.data.check_values,
+        }
+        #: Routes ending in a path parameter, called with it and the body.
+        self._prefix_routes: Dict[Tuple[str, str], Callable[[str, Any], Any]] = {
+            ("GET", "/events/view/"): self.data.view_event,
+        }
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MispServer":
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="misp-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MispServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def handle(self, method: str, path: str, headers, body: bytes) -> Tuple[int, Any]:
+        """Status and JSON payload answering one request."""
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            delay = self.faults.latency + self._rng.uniform(0, self.faults.jitter)
+            failed = self._rng.random() < self.faults.error_rate
+        if delay:
+            time.sleep(delay)
+        if self.key is not None and headers.get("Authorization") != self.key:
+            return 403, _error(
+                "Authentication failed. Please make sure you pass the API key of an "
+                "API enabled user along in the Authorization header.",
+                "Authentication failed.",
+                path,
+            )
+        route = self._routes.get((method, path))
+        if route is None:
+            for (route_method, prefix), prefix_route in self._prefix_routes.items():
+                if route_method == method and path.startswith(prefix):
+                    route = functools.partial(prefix_route, path[len(prefix) :])
+                    break
+            else:
+                return 404, _error("Not Found", "Not Found", path)
+        if failed:
+            return self.faults.error_status, _error(
+                "Injected failure", "Injected failure", path
+            )
+        try:
+            payload = json.loads(body) if body else {}
+            return 200, route(payload)
+        except _HttpError as error:
+            return error.status, _error(error.name, error.message, path)
+        except (ValueError, TypeError, AttributeError) as error:
+            return 400, _error("Bad Request", str(error), path)
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, name: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.name = name
+        self.message = message
+
+
+def _handler(server: MispServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as separate writes.
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            self._respond("GET")
+
+        def do_POST(self) -> None:
+            self._respond("POST")
+
+        def _respond(self, method: str) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            path = self.path.split("?", 1)[0]
+            status, payload = server.handle(method, path, self.headers, body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if "gzip" in self.headers.get("Accept-Encoding", ""):
+                data = gzip.compress(data, compresslevel=1)
+                self.send_header("Content-Encoding", "gzip")
+            if isinstance(payload, dict) and "response" in payload:
+                self.send_header("X-Result-Count", str(_result_count(payload)))
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def _event(rng: random.Random, index: int, timestamp: int) -> Dict[str, Any]:
+    orgc = rng.randrange(1, 6)
+    published = rng.random() < 0.8
+    return {
+        "id": str(index + 1),
+        "org_id": "1",
+        "orgc_id": str(orgc),
+        "distribution": str(rng.randrange(0, 4)),
+        "info": f"Synthetic event {index + 1}",
+        "uuid": _uuid(rng),
+        "date": datetime.fromtimestamp(timestamp, timezone.utc)
+        .replace(hour=0, minute=0, second=0, tzinfo=None)
+        .isoformat(),
+        "published": published,
+        "analysis": str(rng.randrange(0, 3)),
+        "attribute_count": "0",
+        "timestamp": str(timestamp),
+        "sharing_group_id": "0",
+        "proposal_email_lock": False,
+        "locked": False,
+        "threat_level_id": str(rng.randrange(1, 5)),
+        "publish_timestamp": str(timestamp if published else 0),
+        "sighting_timestamp": "0",
+        "disable_correlation": False,
+        "extends_uuid": "",
+        "Org": {"id": "1", "name": "ORGNAME", "uuid": _org_uuid(1)},
+        "Orgc": {"id": str(orgc), "name": f"ORG{orgc}", "uuid": _org_uuid(orgc)},
+    }
+
+
+def _attribute(rng: random.Random, index: int, event: Dict[str, Any]) -> Dict[str, Any]:
+    type_, category = ATTRIBUTE_KINDS[index % len(ATTRIBUTE_KINDS)]
+    event["attribute_count"] = str(int(event["attribute_count"]) + 1)
+    return {
+        "id": str(index + 1),
+        "event_id": event["id"],
+        "object_id": "0",
+        "object_relation": None,
+        "category": category,
+        "type": type_,
+        "value": _value(type_, index),
+        "to_ids": rng.random() < 0.7,
+        "uuid": _uuid(rng),
+        "event_uuid": event["uuid"],
+        "timestamp": event["timestamp"],
+        "distribution": "5",
+        "sharing_group_id": "0",
+        "comment": "",
+        "deleted": False,
+        "disable_correlation": False,
+        "first_seen": None,
+        "last_seen": None,
+    }
+
+
+def _value(type_: str, index: int) -> str:
+    digest = hashlib.sha256(f"{type_}:{index}".encode()).hexdigest()
+    # One value in 16 falls inside a warninglist.
+    listed = index % 16 == 0
+    if type_ in ("ip-dst", "ip-src"):
+        return f"8.8.8.{index % 256}" if listed else _address(digest)
+    if type_ == "domain":
+        return "example.com" if listed else f"d{digest[:10]}.test"
+    if type_ == "hostname":
+        return (
+            f"h{index}.example.org" if listed else f"h{digest[:8]}.d{digest[8:14]}.test"
+        )
+    if type_ == "url":
+        return f"https://d{digest[:10]}.test/{digest[10:18]}"
+    if type_ == "ip-dst|port":
+        return f"{_address(digest)}|{1024 + int(digest[8:12], 16) % 64000}"
+    if type_ == "domain|ip":
+        return f"d{digest[:10]}.test|{_address(digest[10:])}"
+    if type_ == "md5":
+        return digest[:32]
+    if type_ == "sha1":
+        return digest[:40]
+    if type_ == "sha256":
+        return digest
+    if type_ == "filename":
+        return f"{digest[:12]}.exe"
+    return f"u{digest[:8]}@d{digest[8:16]}.test"
+
+
+def _address(digest: str) -> str:
+    # Keep clear of the listed ranges: first octet 11..99.
+    octets = bytes.fromhex(digest[:8])
+    return f"{11 + octets[0] % 89}.{octets[1]}.{octets[2]}.{octets[3]}"
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _org_uuid(org_id: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"misp-org:{org_id}"))
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _flag(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "0", "false")
+    return bool(value)
+
+
+def _member(field: str, values: Any) -> bool:
+    """Whether ``field`` passes a list filter, ``!``-negated values included."""
+    if values is None:
+        return True
+    texts = [str(value) for value in _as_list(values)]
+    positive = [text for text in texts if not text.startswith("!")]
+    if positive and field not in positive:
+        return False
+    return not any(text[1:] == field for text in texts if text.startswith("!"))
+
+
+def _time(value: Any, now: int) -> int:
+    """Unix time of an absolute timestamp or a ``5d``/``12h`` age."""
+    text = str(value)
+    match = _RELATIVE.match(text)
+    if match:
+        return now - int(match.group(1)) * _SECONDS[match.group(2)]
+    return int(text)
+
+
+def _in_range(timestamp: int, spec: Any, now: int) -> bool:
+    if spec is None:
+        return True
+    if isinstance(spec, (list, tuple)):
+        low, high = (_time(item, now) for item in spec)
+        return low <= timestamp <= high
+    return timestamp >= _time(spec, now)
+
+
+def _event_matches(
+    event: Dict[str, Any],
+    filters: Dict[str, Any],
+    now: int,
+    attribute_level: bool = False,
+) -> bool:
+    if not _member(event["id"], filters.get("eventid")):
+        return False
+    if not attribute_level:
+        if not _member(event["uuid"], filters.get("uuid")):
+            return False
+        if not _in_range(int(event["timestamp"]), filters.get("timestamp"), now):
+            return False
+    if not _in_range(
+        int(event["publish_timestamp"]), filters.get("publish_timestamp"), now
+    ):
+        return False
+    if filters.get("last") is not None and (
+        not event["published"]
+        or int(event["publish_timestamp"]) < _time(filters["last"], now)
+    ):
+        return False
+    date = event["date"][:10]
+    if filters.get("from") is not None and date < str(filters["from"])[:10]:
+        return False
+    if filters.get("to") is not None and date > str(filters["to"])[:10]:
+        return False
+    if filters.get("published") is not None and event["published"] != _flag(
+        filters["published"]
+    ):
+        return False
+    return True
+
+
+def _attribute_matches(
+    attribute: Dict[str, Any], filters: Dict[str, Any], now: int
+) -> bool:
+    for name in ("type", "category", "value", "uuid"):
+        if not _member(attribute[name], filters.get(name)):
+            return False
+    if filters.get("to_ids") is not None and attribute["to_ids"] != _flag(
+        filters["to_ids"]
+    ):
+        return False
+    # Deleted attributes are left out unless asked for; [0, 1] gives both.
+    deleted = {_flag(value) for value in _as_list(filters.get("deleted", False))}
+    if len(deleted) == 1 and bool(attribute["deleted"]) not in deleted:
+        return False
+    return _in_range(int(attribute["timestamp"]), filters.get("timestamp"), now)
+
+
+def _paginate(items: List[Any], filters: Dict[str, Any]) -> List[Any]:
+    limit = filters.get("limit")
+    if not limit:
+        return items
+    page = int(filters.get("page") or 1)
+    return items[(page - 1) * int(limit) : page * int(limit)]
+
+
+def _result_count(payload: Dict[str, Any]) -> int:
+    response = payload["response"]
+    if isinstance(response, dict):
+        if "count" in response:
+            return int(response["count"])
+        response = response.get("Attribute") or ()
+    return len(response)
+
+
+def _error(name: str, message: str, url: str) -> Dict[str, str]:
+    return {"name": name, "message": message, "url": url}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--attributes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--key", default=None)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+
+    data = SyntheticMisp(args.events, args.attributes, seed=args.seed)
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    server = MispServer(data, args.host, args.port, faults, args.key)
+    print(
+        f"Serving {len(data.events)} events, {len(data.attributes)} attributes"
+        f" on {server.url}"
+    )
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
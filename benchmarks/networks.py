@@ -0,0 +1,96 @@
+"""Lookup latency of the IP radix index.
+
+Indexes ``--attributes`` addresses, a tenth of them IPv6 and a few percent
+CIDR blocks, then times point lookups (which networks hold this packet's
+address) and prefix lookups (which addresses lie in a /16).
+
+    python -m benchmarks.networks [--attributes N] [--lookups L]
+"""
+import argparse
+import ipaddress
+import random
+import time
+
+from analytics.networks import NetworkIndex
+
+
+def address(rng: random.Random) -> str:
+    if rng.random() < 0.1:
+        return str(ipaddress.IPv6Address((0x2001_0DB8 << 96) | rng.getrandbits(96)))
+    return str(ipaddress.IPv4Address(rng.getrandbits(32)))
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return "  ".join(
+        f"p{q} {latencies[min(len(latencies) - 1, len(latencies) * q // 100)] / 1000:7.2f} us"
+        for q in (50, 99)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=1_000_000)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    rows = []
+    for index in range(args.attributes):
+        value = address(rng)
+        if rng.random() < 0.03 and ":" not in value:
+            value = str(
+                ipaddress.IPv4Network(
+                    f"{value}/{rng.choice((8, 16, 24))}", strict=False
+                )
+            )
+        kind = rng.choice(("ip-dst", "ip-src|port", "domain|ip"))
+        if kind == "ip-src|port":
+            value = f"{value}|{rng.randrange(1, 65536)}"
+        elif kind == "domain|ip":
+            value = f"host{index}.test|{value}"
+        rows.append(
+            (1 + index * args.events // args.attributes, 1 + index, value, kind)
+        )
+
+    start = time.perf_counter()
+    index = NetworkIndex()
+    for event_id, attribute_id, value, kind in rows:
+        index.add(event_id, attribute_id, value, kind)
+    elapsed = time.perf_counter() - start
+    print(
+        f"build     {elapsed * 1000:9.1f} ms  {args.attributes / elapsed:10.0f}"
+        f" attributes/s  {len(index)} networks"
+    )
+
+    for name, probes, lookup in (
+        ("point", [address(rng) for _ in range(args.lookups)], index.containing),
+        (
+            "/16",
+            [
+                f"{ipaddress.IPv4Address(rng.getrandbits(16) << 16)}/16"
+                for _ in range(args.lookups // 10)
+            ],
+            index.within,
+        ),
+    ):
+        latencies, found = [], 0
+        for probe in probes:
+            start = time.perf_counter_ns()
+            found += len(lookup(probe))
+            latencies.append(time.perf_counter_ns() - start)
+        print(
+            f"{name:9} {percentiles(latencies)}  {found / len(probes):8.1f}"
+            " attributes/lookup"
+        )
+
+    start = time.perf_counter()
+    removed = sum(index.remove_event(event_id) for event_id in range(1, 1001))
+    elapsed = time.perf_counter() - start
+    print(f"delete    {elapsed * 1000:9.1f} ms  1000 events, {removed} postings")
+
+
+if __name__ == "__main__":
+    main()
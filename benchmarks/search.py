@@ -0,0 +1,89 @@
+"""Offline attribute restSearch latency, index-planned against a full scan.
+
+The full scan is the synthetic server's own evaluator, which checks every
+attribute against the filters.
+
+    python -m benchmarks.search [--events N] [--attributes M]
+"""
+import argparse
+import random
+import time
+
+from analytics.search import AttributeSearchEngine
+from benchmarks.misp_server import SyntheticMisp
+from models.events import ExtendedEvent
+
+TAGS = ("tlp:white", "tlp:green", "tlp:amber", 'misp-galaxy:threat-actor="APT1"')
+
+
+def timed(function, repeat: int):
+    function()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--attributes", type=int, default=200, help="per event")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    misp = SyntheticMisp(args.events, args.attributes, seed=args.seed)
+    by_event = {}
+    for attribute in misp.attributes:
+        by_event.setdefault(attribute["event_id"], []).append(attribute)
+    events = [
+        ExtendedEvent.model_validate(
+            {
+                **event,
+                "Attribute": by_event.get(event["id"], []),
+                "Tag": [
+                    {"id": str(index), "name": name, "org_id": "1", "user_id": "1"}
+                    for index, name in enumerate(TAGS)
+                    if rng.random() < 0.3
+                ],
+            }
+        )
+        for event in misp.events
+    ]
+
+    start = time.perf_counter()
+    engine = AttributeSearchEngine(clock=lambda: misp.now)
+    engine.add_events(events)
+    elapsed = time.perf_counter() - start
+    print(
+        f"load {elapsed * 1000:9.1f} ms  {len(engine) / elapsed:9.0f} attributes/s"
+        f"  {len(engine)} attributes"
+    )
+
+    value = misp.attributes[len(misp.attributes) // 2]["value"]
+    queries = [
+        {"value": value},
+        {"type": "sha256", "to_ids": True, "last": "2d"},
+        {"eventid": str(args.events // 2), "category": "Network activity"},
+        {"tags": ["tlp:amber"], "type": "domain", "timestamp": "3d"},
+        {"type": ["ip-src", "ip-dst"], "published": True, "limit": 100},
+    ]
+    for filters in queries:
+        planned, result = timed(lambda: engine.search(filters), args.repeat)
+        if "tags" in filters:
+            scan = None
+        else:
+            scan, _ = timed(
+                lambda: misp.rest_search_attributes(dict(filters)), args.repeat
+            )
+        plan = ", ".join(f"{name}~{rows}" for name, rows in engine.explain(filters)[:2])
+        print(
+            f"{len(result.root):6} hits  planned {planned * 1000:8.2f} ms  "
+            + (f"scan {scan * 1000:8.2f} ms  " if scan is not None else " " * 18)
+            + f"{filters}  [{plan}]"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Startup and lookup cost of a mapped snapshot against compiling from models.
+
+    python -m benchmarks.snapshot [--entries N] [--values M] [--workers W]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from analytics.snapshot import Snapshot, SnapshotWriter
+from analytics.warninglists import WarninglistMatcher
+from benchmarks.warninglists import lists, values
+
+
+def open_and_match(path: str, probes) -> float:
+    start = time.perf_counter()
+    with Snapshot.open(path) as snapshot:
+        for type, value in probes:
+            snapshot.warninglists.match(value, type)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--values", type=int, default=200_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    models = lists(args.entries, rng)
+    start = time.perf_counter()
+    matcher = WarninglistMatcher(models)
+    print(f"compile from models   {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "warninglists.snap")
+        start = time.perf_counter()
+        writer = SnapshotWriter("benchmark")
+        writer.add_warninglists(matcher)
+        size = writer.write(path)
+        print(
+            f"write snapshot        {(time.perf_counter() - start) * 1000:9.1f} ms"
+            f"  {size / 2**20:6.1f} MiB"
+        )
+
+        start = time.perf_counter()
+        snapshot = Snapshot.open(path)
+        print(f"open snapshot         {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+        probes = values(args.values, rng)
+        for label, target in (("compiled", matcher), ("mapped", snapshot.warninglists)):
+            start = time.perf_counter()
+            for type, value in probes:
+                target.match(value, type)
+            elapsed = time.perf_counter() - start
+            print(f"match {label:<15} {len(probes) / elapsed * 60:12.0f} values/min")
+        snapshot.close()
+
+        # Each worker opens the file itself and shares its pages.
+        with multiprocessing.Pool(args.workers) as pool:
+            timings = pool.starmap(
+                open_and_match, [(path, probes[:1000])] * args.workers
+            )
+        print(
+            f"{args.workers} workers open+1k    {max(timings) * 1000:9.1f} ms"
+            " (slowest)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Throughput and peak memory of streaming vs whole-body restSearch parsing.
+
+    python -m benchmarks.streaming [--attributes N]
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+
+from client.streaming import stream_attributes
+from models.search import AttributeRestSearchList
+
+
+def attribute(index: int) -> dict:
+    return {
+        "id": str(index),
+        "event_id": str(index // 100),
+        "object_id": "0",
+        "category": "Network activity",
+        "type": "ip-dst",
+        "value": f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+        "to_ids": True,
+        "uuid": "c99506a6-1255-4b71-afa5-7b8ba48c3b1b",
+        "event_uuid": "c99506a6-1255-4b71-afa5-7b8ba48c3b1b",
+        "timestamp": "1617875568",
+        "distribution": "5",
+        "sharing_group_id": "0",
+        "comment": "",
+        "deleted": False,
+        "disable_correlation": False,
+        "first_seen": None,
+        "last_seen": None,
+    }
+
+
+def write_response(path: str, count: int) -> None:
+    with open(path, "w") as file:
+        file.write('{"response": {"Attribute": [')
+        for index in range(count):
+            if index:
+                file.write(", ")
+            json.dump(attribute(index), file)
+        file.write("]}}")
+
+
+def run(label, parse) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = parse()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"{label:<10} {count:>9} items  {count / elapsed:>10.0f} items/s"
+        f"  peak {peak / 2**20:8.1f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attributes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix=".json") as response:
+        write_response(response.name, args.attributes)
+
+        def streamed():
+            with open(response.name, "rb") as body:
+                stream = stream_attributes(body)
+                count = sum(1 for _ in stream)
+            print(f"           {stream.stats.bytes_per_second / 2**20:.1f} MiB/s")
+            return count
+
+        def whole():
+            with open(response.name, "rb") as body:
+                document = json.load(body)
+            items = AttributeRestSearchList.model_validate(
+                document["response"]["Attribute"]
+            )
+            return len(items.root)
+
+        run("streamed", streamed)
+        run("whole", whole)
+
+
+if __name__ == "__main__":
+    main()
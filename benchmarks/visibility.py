@@ -0,0 +1,155 @@
+"""Per-organisation attribute visibility, vectorized against a per-item walk.
+
+The walk checks the event, object and attribute distribution of every
+attribute in turn, the way an access check on one item does.
+
+    python -m benchmarks.visibility [--events N] [--attributes M] [--orgs K]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from analytics.visibility import SHARING_GROUP, VisibilityEngine
+from benchmarks.misp_server import SyntheticMisp
+from models.events import ExtendedEvent
+
+
+def walk(org_id, local, events, groups):
+    """Ids of the attributes ``org_id`` can see, one item at a time."""
+
+    def level(item, owner):
+        distribution = int(item.get("distribution", "5"))
+        if owner or distribution in (2, 3, 5) or (distribution == 1 and local):
+            return True
+        if distribution == SHARING_GROUP:
+            members, all_local = groups.get(int(item["sharing_group_id"]), ((), 0))
+            return org_id in members or (all_local and local)
+        return False
+
+    visible = []
+    for event in events:
+        owner = int(event["org_id"]) == org_id
+        if not level(event, owner):
+            continue
+        for attribute in event["Attribute"]:
+            if level(attribute, owner):
+                visible.append(int(attribute["id"]))
+        for item in event["Object"]:
+            if level(item, owner):
+                for attribute in item["Attribute"]:
+                    if level(attribute, owner):
+                        visible.append(int(attribute["id"]))
+    return visible
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--attributes", type=int, default=200, help="per event")
+    parser.add_argument("--orgs", type=int, default=200)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    misp = SyntheticMisp(args.events, args.attributes, seed=args.seed)
+    groups = {
+        group_id: (
+            set(rng.sample(range(1, args.orgs + 1), rng.randint(2, 20))),
+            rng.random() < 0.1,
+        )
+        for group_id in range(1, args.groups + 1)
+    }
+    local = {org_id: rng.random() < 0.8 for org_id in range(1, args.orgs + 1)}
+
+    def distribute(item):
+        item["distribution"] = rng.choice("0123455")
+        item["sharing_group_id"] = str(rng.randint(1, args.groups))
+
+    by_event = {}
+    for attribute in misp.attributes:
+        distribute(attribute)
+        by_event.setdefault(attribute["event_id"], []).append(attribute)
+    events = []
+    for event in misp.events:
+        distribute(event)
+        event["org_id"] = str(rng.randint(1, args.orgs))
+        attributes = by_event.get(event["id"], [])
+        split = len(attributes) // 2
+        item = {
+            "id": event["id"],
+            "name": "file",
+            "template_uuid": event["uuid"],
+            "event_id": event["id"],
+            "uuid": event["uuid"],
+            "Attribute": attributes[split:],
+        }
+        distribute(item)
+        events.append({**event, "Attribute": attributes[:split], "Object": [item]})
+    models = [ExtendedEvent.model_validate(event) for event in events]
+
+    start = time.perf_counter()
+    engine = VisibilityEngine()
+    for org_id, is_local in local.items():
+        engine.add_org(org_id, local=is_local)
+    for group_id, (members, all_local) in groups.items():
+        engine.set_group(group_id, members, all_local=all_local)
+    engine.add_events(models)
+    elapsed = time.perf_counter() - start
+    print(
+        f"load      {elapsed * 1000:9.1f} ms  {len(engine)} attributes,"
+        f" {args.orgs} orgs, {args.groups} groups"
+    )
+
+    org_ids = rng.sample(sorted(local), min(20, len(local)))
+    walked = cold = cached = 0.0
+    for org_id in org_ids:
+        start = time.perf_counter()
+        expected = walk(org_id, local[org_id], events, groups)
+        walked += time.perf_counter() - start
+        start = time.perf_counter()
+        engine.visible(org_id)
+        cold += time.perf_counter() - start
+        start = time.perf_counter()
+        visible = engine.visible_attributes(org_id)
+        cached += time.perf_counter() - start
+        assert sorted(visible.tolist()) == sorted(expected), org_id
+    print(
+        f"per org   walk {walked / len(org_ids) * 1000:8.2f} ms"
+        f"  vectorized {cold / len(org_ids) * 1000:6.2f} ms"
+        f"  cached {cached / len(org_ids) * 1000:6.2f} ms"
+    )
+
+    ids = engine.attribute_ids().copy()
+    np.random.default_rng(args.seed).shuffle(ids)
+    start = time.perf_counter()
+    for org_id in org_ids:
+        engine.filter(org_id, ids)
+    elapsed = (time.perf_counter() - start) / len(org_ids)
+    print(f"filter    {elapsed * 1000:9.2f} ms  {len(ids)} ids per org")
+
+    changes = 0
+    start = time.perf_counter()
+    for group_id, (members, _) in groups.items():
+        for org_id in org_ids:
+            if org_id in members:
+                engine.remove_member(group_id, org_id)
+                members.discard(org_id)
+            else:
+                engine.add_member(group_id, org_id)
+                members.add(org_id)
+            changes += 1
+    elapsed = time.perf_counter() - start
+    for org_id in org_ids:
+        expected = walk(org_id, local[org_id], events, groups)
+        assert sorted(engine.visible_attributes(org_id).tolist()) == sorted(expected)
+    print(
+        f"member    {elapsed / changes * 1000:9.3f} ms per membership change,"
+        " cached masks updated in place"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Throughput of the compiled warninglist matcher.
+
+    python -m benchmarks.warninglists [--values N] [--entries M]
+"""
+import argparse
+import random
+import time
+
+from analytics.warninglists import WarninglistMatcher
+from models.warning_lists import Warninglist
+
+
+def warninglist(index: int, type: str, entries, valid: str = "") -> Warninglist:
+    return Warninglist.model_validate(
+        {
+            "id": str(index),
+            "name": f"Synthetic {type} list {index}",
+            "type": type,
+            "enabled": True,
+            "valid_attributes": valid,
+            "WarninglistEntry": [{"value": value} for value in entries],
+        }
+    )
+
+
+def lists(entries: int, rng: random.Random):
+    return [
+        warninglist(
+            1, "string", (f"{rng.getrandbits(128):032x}" for _ in range(entries)), "md5"
+        ),
+        warninglist(
+            2,
+            "hostname",
+            (f"host{i}.example{i % 997}.com" for i in range(entries)),
+            "domain, hostname, url, domain|ip",
+        ),
+        warninglist(
+            3,
+            "cidr",
+            (f"10.{i >> 8 & 255}.{i & 255}.0/24" for i in range(entries)),
+            "ip-src, ip-dst, domain|ip",
+        ),
+        warninglist(4, "cidr", (f"2001:db8:{i:x}::/48" for i in range(entries // 10))),
+        warninglist(5, "substring", (f"tracker{i}." for i in range(1000))),
+        warninglist(6, "regex", [r"/^.*\.local$/i", r"/^192\.168\./", r"^test-\d+$"]),
+    ]
+
+
+def values(count: int, rng: random.Random):
+    kinds = [
+        lambda i: ("md5", f"{rng.getrandbits(128):032x}"),
+        lambda i: ("domain", f"host{rng.randrange(2 * count)}.example{i % 997}.com"),
+        lambda i: ("url", f"https://www.host{i}.example{i % 997}.com/path?q={i}"),
+        lambda i: ("ip-dst", f"10.{rng.randrange(256)}.{rng.randrange(256)}.{i & 255}"),
+        lambda i: ("ip-src", f"2001:db8:{rng.randrange(4096):x}::{i & 0xffff:x}"),
+        lambda i: ("domain|ip", f"host{i}.example{i % 997}.com|10.0.{i & 255}.1"),
+        lambda i: ("hostname", f"srv{i}.tracker{rng.randrange(2000)}.net"),
+        lambda i: ("hostname", f"box{i}.corp.local"),
+    ]
+    return [kinds[i % len(kinds)](i) for i in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--values", type=int, default=1_000_000)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    matcher = WarninglistMatcher(lists(args.entries, rng))
+    print(
+        f"compile {len(matcher)} lists  {(time.perf_counter() - start) * 1000:9.1f} ms"
+    )
+
+    typed = values(args.values, rng)
+    for label, pairs in (("typed", typed), ("untyped", [(None, v) for _, v in typed])):
+        start = time.perf_counter()
+        hits = sum(1 for type, value in pairs if matcher.match(value, type))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:<8} {elapsed * 1000:9.1f} ms  {len(pairs) / elapsed * 60:12.0f}"
+            f" values/min  {hits} hits"
+        )
+
+
+if __name__ == "__main__":
+    main()
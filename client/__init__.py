@@ -0,0 +1,30 @@
+"""Client-side helpers for talking to a MISP server.
+
+As in :mod:`models`, the names below are reachable from the package itself
+but their submodules are only imported on first lookup, so importing one
+helper does not load requests, SQLite and every model with it.
+"""
+from __future__ import annotations
+
+from models import lazy_exports
+
+_MODULE_EXPORTS = {
+    "aio": ("AsyncMispClient",),
+    "api": ("MispApiError", "MispClient"),
+    "cache": ("CacheStats", "RestSearchCache", "fingerprint"),
+    "feed_sync": ("FeedCache", "FeedSync", "FeedSyncReport"),
+    "feeds": ("FeedIngestor", "FeedSettings", "IngestStats"),
+    "metrics": ("EndpointStats", "LatencyMetrics"),
+    "mirror": ("MirrorStore",),
+    "streaming": (
+        "RestSearchStream",
+        "StreamStats",
+        "stream_attributes",
+        "stream_events",
+    ),
+    "sync": ("EventSync", "SyncReport", "SyncStore"),
+}
+
+__all__ = sorted(name for names in _MODULE_EXPORTS.values() for name in names)
+
+__getattr__, __dir__ = lazy_exports(__name__, _MODULE_EXPORTS)
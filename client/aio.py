@@ -0,0 +1,168 @@
+"""asyncio front end to :class:`client.api.MispClient` with page fan-out.
+
+Walking a large ``restSearch`` result one page after the other leaves the
+server idle while each page is decoded. :class:`AsyncMispClient` asks for the
+result count first, plans the pages and fetches several at once, while still
+yielding the items in result order.
+
+Requests run on the pooled blocking client in a thread pool, so the
+connection pool limits, gzip handling and latency metrics are those of
+:class:`client.api.MispClient`.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from client.api import MispClient, request_body
+from models.search import (
+    AttributeRestSearchFilter,
+    AttributeRestSearchListItem,
+    ObjectRestSearchFilter,
+    ObjectRestSearchList,
+)
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_CONCURRENCY = 4
+
+Page = Callable[[int], Awaitable[Sequence[T]]]
+
+
+class AsyncMispClient:
+    """Concurrent, ordered ``restSearch`` pagination over ``client``.
+
+    At most ``concurrency`` requests of this client are in flight at once.
+    An iteration schedules at most ``buffer`` pages ahead of the page being
+    consumed (twice ``concurrency`` by default), so a slow consumer holds
+    back the fetching rather than piling pages up in memory. Closing or
+    cancelling an iteration cancels its pending pages; a request already
+    sent completes in its worker thread and its result is dropped.
+    """
+
+    def __init__(
+        self,
+        client: MispClient,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        buffer: Optional[int] = None,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.client = client
+        self.concurrency = concurrency
+        self.buffer = max(buffer or 2 * concurrency, concurrency)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="misp-client"
+        )
+
+    async def __aenter__(self) -> "AsyncMispClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Wait for the worker threads and close the blocking client."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._executor.shutdown
+        )
+        self.client.close()
+
+    async def run(self, function: Callable[..., T], *args: Any) -> T:
+        """Call ``function(*args)`` in a worker thread, within the limit."""
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, function, *args
+            )
+
+    async def count_attributes(
+        self, filters: Union[AttributeRestSearchFilter, Mapping[str, Any]]
+    ) -> int:
+        return await self.run(self.client.count_rest_search_attributes, filters)
+
+    async def iter_attributes(
+        self,
+        filters: Union[AttributeRestSearchFilter, Mapping[str, Any]],
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[AttributeRestSearchListItem]:
+        """Yield the attributes matching ``filters``, in result order.
+
+        A ``page`` or ``limit`` in ``filters`` is replaced by the plan.
+        """
+        body = request_body(filters)
+        total = await self.count_attributes(body)
+
+        async def page(number: int) -> Sequence[AttributeRestSearchListItem]:
+            paged = {**body, "page": number, "limit": page_size}
+            result = await self.run(self.client.rest_search_attributes, paged)
+            return result.root
+
+        pages = math.ceil(total / page_size)
+        async for item in self._fan_out(page, page_size, pages):
+            yield item
+
+    async def iter_objects(
+        self,
+        filters: Union[ObjectRestSearchFilter, Mapping[str, Any]],
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator[ObjectRestSearchList]:
+        """Yield the objects matching ``filters``, in result order.
+
+        ``/objects/restsearch`` cannot count, so pages are fetched ahead
+        speculatively until one comes back short.
+        """
+        body = request_body(filters)
+
+        async def page(number: int) -> Sequence[ObjectRestSearchList]:
+            paged = {**body, "page": number, "limit": page_size}
+            return await self.run(self.client.rest_search_objects, paged)
+
+        async for item in self._fan_out(page, page_size):
+            yield item
+
+    async def _fan_out(
+        self, page: Page[T], page_size: int, pages: Optional[int] = None
+    ) -> AsyncIterator[T]:
+        """Fetch pages ``1..pages`` concurrently and yield their items in order.
+
+        Without ``pages`` the plan is open-ended and ends after the first
+        page holding fewer than ``page_size`` items.
+        """
+        scheduled: Deque[asyncio.Task] = deque()
+        next_page = 1
+        try:
+            while True:
+                while len(scheduled) < self.buffer and (
+                    pages is None or next_page <= pages
+                ):
+                    scheduled.append(asyncio.ensure_future(page(next_page)))
+                    next_page += 1
+                if not scheduled:
+                    return
+                items = await scheduled.popleft()
+                for item in items:
+                    yield item
+                if pages is None and len(items) < page_size:
+                    return
+        finally:
+            for task in scheduled:
+                task.cancel()
+            if scheduled:
+                await asyncio.gather(*scheduled, return_exceptions=True)
+
@@ -0,0 +1,809 @@
+"""Blocking client for the MISP REST API described in ``misp-openapi.yaml``.
+
+One :class:`MispClient` holds a ``requests`` session whose connection pools
+keep connections to the server alive between calls, so that a service
+issuing many calls pays for the TCP and TLS handshakes once. Responses are
+requested gzip-compressed and decoded into the ``models`` classes, and every
+call is timed into :attr:`MispClient.metrics` under the ``operationId`` of
+its endpoint.
+"""
+from __future__ import annotations
+
+import functools
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+)
+
+import requests
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from requests.adapters import HTTPAdapter
+
+from client.cache import RestSearchCache, namespace
+from client.metrics import LatencyMetrics
+from client.streaming import (
+    ATTRIBUTES_PATH,
+    DEFAULT_CHUNK_SIZE,
+    EVENTS_PATH,
+    RestSearchStream,
+)
+from models.attributes import Attribute, AttributeNoId
+from models.events import (
+    CreatedEvent,
+    Event,
+    EventRestSearchList,
+    EventRestSearchListItem,
+    ExtendedEvent,
+    ExtendedEventList,
+    SlimEventList,
+    UpdatedEvent,
+)
+from models.feeds import Feed, FeedNoId
+from models.galaxy import (
+    ExtendedGalaxy,
+    ExtendedGalaxyCluster,
+    Galaxy,
+    GalaxyCluster,
+    GalaxyClusterNoId,
+)
+from models.objects import ExtendedObject, Object
+from models.search import (
+    AttributeRestSearchFilter,
+    AttributeRestSearchList,
+    AttributeRestSearchListItem,
+    AttributesRestSearchReturnFormat,
+    ObjectRestSearchFilter,
+    ObjectRestSearchList,
+)
+from models.server import ApiError
+from models.sightings import Sighting
+from models.unknown import DescribeAttributeTypesResponse
+from models.validation import projected_model
+from models.warning_lists import Warninglist
+
+T = TypeVar("T")
+
+Filters = Union[BaseModel, Mapping[str, Any]]
+
+DEFAULT_TIMEOUT = 60.0
+#: Hosts whose connection pools are kept.
+DEFAULT_POOL_CONNECTIONS = 10
+#: Connections kept alive per host.
+DEFAULT_POOL_MAXSIZE = 10
+
+
+class MispApiError(Exception):
+    """Non-2xx answer of the MISP server.
+
+    ``error`` is the decoded ``ApiError`` body when the server sent one.
+    """
+
+    def __init__(
+        self,
+        status: int,
+        endpoint: str,
+        error: Optional[ApiError] = None,
+        body: str = "",
+    ):
+        self.status = status
+        self.endpoint = endpoint
+        self.error = error
+        self.body = body
+        detail = error.message if error is not None else body[:200]
+        super().__init__(f"{endpoint} failed with HTTP {status}: {detail}")
+
+
+class MispClient:
+    """Pooled, keep-alive client for one MISP server.
+
+    ``pool_maxsize`` bounds the connections kept alive to each host and,
+    with ``pool_block``, the concurrent requests to it from threads sharing
+    the client; ``pool_connections`` is the number of per-host pools kept.
+    Use the client as a context manager, or call :meth:`close`, to release
+    the connections.
+
+    With a ``cache``, the non-streaming ``restSearch`` calls answer
+    repeated searches from it, from entries kept apart from those of any
+    other server or API key.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        *,
+        verify: Union[bool, str] = True,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = True,
+        max_retries: int = 0,
+        metrics: Optional[LatencyMetrics] = None,
+        cache: Optional[RestSearchCache] = None,
+    ):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.metrics = metrics if metrics is not None else LatencyMetrics()
+        self.cache = cache
+        self._cache_namespace = namespace(self.url, key)
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.session.headers.update(
+            {
+                "Authorization": key,
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+            }
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=max_retries,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self) -> "MispClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    # Attributes
+
+    def rest_search_attributes(
+        self, filters: Union[AttributeRestSearchFilter, Mapping[str, Any]]
+    ) -> AttributeRestSearchList:
+        """``POST /attributes/restSearch``.
+
+        With ``requested_attributes`` in ``filters``, the items are validated
+        into the matching :func:`models.validation.projected_model`.
+        """
+        body = request_body(filters)
+        model = _search_model(AttributeRestSearchList, body)
+
+        def load() -> AttributeRestSearchList:
+            payload = self._call(
+                "restSearchAttributes", "POST", "/attributes/restSearch", body
+            )
+            return _decode(model, _navigate(payload, ATTRIBUTES_PATH))
+
+        return self._cached("restSearchAttributes", body, model, load)
+
+    def stream_rest_search_attributes(
+        self,
+        filters: Union[AttributeRestSearchFilter, Mapping[str, Any]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> RestSearchStream[AttributeRestSearchListItem]:
+        """``POST /attributes/restSearch``, yielding items as they arrive.
+
+        The latency recorded is the time to the response headers. The
+        connection goes back to the pool once the stream is exhausted or
+        closed; use it as a context manager when it may be left early.
+        """
+        body = request_body(filters)
+        model = _search_model(AttributeRestSearchListItem, body)
+        response = self._send(
+            "restSearchAttributes", "POST", "/attributes/restSearch", body, stream=True
+        )
+        return RestSearchStream(
+            response.iter_content(chunk_size),
+            model,
+            ATTRIBUTES_PATH,
+            chunk_size,
+            close=response.close,
+        )
+
+    def count_rest_search_attributes(
+        self, filters: Union[AttributeRestSearchFilter, Mapping[str, Any]]
+    ) -> int:
+        """Number of attributes ``POST /attributes/restSearch`` would return.
+
+        Sends the search with ``returnFormat`` ``count`` and without paging.
+        """
+        body = request_body(filters)
+        body.pop("page", None)
+        body.pop("limit", None)
+        body["returnFormat"] = AttributesRestSearchReturnFormat.COUNT.value
+        response = self._send(
+            "restSearchAttributes", "POST", "/attributes/restSearch", body
+        )
+        return _count(response)
+
+    def get_attributes(self) -> List[Attribute]:
+        """``GET /attributes``."""
+        return _decode(
+            List[Attribute], self._call("getAttributes", "GET", "/attributes")
+        )
+
+    def get_attribute(self, attribute_id: Union[int, str]) -> Attribute:
+        """``GET /attributes/view/{attributeId}``."""
+        payload = self._call(
+            "getAttributeById", "GET", f"/attributes/view/{attribute_id}"
+        )
+        return _decode(Attribute, payload["Attribute"])
+
+    def add_attribute(
+        self, event_id: Union[int, str], attribute: AttributeNoId
+    ) -> Attribute:
+        """``POST /attributes/add/{eventId}``."""
+        payload = self._call(
+            "addAttribute",
+            "POST",
+            f"/attributes/add/{event_id}",
+            request_body(attribute),
+        )
+        return _decode(Attribute, payload["Attribute"])
+
+    def edit_attribute(self, attribute: Attribute) -> Attribute:
+        """``PUT /attributes/edit/{attributeId}``."""
+        payload = self._call(
+            "editAttribute",
+            "PUT",
+            f"/attributes/edit/{attribute.id.root}",
+            request_body(attribute),
+        )
+        return _decode(Attribute, payload["Attribute"])
+
+    def delete_attribute(self, attribute_id: Union[int, str]) -> Dict[str, Any]:
+        """``DELETE /attributes/delete/{attributeId}``."""
+        return self._call(
+            "deleteAttribute", "DELETE", f"/attributes/delete/{attribute_id}"
+        )
+
+    def restore_attribute(self, attribute_id: Union[int, str]) -> Attribute:
+        """``POST /attributes/restore/{attributeId}``."""
+        payload = self._call(
+            "restoreAttribute", "POST", f"/attributes/restore/{attribute_id}"
+        )
+        return _decode(Attribute, payload["Attribute"])
+
+    def tag_attribute(
+        self,
+        attribute_id: Union[int, str],
+        tag_id: Union[int, str],
+        local: bool = False,
+    ) -> Dict[str, Any]:
+        """``POST /attributes/addTag/{attributeId}/{tagId}/local:{local}``."""
+        return self._call(
+            "tagAttribute",
+            "POST",
+            f"/attributes/addTag/{attribute_id}/{tag_id}/local:{int(local)}",
+        )
+
+    def untag_attribute(
+        self, attribute_id: Union[int, str], tag_id: Union[int, str]
+    ) -> Dict[str, Any]:
+        """``POST /attributes/removeTag/{attributeId}/{tagId}``."""
+        return self._call(
+            "untagAttribute", "POST", f"/attributes/removeTag/{attribute_id}/{tag_id}"
+        )
+
+    def describe_attribute_types(self) -> DescribeAttributeTypesResponse:
+        """``GET /attributes/describeTypes``."""
+        payload = self._call(
+            "describeAttributeTypes", "GET", "/attributes/describeTypes"
+        )
+        return _decode(DescribeAttributeTypesResponse, payload)
+
+    # Events
+
+    def rest_search_events(self, filters: Filters) -> EventRestSearchList:
+        """``POST /events/restSearch``."""
+        body = request_body(filters)
+
+        def load() -> EventRestSearchList:
+            payload = self._call("restSearchEvents", "POST", "/events/restSearch", body)
+            return _decode(EventRestSearchList, _navigate(payload, EVENTS_PATH))
+
+        return self._cached("restSearchEvents", body, EventRestSearchList, load)
+
+    def stream_rest_search_events(
+        self, filters: Filters, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> RestSearchStream[EventRestSearchListItem]:
+        """``POST /events/restSearch``, yielding events as they arrive.
+
+        The latency recorded is the time to the response headers. The
+        connection goes back to the pool once the stream is exhausted or
+        closed; use it as a context manager when it may be left early.
+        """
+        response = self._send(
+            "restSearchEvents",
+            "POST",
+            "/events/restSearch",
+            request_body(filters),
+            stream=True,
+        )
+        return RestSearchStream(
+            response.iter_content(chunk_size),
+            EventRestSearchListItem,
+            EVENTS_PATH,
+            chunk_size,
+            close=response.close,
+        )
+
+    def get_events(self) -> ExtendedEventList:
+        """``GET /events``."""
+        return _decode(ExtendedEventList, self._call("getEvents", "GET", "/events"))
+
+    def search_events(
+        self, filters: Filters
+    ) -> Union[ExtendedEventList, SlimEventList]:
+        """``POST /events/index``.
+
+        With ``minimal`` set the server only sends the fields of
+        ``SlimEvent``, and a ``SlimEventList`` is returned.
+        """
+        body = request_body(filters)
+        payload = self._call("searchEvents", "POST", "/events/index", body)
+        if body.get("minimal"):
+            return _decode(SlimEventList, payload)
+        return _decode(ExtendedEventList, payload)
+
+    def get_event(self, event_id: Union[int, str]) -> ExtendedEvent:
+        """``GET /events/view/{eventId}``."""
+        payload = self._call("getEventById", "GET", f"/events/view/{event_id}")
+        return _decode(ExtendedEvent, payload["Event"])
+
+    def add_event(self, event: Union[Event, Mapping[str, Any]]) -> CreatedEvent:
+        """``POST /events/add``."""
+        payload = self._call("addEvent", "POST", "/events/add", request_body(event))
+        return _decode(CreatedEvent, payload)
+
+    def edit_event(
+        self, event_id: Union[int, str], event: Union[Event, Mapping[str, Any]]
+    ) -> UpdatedEvent:
+        """``PUT /events/edit/{eventId}``."""
+        payload = self._call(
+            "editEvent", "PUT", f"/events/edit/{event_id}", request_body(event)
+        )
+        return _decode(UpdatedEvent, payload)
+
+    def delete_event(self, event_id: Union[int, str]) -> Dict[str, Any]:
+        """``DELETE /events/delete/{eventId}``."""
+        return self._call("deleteEvent", "DELETE", f"/events/delete/{event_id}")
+
+    def publish_event(self, event_id: Union[int, str]) -> Dict[str, Any]:
+        """``POST /events/publish/{eventId}``."""
+        return self._call("publishEvent", "POST", f"/events/publish/{event_id}")
+
+    def unpublish_event(self, event_id: Union[int, str]) -> Dict[str, Any]:
+        """``POST /events/unpublish/{eventId}``."""
+        return self._call("unpublishEvent", "POST", f"/events/unpublish/{event_id}")
+
+    def tag_event(
+        self,
+        event_id: Union[int, str],
+        tag_id: Union[int, str],
+        local: bool = False,
+    ) -> Dict[str, Any]:
+        """``POST /events/addTag/{eventId}/{tagId}/local:{local}``."""
+        return self._call(
+            "tagEvent", "POST", f"/events/addTag/{event_id}/{tag_id}/local:{int(local)}"
+        )
+
+    def untag_event(
+        self, event_id: Union[int, str], tag_id: Union[int, str]
+    ) -> Dict[str, Any]:
+        """``POST /events/removeTag/{eventId}/{tagId}``."""
+        return self._call(
+            "untagEvent", "POST", f"/events/removeTag/{event_id}/{tag_id}"
+        )
+
+    # Objects
+
+    def rest_search_objects(
+        self, filters: Union[ObjectRestSearchFilter, Mapping[str, Any]]
+    ) -> List[ObjectRestSearchList]:
+        """``POST /objects/restsearch``."""
+        body = request_body(filters)
+        annotation = List[ObjectRestSearchList]
+
+        def load() -> List[ObjectRestSearchList]:
+            payload = self._call(
+                "restSearchObjects", "POST", "/objects/restsearch", body
+            )
+            return _decode(annotation, _navigate(payload, ("response",)))
+
+        return self._cached("restSearchObjects", body, annotation, load)
+
+    def get_object(self, object_id: Union[int, str]) -> ExtendedObject:
+        """``GET /objects/view/{objectId}``."""
+        payload = self._call("getObjectById", "GET", f"/objects/view/{object_id}")
+        return _decode(ExtendedObject, payload["Object"])
+
+    def add_object(
+        self,
+        event_id: Union[int, str],
+        object_template_id: Union[int, str],
+        misp_object: Union[Object, Mapping[str, Any]],
+    ) -> Object:
+        """``POST /objects/add/{eventId}/{objectTemplateId}``."""
+        payload = self._call(
+            "addObject",
+            "POST",
+            f"/objects/add/{event_id}/{object_template_id}",
+            request_body(misp_object),
+        )
+        return _decode(Object, payload["Object"])
+
+    def delete_object(
+        self, object_id: Union[int, str], hard: bool = False
+    ) -> Dict[str, Any]:
+        """``DELETE /objects/delete/{objectId}/{hardDelete}``."""
+        return self._call(
+            "deleteObject", "DELETE", f"/objects/delete/{object_id}/{int(hard)}"
+        )
+
+    # Sightings
+
+    def get_sightings(self, event_id: Union[int, str]) -> List[Sighting]:
+        """``GET /sightings/index/{eventId}``."""
+        payload = self._call(
+            "getSightingsByEventId", "GET", f"/sightings/index/{event_id}"
+        )
+        return _decode(List[Sighting], payload)
+
+    def add_sighting(
+        self,
+        values: Iterable[str],
+        timestamp: Optional[int] = None,
+        filters: Optional[Filters] = None,
+    ) -> Sighting:
+        """``POST /sightings/add``."""
+        body: Dict[str, Any] = {"values": list(values)}
+        if timestamp is not None:
+            body["timestamp"] = timestamp
+        if filters is not None:
+            body["filters"] = request_body(filters)
+        payload = self._call("addSightingByValue", "POST", "/sightings/add", body)
+        return _decode(Sighting, payload)
+
+    def add_sighting_to_attribute(self, attribute_id: Union[int, str]) -> Sighting:
+        """``POST /sightings/add/{attributeId}``."""
+        payload = self._call("addSighting", "POST", f"/sightings/add/{attribute_id}")
+        return _decode(Sighting, payload)
+
+    def delete_sighting(self, sighting_id: Union[int, str]) -> Dict[str, Any]:
+        """``POST /sightings/delete/{sightingId}``."""
+        return self._call("deleteSighting", "POST", f"/sightings/delete/{sighting_id}")
+
+    # Feeds
+
+    def get_feeds(self) -> List[Feed]:
+        """``GET /feeds``."""
+        payload = self._call("getFeeds", "GET", "/feeds")
+        return _decode(List[Feed], [item["Feed"] for item in payload])
+
+    def get_feed(self, feed_id: Union[int, str]) -> Feed:
+        """``GET /feeds/view/{feedId}``."""
+        payload = self._call("getFeedById", "GET", f"/feeds/view/{feed_id}")
+        return _decode(Feed, payload["Feed"])
+
+    def add_feed(self, feed: Union[FeedNoId, Mapping[str, Any]]) -> Feed:
+        """``POST /feeds/add``."""
+        payload = self._call("addFeed", "POST", "/feeds/add", request_body(feed))
+        return _decode(Feed, payload["Feed"])
+
+    def edit_feed(
+        self, feed_id: Union[int, str], feed: Union[FeedNoId, Mapping[str, Any]]
+    ) -> Feed:
+        """``PUT /feeds/edit/{feedId}``."""
+        payload = self._call(
+            "editFeed", "PUT", f"/feeds/edit/{feed_id}", request_body(feed)
+        )
+        return _decode(Feed, payload["Feed"])
+
+    def enable_feed(self, feed_id: Union[int, str]) -> Dict[str, Any]:
+        """``POST /feeds/enable/{feedId}``."""
+        return self._call("enableFeed", "POST", f"/feeds/enable/{feed_id}")
+
+    def disable_feed(self, feed_id: Union[int, str]) -> Dict[str, Any]:
+        """``POST /feeds/disable/{feedId}``."""
+        return self._call("disableFeed", "POST", f"/feeds/disable/{feed_id}")
+
+    def cache_feeds(self, scope: str = "all") -> Dict[str, Any]:
+        """``POST /feeds/cacheFeeds/{cacheFeedsScope}``."""
+        return self._call("cacheFeeds", "POST", f"/feeds/cacheFeeds/{scope}")
+
+    def fetch_from_feed(self, feed_id: Union[int, str]) -> Dict[str, Any]:
+        """``POST /feeds/fetchFromFeed/{feedId}``."""
+        return self._call("fetchFromFeed", "POST", f"/feeds/fetchFromFeed/{feed_id}")
+
+    def fetch_from_all_feeds(self) -> Dict[str, Any]:
+        """``POST /feeds/fetchFromAllFeeds``."""
+        return self._call("fetchFromAllFeeds", "POST", "/feeds/fetchFromAllFeeds")
+
+    # Galaxies
+
+    def get_galaxies(self) -> List[Galaxy]:
+        """``GET /galaxies``."""
+        payload = self._call("getGalaxies", "GET", "/galaxies")
+        return _decode(List[Galaxy], [item["Galaxy"] for item in payload])
+
+    def search_galaxies(self, value: str) -> List[Galaxy]:
+        """``POST /galaxies``."""
+        payload = self._call("searchGalaxies", "POST", "/galaxies", {"value": value})
+        return _decode(List[Galaxy], [item["Galaxy"] for item in payload])
+
+    def get_galaxy(self, galaxy_id: Union[int, str]) -> ExtendedGalaxy:
+        """``GET /galaxies/view/{galaxyId}``."""
+        payload = self._call("getGalaxyById", "GET", f"/galaxies/view/{galaxy_id}")
+        return _decode(ExtendedGalaxy, payload)
+
+    def update_galaxies(self) -> Dict[str, Any]:
+        """``POST /galaxies/update``."""
+        return self._call("updateGalaxies", "POST", "/galaxies/update")
+
+    def delete_galaxy(self, galaxy_id: Union[int, str]) -> Dict[str, Any]:
+        """``DELETE /galaxies/delete/{galaxyId}``."""
+        return self._call("deleteGalaxy", "DELETE", f"/galaxies/delete/{galaxy_id}")
+
+    def get_galaxy_clusters(
+        self,
+        galaxy_id: Union[int, str],
+        context: Optional[str] = None,
+        searchall: Optional[str] = None,
+    ) -> List[GalaxyCluster]:
+        """``GET /galaxy_clusters/index/{galaxyId}``, or ``POST`` to filter."""
+        path = f"/galaxy_clusters/index/{galaxy_id}"
+        if context is None and searchall is None:
+            payload = self._call("getGalaxyClusters", "GET", path)
+        else:
+            body = request_body({"context": context, "searchall": searchall})
+            payload = self._call("searchGalaxyClusters", "POST", path, body)
+        return _decode(List[GalaxyCluster], [item["GalaxyCluster"] for item in payload])
+
+    def get_galaxy_cluster(
+        self, galaxy_cluster_id: Union[int, str]
+    ) -> ExtendedGalaxyCluster:
+        """``GET /galaxy_clusters/view/{galaxyClusterId}``."""
+        payload = self._call(
+            "getGalaxyClusterById", "GET", f"/galaxy_clusters/view/{galaxy_cluster_id}"
+        )
+        return _decode(ExtendedGalaxyCluster, payload["GalaxyCluster"])
+
+    def add_galaxy_cluster(
+        self,
+        galaxy_id: Union[int, str],
+        cluster: Union[GalaxyClusterNoId, Mapping[str, Any]],
+    ) -> GalaxyCluster:
+        """``POST /galaxy_clusters/add/{galaxyId}``."""
+        payload = self._call(
+            "addGalaxyCluster",
+            "POST",
+            f"/galaxy_clusters/add/{galaxy_id}",
+            request_body(cluster),
+        )
+        return _decode(GalaxyCluster, payload["GalaxyCluster"])
+
+    def edit_galaxy_cluster(
+        self,
+        galaxy_cluster_id: Union[int, str],
+        cluster: Union[GalaxyClusterNoId, Mapping[str, Any]],
+    ) -> GalaxyCluster:
+        """``PUT /galaxy_clusters/edit/{galaxyClusterId}``."""
+        payload = self._call(
+            "editGalaxyCluster",
+            "PUT",
+            f"/galaxy_clusters/edit/{galaxy_cluster_id}",
+            request_body(cluster),
+        )
+        return _decode(GalaxyCluster, payload["GalaxyCluster"])
+
+    def publish_galaxy_cluster(
+        self, galaxy_cluster_id: Union[int, str]
+    ) -> Dict[str, Any]:
+        """``POST /galaxy_clusters/publish/{galaxyClusterId}``."""
+        return self._call(
+            "publishGalaxyCluster",
+            "POST",
+            f"/galaxy_clusters/publish/{galaxy_cluster_id}",
+        )
+
+    def unpublish_galaxy_cluster(
+        self, galaxy_cluster_id: Union[int, str]
+    ) -> Dict[str, Any]:
+        """``POST /galaxy_clusters/unpublish/{galaxyClusterId}``."""
+        return self._call(
+            "unpublishGalaxyCluster",
+            "POST",
+            f"/galaxy_clusters/unpublish/{galaxy_cluster_id}",
+        )
+
+    def delete_galaxy_cluster(
+        self, galaxy_cluster_id: Union[int, str]
+    ) -> Dict[str, Any]:
+        """``POST /galaxy_clusters/delete/{galaxyClusterId}``."""
+        return self._call(
+            "deleteGalaxyCluster",
+            "POST",
+            f"/galaxy_clusters/delete/{galaxy_cluster_id}",
+        )
+
+    def restore_galaxy_cluster(
+        self, galaxy_cluster_id: Union[int, str]
+    ) -> Dict[str, Any]:
+        """``POST /galaxy_clusters/restore/{galaxyClusterId}``."""
+        return self._call(
+            "restoreGalaxyCluster",
+            "POST",
+            f"/galaxy_clusters/restore/{galaxy_cluster_id}",
+        )
+
+    # Warninglists
+
+    def get_warninglists(
+        self, value: Optional[str] = None, enabled: Optional[bool] = None
+    ) -> List[Warninglist]:
+        """``GET /warninglists``, or ``POST`` to search."""
+        if value is None and enabled is None:
+            payload = self._call("getWarninglists", "GET", "/warninglists")
+        else:
+            body = request_body({"value": value, "enabled": enabled})
+            payload = self._call("searchWarninglists", "POST", "/warninglists", body)
+        return _decode(
+            List[Warninglist],
+            [item["Warninglist"] for item in payload.get("Warninglists") or ()],
+        )
+
+    def get_warninglist(self, warninglist_id: Union[int, str]) -> Warninglist:
+        """``GET /warninglists/view/{warninglistId}``."""
+        payload = self._call(
+            "getWarninglistById", "GET", f"/warninglists/view/{warninglist_id}"
+        )
+        return _decode(Warninglist, payload["Warninglist"])
+
+    def toggle_warninglists(
+        self,
+        enabled: bool,
+        ids: Optional[Sequence[Union[int, str]]] = None,
+        names: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """``POST /warninglists/toggleEnable``."""
+        body = request_body(
+            {
+                "id": [str(id_) for id_ in ids] if ids is not None else None,
+                "name": list(names) if names is not None else None,
+                "enabled": enabled,
+            }
+        )
+        return self._call(
+            "toggleEnableWarninglist", "POST", "/warninglists/toggleEnable", body
+        )
+
+    def check_value(self, values: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """``POST /warninglists/checkValue``.
+
+        Maps each value hitting a warninglist to the ``id`` and ``name`` of
+        the lists it hits; values without hits are left out.
+        """
+        payload = self._call(
+            "checkValueWarninglistsMatches",
+            "POST",
+            "/warninglists/checkValue",
+            list(values),
+        )
+        # MISP answers an empty PHP array, i.e. [], when nothing matches.
+        return payload or {}
+
+    def update_warninglists(self) -> Dict[str, Any]:
+        """``POST /warninglists/update``."""
+        return self._call("updateWarninglists", "POST", "/warninglists/update")
+
+    # Transport
+
+    def _cached(
+        self, endpoint: str, body: Dict[str, Any], annotation: Any, load
+    ) -> Any:
+        if self.cache is None:
+            return load()
+        return self.cache.fetch(
+            endpoint, body, annotation, load, namespace=self._cache_namespace
+        )
+
+    def _call(self, endpoint: str, method: str, path: str, body: Any = None) -> Any:
+        """Send a request and return its decoded JSON body."""
+        return self._send(endpoint, method, path, body).json()
+
+    def _send(
+        self,
+        endpoint: str,
+        method: str,
+        path: str,
+        body: Any = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.request(
+                method,
+                self.url + path,
+                json=body,
+                timeout=self.timeout,
+                stream=stream,
+            )
+            if response.status_code >= 400:
+                error = _api_error(endpoint, response)
+                response.close()
+                raise error
+            if not stream:
+                # Read the whole body within the timing.
+                response.content
+            ok = True
+            return response
+        finally:
+            self.metrics.record(endpoint, time.perf_counter() - started, ok)
+
+
+def request_body(value: Filters) -> Dict[str, Any]:
+    """JSON-ready request body, without the fields left unset."""
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json", by_alias=True, exclude_none=True)
+    # exclude_none keeps root models wrapping None, such as an unset MispID.
+    return {name: item for name, item in value.items() if item is not None}
+
+
+def _search_model(model: Type[T], body: Mapping[str, Any]) -> Type[T]:
+    fields = body.get("requested_attributes")
+    return projected_model(model, fields) if fields else model
+
+
+def _navigate(payload: Any, path: Sequence[str]) -> Any:
+    """Walk ``path`` like :class:`RestSearchStream` does, ``[]`` if absent."""
+    for key in path:
+        if isinstance(payload, list):
+            # ``{"response": []}`` for an empty attribute search.
+            return payload
+        if not isinstance(payload, dict) or key not in payload:
+            return []
+        payload = payload[key]
+    return payload if payload is not None else []
+
+
+def _count(response: requests.Response) -> int:
+    """Result count of a ``returnFormat`` ``count`` search."""
+    payload = response.json()
+    if isinstance(payload, dict):
+        payload = payload.get("response", payload)
+    if isinstance(payload, dict) and "count" in payload:
+        return int(payload["count"])
+    header = response.headers.get("X-Result-Count")
+    if header is not None:
+        return int(header)
+    raise ValueError(f"no result count in {response.text[:200]!r}")
+
+
+@functools.lru_cache(maxsize=None)
+def _adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(annotation)
+
+
+def _decode(annotation: Any, payload: Any) -> Any:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation.model_validate(payload)
+    return _adapter(annotation).validate_python(payload)
+
+
+def _api_error(endpoint: str, response: requests.Response) -> MispApiError:
+    error = None
+    try:
+        error = ApiError.model_validate(response.json())
+    except (ValueError, ValidationError):
+        pass
+    return MispApiError(response.status_code, endpoint, error, response.text)
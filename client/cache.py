@@ -0,0 +1,341 @@
+"""Cache of ``restSearch`` results keyed by a canonical filter fingerprint.
+
+Two filters asking the same question should hit the same entry however they
+were spelled: :func:`fingerprint` hashes them in the canonical form of
+:func:`models.filters.canonical_filters`, which drops unset fields, uses the
+wire names of aliased fields (``from_`` is sent as ``from``) and sorts the
+filters whose order carries no meaning.
+
+Relative time filters (``last=5d``, ``timestamp=12h``, ...) read the same
+but select a moving window. An entry for such a filter lives at most
+``relative_fraction`` of its shortest window (an hour-long window is cached
+for 36 seconds at 1%) and never more than ``ttl``.
+
+MISP answers a search with what the caller may see, so
+:class:`~client.api.MispClient` files its entries under the
+:func:`namespace` of its server and API key: a cache, or its directory,
+shared by several clients never hands one user's results to another. On
+disk each namespace is a subdirectory.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Mapping, Optional, Tuple, TypeVar
+
+from pydantic import TypeAdapter
+
+from models.filters import as_list, canonical_filters
+
+T = TypeVar("T")
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 256 * 2**20
+DEFAULT_RELATIVE_FRACTION = 0.01
+
+#: Filters that accept a time relative to now.
+TIME_FILTERS = frozenset(
+    {
+        "from",
+        "to",
+        "date",
+        "last",
+        "timestamp",
+        "publish_timestamp",
+        "event_timestamp",
+        "attribute_timestamp",
+        "first_seen",
+        "last_seen",
+    }
+)
+
+_RELATIVE_TIME = re.compile(r"^\s*(\d+)\s*([smhdw])\s*$", re.IGNORECASE)
+_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def fingerprint(endpoint: str, filters: Any) -> str:
+    """Stable hash of ``endpoint`` and the canonical form of ``filters``."""
+    document = json.dumps(
+        [endpoint, canonical_filters(filters)],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(document.encode()).hexdigest()
+
+
+def namespace(url: str, key: str) -> str:
+    """Name of the entries cached for the holder of ``key`` on ``url``."""
+    # The key itself is never written down, not even in a file name.
+    auth = hashlib.sha256(key.encode()).hexdigest()
+    scope = f"{url.rstrip('/')}|{auth}"
+    return hashlib.sha256(scope.encode()).hexdigest()[:32]
+
+
+def relative_window(filters: Mapping[str, Any]) -> Optional[float]:
+    """Shortest relative time window in canonical ``filters``, in seconds."""
+    windows = [
+        _SECONDS[match.group(2).lower()] * int(match.group(1))
+        for name in TIME_FILTERS.intersection(filters)
+        for value in as_list(filters[name])
+        for match in [_RELATIVE_TIME.match(str(value))]
+        if match
+    ]
+    return min(windows) if windows else None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    #: Length of the JSON encoding, which is not kept.
+    size: int
+    expires: float
+
+
+class RestSearchCache:
+    """LRU of search results with a TTL, in memory and optionally on disk.
+
+    The memory tier holds at most ``max_entries`` results and ``max_bytes``
+    of their JSON encoding, evicting the least recently used first. With a
+    ``directory``, results are also written there and outlive the process;
+    a memory miss then falls back to the directory, which is bounded by
+    ``disk_max_bytes``. Memory hits return the cached object itself, so
+    results must be treated as read-only. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        directory: Optional[str] = None,
+        disk_max_bytes: int = 4 * DEFAULT_MAX_BYTES,
+        relative_fraction: float = DEFAULT_RELATIVE_FRACTION,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.relative_fraction = relative_fraction
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        #: Files of the disk tier: key -> (size, expires), oldest first.
+        self._files: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_directory()
+
+    def fetch(
+        self,
+        endpoint: str,
+        filters: Any,
+        annotation: Any,
+        load: Callable[[], T],
+        namespace: str = "",
+    ) -> T:
+        """The cached result of the search, or ``load()``'s, now cached.
+
+        ``annotation`` is the type of the result (a model class, or e.g.
+        ``List[Model]``), used to store it on disk and read it back.
+        Entries of different ``namespace`` values are never shared.
+        """
+        canonical = canonical_filters(filters)
+        key = fingerprint(endpoint, canonical)
+        if namespace:
+            key = f"{namespace}/{key}"
+        value = self.get(key, annotation)
+        if value is not None:
+            return value
+        value = load()
+        self.put(key, value, annotation, self._ttl_for(canonical))
+        return value
+
+    def get(self, key: str, annotation: Any) -> Any:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > now:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    self.stats.memory_hits += 1
+                    return entry.value
+                self._drop(key)
+                self.stats.expirations += 1
+        value = self._read_file(key, annotation, now, counted=entry is not None)
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self.stats.disk_hits += 1
+        return value
+
+    def put(
+        self, key: str, value: Any, annotation: Any, ttl: Optional[float] = None
+    ) -> None:
+        data = _adapter(annotation).dump_json(value, by_alias=True)
+        expires = self.clock() + (self.ttl if ttl is None else ttl)
+        self._remember(key, _Entry(value, len(data), expires))
+        if self.directory is not None:
+            self._write_file(key, data, expires)
+
+    def invalidate(self) -> None:
+        """Forget every entry, on disk too."""
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+            files = list(self._files)
+            self._files.clear()
+        for key in files:
+            self._remove_file(key)
+
+    def _ttl_for(self, canonical: Mapping[str, Any]) -> float:
+        window = relative_window(canonical)
+        if window is None:
+            return self.ttl
+        return min(self.ttl, window * self.relative_fraction)
+
+    def _remember(self, key: str, entry: _Entry) -> None:
+        """Add ``entry`` to the memory tier, evicting to make room."""
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.stats.entries += 1
+            self.stats.bytes += entry.size
+            while (
+                len(self._entries) > self.max_entries
+                or self.stats.bytes > self.max_bytes
+            ):
+                self._drop(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self.stats.entries -= 1
+        self.stats.bytes -= entry.size
+
+    # Disk tier: one ``<key>.json`` file per entry, prefixed by a line
+    # holding its expiry time, in the subdirectory of its namespace.
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, *key.split("/")) + ".json"
+
+    def _scan_directory(self) -> None:
+        files = []
+        for key in _stored_keys(self.directory):
+            path = self._path(key)
+            try:
+                with open(path, "rb") as file:
+                    expires = float(file.readline())
+                files.append(
+                    (os.path.getmtime(path), key, os.path.getsize(path), expires)
+                )
+            except (OSError, ValueError):
+                continue
+        for _, key, size, expires in sorted(files):
+            self._files[key] = (size, expires)
+
+    def _read_file(
+        self, key: str, annotation: Any, now: float, counted: bool = False
+    ) -> Any:
+        if self.directory is None:
+            return None
+        with self._lock:
+            known = self._files.get(key)
+        if known is None:
+            return None
+        if known[1] <= now:
+            with self._lock:
+                self._files.pop(key, None)
+                if not counted:
+                    self.stats.expirations += 1
+            self._remove_file(key)
+            return None
+        try:
+            with open(self._path(key), "rb") as file:
+                expires = float(file.readline())
+                data = file.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self._files.pop(key, None)
+            return None
+        value = _adapter(annotation).validate_json(data)
+        self._remember(key, _Entry(value, len(data), expires))
+        return value
+
+    def _write_file(self, key: str, data: bytes, expires: float) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(f"{expires}\n".encode())
+            file.write(data)
+        os.replace(temporary, path)
+        size = len(data)
+        evicted = []
+        with self._lock:
+            self._files.pop(key, None)
+            self._files[key] = (size, expires)
+            total = sum(size for size, _ in self._files.values())
+            while total > self.disk_max_bytes and len(self._files) > 1:
+                old, (old_size, _) = self._files.popitem(last=False)
+                total -= old_size
+                evicted.append(old)
+        for old in evicted:
+            self._remove_file(old)
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+def _stored_keys(directory: str) -> Iterator[str]:
+    """Keys of the ``.json`` files in ``directory`` and its namespaces."""
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".json"):
+            yield name[:-5]
+        elif os.path.isdir(path):
+            for inner in os.listdir(path):
+                if inner.endswith(".json"):
+                    yield f"{name}/{inner[:-5]}"
+
+
+@functools.lru_cache(maxsize=None)
+def _adapter(annotation: Any) -> TypeAdapter:
+    return TypeAdapter(annotation)
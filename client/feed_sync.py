@@ -0,0 +1,349 @@
+"""Incremental fetching of MISP-format feeds.
+
+A MISP-format feed is a ``manifest.json`` mapping event uuids to a summary
+of each event (``timestamp`` included), a ``hashes.csv`` of value hashes,
+and one ``<uuid>.json`` file per event. :class:`FeedSync` keeps a copy of
+the feed in a :class:`FeedCache` directory and on each run:
+
+* fetches ``manifest.json`` and ``hashes.csv`` with conditional requests,
+  so unchanged files are not sent again;
+* diffs the manifest against the cached one by uuid and ``timestamp``;
+* downloads the new and changed event files only, several at a time;
+* with the feed's ``delta_merge``, drops the events gone from the manifest
+  and reports which attributes each changed event gained and lost.
+
+The cached manifest only lists the events whose files were stored, and the
+validators of the remote manifest are only kept after a complete run, so a
+run that fails half-way is picked up by the next one. Manifest keys name
+files, here and on the server: a key that is not a uuid is reported as
+failed and skipped, never let out of the feed directory. The cache directory
+is itself a local MISP-format feed, which :class:`~client.feeds.FeedIngestor`
+can read. A feed with a local path for ``url`` is read from that
+directory, for offline use and tests.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import requests
+
+from client.feeds import MANIFEST, feed_path, is_event_uuid, parse_headers
+from models.feeds import FeedNoId
+from models.server import FeedInputSource
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 60.0
+HASHES = "hashes.csv"
+#: Validators (ETag, Last-Modified) of the remote files, per file name.
+STATE = "state.json"
+
+Manifest = Dict[str, Dict[str, Any]]
+
+
+class FeedCache:
+    """Local copy of a MISP-format feed, laid out as the feed itself.
+
+    Files are replaced atomically. The cache is used from the thread that
+    created it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def manifest(self) -> Manifest:
+        data = self._read(MANIFEST)
+        return json.loads(data) if data else {}
+
+    def set_manifest(self, manifest: Manifest) -> None:
+        self._write(MANIFEST, json.dumps(manifest, sort_keys=True).encode())
+
+    def validators(self, name: str) -> Dict[str, str]:
+        data = self._read(STATE)
+        return (json.loads(data) if data else {}).get(name, {})
+
+    def set_validators(self, name: str, validators: Dict[str, str]) -> None:
+        data = self._read(STATE)
+        state = json.loads(data) if data else {}
+        state[name] = validators
+        self._write(STATE, json.dumps(state, sort_keys=True).encode())
+
+    def event(self, uuid: str) -> Optional[bytes]:
+        return self._read(_event_file(uuid))
+
+    def put_event(self, uuid: str, data: bytes) -> None:
+        self._write(_event_file(uuid), data)
+
+    def delete_event(self, uuid: str) -> None:
+        try:
+            os.remove(os.path.join(self.path, _event_file(uuid)))
+        except FileNotFoundError:
+            pass
+
+    def hashes(self) -> Iterator[Tuple[str, str]]:
+        """``(value hash, event uuid)`` pairs of the cached ``hashes.csv``."""
+        try:
+            file = open(os.path.join(self.path, HASHES), encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with file:
+            for line in file:
+                digest, _, uuid = line.strip().partition(",")
+                if uuid:
+                    yield digest, uuid
+
+    def put_hashes(self, data: bytes) -> None:
+        self._write(HASHES, data)
+
+    def _read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.path, name), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.path, name)
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+
+
+@dataclass
+class EventDelta:
+    """Attribute uuids an event gained and lost in one run."""
+
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FeedSyncReport:
+    """Outcome of one :meth:`FeedSync.run`."""
+
+    url: str
+    listed: int = 0
+    new: int = 0
+    changed: int = 0
+    fetched: int = 0
+    removed: int = 0
+    #: The manifest had not changed since the last complete run.
+    not_modified: bool = False
+    bytes_downloaded: int = 0
+    #: Attribute changes of the fetched events, with ``delta_merge``.
+    deltas: Dict[str, EventDelta] = field(default_factory=dict)
+    failed: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed
+
+
+class FeedSync:
+    """Bring ``cache`` up to date with a MISP-format ``feed``.
+
+    ``url`` overrides the feed's own. ``delta_merge`` defaults to the
+    feed's setting.
+    """
+
+    def __init__(
+        self,
+        feed: FeedNoId,
+        cache: Union[FeedCache, str],
+        *,
+        url: Optional[str] = None,
+        delta_merge: Optional[bool] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        session: Optional[requests.Session] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.feed = feed
+        self.cache = cache if isinstance(cache, FeedCache) else FeedCache(cache)
+        self.url = url or feed.url
+        if not self.url:
+            raise ValueError("feed has no url")
+        self.local = (
+            getattr(feed.input_source, "value", feed.input_source)
+            == FeedInputSource.LOCAL.value
+            or "://" not in self.url
+        )
+        self.delta_merge = bool(
+            feed.delta_merge if delta_merge is None else delta_merge
+        )
+        self.concurrency = concurrency
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.headers = parse_headers(feed.headers)
+
+    def run(self) -> FeedSyncReport:
+        started = time.perf_counter()
+        report = FeedSyncReport(self.url)
+        validators = self.cache.validators(MANIFEST)
+        data, fresh = self._get(MANIFEST, validators, report)
+        if data is None:
+            report.not_modified = True
+            report.elapsed = time.perf_counter() - started
+            return report
+        remote: Manifest = json.loads(data)
+        for key in [key for key in remote if not is_event_uuid(key)]:
+            report.failed[key] = "manifest key is not an event uuid"
+            del remote[key]
+        report.listed = len(remote)
+
+        cached = {
+            key: summary
+            for key, summary in self.cache.manifest().items()
+            if is_event_uuid(key)
+        }
+        new, changed, revoked = self.diff(remote, cached)
+        report.new, report.changed = len(new), len(changed)
+        self._fetch(new + changed, remote, cached, report)
+        if self.delta_merge:
+            for uuid in revoked:
+                self.cache.delete_event(uuid)
+                del cached[uuid]
+            report.removed = len(revoked)
+        self.cache.set_manifest(cached)
+
+        try:
+            hashes, fresh_hashes = self._get(
+                HASHES, self.cache.validators(HASHES), report
+            )
+        except FileNotFoundError:
+            # Not every feed publishes one.
+            hashes = None
+        if hashes is not None:
+            self.cache.put_hashes(hashes)
+            self.cache.set_validators(HASHES, fresh_hashes)
+        if report.complete:
+            self.cache.set_validators(MANIFEST, fresh)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def diff(
+        self, remote: Manifest, cached: Manifest
+    ) -> Tuple[List[str], List[str], List[str]]:
+        """New, changed and revoked event uuids of ``remote``."""
+        new = [uuid for uuid in remote if uuid not in cached]
+        changed = [
+            uuid
+            for uuid, summary in remote.items()
+            if uuid in cached and _timestamp(summary) != _timestamp(cached[uuid])
+        ]
+        revoked = [uuid for uuid in cached if uuid not in remote]
+        return new, changed, revoked
+
+    def _fetch(
+        self,
+        uuids: List[str],
+        remote: Manifest,
+        cached: Manifest,
+        report: FeedSyncReport,
+    ) -> None:
+        """Download and store ``uuids``, at most ``concurrency`` at a time."""
+        pending: Dict[Future, str] = {}
+        queue = iter(uuids)
+        with ThreadPoolExecutor(
+            self.concurrency, thread_name_prefix="misp-feed"
+        ) as executor:
+            while True:
+                for uuid in queue:
+                    future = executor.submit(self._download, _event_file(uuid))
+                    pending[future] = uuid
+                    if len(pending) >= 2 * self.concurrency:
+                        break
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    uuid = pending.pop(future)
+                    try:
+                        data = future.result()
+                        attributes = _attribute_uuids(data, uuid)
+                    except Exception as error:
+                        report.failed[uuid] = str(error)
+                        continue
+                    report.bytes_downloaded += len(data)
+                    if self.delta_merge:
+                        previous = self.cache.event(uuid)
+                        before = _attribute_uuids(previous, uuid) if previous else set()
+                        report.deltas[uuid] = EventDelta(
+                            sorted(attributes - before), sorted(before - attributes)
+                        )
+                    # Written from this thread only, the manifest last.
+                    self.cache.put_event(uuid, data)
+                    cached[uuid] = remote[uuid]
+                    report.fetched += 1
+
+    def _get(
+        self, name: str, validators: Dict[str, str], report: FeedSyncReport
+    ) -> Tuple[Optional[bytes], Dict[str, str]]:
+        """``name`` and its validators; ``None`` if they still match."""
+        if self.local:
+            path = feed_path(self.url, name)
+            stat = os.stat(path)
+            fresh = {"Last-Modified": f"{stat.st_mtime_ns}:{stat.st_size}"}
+            if fresh == validators:
+                return None, fresh
+            with open(path, "rb") as file:
+                data = file.read()
+            report.bytes_downloaded += len(data)
+            return data, fresh
+        headers = dict(self.headers)
+        if "ETag" in validators:
+            headers["If-None-Match"] = validators["ETag"]
+        if "Last-Modified" in validators:
+            headers["If-Modified-Since"] = validators["Last-Modified"]
+        response = self.session.get(
+            feed_path(self.url, name), headers=headers, timeout=self.timeout
+        )
+        if response.status_code == 304:
+            return None, validators
+        if response.status_code == 404:
+            raise FileNotFoundError(name)
+        response.raise_for_status()
+        report.bytes_downloaded += len(response.content)
+        fresh = {
+            key: response.headers[key]
+            for key in ("ETag", "Last-Modified")
+            if key in response.headers
+        }
+        return response.content, fresh
+
+    def _download(self, name: str) -> bytes:
+        if self.local:
+            with open(feed_path(self.url, name), "rb") as file:
+                return file.read()
+        response = self.session.get(
+            feed_path(self.url, name), headers=self.headers, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.content
+
+
+def _event_file(uuid: str) -> str:
+    if not is_event_uuid(uuid):
+        raise ValueError(f"{uuid!r} is not an event uuid")
+    return f"{uuid}.json"
+
+
+def _timestamp(summary: Dict[str, Any]) -> int:
+    return int(summary.get("timestamp") or 0)
+
+
+def _attribute_uuids(data: bytes, uuid: str) -> Set[str]:
+    """Attribute uuids of an event file, checked to hold event ``uuid``."""
+    event = json.loads(data)
+    event = event.get("Event", event)
+    if event.get("uuid") != uuid:
+        raise ValueError(f"event file {uuid}.json holds event {event.get('uuid')}")
+    attributes = list(event.get("Attribute") or ())
+    for item in event.get("Object") or ():
+        attributes.extend(item.get("Attribute") or ())
+    return {attribute["uuid"] for attribute in attributes if "uuid" in attribute}
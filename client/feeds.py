@@ -0,0 +1,479 @@
+"""Streaming ingestion of CSV, freetext and MISP-format feeds.
+
+A feed (:class:`~models.feeds.FeedNoId`) is read as a stream of bytes from
+a local path or over HTTP, as its ``input_source`` says, and cut into
+chunks: CSV and freetext feeds at line boundaries every ``chunk_size``
+bytes, MISP-format feeds one event file at a time. A process pool parses
+the chunks under the feed's compiled ``settings`` (value columns,
+delimiter, ``excluderegex``, correlation and IDS overrides) into plain
+rows, which pickle back far faster than models do, and the rows are
+validated into :class:`~models.attributes.AttributeNoId` batches in the
+calling process. A row the model rejects, such as one of a type newer
+than it knows, is counted in ``stats.invalid`` and left out of its batch
+rather than failing the ingest.
+
+At most two chunks per worker are in flight and batches are handed out as
+they fill, so memory stays flat however large the feed is.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import re
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+)
+
+import requests
+from pydantic import TypeAdapter, ValidationError
+
+from analytics.freetext import Ioc, IocExtractor
+from models.attributes import AttributeNoId
+from models.feeds import FeedNoId
+from models.server import FeedInputSource, FeedSourceFormat
+from models.unknown import DescribeAttributeTypesResponse
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_TIMEOUT = 60.0
+#: Index of the event files of a MISP-format feed.
+MANIFEST = "manifest.json"
+
+_ATTRIBUTES = TypeAdapter(List[AttributeNoId])
+_ATTRIBUTE = TypeAdapter(AttributeNoId)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+#: ``preg`` modifiers with a Python equivalent.
+_REGEX_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+#: Attribute fields kept from the events of a MISP-format feed.
+_MISP_FIELDS = (
+    "uuid",
+    "type",
+    "category",
+    "value",
+    "to_ids",
+    "comment",
+    "timestamp",
+    "object_relation",
+    "first_seen",
+    "last_seen",
+)
+
+
+def compile_exclude(pattern: Optional[str]) -> Optional[Pattern[str]]:
+    """Compile an ``excluderegex`` setting.
+
+    MISP stores it as a PHP ``preg`` pattern, delimiters and modifiers
+    included (``/^10\\./i``); a bare pattern is taken as it is.
+    """
+    if not pattern:
+        return None
+    flags = 0
+    delimiter = pattern[0]
+    end = pattern.rfind(delimiter)
+    if not delimiter.isalnum() and delimiter != "\\" and end > 0:
+        modifiers = pattern[end + 1 :]
+        if all(modifier in _REGEX_FLAGS for modifier in modifiers):
+            for modifier in modifiers:
+                flags |= _REGEX_FLAGS[modifier]
+            pattern = pattern[1:end]
+    try:
+        return re.compile(pattern, flags)
+    except re.error as exc:
+        raise ValueError(f"invalid excluderegex {pattern!r}: {exc}") from None
+
+
+@dataclass(frozen=True)
+class FeedSettings:
+    """What a feed's ``settings`` and flags say about parsing it.
+
+    Instances are sent to the workers with every chunk, so they hold only
+    plain values and a compiled pattern.
+    """
+
+    source_format: str = FeedSourceFormat.FREETEXT.value
+    #: Zero-based CSV columns holding values.
+    value_columns: Tuple[int, ...] = (0,)
+    delimiter: str = ","
+    exclude: Optional[Pattern[str]] = None
+    #: Forced IDS flag, ``None`` to keep the per-type default.
+    to_ids: Optional[bool] = None
+    disable_correlation: bool = False
+    distribution: Optional[str] = None
+    sharing_group_id: Optional[str] = None
+    event_id: Optional[str] = None
+
+    @classmethod
+    def from_feed(cls, feed: FeedNoId) -> FeedSettings:
+        try:
+            settings = json.loads(feed.settings) if feed.settings else {}
+        except ValueError as exc:
+            raise ValueError(f"feed settings are not JSON: {exc}") from None
+        settings = settings or {}
+        csv_settings = settings.get("csv") or {}
+        columns = str(csv_settings.get("value") or "1")
+        try:
+            value_columns = tuple(
+                int(column) - 1 for column in columns.split(",") if column.strip()
+            )
+        except ValueError:
+            raise ValueError(f"invalid CSV value columns {columns!r}") from None
+        if any(column < 0 for column in value_columns):
+            raise ValueError(f"CSV value columns count from 1, got {columns!r}")
+        to_ids = None
+        if feed.override_ids:
+            to_ids = False
+        elif feed.force_to_ids:
+            to_ids = True
+        source_format = getattr(feed.source_format, "value", feed.source_format)
+        return cls(
+            source_format=source_format or FeedSourceFormat.FREETEXT.value,
+            value_columns=value_columns or (0,),
+            delimiter=csv_settings.get("delimiter") or ",",
+            exclude=compile_exclude((settings.get("common") or {}).get("excluderegex")),
+            to_ids=to_ids,
+            disable_correlation=str(settings.get("disable_correlation", "0"))
+            in ("1", "true", "True"),
+            distribution=getattr(feed.distribution, "value", feed.distribution),
+            sharing_group_id=feed.sharing_group_id or None,
+            event_id=getattr(feed.event_id, "root", feed.event_id) or None,
+        )
+
+
+@dataclass
+class IngestStats:
+    """Throughput counters of a :class:`FeedIngestor`."""
+
+    chunks: int = 0
+    bytes_read: int = 0
+    attributes: int = 0
+    #: Values dropped by ``excluderegex``.
+    excluded: int = 0
+    #: Values of no recognisable attribute type.
+    unknown: int = 0
+    #: Rows the attribute model rejected, and manifest keys not event uuids.
+    invalid: int = 0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def attributes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.attributes / elapsed if elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes_read / elapsed if elapsed else 0.0
+
+
+@dataclass
+class _Parsed:
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    excluded: int = 0
+    unknown: int = 0
+
+
+class FeedIngestor:
+    """Parse a feed into batches of :class:`AttributeNoId`.
+
+    ``workers`` processes parse the chunks, ``os.cpu_count()`` by default;
+    with ``workers=0`` the calling process does. ``url`` overrides the
+    feed's own, e.g. to read a downloaded copy. CSV and freetext values are
+    typed by an :class:`~analytics.freetext.IocExtractor` over ``describe``,
+    the server's ``describeTypes``. :attr:`stats` counts what was read as
+    it is.
+    """
+
+    def __init__(
+        self,
+        feed: FeedNoId,
+        *,
+        url: Optional[str] = None,
+        workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        session: Optional[requests.Session] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        describe: Optional[DescribeAttributeTypesResponse] = None,
+    ):
+        self.feed = feed
+        self.settings = FeedSettings.from_feed(feed)
+        self.extractor = IocExtractor(describe)
+        self.url = url or feed.url
+        if not self.url:
+            raise ValueError("feed has no url")
+        self.local = (
+            getattr(feed.input_source, "value", feed.input_source)
+            == FeedInputSource.LOCAL.value
+            or "://" not in self.url
+        )
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.session = session
+        self.timeout = timeout
+        self.headers = parse_headers(feed.headers)
+        self.stats = IngestStats()
+
+    def __iter__(self) -> Iterator[AttributeNoId]:
+        for batch in self.batches():
+            yield from batch
+
+    def batches(self) -> Iterator[List[AttributeNoId]]:
+        """Validated attributes, ``batch_size`` at a time, in feed order."""
+        self.stats = IngestStats(started=time.perf_counter())
+        rows: List[Dict[str, Any]] = []
+        for parsed in self._parsed():
+            self.stats.excluded += parsed.excluded
+            self.stats.unknown += parsed.unknown
+            rows.extend(parsed.rows)
+            while len(rows) >= self.batch_size:
+                yield self._batch(rows[: self.batch_size])
+                del rows[: self.batch_size]
+        if rows:
+            yield self._batch(rows)
+        self.stats.finished = time.perf_counter()
+
+    def _batch(self, rows: List[Dict[str, Any]]) -> List[AttributeNoId]:
+        try:
+            batch = _ATTRIBUTES.validate_python(rows)
+        except ValidationError:
+            # Rare; find the bad rows one by one and keep the others.
+            batch = []
+            for row in rows:
+                try:
+                    batch.append(_ATTRIBUTE.validate_python(row))
+                except ValidationError:
+                    self.stats.invalid += 1
+        self.stats.attributes += len(batch)
+        return batch
+
+    def _parsed(self) -> Iterator[_Parsed]:
+        if self.workers == 0:
+            for chunk in self._chunks():
+                yield _parse(self.settings, self.extractor, chunk)
+            return
+        with ProcessPoolExecutor(self.workers) as pool:
+            yield from _ordered(
+                pool, self.settings, self.extractor, self._chunks(), 2 * self.workers
+            )
+
+    def _chunks(self) -> Iterator[bytes]:
+        if self.settings.source_format == FeedSourceFormat.MISP.value:
+            chunks = self._event_files()
+        else:
+            chunks = _line_chunks(self._read(self.url), self.chunk_size)
+        for chunk in chunks:
+            self.stats.chunks += 1
+            yield chunk
+
+    def _event_files(self) -> Iterator[bytes]:
+        manifest = json.loads(b"".join(self._read(feed_path(self.url, MANIFEST))))
+        for event_uuid in manifest:
+            if not is_event_uuid(event_uuid):
+                self.stats.invalid += 1
+                continue
+            yield b"".join(self._read(feed_path(self.url, f"{event_uuid}.json")))
+
+    def _read(self, location: str) -> Iterator[bytes]:
+        """The bytes at ``location``, in blocks of at most ``chunk_size``."""
+        if self.local:
+            with open(location, "rb") as file:
+                while True:
+                    block = file.read(self.chunk_size)
+                    if not block:
+                        return
+                    self.stats.bytes_read += len(block)
+                    yield block
+        session = self.session or requests
+        with session.get(
+            location, headers=self.headers, stream=True, timeout=self.timeout
+        ) as response:
+            response.raise_for_status()
+            for block in response.iter_content(self.chunk_size):
+                self.stats.bytes_read += len(block)
+                yield block
+
+
+def _ordered(
+    pool: Executor,
+    settings: FeedSettings,
+    extractor: IocExtractor,
+    chunks: Iterable[bytes],
+    limit: int,
+) -> Iterator[_Parsed]:
+    """Parse ``chunks`` on ``pool``, at most ``limit`` at once, in order."""
+    pending: Deque[Future] = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(_parse, settings, extractor, chunk))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _line_chunks(blocks: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    """Regroup ``blocks`` into chunks of about ``chunk_size`` whole lines."""
+    buffer = bytearray()
+    for block in blocks:
+        buffer += block
+        if len(buffer) >= chunk_size:
+            end = buffer.rfind(b"\n") + 1
+            if end:
+                yield bytes(buffer[:end])
+                del buffer[:end]
+    if buffer:
+        yield bytes(buffer)
+
+
+def feed_path(base: str, name: str) -> str:
+    """The URL or path of file ``name`` in the feed at ``base``."""
+    if "://" in base:
+        return base.rstrip("/") + "/" + name
+    return os.path.join(base, name)
+
+
+def is_event_uuid(key: str) -> bool:
+    """Whether manifest ``key`` is a uuid, safe to name an event file by."""
+    try:
+        uuid.UUID(key)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def parse_headers(headers: Optional[str]) -> Dict[str, str]:
+    """The ``headers`` setting of a feed, one ``Name: value`` per line."""
+    parsed = {}
+    for line in (headers or "").splitlines():
+        name, separator, value = line.partition(":")
+        if separator and name.strip():
+            parsed[name.strip()] = value.strip()
+    return parsed
+
+
+# Parsing, run in the workers.
+
+
+def _parse(settings: FeedSettings, extractor: IocExtractor, chunk: bytes) -> _Parsed:
+    if settings.source_format == FeedSourceFormat.MISP.value:
+        return _parse_event(settings, chunk)
+    text = chunk.decode("utf-8", errors="replace")
+    parsed = _Parsed()
+    if settings.source_format == FeedSourceFormat.CSV.value:
+        found: List[Ioc] = []
+        for value in _csv_values(settings, text):
+            ioc = extractor.classify(value)
+            if ioc is None:
+                parsed.unknown += 1
+            else:
+                found.append(ioc)
+    else:
+        found = extractor.extract(
+            "\n".join(line for line in text.splitlines() if not line.startswith("#"))
+        )
+    for ioc in found:
+        if settings.exclude is not None and settings.exclude.search(ioc.value):
+            parsed.excluded += 1
+            continue
+        parsed.rows.append(
+            _row(
+                settings,
+                {
+                    "type": ioc.type,
+                    "category": ioc.category,
+                    "value": ioc.value,
+                    "to_ids": ioc.to_ids,
+                },
+            )
+        )
+    return parsed
+
+
+def _csv_values(settings: FeedSettings, text: str) -> Iterator[str]:
+    lines = (line for line in text.splitlines() if line and not line.startswith("#"))
+    for record in csv.reader(lines, delimiter=settings.delimiter):
+        for column in settings.value_columns:
+            if column < len(record):
+                value = record[column].strip()
+                if value:
+                    yield value
+
+
+def _parse_event(settings: FeedSettings, chunk: bytes) -> _Parsed:
+    event = json.loads(chunk)
+    event = event.get("Event", event)
+    attributes: List[Dict[str, Any]] = list(event.get("Attribute") or ())
+    for item in event.get("Object") or ():
+        if not item.get("deleted"):
+            attributes.extend(item.get("Attribute") or ())
+    parsed = _Parsed()
+    for attribute in attributes:
+        if attribute.get("deleted"):
+            continue
+        value = attribute.get("value")
+        if settings.exclude is not None and settings.exclude.search(value or ""):
+            parsed.excluded += 1
+            continue
+        fields = {name: attribute[name] for name in _MISP_FIELDS if name in attribute}
+        for name in ("first_seen", "last_seen"):
+            if fields.get(name) is not None:
+                fields[name] = _microseconds(fields[name])
+        parsed.rows.append(_row(settings, fields))
+    return parsed
+
+
+def _microseconds(value: Any) -> Any:
+    """``first_seen``/``last_seen`` as the model's microsecond digits.
+
+    MISP's JSON export writes them as ISO 8601 times; a value that is
+    neither is returned as it is, for validation to reject.
+    """
+    if isinstance(value, int):
+        return str(value)
+    if not isinstance(value, str) or not value or value.isdigit():
+        return value
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return str((moment - _EPOCH) // timedelta(microseconds=1))
+
+
+def _row(settings: FeedSettings, fields: Dict[str, Any]) -> Dict[str, Any]:
+    row = {
+        "event_id": settings.event_id,
+        "object_id": "0",
+        "uuid": str(uuid.uuid4()),
+        "distribution": settings.distribution,
+        "sharing_group_id": settings.sharing_group_id,
+        "disable_correlation": settings.disable_correlation,
+        **fields,
+    }
+    if settings.to_ids is not None:
+        row["to_ids"] = settings.to_ids
+    return row
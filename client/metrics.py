@@ -0,0 +1,103 @@
+"""Per-endpoint latency metrics shared by the API clients."""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, Optional
+
+#: Latencies kept per endpoint for the percentiles.
+DEFAULT_WINDOW = 1024
+
+
+@dataclass
+class EndpointStats:
+    """Latency counters of one endpoint, in seconds.
+
+    ``count``, ``errors`` and the totals cover every call; the percentiles
+    only cover the most recent ``window`` calls.
+    """
+
+    count: int = 0
+    errors: int = 0
+    total: float = 0.0
+    min: Optional[float] = None
+    max: Optional[float] = None
+    window: int = DEFAULT_WINDOW
+    recent: Deque[float] = field(default_factory=deque, repr=False)
+
+    def add(self, seconds: float, ok: bool = True) -> None:
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.recent.append(seconds)
+        if len(self.recent) > self.window:
+            self.recent.popleft()
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile, ``q`` between 0 and 100."""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.mean,
+            "min": self.min or 0.0,
+            "max": self.max or 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class LatencyMetrics:
+    """Thread-safe :class:`EndpointStats` per endpoint name.
+
+    Clients record one sample per call under the ``operationId`` of the
+    endpoint in ``misp-openapi.yaml`` (``restSearchAttributes``,
+    ``getEventById``, ...).
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats(window=self.window)
+            stats.add(seconds, ok)
+
+    def __getitem__(self, endpoint: str) -> EndpointStats:
+        return self._stats[endpoint]
+
+    def __contains__(self, endpoint: str) -> bool:
+        return endpoint in self._stats
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(sorted(self._stats))
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """``summary()`` of every endpoint called so far."""
+        with self._lock:
+            return {
+                name: stats.summary() for name, stats in sorted(self._stats.items())
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,461 @@
+"""Normalized SQLite mirror of events, attributes, tags, sightings and clusters.
+
+:class:`SyncStore` keeps each event as one JSON document, which is all a
+sync needs. :class:`MirrorStore` splits them into one table per record
+kind (``org``, ``event``, ``object``, ``attribute``, ``tag``, ``event_tag``,
+``sighting`` and ``galaxy_cluster``) with the model fields as columns and
+indexes on the columns lookups go through, so offline tools can query the
+data instead of parsing it.
+
+Loading batches rows per table and writes each batch with ``executemany``
+in one transaction; the database runs in WAL mode, so readers on other
+connections are not blocked meanwhile. Queries yield models as rows come
+off the cursor, never building the full result list.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import datetime
+from enum import Enum
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+from uuid import UUID
+
+from pydantic import BaseModel, RootModel
+from pydantic_core import to_json
+
+from models.attributes import Attribute
+from models.events import Event, EventOrganisation, ExtendedEvent
+from models.galaxy import GalaxyCluster
+from models.objects import Object
+from models.sightings import Sighting
+from models.taxonomy_tags import Tag
+
+DEFAULT_BATCH_SIZE = 10000
+#: Rows fetched from the cursor at a time while streaming.
+FETCH_SIZE = 1000
+
+#: Columns holding numbers; SQLite stores numeric strings in them as integers.
+_INTEGER_COLUMNS = frozenset(
+    {
+        "date_sighting",
+        "first_seen",
+        "last_seen",
+        "inherited",
+        "attribute_count",
+    }
+)
+#: Nested records kept in tables of their own, or not kept.
+_NESTED = frozenset({"Attribute", "Organisation"})
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS event_timestamp ON event (timestamp);
+CREATE INDEX IF NOT EXISTS event_orgc ON event (orgc_id);
+CREATE INDEX IF NOT EXISTS object_event ON object (event_id);
+CREATE INDEX IF NOT EXISTS attribute_event ON attribute (event_id);
+CREATE INDEX IF NOT EXISTS attribute_object ON attribute (object_id);
+CREATE INDEX IF NOT EXISTS attribute_type ON attribute (type);
+CREATE INDEX IF NOT EXISTS attribute_value ON attribute (value);
+CREATE INDEX IF NOT EXISTS attribute_timestamp ON attribute (timestamp);
+CREATE INDEX IF NOT EXISTS event_tag_tag ON event_tag (tag_id);
+CREATE INDEX IF NOT EXISTS sighting_attribute ON sighting (attribute_id);
+CREATE INDEX IF NOT EXISTS sighting_event ON sighting (event_id);
+CREATE INDEX IF NOT EXISTS galaxy_cluster_tag_name ON galaxy_cluster (tag_name);
+"""
+
+
+class _Column(NamedTuple):
+    name: str
+    #: Key the model validates the column under.
+    alias: str
+    #: ``bool``, ``json``, ``number`` or ``text``.
+    kind: str
+
+
+class _Table(NamedTuple):
+    name: str
+    model: Type[BaseModel]
+    columns: Tuple[_Column, ...]
+    unique: Tuple[str, ...] = ()
+
+    @property
+    def insert(self) -> str:
+        names = ", ".join(f'"{column.name}"' for column in self.columns)
+        marks = ", ".join("?" * len(self.columns))
+        return f"INSERT OR REPLACE INTO {self.name} ({names}) VALUES ({marks})"
+
+    @property
+    def create(self) -> str:
+        columns = []
+        for column in self.columns:
+            if column.name == "id":
+                columns.append("id INTEGER PRIMARY KEY")
+            elif column.kind in ("bool", "number") or _integer(column.name):
+                columns.append(f'"{column.name}" INTEGER')
+            else:
+                columns.append(f'"{column.name}" TEXT')
+        for name in self.unique:
+            columns.append(f"UNIQUE ({name})")
+        return f"CREATE TABLE IF NOT EXISTS {self.name} ({', '.join(columns)})"
+
+    def row(self, record: BaseModel) -> Tuple[Any, ...]:
+        return tuple(
+            _encode(getattr(record, column.name), column.kind)
+            for column in self.columns
+        )
+
+    def record(self, row: Sequence[Any]) -> BaseModel:
+        return self.model.model_validate(
+            {
+                column.alias: _decode(value, column.kind)
+                for column, value in zip(self.columns, row)
+                if value is not None
+            }
+        )
+
+
+def _integer(name: str) -> bool:
+    return (
+        name == "id"
+        or name.endswith("_id")
+        or name.endswith("timestamp")
+        or name in _INTEGER_COLUMNS
+    )
+
+
+def _table(name: str, model: Type[BaseModel], unique: Tuple[str, ...] = ()) -> _Table:
+    columns = []
+    for field_name, field in model.model_fields.items():
+        if field_name in _NESTED:
+            continue
+        annotation = str(field.annotation)
+        if "bool" in annotation:
+            kind = "bool"
+        elif "Sequence" in annotation or "Mapping" in annotation:
+            kind = "json"
+        elif "int" in annotation:
+            kind = "number"
+        else:
+            kind = "text"
+        columns.append(_Column(field_name, field.alias or field_name, kind))
+    # The primary key first, for readability of the schema.
+    columns.sort(key=lambda column: column.name != "id")
+    return _Table(name, model, tuple(columns), unique)
+
+
+_ORG = _table("org", EventOrganisation)
+_EVENT = _table("event", Event, ("uuid",))
+_OBJECT = _table("object", Object, ("uuid",))
+_ATTRIBUTE = _table("attribute", Attribute, ("uuid",))
+_TAG = _table("tag", Tag, ("name",))
+_SIGHTING = _table("sighting", Sighting)
+_GALAXY_CLUSTER = _table("galaxy_cluster", GalaxyCluster, ("uuid",))
+_TABLES = (_ORG, _EVENT, _OBJECT, _ATTRIBUTE, _TAG, _SIGHTING, _GALAXY_CLUSTER)
+
+_SCHEMA = (
+    ";\n".join(
+        [
+            *(table.create for table in _TABLES),
+            "CREATE TABLE IF NOT EXISTS event_tag ("
+            "event_id INTEGER NOT NULL, tag_id INTEGER NOT NULL, "
+            "PRIMARY KEY (event_id, tag_id))",
+        ]
+    )
+    + ";\n"
+    + _INDEXES
+)
+
+
+#: Values SQLite stores as they are.
+_PLAIN = frozenset({str, int, float})
+
+
+def _encode(value: Any, kind: str) -> Any:
+    if value is None or type(value) in _PLAIN:
+        return value
+    # Cheaper than isinstance() against the pydantic metaclass.
+    if getattr(value, "__pydantic_root_model__", False):
+        value = value.root
+        if value is None or type(value) in _PLAIN:
+            return value
+    if kind == "json":
+        return to_json(value).decode()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode(value: Any, kind: str) -> Any:
+    if kind == "json":
+        return json.loads(value)
+    if kind == "text" and isinstance(value, int):
+        return str(value)
+    if kind == "bool":
+        return bool(value)
+    return value
+
+
+class _Batch:
+    """Rows waiting to be written, per table."""
+
+    def __init__(self) -> None:
+        self.rows: Dict[str, List[Tuple[Any, ...]]] = {}
+        self.replaced_events: List[Tuple[int]] = []
+        self.size = 0
+
+    def add(self, table: _Table, record: BaseModel) -> None:
+        self.rows.setdefault(table.name, []).append(table.row(record))
+        self.size += 1
+
+
+class MirrorStore:
+    """Local normalized copy of MISP data, in SQLite.
+
+    Like :class:`SyncStore`, the store is used from the thread that
+    created it; other processes or connections can read the file while
+    it loads.
+    """
+
+    def __init__(self, path: str = ":memory:", batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Durable at each checkpoint rather than each commit, safe with WAL.
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> MirrorStore:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def load_events(self, events: Iterable[ExtendedEvent]) -> int:
+        """Store ``events`` with their objects, attributes and tags.
+
+        An event stored before is replaced whole: attributes and objects it
+        no longer has are deleted. ``events`` may be an ``ExtendedEventList``.
+        Returns the number of attributes stored.
+        """
+        if isinstance(events, RootModel):
+            events = events.root
+        batch = _Batch()
+        attributes = 0
+        for event in events:
+            event_id = int(event.id.root)
+            batch.replaced_events.append((event_id,))
+            batch.add(_EVENT, event)
+            for org in (event.Org, event.Orgc):
+                if org is not None:
+                    batch.add(_ORG, org)
+            for tag in event.Tag or ():
+                batch.add(_TAG, tag)
+                batch.rows.setdefault("event_tag", []).append(
+                    (event_id, int(tag.id.root))
+                )
+            for attribute in event.Attribute or ():
+                batch.add(_ATTRIBUTE, attribute)
+                attributes += 1
+            for item in event.Object or ():
+                batch.add(_OBJECT, item)
+                for attribute in item.Attribute or ():
+                    batch.add(_ATTRIBUTE, attribute)
+                    attributes += 1
+            if batch.size >= self.batch_size:
+                self._write(batch)
+                batch = _Batch()
+        self._write(batch)
+        return attributes
+
+    def load_sightings(self, sightings: Iterable[Sighting]) -> int:
+        return self._load(_SIGHTING, sightings)
+
+    def load_galaxy_clusters(self, clusters: Iterable[GalaxyCluster]) -> int:
+        return self._load(_GALAXY_CLUSTER, clusters)
+
+    def load_tags(self, tags: Iterable[Tag]) -> int:
+        return self._load(_TAG, tags)
+
+    def delete_events(self, event_ids: Iterable[Union[int, str]]) -> None:
+        batch = _Batch()
+        batch.replaced_events = [(int(event_id),) for event_id in event_ids]
+        self._write(batch)
+
+    def count(self, table: str) -> int:
+        if table not in {t.name for t in _TABLES} | {"event_tag"}:
+            raise ValueError(f"no table {table!r}")
+        return self.connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+    def event(self, key: Union[int, str]) -> Optional[ExtendedEvent]:
+        """The event with id or uuid ``key``, with its objects and tags."""
+        column = "uuid" if isinstance(key, str) and not key.isdigit() else "id"
+        found = next(self._select(_EVENT, f"{column} = ?", (str(key),)), None)
+        if found is None:
+            return None
+        event_id = int(found.id.root)
+        objects = []
+        for item in self._select(_OBJECT, "event_id = ?", (event_id,)):
+            objects.append(
+                item.model_copy(
+                    update={
+                        "Attribute": list(
+                            self._select(
+                                _ATTRIBUTE, "object_id = ?", (int(item.id.root),)
+                            )
+                        )
+                    }
+                )
+            )
+        return ExtendedEvent.model_validate(
+            {
+                **found.model_dump(by_alias=True),
+                "Attribute": list(
+                    self._select(
+                        _ATTRIBUTE, "event_id = ? AND object_id = 0", (event_id,)
+                    )
+                ),
+                "Object": objects,
+                "Org": self._org(found.org_id),
+                "Orgc": self._org(found.orgc_id),
+                "Tag": list(self.event_tags(event_id)),
+            }
+        )
+
+    def events(self, since: Optional[int] = None) -> Iterator[Event]:
+        """Events, without their attributes, modified at or after ``since``."""
+        if since is None:
+            return self._select(_EVENT, order="id")
+        return self._select(_EVENT, "timestamp >= ?", (since,), order="timestamp")
+
+    def attributes(
+        self,
+        event_id: Optional[int] = None,
+        type: Optional[str] = None,
+        value: Optional[str] = None,
+        since: Optional[int] = None,
+    ) -> Iterator[Attribute]:
+        """Attributes matching every filter given, in id order."""
+        conditions, parameters = [], []
+        for column, wanted in (
+            ("event_id = ?", event_id),
+            ("type = ?", type),
+            ("value = ?", value),
+            ("timestamp >= ?", since),
+        ):
+            if wanted is not None:
+                conditions.append(column)
+                parameters.append(wanted)
+        return self._select(
+            _ATTRIBUTE, " AND ".join(conditions), tuple(parameters), order="id"
+        )
+
+    def event_tags(self, event_id: int) -> Iterator[Tag]:
+        return self._select(
+            _TAG,
+            "id IN (SELECT tag_id FROM event_tag WHERE event_id = ?)",
+            (int(event_id),),
+        )
+
+    def tags(self) -> Iterator[Tag]:
+        return self._select(_TAG, order="name")
+
+    def sightings(self, attribute_id: Optional[int] = None) -> Iterator[Sighting]:
+        if attribute_id is None:
+            return self._select(_SIGHTING, order="id")
+        return self._select(_SIGHTING, "attribute_id = ?", (int(attribute_id),))
+
+    def galaxy_clusters(
+        self, tag_name: Optional[str] = None
+    ) -> Iterator[GalaxyCluster]:
+        if tag_name is None:
+            return self._select(_GALAXY_CLUSTER, order="id")
+        return self._select(_GALAXY_CLUSTER, "tag_name = ?", (tag_name,))
+
+    def _org(self, org_id: Any) -> Optional[EventOrganisation]:
+        org_id = getattr(org_id, "root", org_id)
+        if org_id is None:
+            return None
+        return next(self._select(_ORG, "id = ?", (int(org_id),)), None)
+
+    def _load(self, table: _Table, records: Iterable[BaseModel]) -> int:
+        batch = _Batch()
+        loaded = 0
+        for record in records:
+            batch.add(table, record)
+            loaded += 1
+            if batch.size >= self.batch_size:
+                self._write(batch)
+                batch = _Batch()
+        self._write(batch)
+        return loaded
+
+    def _write(self, batch: _Batch) -> None:
+        with self.connection:
+            if batch.replaced_events:
+                for statement in (
+                    "DELETE FROM attribute WHERE event_id = ?",
+                    "DELETE FROM object WHERE event_id = ?",
+                    "DELETE FROM event_tag WHERE event_id = ?",
+                    "DELETE FROM event WHERE id = ?",
+                ):
+                    self.connection.executemany(statement, batch.replaced_events)
+            for table in _TABLES:
+                rows = batch.rows.get(table.name)
+                if rows:
+                    self.connection.executemany(table.insert, rows)
+            rows = batch.rows.get("event_tag")
+            if rows:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO event_tag VALUES (?, ?)", rows
+                )
+
+    def _select(
+        self,
+        table: _Table,
+        where: str = "",
+        parameters: Tuple[Any, ...] = (),
+        order: str = "",
+    ) -> Iterator[Any]:
+        # Quoted: GalaxyCluster has a ``default`` column.
+        names = ", ".join(f'"{column.name}"' for column in table.columns)
+        query = f"SELECT {names} FROM {table.name}"
+        if where:
+            query += f" WHERE {where}"
+        if order:
+            query += f" ORDER BY {order}"
+        cursor = self.connection.execute(query, parameters)
+        return _stream(table, cursor)
+
+
+def _stream(table: _Table, cursor: sqlite3.Cursor) -> Iterator[Any]:
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield table.record(row)
+    finally:
+        cursor.close()
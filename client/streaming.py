@@ -0,0 +1,268 @@
+"""Incremental parsing of ``restSearch`` responses.
+
+``EventRestSearchList`` and ``AttributeRestSearchList`` describe the whole
+response body, which means reading it into memory before validating it.
+:class:`RestSearchStream` instead reads the body chunk by chunk, cuts out one
+list item at a time and validates it on its own, so memory stays bounded by
+the largest single item rather than by the response.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import time
+from dataclasses import dataclass
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Generic,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+    Union,
+)
+
+from pydantic import BaseModel
+
+from models.events import EventRestSearchListItem
+from models.search import AttributeRestSearchListItem
+from models.validation import projected_model
+
+ItemT = TypeVar("ItemT", bound=BaseModel)
+
+Source = Union[IO[bytes], IO[str], Iterable[bytes]]
+
+#: ``/events/restSearch`` wraps the list as ``{"response": [...]}``.
+EVENTS_PATH = ("response",)
+#: ``/attributes/restSearch`` wraps it as ``{"response": {"Attribute": [...]}}``.
+ATTRIBUTES_PATH = ("response", "Attribute")
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+@dataclass
+class StreamStats:
+    """Throughput counters of a :class:`RestSearchStream`."""
+
+    items: int = 0
+    bytes_read: int = 0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def items_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.items / elapsed if elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes_read / elapsed if elapsed else 0.0
+
+
+class RestSearchStream(Generic[ItemT]):
+    """Yield validated ``model`` instances from a JSON list in ``source``.
+
+    ``source`` is a binary or text file object, or any iterable of ``bytes``
+    chunks such as ``requests.Response.iter_content()``. ``path`` lists the
+    object keys leading to the list; an empty path, or a body that is a bare
+    list, means the list is the document itself.
+
+    ``close`` is called once, when iteration ends, stops early or fails, or
+    when :meth:`close` is called; use it to release what ``source`` reads
+    from, such as a streamed HTTP response.
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        model: Type[ItemT],
+        path: Sequence[str] = (),
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        close: Optional[Callable[[], Any]] = None,
+    ):
+        self.model = model
+        self.path = tuple(path)
+        self.stats = StreamStats()
+        self._chunks = _iter_chunks(source, chunk_size)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._close = close
+
+    def __enter__(self) -> RestSearchStream[ItemT]:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the source; a no-op after the first call."""
+        close, self._close = self._close, None
+        if close is not None:
+            close()
+
+    def __iter__(self) -> Iterator[ItemT]:
+        if self.stats.started is not None:
+            raise RuntimeError("a RestSearchStream can only be iterated once")
+        self.stats.started = time.perf_counter()
+        try:
+            for item in self._items():
+                yield self.model.model_validate(item)
+                self.stats.items += 1
+        finally:
+            self.stats.finished = time.perf_counter()
+            self.close()
+
+    def _items(self) -> Iterator[Any]:
+        if self._skip_to_list():
+            if self._peek() == "]":
+                self._pos += 1
+                return
+            while True:
+                yield self._value()
+                delimiter = self._peek()
+                self._pos += 1
+                if delimiter == "]":
+                    return
+                if delimiter != ",":
+                    self._fail("expected ',' or ']'")
+
+    def _skip_to_list(self) -> bool:
+        """Position after the ``[`` opening the list, False if it is absent.
+
+        A list met before the end of ``path`` is taken as the result list:
+        MISP answers an empty attribute search with ``{"response": []}``.
+        """
+        for key in (*self.path, None):
+            char = self._peek()
+            if char == "[":
+                self._pos += 1
+                return True
+            if char != "{" or key is None:
+                # ``null`` or ``{}`` also stand for "no results".
+                if char not in "n{":
+                    self._fail("expected a list")
+                self._value()
+                return False
+            self._pos += 1
+            while True:
+                if self._peek() == "}":
+                    return False
+                name = self._value()
+                if self._peek() != ":":
+                    self._fail("expected ':'")
+                self._pos += 1
+                if name == key:
+                    break
+                self._value()
+                if self._peek() == ",":
+                    self._pos += 1
+        return False
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it."""
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                self._fail("unexpected end of document")
+
+    def _value(self) -> Any:
+        """Decode the JSON value at the current position."""
+        self._peek()
+        wanted = 0
+        while True:
+            if len(self._buffer) - self._pos >= wanted:
+                try:
+                    value, end = _decoder.raw_decode(self._buffer, self._pos)
+                except json.JSONDecodeError:
+                    if self._eof:
+                        raise
+                else:
+                    # A number at the very end of the buffer may continue in
+                    # the next chunk.
+                    if end < len(self._buffer) or self._eof:
+                        self._pos = end
+                        return value
+                # Wait for the pending data to double before decoding again,
+                # which keeps large items linear instead of quadratic.
+                wanted = 2 * (len(self._buffer) - self._pos)
+            if not self._fill():
+                wanted = 0
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, False at end of input."""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._utf8.decode(b"", final=True)
+        elif isinstance(chunk, str):
+            self.stats.bytes_read += len(chunk.encode("utf-8"))
+            text = chunk
+        else:
+            self.stats.bytes_read += len(chunk)
+            text = self._utf8.decode(chunk)
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def _fail(self, message: str):
+        raise json.JSONDecodeError(message, self._buffer, self._pos)
+
+
+def _iter_chunks(source: Source, chunk_size: int) -> Iterator[Union[bytes, str]]:
+    read = getattr(source, "read", None)
+    if read is None:
+        yield from source
+        return
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_events(
+    source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> RestSearchStream[EventRestSearchListItem]:
+    """Stream the items of an ``/events/restSearch`` JSON response."""
+    return RestSearchStream(source, EventRestSearchListItem, EVENTS_PATH, chunk_size)
+
+
+def stream_attributes(
+    source: Source,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    fields: Optional[Iterable[str]] = None,
+) -> RestSearchStream[AttributeRestSearchListItem]:
+    """Stream the items of an ``/attributes/restSearch`` JSON response.
+
+    Pass the search's ``requested_attributes`` as ``fields`` to validate the
+    items into a :func:`models.validation.projected_model` holding only those.
+    """
+    model = AttributeRestSearchListItem
+    if fields is not None:
+        model = projected_model(model, fields)
+    return RestSearchStream(source, model, ATTRIBUTES_PATH, chunk_size)
@@ -0,0 +1,260 @@
+"""Incremental event sync driven by the ``SlimEvent`` index.
+
+A full pull downloads every event body. :class:`EventSync` instead pulls the
+minimal ``/events/index`` (``SlimEvent``: id, uuid, timestamp,
+sighting_timestamp, published) modified since the server's watermark, diffs
+it against :class:`SyncStore` by uuid and timestamps, and fetches the
+``ExtendedEvent`` bodies of the changed events only, several at a time.
+
+Every fetched event is committed as it arrives and the watermark only moves
+once a run has fetched everything it listed, so a run killed half-way
+resumes where it stopped: the events already stored match the index and
+are not fetched again.
+"""
+from __future__ import annotations
+
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from client.api import MispClient
+from models.events import ExtendedEvent, SlimEvent
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_INDEX_PAGE_SIZE = 10000
+
+#: ``(timestamp, sighting_timestamp, published)`` of a stored event.
+Version = Tuple[int, int, bool]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermark (
+    server TEXT PRIMARY KEY,
+    timestamp INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS event (
+    server TEXT NOT NULL,
+    uuid TEXT NOT NULL,
+    id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    sighting_timestamp INTEGER NOT NULL,
+    published INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (server, uuid)
+);
+"""
+
+
+class SyncStore:
+    """Local copy of the events of one or more servers, in SQLite.
+
+    ``server`` keys every row, so one file can hold several servers. The
+    store is used from the thread that created it.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def watermark(self, server: str) -> Optional[int]:
+        row = self.connection.execute(
+            "SELECT timestamp FROM watermark WHERE server = ?", (server,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, server: str, timestamp: int) -> None:
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermark VALUES (?, ?)", (server, timestamp)
+            )
+
+    def versions(self, server: str, uuids: Iterable[str]) -> Dict[str, Version]:
+        """Stored version of each of ``uuids`` known for ``server``."""
+        versions: Dict[str, Version] = {}
+        uuids = list(uuids)
+        # Stay under SQLite's limit on bound parameters.
+        for start in range(0, len(uuids), 500):
+            chunk = uuids[start:start + 500]
+            rows = self.connection.execute(
+                "SELECT uuid, timestamp, sighting_timestamp, published FROM event"
+                f" WHERE server = ? AND uuid IN ({','.join('?' * len(chunk))})",
+                (server, *chunk),
+            )
+            for uuid, timestamp, sighting_timestamp, published in rows:
+                versions[uuid] = (timestamp, sighting_timestamp, bool(published))
+        return versions
+
+    def uuids(self, server: str) -> Set[str]:
+        rows = self.connection.execute(
+            "SELECT uuid FROM event WHERE server = ?", (server,)
+        )
+        return {uuid for uuid, in rows}
+
+    def put(self, server: str, slim: SlimEvent, event: ExtendedEvent) -> None:
+        """Store ``event`` under the version the index listed it with."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO event VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    server,
+                    str(slim.uuid),
+                    slim.id,
+                    int(slim.timestamp),
+                    int(slim.sighting_timestamp),
+                    slim.published,
+                    event.model_dump_json(exclude_none=True),
+                ),
+            )
+
+    def delete(self, server: str, uuids: Iterable[str]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM event WHERE server = ? AND uuid = ?",
+                ((server, uuid) for uuid in uuids),
+            )
+
+    def get(self, server: str, uuid: str) -> Optional[ExtendedEvent]:
+        row = self.connection.execute(
+            "SELECT body FROM event WHERE server = ? AND uuid = ?", (server, uuid)
+        ).fetchone()
+        return ExtendedEvent.model_validate_json(row[0]) if row else None
+
+    def events(self, server: str) -> Iterator[ExtendedEvent]:
+        rows = self.connection.execute(
+            "SELECT body FROM event WHERE server = ? ORDER BY timestamp", (server,)
+        )
+        for body, in rows:
+            yield ExtendedEvent.model_validate_json(body)
+
+
+@dataclass
+class SyncReport:
+    """Outcome of one :meth:`EventSync.run`."""
+
+    server: str
+    listed: int = 0
+    changed: int = 0
+    fetched: int = 0
+    deleted: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    watermark: Optional[int] = None
+    elapsed: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed
+
+
+class EventSync:
+    """Pull the events of ``client``'s server changed since the last run.
+
+    ``server`` names the server in ``store`` and defaults to the client URL.
+    With ``full_index`` the whole index is listed rather than the events
+    modified since the watermark; only then are events deleted on the
+    server detected, and sightings, which do not touch an event's
+    ``timestamp``, picked up for every event.
+    """
+
+    def __init__(
+        self,
+        client: MispClient,
+        store: SyncStore,
+        server: Optional[str] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        index_page_size: int = DEFAULT_INDEX_PAGE_SIZE,
+    ):
+        self.client = client
+        self.store = store
+        self.server = server or client.url
+        self.concurrency = concurrency
+        self.index_page_size = index_page_size
+
+    def run(self, full_index: bool = False) -> SyncReport:
+        started = time.perf_counter()
+        report = SyncReport(self.server)
+        watermark = None if full_index else self.store.watermark(self.server)
+        index = self.index(watermark)
+        report.listed = len(index)
+
+        changed = self.diff(index)
+        report.changed = len(changed)
+        report.fetched = self._fetch(changed, report)
+
+        if full_index:
+            gone = self.store.uuids(self.server) - {str(slim.uuid) for slim in index}
+            self.store.delete(self.server, gone)
+            report.deleted = len(gone)
+        if report.complete:
+            newest = max((int(slim.timestamp) for slim in index), default=None)
+            previous = self.store.watermark(self.server)
+            if newest is not None and (previous is None or newest > previous):
+                self.store.set_watermark(self.server, newest)
+        report.watermark = self.store.watermark(self.server)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def index(self, since: Optional[int] = None) -> List[SlimEvent]:
+        """The minimal index, restricted to events modified at or after ``since``.
+
+        The bound is inclusive: events modified within the watermark's second
+        after the previous run are listed again, and skipped by the diff.
+        """
+        filters: Dict[str, object] = {"minimal": True, "limit": self.index_page_size}
+        if since is not None:
+            filters["timestamp"] = since
+        index: List[SlimEvent] = []
+        page = 1
+        while True:
+            slims = self.client.search_events({**filters, "page": page}).root
+            index.extend(slims)
+            if len(slims) < self.index_page_size:
+                return index
+            page += 1
+
+    def diff(self, index: List[SlimEvent]) -> List[SlimEvent]:
+        """The events of ``index`` missing from the store or changed since."""
+        versions = self.store.versions(self.server, (str(slim.uuid) for slim in index))
+        return [
+            slim
+            for slim in index
+            if versions.get(str(slim.uuid))
+            != (int(slim.timestamp), int(slim.sighting_timestamp), slim.published)
+        ]
+
+    def _fetch(self, changed: List[SlimEvent], report: SyncReport) -> int:
+        """Fetch and store ``changed``, at most ``concurrency`` at a time."""
+        fetched = 0
+        pending: Dict[Future, SlimEvent] = {}
+        queue = iter(changed)
+        with ThreadPoolExecutor(
+            self.concurrency, thread_name_prefix="misp-sync"
+        ) as executor:
+            while True:
+                # Keep the queue of submitted fetches short, so that the
+                # events of a run killed half-way are either stored or not
+                # requested yet.
+                for slim in queue:
+                    pending[executor.submit(self.client.get_event, slim.id)] = slim
+                    if len(pending) >= 2 * self.concurrency:
+                        break
+                if not pending:
+                    return fetched
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    slim = pending.pop(future)
+                    try:
+                        event = future.result()
+                    except Exception as error:
+                        report.failed[str(slim.uuid)] = str(error)
+                        continue
+                    # Written from this thread only; SQLite connections do
+                    # not cross threads.
+                    self.store.put(self.server, slim, event)
+                    fetched += 1
+
@@ -0,0 +1,300 @@
+"""Pydantic models for the MISP REST API.
+
+Every model is reachable from the package itself (``from models import
+ExtendedEvent``) but submodules are only imported when one of their names is
+first looked up, so short-lived processes pay for the models they touch and
+nothing else.
+"""
+from __future__ import annotations
+
+import importlib
+import re
+import sys
+from typing import Any, Callable, Iterator, List, Mapping, Sequence, Set, Tuple
+from types import ModuleType
+
+_MODULE_EXPORTS = {
+    "attributes": (
+        "AttributeEventUUID",
+        "AttributeNoId",
+        "Attribute",
+        "ExtendedAttribute",
+    ),
+    "common": (
+        "MispBaseModel",
+        "MispRootModel",
+        "MispID",
+        "AttributeType",
+        "AttributeCategory",
+        "DistributionLevelId",
+        "ThreatLevelId",
+        "AnalysisLevelId",
+        "UUIDModel",
+        "Timestamp",
+        "MicroTimestamp",
+        "Local",
+        "ModelName",
+    ),
+    "decay": (
+        "DecayingModelParameters",
+        "DecayingModel",
+        "Formula",
+        "FullDecayingModel",
+        "DecayScore",
+    ),
+    "events": (
+        "EventReport",
+        "EventOrganisation",
+        "Event",
+        "SlimEvent",
+        "EventList",
+        "SlimEventList",
+        "Event4",
+        "EventTag",
+        "EventTagList",
+        "RelatedEventItem",
+        "ExtendedEvent",
+        "CreatedEvent",
+        "CreatedEventSchema",
+        "UpdatedEvent",
+        "UpdatedEventSchema",
+        "ExtendedEventList",
+        "EventRestSearchListItem",
+        "EventRestSearchListItemResult",
+        "EventRestSearchList",
+    ),
+    "feeds": (
+        "ServerNoId",
+        "Server",
+        "ServerListItem",
+        "ServerList",
+        "FeedNoId",
+        "Feed",
+    ),
+    "filters": (
+        "UNORDERED_FILTERS",
+        "canonical_filters",
+    ),
+    "galaxy": (
+        "GalaxyClusterVersion",
+        "GalaxyElement",
+        "GalaxyElementList",
+        "GalaxyValueSearchFilter",
+        "Galaxy",
+        "GalaxyClusterNoId",
+        "GalaxyCluster",
+        "ExtendedGalaxyCluster",
+        "ExtendedGalaxy",
+        "Value",
+        "GalaxyMispFormat",
+        "Galaxy1",
+        "ImportGalaxyClusterItem",
+    ),
+    "logs": (
+        "LogActionType",
+        "Log",
+    ),
+    "objects": (
+        "ObjectNames",
+        "ObjectFormats",
+        "ObjectRelationshipType",
+        "Object",
+        "ExtendedObject",
+    ),
+    "organisation": (
+        "OrganisationId",
+        "OrganisationName",
+        "OrganisationNoId",
+        "Organisation",
+        "OrganisationListItem",
+        "OrganisationList",
+        "OrganisationModel",
+    ),
+    "search": (
+        "ObjectRestSearchList",
+        "ObjectsRestSearchReturnFormat",
+        "EventsRestSearchReturnFormat",
+        "AttributesRestSearchReturnFormat",
+        "ObjectRestSearchFilter",
+        "AttributeRestSearchFilter",
+        "AttributeRestSearchListItem",
+        "AttributeRestSearchList",
+        "DateIntervalRestSearchFilter",
+        "ExcludeLocalTagsRestSearchFilter",
+    ),
+    "server": (
+        "Position",
+        "DashboardUserSetting",
+        "PublishAlertFilterUserSetting",
+        "HomepageUserSetting",
+        "DefaultRestSearchParametersUserSetting",
+        "TagNumbericalValueOverrideUserSetting",
+        "UserSettingName",
+        "ViewUserSettings",
+        "ChangePw",
+        "PhpServerSetting",
+        "ServerPackageVersion",
+        "DatabaseTableDiagnostics",
+        "Type",
+        "MispSetting",
+        "Worker",
+        "WorkersStatus",
+        "UpdateServerResultItem",
+        "FeedSourceFormat",
+        "FeedInputSource",
+        "UserSetting",
+        "SortSearchField",
+        "DirectionSearchField",
+        "ApiError",
+        "UnauthorizedApiError",
+        "NotFoundApiError",
+        "NotFoundUserTotpDeleteError",
+        "AuthKey",
+    ),
+    "sharing": (
+        "Role",
+        "SharingGroupServerId",
+        "Server1",
+        "SharingGroupServer",
+        "SlimSharingGroupNoId",
+        "SlimSharingGroup",
+        "SharingGroupNoId",
+        "SharingGroup",
+        "Organisation2",
+        "SharingGroupOrganisation",
+        "SharingGroupListItem",
+    ),
+    "sightings": (
+        "Sighting",
+    ),
+    "taxonomy_tags": (
+        "Taxonomy",
+        "TaxonomyPredicate",
+        "TaxonomyPredicateExport",
+        "TaxonomyEntryExport",
+        "TaxonomyValueExport",
+        "TaxonomyEntry",
+        "ExtendedTaxonomyEntry",
+        "TagNoId",
+        "Tag",
+        "ExtendedTag",
+    ),
+    "unknown": (
+        "AttributeStatisticsResponse",
+        "DescribeAttributeTypesResponse",
+        "ObjectRelation",
+        "ObjectTemplateId",
+        "TagCollectionId",
+    ),
+    "users": (
+        "UserNoId",
+        "User",
+        "ExtendedUser",
+        "Organisation1",
+        "UserListItem",
+        "UserList",
+    ),
+    "validation": (
+        "projected_model",
+    ),
+    "warning_lists": (
+        "Message",
+        "Data",
+        "WarninglistId",
+        "WarninglistEntry",
+        "WarningListType",
+        "Warninglist",
+        "WarninglistsIdFilter",
+        "WarninglistsNameFilter",
+        "NoticelistEntry",
+        "Noticelist",
+    ),
+}
+
+_EXPORTS = {
+    name: module for module, names in _MODULE_EXPORTS.items() for name in names
+}
+
+__all__ = [*_EXPORTS, "lazy_exports", "resolve_forward_refs"]
+
+# ``feeds.Feed`` inside an annotation string.
+_QUALIFIED_REFERENCE = re.compile(r"\b([a-z_]+)\.[A-Z]")
+
+_resolved: Set[str] = set()
+
+
+def _referenced_submodules(module: ModuleType) -> Iterator[str]:
+    for value in list(vars(module).values()):
+        if not isinstance(value, type) or value.__module__ != module.__name__:
+            continue
+        for annotation in vars(value).get("__annotations__", {}).values():
+            if isinstance(annotation, str):
+                yield from _QUALIFIED_REFERENCE.findall(annotation)
+
+
+def resolve_forward_refs() -> None:
+    """Bind the submodules that models refer to as ``module.Model``.
+
+    A model pointing into another submodule spells the reference
+    module-qualified (``Optional[feeds.Feed]``) and imports that module under
+    ``TYPE_CHECKING`` only, so that loading ``models.events`` does not drag in
+    the rest of the package. Right before pydantic builds a schema,
+    :class:`models.common.MispBaseModel` calls this to import the referenced
+    submodules, transitively, and bind them into the referring module. Each
+    loaded submodule is scanned once.
+    """
+    pending: List[ModuleType] = [
+        module
+        for name, module in list(sys.modules.items())
+        if name.startswith(f"{__name__}.") and name not in _resolved
+    ]
+    while pending:
+        module = pending.pop()
+        if module.__name__ in _resolved:
+            continue
+        if getattr(module.__spec__, "_initializing", False):
+            # Still executing its body; it is scanned on a later call.
+            continue
+        _resolved.add(module.__name__)
+        for submodule in set(_referenced_submodules(module)):
+            if submodule not in _MODULE_EXPORTS or hasattr(module, submodule):
+                continue
+            dependency = importlib.import_module(f"{__name__}.{submodule}")
+            setattr(module, submodule, dependency)
+            pending.append(dependency)
+
+
+def lazy_exports(
+    package: str, module_exports: Mapping[str, Sequence[str]]
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """``__getattr__`` and ``__dir__`` for a package exporting names lazily.
+
+    ``module_exports`` maps each submodule of ``package`` to the names it
+    exports. A name imports its submodule on first lookup and is then bound
+    in the package, so later lookups no longer come here. The submodules
+    themselves are reachable the same way. Used by this package and by
+    :mod:`client` and :mod:`analytics`::
+
+        __getattr__, __dir__ = lazy_exports(__name__, _MODULE_EXPORTS)
+    """
+    exports = {
+        name: module for module, names in module_exports.items() for name in names
+    }
+
+    def __getattr__(name: str) -> Any:
+        if name in module_exports:
+            return importlib.import_module(f"{package}.{name}")
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(f"{package}.{module}"), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted({*vars(sys.modules[package]), *module_exports, *exports})
+
+    return __getattr__, __dir__
+
+
+__getattr__, __dir__ = lazy_exports(__name__, _MODULE_EXPORTS)
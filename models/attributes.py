@@ -1,28 +1,32 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from typing import Sequence
 from uuid import UUID
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
-from common import (
+from models.common import (
     MispID,
     AttributeType,
     AttributeCategory,
     DistributionLevelId,
+    MispBaseModel,
+    MispRootModel,
 )
-from decay import DecayScore
 
+if TYPE_CHECKING:
+    from models import decay
 
-class AttributeEventUUID(RootModel[UUID]):
+
+class AttributeEventUUID(MispRootModel[UUID]):
     root: Annotated[
-        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"], max_length=36)
+        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"])
     ]
 
 
-class AttributeNoId(BaseModel):
+class AttributeNoId(MispBaseModel):
     event_id: MispID
     object_id: MispID
     object_relation: Annotated[
@@ -65,4 +69,4 @@ class ExtendedAttribute(Attribute):
     base64 representation of the attachment
     """
     event_uuid: Optional[UUID]
-    decay_score: Optional[Sequence[DecayScore]] = None
+    decay_score: Optional[Sequence[decay.DecayScore]] = None
@@ -1,11 +1,81 @@
+import threading
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, Optional, Set
 from uuid import UUID
 
-from pydantic import RootModel, Field
+from pydantic import BaseModel, ConfigDict, RootModel, Field
+from pydantic.root_model import RootModelRootType
 from typing_extensions import Annotated
 
-MispID = RootModel[Annotated[
+from models import resolve_forward_refs
+
+
+class _DeferredBuild:
+    """Shared by :class:`MispBaseModel` and :class:`MispRootModel`.
+
+    The validation schema is built on first use instead of at import time,
+    which is also when references to other ``models`` submodules
+    (``feeds.Feed``, ``taxonomy_tags.Tag``, ...) get resolved.
+    """
+    model_config = ConfigDict(defer_build=True)
+
+    @classmethod
+    def model_rebuild(
+        cls,
+        *,
+        force: bool = False,
+        raise_errors: bool = True,
+        _parent_namespace_depth: int = 2,
+        _types_namespace: Optional[Dict[str, Any]] = None,
+    ) -> Optional[bool]:
+        # Parametrizing the generic MispRootModel rebuilds it while a
+        # submodule may still be importing; only concrete models resolve.
+        # Threads sharing a model may all reach its first use at once; only
+        # one of them builds, the others then find the model complete.
+        with _build_lock:
+            if not cls.__pydantic_generic_metadata__["parameters"]:
+                resolve_forward_refs()
+            _building.add(cls)
+            try:
+                # Every model is defined at module level, so its module
+                # globals are the whole namespace; the caller's frame is
+                # ignored.
+                return super().model_rebuild(
+                    force=force,
+                    raise_errors=raise_errors,
+                    _parent_namespace_depth=0,
+                    _types_namespace=_types_namespace,
+                )
+            finally:
+                _building.discard(cls)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        # Pydantic evaluates the pending annotations of a nested model in the
+        # namespace of the outer one; build the nested model on its own first
+        # so they are evaluated against its own module.
+        if (
+            source is cls
+            and not cls.__pydantic_complete__
+            and cls not in _building
+        ):
+            cls.model_rebuild(raise_errors=False)
+        return super().__get_pydantic_core_schema__(source, handler)
+
+
+_building: Set[type] = set()
+_build_lock = threading.RLock()
+
+
+class MispBaseModel(_DeferredBuild, BaseModel):
+    """Base class of every MISP model."""
+
+
+class MispRootModel(_DeferredBuild, RootModel[RootModelRootType]):
+    """Base class of every list and scalar MISP root model."""
+
+
+MispID = MispRootModel[Annotated[
     Optional[str], Field(None, examples=["12345"], max_length=10, pattern="^\\d+$")
 ]]
 
@@ -242,17 +312,17 @@ class AnalysisLevelId(str, Enum):
     FIELD_2 = "2"
 
 
-class UUIDModel(RootModel[UUID]):
+class UUIDModel(MispRootModel[UUID]):
     root: Annotated[
-        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"], max_length=36)
+        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"])
     ]
 
 
-class Timestamp(RootModel[str]):
+class Timestamp(MispRootModel[str]):
     root: Annotated[str, Field(examples=["1617875568"], pattern="^\\d+$")]
 
 
-class MicroTimestamp(RootModel[str]):
+class MicroTimestamp(MispRootModel[str]):
     root: Annotated[str, Field(examples=["1581984000000000"], pattern="^\\d+$")]
 
 
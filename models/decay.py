@@ -2,19 +2,23 @@ from __future__ import annotations
 
 from typing import Sequence
 from enum import Enum
-from typing import Optional, Union, Mapping, Any
+from typing import TYPE_CHECKING, Optional, Union, Mapping, Any
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
     AttributeType,
+    MispBaseModel,
 )
 
+if TYPE_CHECKING:
+    from models import decay
 
-class DecayingModelParameters(BaseModel):
+
+class DecayingModelParameters(MispBaseModel):
     lifetime: Annotated[Optional[float], Field(None, examples=[3])]
     decay_speed: Annotated[Optional[float], Field(None, examples=[2.3])]
     threshold: Annotated[Optional[float], Field(None, examples=[30])]
@@ -35,7 +39,7 @@ class DecayingModelParameters(BaseModel):
     ]
 
 
-class DecayingModel(BaseModel):
+class DecayingModel(MispBaseModel):
     id: MispID
     name: Annotated[
         Optional[str], Field(None, examples=["Phishing model"], max_length=255)
@@ -46,7 +50,7 @@ class Formula(str, Enum):
     POLYNOMIAL = "Polynomial"
 
 
-class FullDecayingModel(BaseModel):
+class FullDecayingModel(MispBaseModel):
     id: MispID
     uuid: Optional[UUID]
     name: Annotated[
@@ -72,8 +76,8 @@ class FullDecayingModel(BaseModel):
     isEditable: Optional[bool] = None
 
 
-class DecayScore(BaseModel):
+class DecayScore(MispBaseModel):
     score: Annotated[Optional[float], Field(None, examples=[10.5])]
     base_score: Annotated[Optional[float], Field(None, examples=[80])]
     decayed: Optional[bool] = None
-    DecayingModel: Optional[Union[DecayingModel, FullDecayingModel]] = None
+    DecayingModel: Optional[Union[decay.DecayingModel, decay.FullDecayingModel]] = None
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 from typing import Sequence
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from uuid import UUID
 from datetime import datetime
 
-from pydantic import BaseModel, EmailStr, Field, RootModel
+from pydantic import EmailStr, Field
 from typing_extensions import Annotated
 
 from models.common import (
@@ -13,21 +13,25 @@ from models.common import (
     AnalysisLevelId,
     DistributionLevelId,
     ThreatLevelId,
+    MispBaseModel,
+    MispRootModel,
 )
-from models.users import UserNoId
 
+if TYPE_CHECKING:
+    from models import attributes, feeds, galaxy, objects, taxonomy_tags
 
-class EventReport(BaseModel):
+
+class EventReport(MispBaseModel):
     pass
 
 
-class EventOrganisation(BaseModel):
+class EventOrganisation(MispBaseModel):
     id: MispID
     name: Annotated[Optional[str], Field(None, examples=["ORGNAME"], max_length=255)]
     uuid: Optional[UUID]
 
 
-class Event(BaseModel):
+class Event(MispBaseModel):
     id: MispID = None
     """It is possible to have an event with no id. Probably on creation"""
 
@@ -67,28 +71,28 @@ class Event(BaseModel):
     event_creator_email: Optional[EmailStr] = None
 
 
-class SlimEvent(BaseModel):
+class SlimEvent(MispBaseModel):
     id: Annotated[str, Field(examples=["12345"], max_length=10, pattern="^\\d+$")]
     timestamp: Annotated[str, Field(examples=["1617875568"], pattern="^\\d+$")]
     sighting_timestamp: Annotated[str, Field(examples=["1617875568"], pattern="^\\d+$")]
     published: bool
     uuid: Annotated[
-        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"], max_length=36)
+        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"])
     ]
     orgc_uuid: Annotated[
-        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"], max_length=36)
+        UUID, Field(examples=["c99506a6-1255-4b71-afa5-7b8ba48c3b1b"])
     ]
 
 
-class EventList(RootModel[Sequence[Event]]):
+class EventList(MispRootModel[Sequence[Event]]):
     root: Sequence[Event]
 
 
-class SlimEventList(RootModel[Sequence[SlimEvent]]):
+class SlimEventList(MispRootModel[Sequence[SlimEvent]]):
     root: Sequence[SlimEvent]
 
 
-class Event4(BaseModel):
+class Event4(MispBaseModel):
     id: MispID
     info: Annotated[
         Optional[str], Field(None, examples=["logged source ip"], max_length=65535)
@@ -97,68 +101,63 @@ class Event4(BaseModel):
     orgc_id: MispID
 
 
-class EventTag(BaseModel):
+class EventTag(MispBaseModel):
     id: MispID
     event_id: MispID
     tag_id: MispID
     local: Optional[bool] = None
-    Tag: Optional[Tag] = None
+    Tag: Optional[taxonomy_tags.Tag] = None
 
 
-class EventTagList(RootModel[Sequence[EventTag]]):
+class EventTagList(MispRootModel[Sequence[EventTag]]):
     root: Sequence[EventTag]
 
 
-class ExtendedTaxonomyEntry(UserNoId):
-    events: Optional[float] = None
-    attributes: Optional[float] = None
-
-
-class RelatedEventItem(BaseModel):
+class RelatedEventItem(MispBaseModel):
     Event: Optional[ExtendedEvent] = None
 
 
 class ExtendedEvent(Event):
-    Feed: Optional[Feed] = None
+    Feed: Optional[feeds.Feed] = None
     Org: Optional[EventOrganisation] = None
     Orgc: Optional[EventOrganisation] = None
-    Attribute: Optional[Sequence[Attribute]] = None
-    ShadowAttribute: Optional[Sequence[Attribute]] = None
+    Attribute: Optional[Sequence[attributes.Attribute]] = None
+    ShadowAttribute: Optional[Sequence[attributes.Attribute]] = None
     RelatedEvent: Optional[Sequence[RelatedEventItem]] = None
-    Galaxy: Optional[Sequence[Galaxy]] = None
-    Object: Optional[Sequence[Object]] = None
+    Galaxy: Optional[Sequence[galaxy.Galaxy]] = None
+    Object: Optional[Sequence[objects.Object]] = None
     EventReport: Optional[Sequence[EventReport]] = None
-    Tag: Optional[Sequence[Tag]] = None
+    Tag: Optional[Sequence[taxonomy_tags.Tag]] = None
 
 
-class CreatedEvent(BaseModel):
+class CreatedEvent(MispBaseModel):
     Event: Optional[CreatedEventSchema] = None
 
 
 class CreatedEventSchema(ExtendedEvent):
     event_creator_email: Optional[EmailStr] = None
-    Galaxy: Optional[Sequence[Galaxy]] = None
-    Object: Optional[Sequence[Object]] = None
+    Galaxy: Optional[Sequence[galaxy.Galaxy]] = None
+    Object: Optional[Sequence[objects.Object]] = None
     EventReport: Optional[Sequence[EventReport]] = None
 
 
-class UpdatedEvent(BaseModel):
+class UpdatedEvent(MispBaseModel):
     Event: Optional[UpdatedEventSchema] = None
 
 
 class UpdatedEventSchema(ExtendedEvent):
     event_creator_email: Optional[EmailStr] = None
-    Galaxy: Optional[Sequence[Galaxy]] = None
-    Object: Optional[Sequence[Object]] = None
+    Galaxy: Optional[Sequence[galaxy.Galaxy]] = None
+    Object: Optional[Sequence[objects.Object]] = None
     EventReport: Optional[Sequence[EventReport]] = None
-    Tag: Optional[Sequence[Tag]] = None
+    Tag: Optional[Sequence[taxonomy_tags.Tag]] = None
 
 
-class ExtendedEventList(RootModel[Sequence[ExtendedEvent]]):
+class ExtendedEventList(MispRootModel[Sequence[ExtendedEvent]]):
     root: Sequence[ExtendedEvent]
 
 
-class EventRestSearchListItem(BaseModel):
+class EventRestSearchListItem(MispBaseModel):
     Event: Optional[EventRestSearchListItemResult] = None
 
 
@@ -166,11 +165,15 @@ class EventRestSearchListItemResult(ExtendedEvent):
     Event: Optional[SlimEvent] = None
 
 
-class EventRestSearchList(RootModel[Sequence[EventRestSearchListItem]]):
+class EventRestSearchList(MispRootModel[Sequence[EventRestSearchListItem]]):
     root: Sequence[EventRestSearchListItem]
 
 
-RelatedEventItem.model_rebuild()
-CreatedEvent.model_rebuild()
-UpdatedEvent.model_rebuild()
-EventRestSearchListItem.model_rebuild()
+def __getattr__(name):
+    # ExtendedTaxonomyEntry extends UserNoId and now lives next to the other
+    # taxonomy models, so that importing this module skips models.users.
+    if name == "ExtendedTaxonomyEntry":
+        from models.taxonomy_tags import ExtendedTaxonomyEntry
+
+        return ExtendedTaxonomyEntry
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
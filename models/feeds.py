@@ -3,19 +3,21 @@ from __future__ import annotations
 from typing import Sequence
 from typing import Optional, Union
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
     DistributionLevelId,
     Timestamp,
+    MispBaseModel,
+    MispRootModel,
 )
 from models.organisation import Organisation
 from models.server import FeedInputSource, FeedSourceFormat
 
 
-class ServerNoId(BaseModel):
+class ServerNoId(MispBaseModel):
     name: Annotated[
         Optional[str], Field(None, examples=["Phising Server"], max_length=255)
     ]
@@ -82,18 +84,18 @@ class Server(ServerNoId):
     id: MispID
 
 
-class ServerListItem(BaseModel):
+class ServerListItem(MispBaseModel):
     Server: Optional[Server] = None
     Organisation: Optional[Organisation] = None
     RemoteOrg: Optional[Organisation] = None
     User: Optional[Sequence[User]] = None
 
 
-class ServerList(RootModel[Sequence[ServerListItem]]):
+class ServerList(MispRootModel[Sequence[ServerListItem]]):
     root: Sequence[ServerListItem]
 
 
-class FeedNoId(BaseModel):
+class FeedNoId(MispBaseModel):
     name: Annotated[
         Optional[str], Field(None, examples=["CIRCL OSINT Feed"], max_length=255)
     ]
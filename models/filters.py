@@ -0,0 +1,70 @@
+"""Canonical form of ``restSearch`` filters.
+
+Two filters asking the same question should read the same however they
+were spelled: :func:`canonical_filters` drops unset fields, uses the wire
+names of aliased fields (``from_`` is sent as ``from``) and sorts the
+filters whose order carries no meaning. The ``restSearch`` cache hashes
+that form, and the local attribute search engine evaluates it.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Mapping
+
+from pydantic import BaseModel
+
+#: Filters whose values are sets: their order does not change the result.
+UNORDERED_FILTERS = frozenset(
+    {
+        "tags",
+        "event_tags",
+        "sharinggroup",
+        "type",
+        "category",
+        "org",
+        "uuid",
+        "eventid",
+    }
+)
+
+
+def canonical_filters(filters: Any) -> Dict[str, Any]:
+    """``filters`` as the request body it stands for, in canonical form."""
+    if isinstance(filters, BaseModel):
+        body = filters.model_dump(mode="json", by_alias=True, exclude_none=True)
+    else:
+        # A field name given instead of its alias.
+        body = {
+            ("from" if name == "from_" else name): value
+            for name, value in filters.items()
+        }
+    # exclude_none keeps root models wrapping None, such as an unset MispID.
+    return {
+        name: _canonical(name, value)
+        for name, value in body.items()
+        if value is not None
+    }
+
+
+def as_list(value: Any) -> List[Any]:
+    """The values of a filter given either one value or a collection of them.
+
+    An unset filter (``None``) has no values.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return list(value)
+    return [value]
+
+
+def _canonical(name: str, value: Any) -> Any:
+    if isinstance(value, Mapping):
+        # ``tags`` may be {"OR": [...], "NOT": [...]}.
+        return {key: _canonical(name, item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_canonical(name, item) for item in value]
+        if name in UNORDERED_FILTERS:
+            items = sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+        return items
+    return value
@@ -1,21 +1,29 @@
 from __future__ import annotations
 
 from typing import Mapping, Sequence
-from typing import Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
-from models.common import MispID, DistributionLevelId
+from models.common import (
+    MispID,
+    DistributionLevelId,
+    MispBaseModel,
+    MispRootModel,
+)
 from models.organisation import Organisation
 
+if TYPE_CHECKING:
+    from models import galaxy
 
-class GalaxyClusterVersion(RootModel[Optional[str]]):
+
+class GalaxyClusterVersion(MispRootModel[Optional[str]]):
     root: Annotated[Optional[str], Field(None, examples=["1"], max_length=255)] = None
 
 
-class GalaxyElement(BaseModel):
+class GalaxyElement(MispBaseModel):
     id: MispID
     galaxy_cluster_id: MispID
     key: Annotated[Optional[str], Field(None, examples=["categories"], max_length=255)]
@@ -24,18 +32,18 @@ class GalaxyElement(BaseModel):
     ]
 
 
-class GalaxyElementList(RootModel[Sequence[GalaxyElement]]):
+class GalaxyElementList(MispRootModel[Sequence[GalaxyElement]]):
     root: Sequence[GalaxyElement]
 
 
-class GalaxyValueSearchFilter(RootModel[str]):
+class GalaxyValueSearchFilter(MispRootModel[str]):
     root: Annotated[str, Field(examples=["botnet"])]
     """
     Text search term to find a matching galaxy name, namespace, description, kill_chain_order or uuid.
     """
 
 
-class Galaxy(BaseModel):
+class Galaxy(MispBaseModel):
     id: MispID
     uuid: Optional[UUID]
     name: Annotated[Optional[str], Field(None, examples=["Ransomware"], max_length=255)]
@@ -67,7 +75,7 @@ class Galaxy(BaseModel):
     ]
 
 
-class GalaxyClusterNoId(BaseModel):
+class GalaxyClusterNoId(MispBaseModel):
     uuid: Optional[UUID]
     collection_uuid: Optional[UUID]
     type: Annotated[
@@ -116,7 +124,7 @@ class GalaxyClusterNoId(BaseModel):
     ]
     published: Optional[bool] = None
     deleted: Optional[bool] = None
-    GalaxyElement: Optional[Sequence[GalaxyElement]] = None
+    GalaxyElement: Optional[Sequence[galaxy.GalaxyElement]] = None
 
 
 class GalaxyCluster(GalaxyClusterNoId):
@@ -124,7 +132,7 @@ class GalaxyCluster(GalaxyClusterNoId):
 
 
 class ExtendedGalaxyCluster(GalaxyCluster):
-    Galaxy: Optional[Galaxy] = None
+    Galaxy: Optional[galaxy.Galaxy] = None
     GalaxyClusterRelation: Optional[Sequence[GalaxyElement]] = None
     Org: Optional[Organisation] = None
     Orgc: Optional[Organisation] = None
@@ -132,12 +140,12 @@ class ExtendedGalaxyCluster(GalaxyCluster):
     tag_id: MispID
 
 
-class ExtendedGalaxy(BaseModel):
-    Galaxy: Optional[Galaxy] = None
-    GalaxyCluster: Optional[Sequence[GalaxyCluster]] = None
+class ExtendedGalaxy(MispBaseModel):
+    Galaxy: Optional[galaxy.Galaxy] = None
+    GalaxyCluster: Optional[Sequence[galaxy.GalaxyCluster]] = None
 
 
-class Value(BaseModel):
+class Value(MispBaseModel):
     description: Annotated[
         Optional[str],
         Field(
@@ -178,7 +186,7 @@ class Value(BaseModel):
     """
 
 
-class GalaxyMispFormat(BaseModel):
+class GalaxyMispFormat(MispBaseModel):
     name: Annotated[Optional[str], Field(None, examples=["Ransomware"], max_length=255)]
     type: Annotated[Optional[str], Field(None, examples=["ransomware"], max_length=255)]
     authors: Optional[Sequence[str]] = None
@@ -191,10 +199,10 @@ class GalaxyMispFormat(BaseModel):
     values: Optional[Sequence[Value]] = None
 
 
-class Galaxy1(BaseModel):
+class Galaxy1(MispBaseModel):
     uuid: Optional[UUID]
 
 
-class ImportGalaxyClusterItem(BaseModel):
+class ImportGalaxyClusterItem(MispBaseModel):
     GalaxyCluster: Optional[GalaxyClusterNoId] = None
     Galaxy: Optional[Galaxy1] = None
@@ -4,12 +4,13 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import EmailStr, Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
     ModelName,
+    MispBaseModel,
 )
 
 
@@ -71,7 +72,7 @@ class LogActionType(str, Enum):
     WIPE_DEFAULT = "wipe_default"
 
 
-class Log(BaseModel):
+class Log(MispBaseModel):
     id: MispID
     title: Annotated[
         Optional[str],
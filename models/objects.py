@@ -1,19 +1,23 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import Optional, List
+from typing import TYPE_CHECKING, Optional, List
 from typing import Sequence
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
     DistributionLevelId,
+    MispBaseModel,
 )
 from models.events import Event4
 
+if TYPE_CHECKING:
+    from models import attributes
+
 
 class ObjectNames(str, Enum):
     ACQUAINTANCE = 'Acquaintance'
@@ -263,7 +267,7 @@ class ObjectFormats(str, Enum):
     STIX21 = "stix-2.1"
 
 
-class ObjectRelationshipType(BaseModel):
+class ObjectRelationshipType(MispBaseModel):
     # See object-relationship.json
     # or https://github.com/MISP/misp-objects/blob/main/relationships/definition.json
     name: ObjectNames
@@ -272,7 +276,7 @@ class ObjectRelationshipType(BaseModel):
     description: str
 
 
-class Object(BaseModel):
+class Object(MispBaseModel):
     id: MispID
     name: Annotated[
         Optional[str], Field(None, examples=["ail-leak"], max_length=131071)
@@ -300,7 +304,7 @@ class Object(BaseModel):
     last_seen: Annotated[
         Optional[str], Field(None, examples=["1581984000000000"], pattern="^\\d+$|^$")
     ]
-    Attribute: Optional[Sequence[Attribute]] = None
+    Attribute: Optional[Sequence[attributes.Attribute]] = None
 
 
 class ExtendedObject(Object):
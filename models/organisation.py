@@ -4,23 +4,25 @@ from typing import Sequence
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, RootModel, constr
+from pydantic import Field, constr
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
+    MispBaseModel,
+    MispRootModel,
 )
 
 
-class OrganisationId(RootModel[str]):
+class OrganisationId(MispRootModel[str]):
     root: Annotated[str, Field(examples=["12345"], max_length=10, pattern="^\\d+$")]
 
 
-class OrganisationName(RootModel[str]):
+class OrganisationName(MispRootModel[str]):
     root: Annotated[str, Field(examples=["ORGNAME"], max_length=255)]
 
 
-class OrganisationNoId(BaseModel):
+class OrganisationNoId(MispBaseModel):
     name: Annotated[Optional[str], Field(None, examples=["ORGNAME"], max_length=255)]
     date_created: Annotated[
         Optional[str], Field(None, examples=["2021-06-14 14:29:19"])
@@ -52,15 +54,15 @@ class Organisation(OrganisationNoId):
     id: MispID
 
 
-class OrganisationListItem(BaseModel):
+class OrganisationListItem(MispBaseModel):
     Organisation: Optional[Organisation] = None
 
 
-class OrganisationList(RootModel[Sequence[OrganisationListItem]]):
+class OrganisationList(MispRootModel[Sequence[OrganisationListItem]]):
     root: Sequence[OrganisationListItem]
 
 
-class OrganisationModel(BaseModel):
+class OrganisationModel(MispBaseModel):
     id: MispID
     uuid: Optional[UUID]
     name: Annotated[Optional[str], Field(None, examples=["ORGNAME"], max_length=255)]
@@ -2,10 +2,10 @@ from __future__ import annotations
 
 from typing import Sequence
 from enum import Enum
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.attributes import ExtendedAttribute
@@ -14,13 +14,16 @@ from models.common import (
     AttributeType,
     AttributeCategory,
     ThreatLevelId,
+    MispBaseModel,
+    MispRootModel,
 )
-from models.decay import DecayingModelParameters
-from models.organisation import OrganisationId, OrganisationName
 
+if TYPE_CHECKING:
+    from models import decay, events, objects, organisation, taxonomy_tags
 
-class ObjectRestSearchList(BaseModel):
-    Object: Optional[Object] = None
+
+class ObjectRestSearchList(MispBaseModel):
+    Object: Optional[objects.Object] = None
 
 
 class ObjectsRestSearchReturnFormat(str, Enum):
@@ -69,7 +72,7 @@ class AttributesRestSearchReturnFormat(str, Enum):
     YARA_JSON = "yara-json"
 
 
-class ObjectRestSearchFilter(BaseModel):
+class ObjectRestSearchFilter(MispBaseModel):
     page: Annotated[Optional[int], Field(None, ge=1)]
     limit: Annotated[Optional[int], Field(None, ge=0)]
     quickFilter: Annotated[Optional[str], Field(None, examples=["malware"])]
@@ -121,7 +124,9 @@ class ObjectRestSearchFilter(BaseModel):
     publish_timestamp: Annotated[
         Optional[str], Field(None, examples=["1617875568"], pattern="^\\d+$")
     ]
-    org: Optional[Union[OrganisationId, OrganisationName]] = None
+    org: Optional[
+        Union[organisation.OrganisationId, organisation.OrganisationName]
+    ] = None
     uuid: Optional[UUID]
     value: Annotated[
         Optional[str], Field(None, examples=["127.0.0.1"], max_length=131071)
@@ -214,7 +219,7 @@ class ObjectRestSearchFilter(BaseModel):
     """
     Specify the decaying model from which the decaying score should be calculated
     """
-    modelOverrides: Optional[DecayingModelParameters] = None
+    modelOverrides: Optional[decay.DecayingModelParameters] = None
     score: Optional[str] = None
     """
     An alias to override on-the-fly the threshold of the decaying model
@@ -222,7 +227,7 @@ class ObjectRestSearchFilter(BaseModel):
     returnFormat: Optional[ObjectsRestSearchReturnFormat] = None
 
 
-class AttributeRestSearchFilter(BaseModel):
+class AttributeRestSearchFilter(MispBaseModel):
     page: Annotated[Optional[int], Field(None, ge=1)]
     limit: Annotated[Optional[int], Field(None, ge=0)]
     value: Annotated[
@@ -236,7 +241,9 @@ class AttributeRestSearchFilter(BaseModel):
     ]
     type: Optional[AttributeType] = None
     category: Optional[AttributeCategory] = None
-    org: Optional[Union[OrganisationId, OrganisationName]] = None
+    org: Optional[
+        Union[organisation.OrganisationId, organisation.OrganisationName]
+    ] = None
     tags: Optional[Sequence[str]] = None
     from_: Annotated[Optional[str], Field(None, alias="from")]
     """
@@ -335,7 +342,7 @@ class AttributeRestSearchFilter(BaseModel):
     Extend response with Sightings DB results if the module is enabled
     """
     includeCorrelations: Optional[bool] = None
-    modelOverrides: Optional[DecayingModelParameters] = None
+    modelOverrides: Optional[decay.DecayingModelParameters] = None
     includeDecayScore: Optional[bool] = None
     """
     Include all enabled decaying score
@@ -352,23 +359,23 @@ class AttributeRestSearchFilter(BaseModel):
 
 
 class AttributeRestSearchListItem(ExtendedAttribute):
-    Event: Optional[Event] = None
-    Object: Optional[Object] = None
-    Tag: Optional[Sequence[Tag]] = None
+    Event: Optional[events.Event] = None
+    Object: Optional[objects.Object] = None
+    Tag: Optional[Sequence[taxonomy_tags.Tag]] = None
 
 
-class AttributeRestSearchList(RootModel[Sequence[AttributeRestSearchListItem]]):
+class AttributeRestSearchList(MispRootModel[Sequence[AttributeRestSearchListItem]]):
     root: Sequence[AttributeRestSearchListItem]
 
 
-class DateIntervalRestSearchFilter(RootModel[Sequence[str]]):
+class DateIntervalRestSearchFilter(MispRootModel[Sequence[str]]):
     root: Annotated[Sequence[str], Field(ge=2, le=2)]
     """
     Interval described by two dates
     """
 
 
-class ExcludeLocalTagsRestSearchFilter(RootModel[Optional[bool]]):
+class ExcludeLocalTagsRestSearchFilter(MispRootModel[Optional[bool]]):
     root: Optional[bool] = None
     """
     Exclude local tags from the export
@@ -5,37 +5,37 @@ from enum import Enum
 from typing import Any, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
-from models.common import MispID
+from models.common import MispID, MispBaseModel, MispRootModel
 
 
-class Position(BaseModel):
+class Position(MispBaseModel):
     x: Annotated[Optional[str], Field(None, examples=["0"], pattern="^\\d+$")]
     y: Annotated[Optional[str], Field(None, examples=["0"], pattern="^\\d+$")]
     width: Annotated[Optional[str], Field(None, examples=["2"], pattern="^\\d+$")]
     height: Annotated[Optional[str], Field(None, examples=["2"], pattern="^\\d+$")]
 
 
-class DashboardUserSetting(BaseModel):
+class DashboardUserSetting(MispBaseModel):
     widget: Annotated[Optional[str], Field(None, examples=["MispStatusWidget"])]
     position: Optional[Position] = None
 
 
-class PublishAlertFilterUserSetting(BaseModel):
+class PublishAlertFilterUserSetting(MispBaseModel):
     pass
 
 
-class HomepageUserSetting(BaseModel):
+class HomepageUserSetting(MispBaseModel):
     path: Annotated[Optional[str], Field(None, examples=["/events/index"])]
 
 
-class DefaultRestSearchParametersUserSetting(BaseModel):
+class DefaultRestSearchParametersUserSetting(MispBaseModel):
     pass
 
 
-class TagNumbericalValueOverrideUserSetting(BaseModel):
+class TagNumbericalValueOverrideUserSetting(MispBaseModel):
     pass
 
 
@@ -49,7 +49,7 @@ class UserSettingName(str, Enum):
     EVENT_INDEX_HIDE_COLUMNS = "event_index_hide_columns"
 
 
-class ViewUserSettings(BaseModel):
+class ViewUserSettings(MispBaseModel):
     publish_alert_filter: Optional[PublishAlertFilterUserSetting] = None
     dashboard_access: Optional[bool] = None
     dashboard: Optional[Sequence[DashboardUserSetting]] = None
@@ -66,7 +66,7 @@ class ChangePw(str, Enum):
     FIELD_1 = "1"
 
 
-class PhpServerSetting(BaseModel):
+class PhpServerSetting(MispBaseModel):
     explanation: Annotated[
         Optional[str],
         Field(
@@ -81,13 +81,13 @@ class PhpServerSetting(BaseModel):
     value: Optional[Union[int, str]] = None
 
 
-class ServerPackageVersion(BaseModel):
+class ServerPackageVersion(MispBaseModel):
     version: Annotated[Optional[str], Field(None, examples=["1.2.0.11"])]
     expected: Annotated[Optional[str], Field(None, examples=[">1.2.0.9"])]
     status: Annotated[Optional[int], Field(None, examples=[1], ge=0)]
 
 
-class DatabaseTableDiagnostics(BaseModel):
+class DatabaseTableDiagnostics(MispBaseModel):
     used: Annotated[Optional[str], Field(None, examples=["207.63MB"])]
     reclaimable: Annotated[Optional[str], Field(None, examples=["5MB"])]
     table: Annotated[Optional[str], Field(None, examples=["attributes"])]
@@ -99,7 +99,7 @@ class Type(str, Enum):
     NUMERIC = "numeric"
 
 
-class MispSetting(BaseModel):
+class MispSetting(MispBaseModel):
     level: Annotated[Optional[int], Field(None, examples=[0])]
     value: Optional[Union[str, bool, float]] = None
     errorMessage: Annotated[
@@ -130,7 +130,7 @@ class MispSetting(BaseModel):
     ] = None
 
 
-class Worker(BaseModel):
+class Worker(MispBaseModel):
     pid: Annotated[Optional[int], Field(None, examples=[1233])]
     user: Annotated[Optional[str], Field(None, examples=["www-data"])]
     alive: Optional[bool] = None
@@ -138,13 +138,13 @@ class Worker(BaseModel):
     ok: Optional[bool] = None
 
 
-class WorkersStatus(BaseModel):
+class WorkersStatus(MispBaseModel):
     ok: Optional[bool] = None
     workers: Optional[Sequence[Worker]] = None
     jobCount: Annotated[Optional[int], Field(None, examples=[0])]
 
 
-class UpdateServerResultItem(BaseModel):
+class UpdateServerResultItem(MispBaseModel):
     input: Annotated[
         Optional[str],
         Field(
@@ -170,7 +170,7 @@ class FeedInputSource(str, Enum):
     NETWORK = "network"
 
 
-class UserSetting(BaseModel):
+class UserSetting(MispBaseModel):
     id: MispID
     setting: Optional[UserSettingName] = None
     value: Optional[
@@ -190,7 +190,7 @@ class UserSetting(BaseModel):
     ]
 
 
-class SortSearchField(RootModel[Optional[str]]):
+class SortSearchField(MispRootModel[Optional[str]]):
     root: Annotated[Optional[str], Field(None, examples=["timestamp"])] = None
     """
     Field to be used to sort the result
@@ -202,13 +202,13 @@ class DirectionSearchField(str, Enum):
     DESC = "desc"
 
 
-class ApiError(BaseModel):
+class ApiError(MispBaseModel):
     name: str
     message: str
     url: Annotated[str, Field(examples=["/attributes"])]
 
 
-class UnauthorizedApiError(BaseModel):
+class UnauthorizedApiError(MispBaseModel):
     name: Annotated[
         str,
         Field(
@@ -228,19 +228,19 @@ class UnauthorizedApiError(BaseModel):
     url: Annotated[str, Field(examples=["/attributes"])]
 
 
-class NotFoundApiError(BaseModel):
+class NotFoundApiError(MispBaseModel):
     name: Annotated[str, Field(examples=["Invalid attribute"])]
     message: Annotated[str, Field(examples=["Invalid attribute"])]
     url: Annotated[str, Field(examples=["/attributes/1234"])]
 
 
-class NotFoundUserTotpDeleteError(BaseModel):
+class NotFoundUserTotpDeleteError(MispBaseModel):
     name: Annotated[str, Field(examples=["Invalid user"])]
     message: Annotated[str, Field(examples=["Invalid user"])]
     url: Annotated[str, Field(examples=["/users/totp_delete/1"])]
 
 
-class AuthKey(BaseModel):
+class AuthKey(MispBaseModel):
     id: MispID
     uuid: Optional[UUID]
     authkey_start: Annotated[Optional[str], Field(None, max_length=4)]
@@ -5,15 +5,17 @@ from typing import Optional
 from typing import Sequence
 from uuid import UUID
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
+    MispBaseModel,
+    MispRootModel,
 )
 
 
-class Role(BaseModel):
+class Role(MispBaseModel):
     id: Annotated[
         Optional[str], Field(None, examples=["3"], max_length=10, pattern="^\\d+$")
     ]
@@ -49,20 +51,20 @@ class Role(BaseModel):
     permission_description: Annotated[Optional[str], Field(None, examples=["publish"])]
 
 
-class SharingGroupServerId(RootModel[Optional[str]]):
+class SharingGroupServerId(MispRootModel[Optional[str]]):
     root: Annotated[
         Optional[str], Field(None, examples=["1"], max_length=10, pattern="^\\d+$|^$")
     ] = None
 
 
-class Server1(BaseModel):
+class Server1(MispBaseModel):
     id: MispID
     name: Annotated[
         Optional[str], Field(None, examples=["Phising Server"], max_length=255)
     ]
 
 
-class SharingGroupServer(BaseModel):
+class SharingGroupServer(MispBaseModel):
     all_orgs: Optional[bool] = None
     server_id: MispID
     sharing_group_id: Annotated[
@@ -71,7 +73,7 @@ class SharingGroupServer(BaseModel):
     Server: Optional[Server1] = None
 
 
-class SlimSharingGroupNoId(BaseModel):
+class SlimSharingGroupNoId(MispBaseModel):
     uuid: Optional[UUID]
     name: Annotated[
         Optional[str], Field(None, examples=["Banking Sharing Group"], max_length=255)
@@ -109,13 +111,13 @@ class SharingGroup(SharingGroupNoId):
     ]
 
 
-class Organisation2(BaseModel):
+class Organisation2(MispBaseModel):
     id: MispID
     name: Annotated[Optional[str], Field(None, examples=["ORGNAME"], max_length=255)]
     uuid: Optional[UUID]
 
 
-class SharingGroupOrganisation(BaseModel):
+class SharingGroupOrganisation(MispBaseModel):
     id: Annotated[
         Optional[str], Field(None, examples=["1"], max_length=10, pattern="^\\d+$|^$")
     ]
@@ -127,7 +129,7 @@ class SharingGroupOrganisation(BaseModel):
     Organisation: Optional[Organisation2] = None
 
 
-class SharingGroupListItem(BaseModel):
+class SharingGroupListItem(MispBaseModel):
     SharingGroup: Optional[SlimSharingGroup] = None
     Organisation: Optional[Organisation2] = None
     SharingGroupOrg: Optional[Sequence[SharingGroupOrganisation]] = None
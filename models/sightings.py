@@ -8,16 +8,17 @@ from __future__ import annotations
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
+    MispBaseModel,
 )
 from models.organisation import OrganisationModel
 
 
-class Sighting(BaseModel):
+class Sighting(MispBaseModel):
     id: MispID
     attribute_id: MispID
     event_id: MispID
@@ -1,17 +1,22 @@
 from __future__ import annotations
 
 from typing import Sequence
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
+    MispBaseModel,
 )
+from models.users import UserNoId
 
+if TYPE_CHECKING:
+    from models import taxonomy_tags
 
-class Taxonomy(BaseModel):
+
+class Taxonomy(MispBaseModel):
     id: MispID
     namespace: Annotated[Optional[str], Field(None, examples=["tlp"])]
     description: Annotated[
@@ -29,7 +34,7 @@ class Taxonomy(BaseModel):
     required: Optional[bool] = None
 
 
-class TaxonomyPredicate(BaseModel):
+class TaxonomyPredicate(MispBaseModel):
     id: MispID
     taxonomy_id: MispID
     value: Annotated[Optional[str], Field(None, examples=["white"])]
@@ -56,7 +61,7 @@ class TaxonomyPredicate(BaseModel):
     numerical_value: Optional[int] = None
 
 
-class TaxonomyPredicateExport(BaseModel):
+class TaxonomyPredicateExport(MispBaseModel):
     value: Annotated[Optional[str], Field(None, examples=["white"])]
     expanded: Annotated[
         Optional[str],
@@ -69,7 +74,7 @@ class TaxonomyPredicateExport(BaseModel):
     ]
 
 
-class TaxonomyEntryExport(BaseModel):
+class TaxonomyEntryExport(MispBaseModel):
     value: Annotated[Optional[str], Field(None, examples=["spam"])]
     expanded: Annotated[Optional[str], Field(None, examples=["spam"])]
     description: Annotated[
@@ -83,12 +88,12 @@ class TaxonomyEntryExport(BaseModel):
     ]
 
 
-class TaxonomyValueExport(BaseModel):
+class TaxonomyValueExport(MispBaseModel):
     predicate: Annotated[Optional[str], Field(None, examples=["white"])]
     entry: Optional[Sequence[TaxonomyEntryExport]] = None
 
 
-class TaxonomyEntry(BaseModel):
+class TaxonomyEntry(MispBaseModel):
     tag: Annotated[Optional[str], Field(None, examples=["tlp:white"], max_length=255)]
     expanded: Optional[str] = None
     description: Optional[str] = None
@@ -96,7 +101,12 @@ class TaxonomyEntry(BaseModel):
     existing_tag: Optional[bool] = None
 
 
-class TagNoId(BaseModel):
+class ExtendedTaxonomyEntry(UserNoId):
+    events: Optional[float] = None
+    attributes: Optional[float] = None
+
+
+class TagNoId(MispBaseModel):
     name: Annotated[Optional[str], Field(None, examples=["tlp:white"], max_length=255)]
     colour: Annotated[Optional[str], Field(None, examples=["#ffffff"], max_length=7)]
     exportable: Optional[bool] = None
@@ -115,7 +125,7 @@ class Tag(TagNoId):
     id: MispID
 
 
-class ExtendedTag(BaseModel):
-    Tag: Optional[Tag] = None
-    Taxonomy: Optional[Taxonomy] = None
-    TaxonomyPredicate: Optional[TaxonomyPredicate] = None
+class ExtendedTag(MispBaseModel):
+    Tag: Optional[taxonomy_tags.Tag] = None
+    Taxonomy: Optional[taxonomy_tags.Taxonomy] = None
+    TaxonomyPredicate: Optional[taxonomy_tags.TaxonomyPredicate] = None
@@ -3,20 +3,22 @@ from __future__ import annotations
 from typing import Mapping, Sequence
 from typing import Any, Optional
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
 from models.common import (
     AttributeType,
     AttributeCategory,
+    MispBaseModel,
+    MispRootModel,
 )
 
 
-class AttributeStatisticsResponse(BaseModel):
+class AttributeStatisticsResponse(MispBaseModel):
     pass
 
 
-class DescribeAttributeTypesResponse(BaseModel):
+class DescribeAttributeTypesResponse(MispBaseModel):
     sane_defaults: Annotated[
         Optional[Mapping[str, Any]],
         Field(
@@ -45,13 +47,13 @@ class DescribeAttributeTypesResponse(BaseModel):
     ]
 
 
-class ObjectRelation(RootModel[str]):
+class ObjectRelation(MispRootModel[str]):
     root: Annotated[str, Field(examples=["sensor"], max_length=255)]
 
 
-class ObjectTemplateId(RootModel[str]):
+class ObjectTemplateId(MispRootModel[str]):
     root: Annotated[str, Field(examples=["12345"], max_length=10, pattern="^\\d+$")]
 
 
-class TagCollectionId(RootModel[str]):
+class TagCollectionId(MispRootModel[str]):
     root: Annotated[str, Field(examples=["12345"], max_length=10, pattern="^\\d+$")]
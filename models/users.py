@@ -3,16 +3,18 @@ from __future__ import annotations
 from typing import Sequence
 from typing import Optional
 
-from pydantic import AwareDatetime, BaseModel, EmailStr, Field, RootModel
+from pydantic import AwareDatetime, EmailStr, Field
 from typing_extensions import Annotated
 
 from models.common import (
     MispID,
+    MispBaseModel,
+    MispRootModel,
 )
 from models.server import ChangePw, ViewUserSettings
 
 
-class UserNoId(BaseModel):
+class UserNoId(MispBaseModel):
     org_id: MispID
     server_id: MispID
     email: Optional[EmailStr] = None
@@ -75,16 +77,16 @@ class ExtendedUser(User):
     UserSetting: Optional[ViewUserSettings] = None
 
 
-class Organisation1(BaseModel):
+class Organisation1(MispBaseModel):
     id: MispID
     name: Annotated[Optional[str], Field(None, examples=["ORGNAME"], max_length=255)]
 
 
-class UserListItem(BaseModel):
+class UserListItem(MispBaseModel):
     User: Optional[User] = None
     Role: Optional[Role] = None
     Organisation: Optional[Organisation1] = None
 
 
-class UserList(RootModel[Sequence[UserListItem]]):
+class UserList(MispRootModel[Sequence[UserListItem]]):
     root: Sequence[UserListItem]
@@ -0,0 +1,87 @@
+"""Validation into leaner variants of the models.
+
+When a search names its ``requested_attributes``, the server only sends
+those fields; :func:`projected_model` builds the model declaring only
+them, so a response is validated and stored at the cost of what it holds
+rather than of the full model.
+"""
+from __future__ import annotations
+
+from collections import abc
+from typing import Dict, FrozenSet, Iterable, Optional, Sequence, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, RootModel, create_model
+from pydantic.fields import FieldInfo
+from typing_extensions import get_args, get_origin
+
+from models.common import MispBaseModel, MispRootModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_PROJECTED_PREFIX = "Projected"
+_projections: Dict[Tuple[type, FrozenSet[str]], type] = {}
+
+
+def projected_model(model: Type[ModelT], fields: Iterable[str]) -> Type[ModelT]:
+    """Variant of ``model`` declaring only ``fields``.
+
+    Meant for responses to a search with ``requested_attributes``: the
+    variant validates and stores the requested fields only, each with its
+    original type and constraints, and ignores anything else in the input.
+    A root model over a list of models is projected item-wise. Variants are
+    cached per model and field set and kept as attributes of this module.
+
+    The variant is a separate model, not a subclass of ``model``. Raises
+    :class:`ValueError` if ``model`` has no field by one of the names.
+    """
+    key = (model, frozenset(fields))
+    projected = _projections.get(key)
+    if projected is not None:
+        return projected
+
+    name = "__".join([_PROJECTED_PREFIX + model.__name__, *sorted(key[1])])
+    item_model = _sequence_item_model(model)
+    if item_model is not None:
+        item = projected_model(item_model, key[1])
+        base = MispRootModel[Sequence[item]]  # type: ignore[valid-type]
+        projected = create_model(name, __base__=base)
+    else:
+        model.model_rebuild()
+        unknown = key[1] - model.model_fields.keys()
+        if unknown:
+            raise ValueError(
+                f"{model.__name__} has no field {', '.join(sorted(unknown))}"
+            )
+        projected = create_model(
+            name,
+            __base__=MispBaseModel,
+            **{
+                name: (field.annotation, _copy_field(field))
+                for name, field in model.model_fields.items()
+                if name in key[1]
+            },
+        )
+    projected.__module__ = __name__
+    globals()[projected.__name__] = projected
+    _projections[key] = projected
+    return projected  # type: ignore[return-value]
+
+
+def _copy_field(field: FieldInfo) -> FieldInfo:
+    copied = FieldInfo.merge_field_infos(field)
+    copied.annotation = None
+    return copied
+
+
+def _sequence_item_model(model: Type[BaseModel]) -> Optional[Type[BaseModel]]:
+    if not issubclass(model, RootModel):
+        return None
+    model.model_rebuild()
+    annotation = model.model_fields["root"].annotation
+    origin = get_origin(annotation)
+    if not isinstance(origin, type) or not issubclass(origin, abc.Sequence):
+        return None
+    item = get_args(annotation)[0]
+    if isinstance(item, type) and issubclass(item, BaseModel):
+        return item
+    return None
@@ -2,13 +2,18 @@ from __future__ import annotations
 
 from typing import Sequence
 from enum import Enum
-from typing import Optional, Union
+from typing import TYPE_CHECKING, Optional, Union
 
-from pydantic import BaseModel, Field, RootModel
+from pydantic import Field
 from typing_extensions import Annotated
 
+from models.common import MispBaseModel, MispRootModel
 
-class Message(BaseModel):
+if TYPE_CHECKING:
+    from models import warning_lists
+
+
+class Message(MispBaseModel):
     en: Annotated[
         Optional[str],
         Field(
@@ -21,7 +26,7 @@ class Message(BaseModel):
     ]
 
 
-class Data(BaseModel):
+class Data(MispBaseModel):
     scope: Optional[Sequence[str]] = None
     field: Optional[Sequence[str]] = None
     value: Optional[Sequence[str]] = None
@@ -29,11 +34,11 @@ class Data(BaseModel):
     message: Optional[Message] = None
 
 
-class WarninglistId(RootModel[str]):
+class WarninglistId(MispRootModel[str]):
     root: Annotated[str, Field(examples=["3"], max_length=10, pattern="^\\d+$")]
 
 
-class WarninglistEntry(BaseModel):
+class WarninglistEntry(MispBaseModel):
     id: Annotated[Optional[str], Field(None, examples=["1234"], pattern="^\\d+$")]
     value: Annotated[Optional[str], Field(None, examples=["10.128.0.0/24"])]
     warninglist_id: Annotated[
@@ -49,7 +54,7 @@ class WarningListType(str, Enum):
     REGEX = "regex"
 
 
-class Warninglist(BaseModel):
+class Warninglist(MispBaseModel):
     id: Annotated[
         Optional[str], Field(None, examples=["3"], max_length=10, pattern="^\\d+$")
     ]
@@ -70,18 +75,18 @@ class Warninglist(BaseModel):
     """
     List of comma separated warninglist types.
     """
-    WarninglistEntry: Optional[Sequence[WarninglistEntry]] = None
+    WarninglistEntry: Optional[Sequence[warning_lists.WarninglistEntry]] = None
 
 
-class WarninglistsIdFilter(RootModel[Union[WarninglistId, Sequence[WarninglistId]]]):
+class WarninglistsIdFilter(MispRootModel[Union[WarninglistId, Sequence[WarninglistId]]]):
     root: Union[WarninglistId, Sequence[WarninglistId]]
 
 
-class WarninglistsNameFilter(RootModel[Union[str, Sequence[str]]]):
+class WarninglistsNameFilter(MispRootModel[Union[str, Sequence[str]]]):
     root: Union[str, Sequence[str]]
 
 
-class NoticelistEntry(BaseModel):
+class NoticelistEntry(MispBaseModel):
     id: Annotated[Optional[str], Field(None, examples=["1234"], pattern="^\\d+$")]
     noticelist_id: Annotated[
         Optional[str], Field(None, examples=["3"], max_length=10, pattern="^\\d+$")
@@ -93,4 +98,4 @@ class Noticelist(Warninglist):
     """
     List of comma separated warninglist types.
     """
-    NoticelistEntry: Optional[Sequence[NoticelistEntry]] = None
+    NoticelistEntry: Optional[Sequence[warning_lists.NoticelistEntry]] = None